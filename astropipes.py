@@ -13,14 +13,15 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 # ----------------------------------------------------------
 
-# Initialize database
-from lib.db import get_db_manager
-import config
-db_manager = get_db_manager(config.DATABASE_PATH)
-
 VIEWER_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'lib/gui/viewer/index.py'))
 
 if __name__ == "__main__":
+    # Initialize database here rather than at import: the GUI modules and the
+    # spawned scan workers import this file too
+    from lib.db import get_db_manager
+    import config
+    db_manager = get_db_manager(config.DATABASE_PATH)
+
     import argparse
     import sys
     from colorama import Fore, Style
@@ -55,10 +56,46 @@ if __name__ == "__main__":
     parser.add_argument(
         "--scan-all", action="store_true", help="scan and import both image and calibration FITS files into database"
     )
+    parser.add_argument(
+        "--analyze", nargs="?", const=0, type=int, metavar="MAX_FRAMES",
+        help="run source detection on all un-analyzed frames in the database (optionally at most MAX_FRAMES)"
+    )
+    parser.add_argument(
+        "--retry-failed", action="store_true",
+        help="with --analyze, also retry frames whose previous analysis failed"
+    )
+    parser.add_argument(
+        "--crossmatch", nargs="?", const="", metavar="TARGET",
+        help="match analyzed sources across frames (of TARGET, or of every target) and store their object ids"
+    )
     parser.add_argument(
         "-S", "--solve", nargs="+", metavar="FITS_FILE", 
         help="solve one or more FITS files using astrometry.net"
     )
+    parser.add_argument(
+        "--star-list", action="store_true",
+        help="with --solve, pass solve-field a list of the brightest stars found by our detector instead of the image"
+    )
+    parser.add_argument(
+        "--sequence", action="store_true",
+        help="with --solve, treat the files as a sequence of one field and propagate solutions between neighbouring frames"
+    )
+    parser.add_argument(
+        "--solve-jobs", type=int, metavar="N",
+        help="with --solve, number of concurrent solve-field processes (default: tuned to cores and index memory)"
+    )
+    parser.add_argument(
+        "--restore-wcs", nargs="+", metavar="FITS_FILE",
+        help="restore the header cards replaced by platesolving, from the .wcsjournal sidecar"
+    )
+    parser.add_argument(
+        "--cache-stats", action="store_true",
+        help="show the artifact store contents and hit rates"
+    )
+    parser.add_argument(
+        "--solve-benchmark", nargs="+", metavar="FITS_FILE",
+        help="compare solve times of the image and star-list paths (files are not modified)"
+    )
     parser.add_argument(
         "-C", "--calibrate", nargs="+", metavar="FITS_FILE", 
         help="calibrate one or more FITS files using master bias, dark, and flat"
@@ -79,6 +116,30 @@ if __name__ == "__main__":
         "--sigma-clip", action="store_true",
         help="apply sigma clipping during integration to reject outliers"
     )
+    parser.add_argument(
+        "--compress", choices=['none', 'rice', 'gzip', 'gzip2', 'hcompress'],
+        help="output format of calibrated, aligned and integrated files (default: config.OUTPUT_COMPRESSION)"
+    )
+    parser.add_argument(
+        "--quantize-level", type=float, metavar="Q",
+        help="with --compress, float quantization level (0 = lossless, gzip only; default: config.OUTPUT_QUANTIZE_LEVEL)"
+    )
+    parser.add_argument(
+        "--db-benchmark", nargs="?", type=int, const=200000, metavar="N_FILES",
+        help="time the library queries on a synthetic database of N_FILES files (default 200000), without and with the schema indexes"
+    )
+    parser.add_argument(
+        "--scan-benchmark", nargs="?", type=int, const=2000, metavar="N_FILES",
+        help="time the library scanner (serial, parallel and unchanged rescan) on a synthetic tree of N_FILES files (default 2000)"
+    )
+    parser.add_argument(
+        "--sky-benchmark", nargs="?", type=int, const=200000, metavar="N_FILES",
+        help="time the sky index build and footprint queries on a synthetic library of N_FILES files (default 200000)"
+    )
+    parser.add_argument(
+        "--compression-benchmark", nargs="+", metavar="FITS_FILE",
+        help="compare write/read throughput and file size of the output compressions (files are not modified)"
+    )
     parser.add_argument(
         "--get-obs", metavar="OBJECT_DESIGNATION", help="download and display MPC observations for the given asteroid designation"
     )
@@ -90,6 +151,10 @@ if __name__ == "__main__":
     )
     
     args = parser.parse_args()
+    if args.compress is not None:
+        config.OUTPUT_COMPRESSION = args.compress
+    if args.quantize_level is not None:
+        config.OUTPUT_QUANTIZE_LEVEL = args.quantize_level
 
     def launch_gui():
         """Launch the PyQt6 GUI viewer"""
@@ -181,6 +246,41 @@ if __name__ == "__main__":
         scan_calibration()
         print(f"\n{Style.BRIGHT + Fore.CYAN}Full scan completed!{Style.RESET_ALL}")
 
+    def analyze_library():
+        """Run source detection on un-analyzed frames of the database"""
+        try:
+            from lib.db import analyze_fits_library
+
+            print(f"{Style.BRIGHT + Fore.GREEN}Starting batch source analysis...{Style.RESET_ALL}")
+            print(f"Database: {db_manager.db_path}")
+
+            results = analyze_fits_library(limit=args.analyze or None, include_failed=args.retry_failed)
+
+            if results['cancelled']:
+                print(f"\n{Style.BRIGHT + Fore.YELLOW}Source analysis interrupted.{Style.RESET_ALL}")
+            else:
+                print(f"\n{Style.BRIGHT + Fore.GREEN}Source analysis completed!{Style.RESET_ALL}")
+            print(f"Analyzed {results['frames_analyzed']} frames at {results['frames_per_minute']:.1f} frames/min")
+
+        except KeyboardInterrupt:
+            print(f"\n{Style.BRIGHT + Fore.YELLOW}Source analysis interrupted; committed frames are kept.{Style.RESET_ALL}")
+            sys.exit(1)
+        except Exception as e:
+            print(f"{Style.BRIGHT + Fore.RED}Error during source analysis: {e}{Style.RESET_ALL}")
+            sys.exit(1)
+
+    def crossmatch_library():
+        """Match detected sources across the frames of each target"""
+        try:
+            print(f"{Style.BRIGHT + Fore.GREEN}Cross-matching sources...{Style.RESET_ALL}")
+            results = db_manager.crossmatch_sources(target=args.crossmatch or None, verbose=True)
+            print(f"\n{Style.BRIGHT + Fore.GREEN}Cross-matching completed!{Style.RESET_ALL}")
+            print(f"Matched {results['sources']} sources from {results['frames']} frames in {results['groups']} targets "
+                  f"({results['new_objects']} new objects, {results['elapsed']:.1f} s)")
+        except Exception as e:
+            print(f"{Style.BRIGHT + Fore.RED}Error during cross-matching: {e}{Style.RESET_ALL}")
+            sys.exit(1)
+
     def solve_image():
         """Solve one or more FITS images using astrometry.net"""
         try:
@@ -218,25 +318,61 @@ if __name__ == "__main__":
             # Temporarily enable logging for platesolving
             logging.disable(logging.NOTSET)
             
-            # Solve each file
-            for i, fits_file in enumerate(valid_files, 1):
-                print(f"\n{Style.BRIGHT + Fore.CYAN}[{i}/{len(valid_files)}] Processing: {os.path.basename(fits_file)}{Style.RESET_ALL}")
+            if args.sequence:
+                # Solve the files as one sequence, propagating solutions between neighbours
+                from lib.sci.platesolving import solve_sequence
+                results = solve_sequence(valid_files, use_star_list=args.star_list)
+                successful_solves = sum(1 for result in results if result.success)
+                failed_solves = len(results) - successful_solves
+            elif len(valid_files) > 1:
+                # Solve the files concurrently through the solver pool
+                from lib.sci.solver_pool import SolverPool, SolveJob
+                pool = SolverPool(max_workers=args.solve_jobs, timeout=config.SOLVER_OFFLINE_TIMEOUT,
+                                  use_star_list=args.star_list)
+                print(f"Concurrent solve-field processes: {pool.max_workers} (timeout {pool.timeout}s)")
+                done = []
                 
-                # Run the platesolving pipeline
-                result = solve_single_image(
-                    fits_file_path=fits_file,
-                    solve_field_path="solve-field",
-                    output_dir="/tmp/astropipes/solved",
-                    timeout=300,
-                    apply_solution=True
-                )
+                def report_status(job):
+                    if job.status == SolveJob.RUNNING:
+                        print(f"{Style.BRIGHT + Fore.CYAN}Solving {job.name}... ({pool.status_line()}){Style.RESET_ALL}")
+                    elif job.status in SolveJob.FINAL_STATES:
+                        done.append(job)
+                        color = Fore.GREEN if job.status == SolveJob.SOLVED else Fore.RED
+                        print(f"{Style.BRIGHT + color}[{len(done)}/{len(valid_files)}] {job}{Style.RESET_ALL}")
                 
-                if result.success:
-                    print(f"{Style.BRIGHT + Fore.GREEN}✓ Platesolving completed successfully!{Style.RESET_ALL}")
-                    successful_solves += 1
-                else:
-                    print(f"{Style.BRIGHT + Fore.RED}✗ Platesolving failed{Style.RESET_ALL}")
-                    failed_solves += 1
+                jobs = [pool.submit(fits_file, status_callback=report_status) for fits_file in valid_files]
+                try:
+                    for job in jobs:
+                        job.wait()
+                except KeyboardInterrupt:
+                    print(f"\n{Style.BRIGHT + Fore.YELLOW}Interrupted, cancelling remaining solves...{Style.RESET_ALL}")
+                    pool.cancel_all()
+                    for job in jobs:
+                        job.wait()
+                pool.shutdown()
+                successful_solves = sum(1 for job in jobs if job.status == SolveJob.SOLVED)
+                failed_solves = len(jobs) - successful_solves
+            else:
+                # Solve a single file with live solve-field output
+                for i, fits_file in enumerate(valid_files, 1):
+                    print(f"\n{Style.BRIGHT + Fore.CYAN}[{i}/{len(valid_files)}] Processing: {os.path.basename(fits_file)}{Style.RESET_ALL}")
+                
+                    # Run the platesolving pipeline
+                    result = solve_single_image(
+                        fits_file_path=fits_file,
+                        solve_field_path="solve-field",
+                        output_dir="/tmp/astropipes/solved",
+                        timeout=config.SOLVER_OFFLINE_TIMEOUT,
+                        apply_solution=True,
+                        use_star_list=args.star_list
+                    )
+                
+                    if result.success:
+                        print(f"{Style.BRIGHT + Fore.GREEN}✓ Platesolving completed successfully!{Style.RESET_ALL}")
+                        successful_solves += 1
+                    else:
+                        print(f"{Style.BRIGHT + Fore.RED}✗ Platesolving failed{Style.RESET_ALL}")
+                        failed_solves += 1
             
             # Disable logging again after platesolving
             logging.disable(sys.maxsize)
@@ -259,6 +395,93 @@ if __name__ == "__main__":
             print(f"{Style.BRIGHT + Fore.RED}Error during platesolving: {e}{Style.RESET_ALL}")
             sys.exit(1)
 
+    def benchmark_solving():
+        """Compare solve-field times with and without star-list extraction"""
+        try:
+            from lib.sci.platesolving import benchmark_star_list_solving
+
+            fits_files = [f for f in args.solve_benchmark if os.path.exists(f)]
+            if not fits_files:
+                print(f"{Style.BRIGHT + Fore.RED}No valid FITS files found to benchmark{Style.RESET_ALL}")
+                sys.exit(1)
+
+            print(f"{Style.BRIGHT + Fore.BLUE}Benchmarking platesolving on {len(fits_files)} file(s)...{Style.RESET_ALL}")
+            benchmark_star_list_solving(fits_files)
+
+        except Exception as e:
+            print(f"{Style.BRIGHT + Fore.RED}Error during solve benchmark: {e}{Style.RESET_ALL}")
+            sys.exit(1)
+
+    def restore_wcs():
+        """Restore the original WCS header cards of platesolved images"""
+        from lib.fits.wcs import restore_wcs_backup, WCSApplicationError
+        from lib.db.scan import is_file_in_database, rescan_single_file
+
+        failed = 0
+        for fits_file in args.restore_wcs:
+            try:
+                undone = restore_wcs_backup(fits_file, original=True)
+                print(f"{Style.BRIGHT + Fore.GREEN}Restored {fits_file} ({undone} solution(s) undone){Style.RESET_ALL}")
+                if is_file_in_database(fits_file):
+                    rescan_single_file(fits_file)
+            except WCSApplicationError as e:
+                print(f"{Style.BRIGHT + Fore.RED}{e}{Style.RESET_ALL}")
+                failed += 1
+        if failed:
+            sys.exit(1)
+
+    def benchmark_compression():
+        """Compare write/read throughput and file size of the output compressions"""
+        try:
+            from lib.fits.compression import benchmark_compression as run_benchmark
+
+            fits_files = [f for f in args.compression_benchmark if os.path.exists(f)]
+            if not fits_files:
+                print(f"{Style.BRIGHT + Fore.RED}No valid files to benchmark.{Style.RESET_ALL}")
+                sys.exit(1)
+            print(f"{Style.BRIGHT}Compression benchmark:{Style.RESET_ALL}")
+            run_benchmark(fits_files, quantize_level=args.quantize_level)
+
+        except Exception as e:
+            print(f"{Style.BRIGHT + Fore.RED}Error during compression benchmark: {e}{Style.RESET_ALL}")
+            sys.exit(1)
+
+    def benchmark_database():
+        """Time the library queries on a synthetic database, before and after the schema migrations"""
+        try:
+            from lib.db.migrations import benchmark_queries
+            print(f"{Style.BRIGHT}Database query benchmark:{Style.RESET_ALL}")
+            benchmark_queries(n_files=args.db_benchmark)
+        except Exception as e:
+            print(f"{Style.BRIGHT + Fore.RED}Error during database benchmark: {e}{Style.RESET_ALL}")
+            sys.exit(1)
+
+    def benchmark_scan():
+        """Time the library scanner on a synthetic tree of FITS files"""
+        try:
+            from lib.db.scan import benchmark_scanner
+            print(f"{Style.BRIGHT}Library scan benchmark:{Style.RESET_ALL}")
+            benchmark_scanner(n_files=args.scan_benchmark)
+        except Exception as e:
+            print(f"{Style.BRIGHT + Fore.RED}Error during scan benchmark: {e}{Style.RESET_ALL}")
+            sys.exit(1)
+
+    def benchmark_sky():
+        """Time the sky index on a synthetic library"""
+        try:
+            from lib.db.sky import benchmark_sky_index
+            print(f"{Style.BRIGHT}Sky index benchmark:{Style.RESET_ALL}")
+            benchmark_sky_index(n_frames=args.sky_benchmark)
+        except Exception as e:
+            print(f"{Style.BRIGHT + Fore.RED}Error during sky index benchmark: {e}{Style.RESET_ALL}")
+            sys.exit(1)
+
+    def show_cache_stats():
+        """Show the artifact store contents and hit rates"""
+        from lib.fits.artifacts import get_artifact_store
+        print(f"{Style.BRIGHT}Artifact store:{Style.RESET_ALL}")
+        print(get_artifact_store().format_stats())
+
     def calibrate_image():
         """Calibrate one or more FITS images using master bias, dark, and flat"""
         try:
@@ -342,6 +565,7 @@ if __name__ == "__main__":
                                       check_all_have_wcs, check_pixel_scales_match, 
                                       check_astroalign_available, align_images_chunked)
             from astropy.io import fits
+            from lib.fits.compression import image_hdu_index, write_image
             import os
             import tempfile
             import config
@@ -384,8 +608,8 @@ if __name__ == "__main__":
                 print(f"  [{i+1}/{len(valid_files)}] Loading: {os.path.basename(fits_file)}")
                 try:
                     with fits.open(fits_file) as hdul:
-                        img = hdul[0].data
-                        hdr = hdul[0].header
+                        img = hdul[image_hdu_index(hdul)].data
+                        hdr = hdul[image_hdu_index(hdul)].header
                         image_datas.append(img)
                         headers.append(hdr)
                         total_memory_estimate += img.nbytes
@@ -519,8 +743,7 @@ if __name__ == "__main__":
                     aligned_path = os.path.join(temp_dir, aligned_filename)
                     
                     # Save aligned image
-                    hdu = fits.PrimaryHDU(aligned_data, new_header)
-                    hdu.writeto(aligned_path, overwrite=True)
+                    write_image(aligned_path, aligned_data, new_header)
                     
                     new_file_paths.append(aligned_path)
                     successful_saves += 1
@@ -569,6 +792,7 @@ if __name__ == "__main__":
             from lib.fits.integration import integrate_standard
             from lib.fits.align import get_memory_usage
             from astropy.io import fits
+            from lib.fits.compression import write_ccddata
             import os
             import tempfile
             import config
@@ -657,7 +881,7 @@ if __name__ == "__main__":
             
             try:
                 # Save the integrated result
-                integrated_result.write(new_file_path, overwrite=True)
+                write_ccddata(integrated_result, new_file_path)
                 print(f"  Saved: {output_filename}")
                 
             except Exception as e:
@@ -796,8 +1020,26 @@ if __name__ == "__main__":
         scan_calibration()
     elif args.scan_all:
         scan_all()
+    elif args.analyze is not None:
+        analyze_library()
+    elif args.crossmatch is not None:
+        crossmatch_library()
     elif args.solve:
         solve_image()
+    elif args.restore_wcs:
+        restore_wcs()
+    elif args.solve_benchmark:
+        benchmark_solving()
+    elif args.cache_stats:
+        show_cache_stats()
+    elif args.compression_benchmark:
+        benchmark_compression()
+    elif args.db_benchmark:
+        benchmark_database()
+    elif args.scan_benchmark:
+        benchmark_scan()
+    elif args.sky_benchmark:
+        benchmark_sky()
     elif args.calibrate:
         calibrate_image()
     elif args.align:
@@ -15,6 +15,7 @@ from pathlib import Path
 from datetime import datetime
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+import shutil
 import threading
 from queue import Queue, Empty
 import signal
@@ -23,56 +24,181 @@ import signal
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import astro-pipelines modules
-from lib.class_calibrator import Calibrator
-from lib.class_fits_sequence import FITSSequence
-import lib.solver
+from lib.fits.calibration import CalibrationManager
+from lib.fits.rawheader import fits_file_complete
+from lib.sci.solver_pool import get_solver_pool, SolveJob
+from lib.sci.pipeline import PipelineTask, Stage, StagedPipeline
+from lib.db import get_db_manager
+from lib.db.analyze import _analyze_frame_worker
+from lib.db.scan import rescan_single_file
 import config
 from colorama import Fore, Style
 import warnings
 from astropy import wcs
 from astropy.utils.exceptions import AstropyUserWarning
-import lib.helpers
 
 # Suppress warnings
 warnings.filterwarnings("ignore", category=wcs.FITSFixedWarning)
 warnings.filterwarnings("ignore", category=AstropyUserWarning)
 logging.disable(sys.maxsize)
 
+# Worker threads per stage; config.AUTOPIPE_STAGE_WORKERS overrides them
+# (solve: None matches the solver pool size)
+DEFAULT_STAGE_WORKERS = {'ingest': 2, 'calibrate': 2, 'solve': None, 'analyze': 1, 'db': 1}
+
+# Size/mtime polling interval range (seconds) for files being written
+COMPLETION_POLL_MIN = 0.05
+COMPLETION_POLL_MAX = 1.0
+
 
 class FITSFileHandler(FileSystemEventHandler):
-    """Handles new FITS file events."""
+    """Handles new FITS file events.
+    
+    A new file is queued as soon as it is completely written: when the
+    writer closes it (inotify IN_CLOSE_WRITE) or when it is moved into the
+    watched tree, otherwise when polling finds its size and mtime stable.
+    Polling starts every COMPLETION_POLL_MIN seconds and backs off to
+    COMPLETION_POLL_MAX while the file does not change. In every case the
+    FITS structure must be complete (END cards and data length) first.
+    """
     
     def __init__(self, processing_queue, autopipe_path):
         self.processing_queue = processing_queue
         self.autopipe_path = Path(autopipe_path)
         self.processed_files = set()  # Track processed files to avoid duplicates
+        self.completion_timeout = getattr(config, 'AUTOPIPE_COMPLETION_TIMEOUT', 600)
+        # Files being written: path -> {'detected', 'size', 'mtime', 'interval', 'next_check'}
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._poller = threading.Thread(target=self._poll_loop, name="completion-poller", daemon=True)
+        self._poller.start()
         
-    def on_created(self, event):
-        if not event.is_directory and event.src_path.lower().endswith('.fits'):
-            # Check if the file is in the autopipe directory (ignore to prevent loops)
-            file_path = Path(event.src_path)
-            if self.autopipe_path in file_path.parents:
-                print(f"{Style.BRIGHT + Fore.YELLOW}Ignoring file in autopipe directory: {event.src_path}{Style.RESET_ALL}")
+    def stop(self):
+        """Stop polling the files being written."""
+        self._stopped.set()
+        self._wakeup.set()
+        self._poller.join()
+        
+    def _is_new_fits_file(self, path):
+        if not path.lower().endswith('.fits') or path in self.processed_files:
+            return False
+        # Check if the file is in the autopipe directory (ignore to prevent loops)
+        if self.autopipe_path in Path(path).parents:
+            print(f"{Style.BRIGHT + Fore.YELLOW}Ignoring file in autopipe directory: {path}{Style.RESET_ALL}")
+            return False
+        return True
+        
+    def _track(self, path):
+        """Start watching a new file until it is complete."""
+        with self._lock:
+            if path in self.pending:
                 return
+            self.pending[path] = {'detected': time.time(), 'size': None, 'mtime': None,
+                                  'interval': COMPLETION_POLL_MIN, 'next_check': time.time()}
+        print(f"{Style.BRIGHT + Fore.GREEN}New FITS file detected: {path}{Style.RESET_ALL}")
+        self._wakeup.set()
+        
+    def _enqueue_if_complete(self, path):
+        """Queue a pending file if its FITS structure is complete. Returns whether it was queued."""
+        if not fits_file_complete(path):
+            return False
+        with self._lock:
+            state = self.pending.pop(path, None)
+            if state is None or path in self.processed_files:
+                return False  # Already queued from another event
+            self.processed_files.add(path)
+        print(f"{Style.BRIGHT + Fore.GREEN}File complete: {path} "
+              f"({time.time() - state['detected']:.1f}s after detection){Style.RESET_ALL}")
+        self.processing_queue.put((path, time.time()))
+        return True
+        
+    def on_created(self, event):
+        if not event.is_directory and self._is_new_fits_file(event.src_path):
+            self._track(event.src_path)
+            
+    def on_moved(self, event):
+        # Files written under a temporary name and renamed when done
+        if not event.is_directory and self._is_new_fits_file(event.dest_path):
+            self._track(event.dest_path)
+            self._enqueue_if_complete(event.dest_path)
+            
+    def on_closed(self, event):
+        # IN_CLOSE_WRITE: the writer is done, no need to wait for the next poll
+        if not event.is_directory and event.src_path in self.pending:
+            self._enqueue_if_complete(event.src_path)
+            
+    def on_modified(self, event):
+        # Still being written: poll again soon
+        with self._lock:
+            state = self.pending.get(event.src_path)
+            if state is not None:
+                state['interval'] = COMPLETION_POLL_MIN
+                state['next_check'] = min(state['next_check'], time.time() + COMPLETION_POLL_MIN)
                 
-            # Add to processing queue
-            self.processing_queue.put(event.src_path)
-            print(f"{Style.BRIGHT + Fore.GREEN}New FITS file detected: {event.src_path}{Style.RESET_ALL}")
+    def _poll_loop(self):
+        """Queue the pending files whose size and mtime are stable and whose FITS structure is complete."""
+        while not self._stopped.is_set():
+            now = time.time()
+            with self._lock:
+                due = [path for path, state in self.pending.items() if state['next_check'] <= now]
+            for path in due:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    with self._lock:
+                        self.pending.pop(path, None)  # Deleted or renamed before completion
+                    continue
+                with self._lock:
+                    state = self.pending.get(path)
+                    if state is None:
+                        continue
+                    stable = (st.st_size, st.st_mtime_ns) == (state['size'], state['mtime'])
+                    state['size'], state['mtime'] = st.st_size, st.st_mtime_ns
+                if stable and self._enqueue_if_complete(path):
+                    continue
+                with self._lock:
+                    state = self.pending.get(path)
+                    if state is None:
+                        continue
+                    if now - state['detected'] > self.completion_timeout:
+                        del self.pending[path]
+                        print(f"{Style.BRIGHT + Fore.YELLOW}{path} is still incomplete after "
+                              f"{self.completion_timeout}s, skipping.{Style.RESET_ALL}")
+                        continue
+                    # Back off while the file is not changing
+                    state['interval'] = COMPLETION_POLL_MIN if not stable else \
+                        min(state['interval'] * 2, COMPLETION_POLL_MAX)
+                    state['next_check'] = now + state['interval']
+            with self._lock:
+                next_check = min((state['next_check'] for state in self.pending.values()), default=None)
+            wait = COMPLETION_POLL_MAX if next_check is None else max(0.0, next_check - time.time())
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
 
 
 class AutoPipeProcessor:
-    """Main processor for AutoPipe pipeline."""
+    """Main processor for AutoPipe pipeline.
+    
+    New frames go through a staged pipeline (lib/sci/pipeline.py):
+    ingest -> [calibrate] -> solve -> [analyze] -> db. Each stage has its own
+    worker threads and bounded queue, so a frame is calibrated while the
+    previous ones are being solved.
+    """
     
-    def __init__(self, obs_path, autopipe_path, enable_calibration=False):
+    def __init__(self, obs_path, autopipe_path, enable_calibration=False, enable_analysis=False):
         self.obs_path = Path(obs_path)
         self.autopipe_path = Path(autopipe_path) if autopipe_path else None
         self.enable_calibration = enable_calibration
-        self.calibrator = Calibrator() if enable_calibration else None
-        self.processing_queue = Queue()
+        self.enable_analysis = enable_analysis
+        self.processing_queue = Queue()  # Paths from the file system observer, fed to the pipeline
         self.running = True
+        self._local = threading.local()  # One CalibrationManager per calibration worker
         
-        # Reset solver interruption flag
-        lib.solver.set_solver_interrupted(False)
+        # Plate solving runs concurrently on the shared solver pool
+        self.solver_pool = get_solver_pool()
+        self.pipeline = self.create_pipeline()
         
         # Create autopipe directory if calibration is enabled
         if self.enable_calibration and self.autopipe_path:
@@ -82,12 +208,28 @@ class AutoPipeProcessor:
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
         
+    def create_pipeline(self):
+        """Build the stages, sized from config.AUTOPIPE_STAGE_WORKERS."""
+        workers = dict(DEFAULT_STAGE_WORKERS, **(getattr(config, 'AUTOPIPE_STAGE_WORKERS', None) or {}))
+        # Each solve worker waits on one solver pool job: match the pool size
+        workers['solve'] = workers.get('solve') or self.solver_pool.max_workers
+        queue_size = getattr(config, 'AUTOPIPE_QUEUE_SIZE', 8)
+        
+        stages = [Stage('ingest', self.ingest_stage, workers['ingest'], queue_size)]
+        if self.enable_calibration:
+            stages.append(Stage('calibrate', self.calibrate_stage, workers['calibrate'], queue_size))
+        stages.append(Stage('solve', self.solve_stage, workers['solve'], queue_size))
+        if self.enable_analysis:
+            stages.append(Stage('analyze', self.analyze_stage, workers['analyze'], queue_size))
+        stages.append(Stage('db', self.db_stage, workers['db'], queue_size))
+        return StagedPipeline(stages, on_complete=self.report_completed, on_failure=self.report_failed)
+        
     def signal_handler(self, signum, frame):
         """Handle shutdown signals gracefully."""
         print(f"\n{Style.BRIGHT + Fore.YELLOW}Shutdown signal received. Stopping AutoPipe...{Style.RESET_ALL}")
         self.running = False
-        # Also signal the solver to stop
-        lib.solver.set_solver_interrupted(True)
+        # Also kill the running solve-field processes
+        self.solver_pool.cancel_all()
         
     def get_relative_path(self, file_path):
         """Get the relative path from obs_path."""
@@ -100,148 +242,105 @@ class AutoPipeProcessor:
         output_dir.mkdir(parents=True, exist_ok=True)
         return output_dir / relative_path.name
         
-    def calibrate_file(self, input_file_path):
-        """Calibrate a single FITS file."""
-        try:
-            print(f"{Style.BRIGHT}Calibrating {input_file_path}...{Style.RESET_ALL}")
-            
-            # Load the FITS file
-            seq = FITSSequence([str(input_file_path)])
-            
-            # Calibrate the image
-            image = seq.files[0]
-            calibrated_image, new_filename = self.calibrator.calibrate_image(image, write=False)
-            
-            if calibrated_image is False:
-                print(f"{Style.BRIGHT + Fore.RED}Calibration failed for {input_file_path}{Style.RESET_ALL}")
-                return None
-                
-            # Create output path
-            output_path = self.create_output_path(input_file_path)
-            
-            # Write calibrated file
-            print(f"{Style.BRIGHT}Writing calibrated file to {output_path}...{Style.RESET_ALL}")
-            calibrated_image.write(str(output_path), overwrite=True)
-            
-            return str(output_path)
-            
-        except Exception as e:
-            print(f"{Style.BRIGHT + Fore.RED}Error calibrating {input_file_path}: {e}{Style.RESET_ALL}")
-            return None
-            
-    def platesolve_file(self, file_path):
-        """Platesolve a FITS file."""
-        try:
-            print(f"{Style.BRIGHT}Platesolving {file_path}...{Style.RESET_ALL}")
-            
-            # Setup solver options
-            solver_options = type('Options', (), {
-                'blind': False,
-                'radius': config.SOLVER_SEARCH_RADIUS,
-                'downsample': config.SOLVER_DOWNSAMPLE,
-                'files': [file_path],
-                'ra': None,
-                'dec': None
-            })()
-            
-            # Try to get coordinates from file header
-            try:
-                seq = FITSSequence([file_path])
-                header = seq.files[0]['header']
-                
-                # Use helper function to extract coordinates
-                ra_center, dec_center, has_wcs, source = lib.helpers.extract_coordinates_from_header(header)
-                
-                if has_wcs:
-                    solver_options.ra = ra_center
-                    solver_options.dec = dec_center
-                    print(f"{Style.BRIGHT + Fore.GREEN}Found coordinates in file header.{Style.RESET_ALL}")
-                    print(f"  Source: {source}")
-                else:
-                    print(f"{Style.BRIGHT + Fore.YELLOW}No coordinates found, using blind solving.{Style.RESET_ALL}")
-                    solver_options.blind = True
-                    
-            except Exception as e:
-                print(f"{Style.BRIGHT + Fore.YELLOW}Could not read coordinates from header: {e}{Style.RESET_ALL}")
-                solver_options.blind = True
-            
-            # Run platesolving
-            lib.solver.solve_offline(solver_options)
-            
-            print(f"{Style.BRIGHT + Fore.GREEN}Platesolving completed for {file_path}{Style.RESET_ALL}")
-            return True
-            
-        except Exception as e:
-            print(f"{Style.BRIGHT + Fore.RED}Error platesolving {file_path}: {e}{Style.RESET_ALL}")
+    def ingest_stage(self, task):
+        """Check that the file is readable and completely written."""
+        # Watched files are only queued once complete; this also covers --process-existing
+        if not (os.path.exists(task.path) and os.access(task.path, os.R_OK)):
+            print(f"{Style.BRIGHT + Fore.YELLOW}File {task.path} is not accessible, skipping.{Style.RESET_ALL}")
             return False
-            
-    def process_file(self, file_path):
-        """Process a single file through the pipeline."""
-        # Check if we should stop processing
+        if not fits_file_complete(task.path):
+            print(f"{Style.BRIGHT + Fore.YELLOW}File {task.path} is not a complete FITS file, skipping.{Style.RESET_ALL}")
+            return False
+        task.data['image_path'] = task.path
+        
+    def calibrate_stage(self, task):
+        """Calibrate the frame with the library's masters, into the autopipe directory."""
+        if not hasattr(self._local, 'calibration_manager'):
+            self._local.calibration_manager = CalibrationManager()
+        print(f"{Style.BRIGHT}Calibrating {task.path}...{Style.RESET_ALL}")
+        result = self._local.calibration_manager.calibrate_file(task.path)
+        if 'error' in result:
+            raise RuntimeError(f"calibration failed: {result['error']}")
+        output_path = self.create_output_path(task.path)
+        shutil.move(result['calibrated_path'], output_path)
+        print(f"{Style.BRIGHT}Wrote calibrated file {output_path}{Style.RESET_ALL}")
+        task.data['image_path'] = str(output_path)
+        
+    def solve_stage(self, task):
+        """Platesolve the frame (calibrated or original) on the solver pool and wait for the result."""
         if not self.running:
             return False
+        job = self.solver_pool.submit(task.data['image_path'], status_callback=self.report_solve_status)
+        result = job.wait()
+        task.data['solved'] = job.status == SolveJob.SOLVED
+        task.data['solve_result'] = result
+        # Later stages still run on an unsolved frame; the failure is in the log
+        
+    def analyze_stage(self, task):
+        """Detect sources: HFR and source count in the log, sources stored by the db stage."""
+        result = _analyze_frame_worker(None, task.data['image_path'])
+        task.data['analysis'] = result
+        if not result['success']:
+            raise RuntimeError(f"source detection failed: {result['message']}")
+        hfr = f"{result['hfr']:.2f}\"" if result['hfr'] is not None else "n/a"
+        print(f"{Style.BRIGHT}{os.path.basename(task.path)}: {result['sources_count']} sources, HFR={hfr}{Style.RESET_ALL}")
+        
+    def db_stage(self, task):
+        """Update the library entry of the frame, if it is in the library."""
+        db_manager = get_db_manager()
+        fits_file = db_manager.get_fits_file_by_path(task.path)
+        if fits_file is None:
+            return
+        if task.data.get('solved') and not self.enable_calibration:
+            # The solution was written into the original file
+            rescan_single_file(task.path)
+        analysis = task.data.get('analysis')
+        if analysis and analysis['success']:
+            db_manager.save_source_analysis_results([dict(analysis, fits_file_id=fits_file.id)])
+        task.data['db_updated'] = True
+        
+    def report_solve_status(self, job):
+        """Print the status changes of platesolving jobs."""
+        if job.status == SolveJob.RUNNING:
+            print(f"{Style.BRIGHT}Platesolving {job.fits_file_path}...{Style.RESET_ALL}")
+        elif job.status == SolveJob.SOLVED:
+            print(f"{Style.BRIGHT + Fore.GREEN}Successfully platesolved {job.fits_file_path} ({job.elapsed:.1f}s){Style.RESET_ALL}")
+        elif job.status in (SolveJob.FAILED, SolveJob.TIMEOUT):
+            print(f"{Style.BRIGHT + Fore.RED}Platesolving failed for {job.fits_file_path}: {job.message}{Style.RESET_ALL}")
+        if job.status in SolveJob.FINAL_STATES:
+            # Long-running process: do not accumulate finished jobs
+            self.solver_pool.clear_finished()
             
-        try:
-            print(f"\n{Style.BRIGHT + Fore.CYAN}Processing {file_path}...{Style.RESET_ALL}")
+    def report_completed(self, task):
+        """Log the end-to-end latency of a frame and its time in each stage."""
+        print(f"{Style.BRIGHT + Fore.GREEN}Done {os.path.basename(task.path)} in {task.latency:.1f}s "
+              f"({task.format_timings()}){Style.RESET_ALL}")
+        
+    def report_failed(self, task):
+        print(f"{Style.BRIGHT + Fore.RED}Error processing {task.path} in {task.failed_stage} stage: "
+              f"{task.message}{Style.RESET_ALL}")
             
-            if self.enable_calibration:
-                # Step 1: Calibrate the file
-                if not self.running:
-                    return False
-                calibrated_path = self.calibrate_file(file_path)
-                if calibrated_path is None:
-                    print(f"{Style.BRIGHT + Fore.RED}Calibration failed, skipping platesolving.{Style.RESET_ALL}")
-                    return False
-                    
-                # Step 2: Platesolve the calibrated file
-                if not self.running:
-                    return False
-                solve_success = self.platesolve_file(calibrated_path)
-                
-                if solve_success:
-                    print(f"{Style.BRIGHT + Fore.GREEN}Successfully processed {file_path}{Style.RESET_ALL}")
-                    return True
-                else:
-                    print(f"{Style.BRIGHT + Fore.YELLOW}Platesolving failed for {file_path}, but calibration was successful.{Style.RESET_ALL}")
-                    return True  # Still consider it a success since calibration worked
-            else:
-                # Platesolve the original file in place
-                if not self.running:
-                    return False
-                solve_success = self.platesolve_file(file_path)
-                
-                if solve_success:
-                    print(f"{Style.BRIGHT + Fore.GREEN}Successfully platesolved {file_path}{Style.RESET_ALL}")
-                    return True
-                else:
-                    print(f"{Style.BRIGHT + Fore.RED}Platesolving failed for {file_path}{Style.RESET_ALL}")
-                    return False
-                
-        except KeyboardInterrupt:
-            print(f"{Style.BRIGHT + Fore.YELLOW}Processing interrupted by user.{Style.RESET_ALL}")
-            self.running = False
-            return False
-        except Exception as e:
-            print(f"{Style.BRIGHT + Fore.RED}Error processing {file_path}: {e}{Style.RESET_ALL}")
+    def process_file(self, file_path, detected=None):
+        """Feed a file to the pipeline. Blocks while the first stage is full.
+        
+        Args:
+            file_path: FITS file
+            detected: Time the file was found complete (default now)
+        
+        Returns:
+            False if AutoPipe is stopping
+        """
+        if not self.running:
             return False
+        print(f"\n{Style.BRIGHT + Fore.CYAN}Queued {file_path} ({self.pipeline.in_flight()} frames in progress){Style.RESET_ALL}")
+        return self.pipeline.submit(PipelineTask(str(file_path), created=detected))
             
     def process_queue(self):
-        """Process files from the queue."""
+        """Feed the files detected by the observer to the pipeline."""
         while self.running:
             try:
-                # Get file from queue with timeout
-                file_path = self.processing_queue.get(timeout=1)
-                
-                # Check if file is still being written (wait a bit)
-                time.sleep(2)
-                
-                # Check if file exists and is readable
-                if os.path.exists(file_path) and os.access(file_path, os.R_OK):
-                    # Process the file
-                    self.process_file(file_path)
-                else:
-                    print(f"{Style.BRIGHT + Fore.YELLOW}File {file_path} is not accessible, skipping.{Style.RESET_ALL}")
-                    
+                file_path, detected = self.processing_queue.get(timeout=1)
+                self.process_file(file_path, detected)
             except Empty:
                 # This is expected when no files are in the queue - just continue
                 continue
@@ -258,6 +357,7 @@ class AutoPipeProcessor:
             print(f"Mode: Calibration + Platesolving")
         else:
             print(f"Mode: Platesolving only (modifying files in place)")
+        print("Stages: " + " -> ".join(f"{stage.name} ({stage.workers})" for stage in self.pipeline.stages))
         print(f"Press Ctrl+C to stop monitoring\n")
         
         # Start the processing thread
@@ -278,6 +378,11 @@ class AutoPipeProcessor:
         finally:
             observer.stop()
             observer.join()
+            event_handler.stop()
+            self.solver_pool.shutdown(wait=True, cancel_pending=True)
+            self.pipeline.stop(wait=True)
+            print(f"\n{Style.BRIGHT}Pipeline statistics:{Style.RESET_ALL}")
+            print(self.pipeline.format_metrics())
             print(f"{Style.BRIGHT + Fore.GREEN}AutoPipe stopped.{Style.RESET_ALL}")
 
 
@@ -287,8 +392,8 @@ def main():
     )
     parser.add_argument(
         "--obs-path",
-        default=config.OBS_PATH,
-        help=f"Path to the observation directory to monitor (default: {config.OBS_PATH})"
+        default=getattr(config, 'OBS_PATH', config.DATA_PATH),
+        help=f"Path to the observation directory to monitor (default: {getattr(config, 'OBS_PATH', config.DATA_PATH)})"
     )
     parser.add_argument(
         "--autopipe-path",
@@ -300,6 +405,11 @@ def main():
         action="store_true",
         help="Enable calibration before platesolving (creates new files in autopipe directory)"
     )
+    parser.add_argument(
+        "--analyze", "-A",
+        action="store_true",
+        help="Also run source detection on each frame (HFR in the log, sources stored for library files)"
+    )
     parser.add_argument(
         "--process-existing",
         action="store_true",
@@ -329,7 +439,8 @@ def main():
         sys.exit(1)
         
     # Create processor
-    processor = AutoPipeProcessor(obs_path, autopipe_path, enable_calibration=args.calibrate)
+    processor = AutoPipeProcessor(obs_path, autopipe_path, enable_calibration=args.calibrate,
+                                  enable_analysis=args.analyze)
     
     # Process existing files if requested
     if args.process_existing:
@@ -341,17 +452,14 @@ def main():
         if fits_files:
             print(f"Found {len(fits_files)} existing FITS files to process.")
             try:
-                for i, file_path in enumerate(fits_files, 1):
+                # Queued files are processed while monitoring starts; submission
+                # blocks whenever the first stage is full
+                for file_path in fits_files:
                     if not processor.running:
                         print(f"\n{Style.BRIGHT + Fore.YELLOW}Processing stopped by user.{Style.RESET_ALL}")
                         break
-                        
-                    print(f"\n{Style.BRIGHT + Fore.CYAN}Processing file {i}/{len(fits_files)}: {file_path}{Style.RESET_ALL}")
                     processor.process_file(str(file_path))
                     
-                    # Small sleep to make the loop more responsive to interrupts
-                    time.sleep(0.1)
-                    
             except KeyboardInterrupt:
                 print(f"\n{Style.BRIGHT + Fore.YELLOW}Processing interrupted by user.{Style.RESET_ALL}")
                 processor.running = False
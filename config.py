@@ -27,9 +27,21 @@ OBS_LAT = -43.906701849273134
 
 # Database configuration
 DATABASE_PATH = '/home/tan/dev/astro-pipelines/astropipes.db'  # SQLite database file path (absolute path)
+DATABASE_JOURNAL_MODE = 'WAL'  # WAL lets the GUI read while scans write; use 'DELETE' if the database is on a network share
+DATABASE_SYNCHRONOUS = 'NORMAL'  # 'FULL' also survives power loss without losing the last commits
+DATABASE_BUSY_TIMEOUT = 30  # seconds a connection waits for a lock before failing
+DATABASE_CACHE_SIZE_MB = 64  # page cache per connection
+DATABASE_MMAP_SIZE_MB = 256  # memory-mapped I/O size
+DATABASE_COMPRESS_HEADERS = False  # store new header_json blobs zlib-compressed (about 5x smaller)
+CROSSMATCH_RADIUS = 2.0  # arcsec; sources of different frames closer than this are the same object
+
+# Store of derived products (calibrated frames, solutions, stacks) reused across runs
+ARTIFACT_STORE_PATH = '/tmp/astropipes/store'
+ARTIFACT_STORE_MAX_SIZE = 20 * 1024**3  # bytes; least recently used artifacts are evicted beyond this
 
 # Astrometry.net API key
 ASTROMETRY_KEY = 'zrvbykzuksfbcilr'
+ASTROMETRY_API_URL = 'http://nova.astrometry.net'  # Online solver service (or a local mock for testing)
 
 # Solver methods default options. Search radius in degrees.
 SOLVER_DOWNSAMPLE = 2
@@ -42,6 +54,15 @@ SOLVER_ONLINE_POLL_INTERVAL = 5  # How often to check online solver status
 SOLVER_MAX_RETRIES = 3  # Maximum number of retries for failed solves
 SOLVER_VALIDATE_IMAGES = True  # Whether to validate images before attempting to solve
 
+# Solver pool settings
+SOLVER_MAX_CONCURRENT = None  # Concurrent solve-field processes (None: tuned to cores and index memory)
+SOLVER_INDEX_PATH = '/usr/share/astrometry'  # astrometry.net index files, used to size the pool
+
+# AutoPipe stages (ingest -> calibrate -> solve -> analyze -> db)
+AUTOPIPE_STAGE_WORKERS = {'ingest': 2, 'calibrate': 2, 'solve': None, 'analyze': 1, 'db': 1}  # solve None: solver pool size
+AUTOPIPE_QUEUE_SIZE = 8  # frames waiting per stage before the previous stage blocks
+AUTOPIPE_COMPLETION_TIMEOUT = 600  # seconds a new file may stay incomplete before it is skipped
+
 # Image alignment settings
 # Default alignment method: "astroalign" (fast, asterism-based) or "wcs_reprojection" (slow, WCS-based)
 DEFAULT_ALIGNMENT_METHOD = "astroalign"
@@ -73,6 +94,12 @@ INTEGRATION_ENABLE_CHUNKED = True  # Enable chunked processing for large dataset
 INTEGRATION_SAVE_PROGRESSIVE = True  # Save integrated images progressively instead of all at once
 MAX_INTEGRATION_IMAGES = 100    # Maximum number of images to integrate at once
 
+# Output format of calibrated, aligned and stacked products.
+# None writes plain float32 FITS; 'rice', 'gzip', 'gzip2' or 'hcompress' write
+# tile-compressed FITS (image in the first extension, read transparently).
+OUTPUT_COMPRESSION = None
+OUTPUT_QUANTIZE_LEVEL = 16  # Float quantization: step = noise / level (higher keeps more precision). 0 = lossless (gzip only)
+
 # Motion tracking integration settings
 MOTION_TRACKING_SIGMA_CLIP = False  # Disable sigma clipping by default for motion tracking to avoid border issues
 MOTION_TRACKING_METHOD = 'average'  # Default integration method for motion tracking
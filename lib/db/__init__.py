@@ -3,8 +3,13 @@ Database module for astro-pipelines.
 Provides database models and management functionality.
 """
 
-from .models import Base, FitsFile, Source
-from .manager import DatabaseManager, get_db_manager
+from .models import Base, FitsFile, Source, ObservationRun, SkyFootprint, HeaderKeyword
+from .manager import DatabaseManager, get_db_manager, FITS_FILE_LIST_COLUMNS
+from .migrations import run_migrations, get_schema_version, MIGRATIONS
 from .scan import FitsFileScanner, scan_fits_library, CalibrationMasterScanner, scan_calibration_masters
+from .analyze import SourceAnalyzer, analyze_fits_library
+from .sky import frame_footprint, benchmark_sky_index
+from .crossmatch import crossmatch_sources
+from .keywords import parse_header_filter
 
-__all__ = ['Base', 'FitsFile', 'Source', 'DatabaseManager', 'get_db_manager', 'FitsFileScanner', 'scan_fits_library', 'CalibrationMasterScanner', 'scan_calibration_masters'] 
\ No newline at end of file
+__all__ = ['Base', 'FitsFile', 'Source', 'ObservationRun', 'SkyFootprint', 'HeaderKeyword', 'DatabaseManager', 'get_db_manager', 'FITS_FILE_LIST_COLUMNS', 'run_migrations', 'get_schema_version', 'MIGRATIONS', 'FitsFileScanner', 'scan_fits_library', 'CalibrationMasterScanner', 'scan_calibration_masters', 'SourceAnalyzer', 'analyze_fits_library', 'frame_footprint', 'benchmark_sky_index', 'crossmatch_sources', 'parse_header_filter'] 
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""
+Batch source analysis of the FITS library.
+
+Frames whose analysis_status is still 'not_analyzed' are loaded and run through
+source detection in a process pool. Results are written back in batches, one
+transaction per batch, so an interrupted run simply resumes with the frames
+that were not committed yet.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .manager import get_db_manager
+
+
+def _analyze_frame_worker(fits_file_id: int, path: str) -> Dict[str, Any]:
+    """
+    Detect sources in one FITS file (runs in a worker process).
+
+    Returns a result dictionary ready for DatabaseManager.save_source_analysis_results.
+    """
+    import warnings
+    import numpy as np
+    from astropy.io import fits
+    from astropy.wcs import WCS, FITSFixedWarning
+    from ..fits.compression import image_hdu_index
+    from lib.sci.sources import detect_sources_in_image, default_detection_parameters
+
+    warnings.filterwarnings("ignore", category=FITSFixedWarning)
+
+    result = {
+        'fits_file_id': fits_file_id,
+        'path': path,
+        'success': False,
+        'message': '',
+        'hfr': None,
+        'sources_count': None,
+        'sources': [],
+        'analysis_date': datetime.now(),
+        'analysis_method': 'photutils',
+    }
+
+    try:
+        with fits.open(path, memmap=False) as hdul:
+            image_hdu = hdul[image_hdu_index(hdul)]
+            image = np.asarray(image_hdu.data, dtype=np.float32)
+            header = image_hdu.header
+            wcs = None
+            if header.get('CTYPE1') and header.get('CTYPE2'):
+                try:
+                    wcs = WCS(header)
+                except Exception:
+                    wcs = None
+
+        if image.ndim != 2:
+            result['message'] = f"Unsupported image dimensions: {image.shape}"
+            return result
+
+        detection = detect_sources_in_image(image, wcs=wcs, **default_detection_parameters(image.shape))
+        if not detection.success:
+            result['message'] = detection.message
+            return result
+
+        # Frame HFR is the mean of the per-source HFRs in arcseconds, as in the viewer
+        hfr_arcsec_values = [s.hfr_arcsec for s in detection.sources if s.hfr_arcsec > 0]
+        result['hfr'] = sum(hfr_arcsec_values) / len(hfr_arcsec_values) if hfr_arcsec_values else None
+        result['sources_count'] = len(detection.sources)
+        result['sources'] = [
+            {
+                'x': float(s.x),
+                'y': float(s.y),
+                'ra': float(s.ra) if s.ra is not None else None,
+                'dec': float(s.dec) if s.dec is not None else None,
+                'fwhm': float(s.fwhm),
+                'flux': float(s.flux),
+                'source_metadata': json.dumps({
+                    'hfr': float(s.hfr),
+                    'hfr_arcsec': float(s.hfr_arcsec),
+                    'fwhm_arcsec': float(s.fwhm_arcsec),
+                    'snr': float(s.snr),
+                    'area': float(s.area),
+                    'eccentricity': float(s.eccentricity),
+                    'peak_value': float(s.peak_value),
+                }),
+            }
+            for s in detection.sources
+        ]
+        result['success'] = True
+        result['message'] = detection.message
+    except Exception as e:
+        result['message'] = str(e)
+
+    return result
+
+
+class SourceAnalyzer:
+    """Batch source analyzer for frames in the database."""
+
+    def __init__(self, max_workers: Optional[int] = None, batch_size: int = 20,
+                 include_failed: bool = False):
+        """
+        Initialize the analyzer.
+
+        Args:
+            max_workers: Number of worker processes. If None, uses the CPU count.
+            batch_size: Number of analyzed frames committed per transaction
+            include_failed: Also retry frames whose previous analysis failed
+        """
+        self.db_manager = get_db_manager()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.include_failed = include_failed
+        self._stop_requested = False
+
+    def stop(self):
+        """Request the analysis to stop after the frames currently being processed."""
+        self._stop_requested = True
+
+    def analyze_library(self, limit: Optional[int] = None, verbose: bool = True) -> Dict[str, Any]:
+        """
+        Analyze all frames that have not been analyzed yet.
+
+        Args:
+            limit: Maximum number of frames to analyze (None for all)
+            verbose: Whether to print progress information
+
+        Returns:
+            Dictionary with analysis results
+        """
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from multiprocessing import get_context
+
+        frames = self.db_manager.get_unanalyzed_fits_files(self.include_failed, limit)
+
+        results = {
+            'total_frames': len(frames),
+            'frames_analyzed': 0,
+            'frames_failed': 0,
+            'sources_found': 0,
+            'elapsed': 0.0,
+            'frames_per_minute': 0.0,
+            'cancelled': False,
+            'errors': [],
+        }
+
+        if verbose:
+            print(f"Frames to analyze: {len(frames)}")
+            print(f"Worker processes: {self.max_workers}")
+            print("-" * 60)
+
+        if not frames:
+            return results
+
+        start = time.time()
+        pending_results: List[Dict[str, Any]] = []
+        done = 0
+
+        # Spawned workers do not inherit the parent state (Qt, open DB connections)
+        executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=get_context('spawn'))
+        try:
+            futures = [executor.submit(_analyze_frame_worker, fits_id, path) for fits_id, path in frames]
+            for future in as_completed(futures):
+                result = future.result()
+                done += 1
+                pending_results.append(result)
+
+                if result['success']:
+                    results['frames_analyzed'] += 1
+                    results['sources_found'] += result['sources_count']
+                else:
+                    results['frames_failed'] += 1
+                    results['errors'].append(f"{result['path']}: {result['message']}")
+
+                if verbose:
+                    elapsed = time.time() - start
+                    rate = done / elapsed * 60.0 if elapsed > 0 else 0.0
+                    name = os.path.basename(result['path'])
+                    if result['success']:
+                        hfr = f"{result['hfr']:.2f}\"" if result['hfr'] is not None else "n/a"
+                        print(f"[{done}/{len(frames)}] {name}: {result['sources_count']} sources, "
+                              f"HFR={hfr} ({rate:.1f} frames/min)")
+                    else:
+                        print(f"[{done}/{len(frames)}] {name}: failed - {result['message']} "
+                              f"({rate:.1f} frames/min)")
+
+                if len(pending_results) >= self.batch_size:
+                    self.db_manager.save_source_analysis_results(pending_results)
+                    pending_results = []
+
+                if self._stop_requested:
+                    results['cancelled'] = True
+                    break
+        finally:
+            executor.shutdown(wait=not results['cancelled'], cancel_futures=True)
+            if pending_results:
+                self.db_manager.save_source_analysis_results(pending_results)
+
+        results['elapsed'] = time.time() - start
+        if results['elapsed'] > 0:
+            results['frames_per_minute'] = done / results['elapsed'] * 60.0
+
+        if verbose:
+            self._print_summary(results)
+
+        return results
+
+    def _print_summary(self, results: Dict[str, Any]):
+        """Print a summary of the analysis results."""
+        print("\n" + "=" * 60)
+        print("SOURCE ANALYSIS SUMMARY")
+        print("=" * 60)
+        print(f"Frames to analyze: {results['total_frames']}")
+        print(f"Frames analyzed: {results['frames_analyzed']}")
+        print(f"Frames failed: {results['frames_failed']}")
+        print(f"Sources found: {results['sources_found']}")
+        print(f"Elapsed time: {results['elapsed']:.1f} s ({results['frames_per_minute']:.1f} frames/min)")
+        if results['cancelled']:
+            print("Analysis cancelled; run again to resume with the remaining frames.")
+
+        if results['errors']:
+            print("\nErrors encountered:")
+            for error in results['errors']:
+                print(f"  - {error}")
+
+
+def analyze_fits_library(limit: Optional[int] = None, max_workers: Optional[int] = None,
+                         include_failed: bool = False, verbose: bool = True) -> Dict[str, Any]:
+    """
+    Convenience function to run source analysis on all un-analyzed frames.
+
+    Args:
+        limit: Maximum number of frames to analyze (None for all)
+        max_workers: Number of worker processes. If None, uses the CPU count.
+        include_failed: Also retry frames whose previous analysis failed
+        verbose: Whether to print progress information
+
+    Returns:
+        Dictionary with analysis results
+    """
+    analyzer = SourceAnalyzer(max_workers=max_workers, include_failed=include_failed)
+    return analyzer.analyze_library(limit, verbose)
@@ -0,0 +1,205 @@
+"""
+Cross-frame matching of detected sources.
+
+Sources with sky coordinates are matched frame by frame against a catalog of
+the objects seen so far in their group (a target, or an observation run):
+each frame gets a KD-tree of its sources in unit-vector space, every catalog
+object takes its nearest source within the match radius (one source per
+object, closest pair first), and unmatched sources become new objects. The
+catalog position of an object is the mean of its detections.
+
+Objects are named from their first position ("J123.45678+12.34567") and the
+name is written to Source.source_id. Matching is incremental: the objects
+already named in a group seed the catalog, and only sources without a
+source_id are matched, so ids stay stable as frames are added. reset=True
+re-matches a group from scratch (and may rename its objects).
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.engine import Connection
+
+import config
+from .models import FitsFile, Source
+
+DEFAULT_MATCH_RADIUS_ARCSEC = 2.0
+
+
+def _unit_vectors(ra, dec) -> np.ndarray:
+    """Unit vectors of positions in degrees."""
+    ra, dec = np.radians(ra), np.radians(dec)
+    cos_dec = np.cos(dec)
+    return np.column_stack([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)])
+
+
+def _object_name(xyz: np.ndarray) -> str:
+    """Position-derived name of an object."""
+    ra = np.degrees(np.arctan2(xyz[1], xyz[0])) % 360
+    dec = np.degrees(np.arcsin(np.clip(xyz[2] / np.linalg.norm(xyz), -1, 1)))
+    return f"J{ra:09.5f}{dec:+09.5f}"
+
+
+class _Catalog:
+    """Objects of a group: summed unit vectors of their detections, and names."""
+
+    def __init__(self):
+        self.sums = np.empty((0, 3))
+        self.names: List[str] = []
+        self._used = set()
+
+    def seed(self, names: List[str], xyz: np.ndarray):
+        """Add the detections of already named objects."""
+        if not names:
+            return
+        unique, inverse = np.unique(np.asarray(names), return_inverse=True)
+        sums = np.zeros((len(unique), 3))
+        np.add.at(sums, inverse, xyz)
+        self.sums = np.vstack([self.sums, sums])
+        self.names.extend(unique.tolist())
+        self._used.update(unique.tolist())
+
+    def add(self, xyz: np.ndarray) -> List[str]:
+        """Create objects from unmatched detections; returns their names."""
+        names = []
+        for vector in xyz:
+            name = base = _object_name(vector)
+            suffix = 2
+            while name in self._used:
+                name = f"{base}-{suffix}"
+                suffix += 1
+            self._used.add(name)
+            names.append(name)
+        self.sums = np.vstack([self.sums, xyz])
+        self.names.extend(names)
+        return names
+
+    def positions(self) -> np.ndarray:
+        return self.sums / np.linalg.norm(self.sums, axis=1)[:, None]
+
+
+def match_frame(catalog_xyz: np.ndarray, frame_xyz: np.ndarray, max_chord: float) -> np.ndarray:
+    """
+    One-to-one match of catalog objects to the sources of one frame.
+
+    Returns:
+        For each frame source, the index of its catalog object, or -1
+    """
+    matches = np.full(len(frame_xyz), -1)
+    if not len(catalog_xyz) or not len(frame_xyz):
+        return matches
+    distance, source = cKDTree(frame_xyz).query(catalog_xyz, k=1, distance_upper_bound=max_chord)
+    candidates = np.flatnonzero(np.isfinite(distance))
+    # Closest pairs first; a source claimed by several objects goes to the nearest
+    candidates = candidates[np.argsort(distance[candidates], kind='stable')]
+    _, first = np.unique(source[candidates], return_index=True)
+    kept = candidates[first]
+    matches[source[kept]] = kept
+    return matches
+
+
+def match_group(conn: Connection, condition, radius_arcsec: float, reset: bool = False) -> Dict[str, int]:
+    """
+    Match the sources of the frames selected by condition (a FitsFile clause).
+
+    Returns:
+        Dictionary with 'sources' (sources matched), 'new_objects' and 'frames'
+    """
+    rows = conn.execute(
+        select(Source.id, Source.fits_file_id, Source.ra, Source.dec, Source.source_id)
+        .join(FitsFile, FitsFile.id == Source.fits_file_id)
+        .where(condition, Source.ra.isnot(None), Source.dec.isnot(None))
+        .order_by(FitsFile.date_obs, Source.fits_file_id, Source.id)
+    ).all()
+    stats = {'sources': 0, 'new_objects': 0, 'frames': 0}
+    if not rows:
+        return stats
+
+    ids = np.array([r.id for r in rows])
+    frames = np.array([r.fits_file_id for r in rows])
+    xyz = _unit_vectors(np.array([r.ra for r in rows], dtype=float), np.array([r.dec for r in rows], dtype=float))
+    pending = np.ones(len(rows), dtype=bool) if reset else \
+        np.array([r.source_id is None for r in rows])
+    if not pending.any():
+        return stats
+
+    catalog = _Catalog()
+    catalog.seed([r.source_id for r, p in zip(rows, pending) if not p], xyz[~pending])
+    max_chord = 2 * np.sin(np.radians(radius_arcsec / 3600) / 2)
+
+    assignments = []
+    # Rows are sorted by frame: split the pending ones at frame boundaries
+    pending_index = np.flatnonzero(pending)
+    boundaries = np.flatnonzero(np.diff(frames[pending_index])) + 1
+    for frame_rows in np.split(pending_index, boundaries):
+        frame_xyz = xyz[frame_rows]
+        matches = match_frame(catalog.positions(), frame_xyz, max_chord)
+        matched = matches >= 0
+        np.add.at(catalog.sums, matches[matched], frame_xyz[matched])
+        names = np.empty(len(frame_rows), dtype=object)
+        names[matched] = [catalog.names[i] for i in matches[matched]]
+        if (~matched).any():
+            names[~matched] = catalog.add(frame_xyz[~matched])
+            stats['new_objects'] += int((~matched).sum())
+        assignments.extend({'source_pk': int(i), 'object_name': name} for i, name in zip(ids[frame_rows], names))
+        stats['frames'] += 1
+
+    conn.execute(
+        update(Source.__table__).where(Source.__table__.c.id == bindparam('source_pk'))
+        .values(source_id=bindparam('object_name')),
+        assignments
+    )
+    stats['sources'] = len(assignments)
+    return stats
+
+
+def crossmatch_sources(conn: Connection, target: Optional[str] = None, run_id: Optional[int] = None,
+                       by: str = 'target', radius_arcsec: Optional[float] = None, reset: bool = False,
+                       verbose: bool = False) -> Dict[str, Any]:
+    """
+    Match sources across frames and write their object ids to Source.source_id.
+
+    Args:
+        target: Only match the frames of this target
+        run_id: Only match the frames of this observation run
+        by: Matching groups when neither is given: 'target' or 'run'
+        radius_arcsec: Match radius (default config.CROSSMATCH_RADIUS)
+        reset: Re-match already matched sources too
+        verbose: Print progress
+
+    Returns:
+        Dictionary with 'groups', 'sources', 'new_objects', 'frames' and 'elapsed'
+    """
+    if by not in ('target', 'run'):
+        raise ValueError(f"Unknown matching group: {by}")
+    radius_arcsec = radius_arcsec or getattr(config, 'CROSSMATCH_RADIUS', DEFAULT_MATCH_RADIUS_ARCSEC)
+    column = FitsFile.run_id if (run_id is not None or (target is None and by == 'run')) else FitsFile.target
+
+    if target is not None:
+        groups = [target]
+    elif run_id is not None:
+        groups = [run_id]
+    else:
+        # Only the groups holding unmatched sources have work to do
+        query = select(column).distinct().join(Source, Source.fits_file_id == FitsFile.id) \
+            .where(column.isnot(None), Source.ra.isnot(None))
+        if not reset:
+            query = query.where(Source.source_id.is_(None))
+        groups = conn.execute(query).scalars().all()
+
+    start = time.time()
+    results = {'groups': 0, 'sources': 0, 'new_objects': 0, 'frames': 0, 'elapsed': 0.0}
+    for group in groups:
+        stats = match_group(conn, column == group, radius_arcsec, reset)
+        if stats['sources']:
+            results['groups'] += 1
+            for key in ('sources', 'new_objects', 'frames'):
+                results[key] += stats[key]
+            if verbose:
+                print(f"  {group}: {stats['sources']} sources in {stats['frames']} frames, "
+                      f"{stats['new_objects']} new objects")
+    results['elapsed'] = time.time() - start
+    return results
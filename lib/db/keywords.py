@@ -0,0 +1,227 @@
+"""
+Indexed table of header keywords, for queries on any FITS keyword.
+
+Only a few header values are promoted to fits_files columns; the rest live in
+header_json. header_keywords holds one row per card of every file
+(fits_file_id, keyword, numeric_value, text_value), indexed on
+(keyword, numeric_value) and (keyword, text_value), so conditions such as
+FOCUSPOS ranges or OBSERVER names are answered by SQLite instead of by
+decoding every header in Python.
+
+As for the sky index, triggers (migration 8) queue the files inserted or
+whose header_json changes in header_keyword_changes, and drop the keywords of
+deleted files; refresh_header_keywords() processes the queue (header_json may
+be compressed, so it is decoded in Python).
+
+parse_header_filter() compiles filter expressions such as
+    EXPTIME>=120 AND FILTER='L'
+    (AIRMASS < 1.5 OR NOT OBSERVER = 'remote') AND FOCUSPOS >= 11000
+into a SQL condition on fits_files.
+"""
+
+import json
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, insert, not_, or_, select, text
+from sqlalchemy.engine import Connection
+
+from .models import FitsFile, HeaderKeyword, HeaderKeywordChange
+
+_SKIPPED_KEYWORDS = ('', 'COMMENT', 'HISTORY')
+
+_OPERATORS = {
+    '=': lambda column, value: column == value,
+    '==': lambda column, value: column == value,
+    '!=': lambda column, value: column != value,
+    '<>': lambda column, value: column != value,
+    '<': lambda column, value: column < value,
+    '<=': lambda column, value: column <= value,
+    '>': lambda column, value: column > value,
+    '>=': lambda column, value: column >= value,
+}
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*'|"(?:[^"]|"")*")
+      | (?P<op>>=|<=|!=|<>|==|=|<|>)
+      | (?P<paren>[()])
+      | (?P<word>[^\s()=<>!'"]+)
+    )""", re.VERBOSE)
+
+
+def _numeric(value: str) -> Optional[float]:
+    """Numeric value of a stored header value, None for text and booleans."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def keyword_rows(fits_file_id: int, header_json: str) -> List[Dict[str, Any]]:
+    """header_keywords rows of a stored header_json."""
+    rows = []
+    for keyword, (value, _comment) in json.loads(header_json).items():
+        if keyword in _SKIPPED_KEYWORDS:
+            continue
+        value = str(value).strip()
+        rows.append({'fits_file_id': fits_file_id, 'keyword': keyword.upper(),
+                     'numeric_value': _numeric(value), 'text_value': value})
+    return rows
+
+
+def refresh_header_keywords(conn: Connection, batch_size: int = 1000) -> int:
+    """
+    Index the header keywords of the files queued in header_keyword_changes.
+
+    Returns:
+        Number of files processed
+    """
+    processed = 0
+    while True:
+        file_ids = conn.execute(select(HeaderKeywordChange.fits_file_id).limit(batch_size)).scalars().all()
+        if not file_ids:
+            break
+        conn.execute(delete(HeaderKeyword).where(HeaderKeyword.fits_file_id.in_(file_ids)))
+        rows = []
+        for file_id, header_json in conn.execute(
+                select(FitsFile.id, FitsFile.header_json).where(FitsFile.id.in_(file_ids))):
+            if header_json:
+                try:
+                    rows.extend(keyword_rows(file_id, header_json))
+                except (ValueError, TypeError, AttributeError):
+                    continue  # Unreadable header_json: the file is simply not indexed
+        if rows:
+            conn.execute(insert(HeaderKeyword).prefix_with('OR REPLACE'), rows)
+        conn.execute(delete(HeaderKeywordChange).where(HeaderKeywordChange.fits_file_id.in_(file_ids)))
+        processed += len(file_ids)
+    return processed
+
+
+def create_header_keyword_triggers(conn: Connection):
+    """Triggers queuing new files and header changes, and dropping the keywords of deleted files."""
+    queue = "INSERT OR IGNORE INTO header_keyword_changes (fits_file_id) VALUES (NEW.id);"
+    triggers = {
+        'fits_files_keywords_insert': ('INSERT', queue),
+        'fits_files_keywords_update': ('UPDATE OF header_json', queue),
+        'fits_files_keywords_delete': ('DELETE', "DELETE FROM header_keywords WHERE fits_file_id = OLD.id; "
+                                                 "DELETE FROM header_keyword_changes WHERE fits_file_id = OLD.id;"),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON fits_files "
+                          f"FOR EACH ROW BEGIN {body} END"))
+
+
+def queue_all_headers(conn: Connection):
+    """Queue every file for (re)indexing of its header keywords."""
+    conn.execute(text("INSERT OR IGNORE INTO header_keyword_changes (fits_file_id) SELECT id FROM fits_files"))
+
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if not match:
+            raise ValueError(f"Invalid filter near: {expression[position:].strip()!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'word' and value.upper() in ('AND', 'OR', 'NOT'):
+            kind, value = 'logic', value.upper()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class _FilterParser:
+    """Recursive descent parser of header filter expressions."""
+
+    def __init__(self, expression: str):
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def _peek(self) -> Tuple[Optional[str], Optional[str]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def _next(self, expected: str, description: str) -> str:
+        kind, value = self._peek()
+        if kind != expected:
+            found = repr(value) if value is not None else 'end of filter'
+            raise ValueError(f"Invalid filter: expected {description}, found {found}")
+        self.position += 1
+        return value
+
+    def parse(self):
+        clause = self._or()
+        if self.position < len(self.tokens):
+            raise ValueError(f"Invalid filter: unexpected {self.tokens[self.position][1]!r}")
+        return clause
+
+    def _or(self):
+        clauses = [self._and()]
+        while self._peek() == ('logic', 'OR'):
+            self.position += 1
+            clauses.append(self._and())
+        return or_(*clauses) if len(clauses) > 1 else clauses[0]
+
+    def _and(self):
+        clauses = [self._not()]
+        while self._peek() == ('logic', 'AND'):
+            self.position += 1
+            clauses.append(self._not())
+        return and_(*clauses) if len(clauses) > 1 else clauses[0]
+
+    def _not(self):
+        kind, value = self._peek()
+        if (kind, value) == ('logic', 'NOT'):
+            self.position += 1
+            return not_(self._not())
+        if (kind, value) == ('paren', '('):
+            self.position += 1
+            clause = self._or()
+            if self._next('paren', "')'") != ')':
+                raise ValueError("Invalid filter: expected ')'")
+            return clause
+        return self._comparison()
+
+    def _comparison(self):
+        keyword = self._next('word', 'a keyword').upper()
+        operator = self._next('op', 'a comparison operator')
+        kind, value = self._peek()
+        if kind == 'string':
+            self.position += 1
+            quote = value[0]
+            value = value[1:-1].replace(quote * 2, quote)
+            column, operand = HeaderKeyword.text_value, value.strip()
+        elif kind == 'word':
+            self.position += 1
+            number = _numeric(value)
+            if number is not None:
+                column, operand = HeaderKeyword.numeric_value, number
+            else:
+                column, operand = HeaderKeyword.text_value, value
+        else:
+            raise ValueError(f"Invalid filter: missing value after {keyword} {operator}")
+        return FitsFile.id.in_(
+            select(HeaderKeyword.fits_file_id)
+            .where(HeaderKeyword.keyword == keyword, _OPERATORS[operator](column, operand))
+        )
+
+
+def parse_header_filter(expression: str):
+    """
+    SQL condition on fits_files for a header filter expression.
+
+    Comparisons are KEYWORD OP VALUE with OP one of = == != <> < <= > >=;
+    numbers compare numerically, quoted or bare words as text. They combine
+    with AND, OR, NOT and parentheses.
+
+    Raises:
+        ValueError: If the expression is invalid
+    """
+    if not expression or not expression.strip():
+        raise ValueError("Empty filter")
+    return _FilterParser(expression).parse()
@@ -1,10 +1,45 @@
 import os
 import json
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, insert, update, delete, or_, select, func
+from sqlalchemy.orm import sessionmaker, scoped_session, Session
 from sqlalchemy.exc import SQLAlchemyError
-from .models import Base, FitsFile, Source, CalibrationMaster
-from config import to_display_time
+from .models import Base, FitsFile, Source, CalibrationMaster, ObservationRun, HeaderKeyword
+from .migrations import run_migrations, refresh_night_dates
+from .runs import refresh_runs, rebuild_runs
+from .sky import refresh_sky_index, queue_all_frames, find_frame_ids
+from .crossmatch import crossmatch_sources
+from .keywords import refresh_header_keywords, queue_all_headers, parse_header_filter
+import config
+
+# Columns shown by the library list views: everything but the large JSON texts
+FITS_FILE_LIST_COLUMNS = tuple(
+    column.name for column in FitsFile.__table__.columns
+    if column.name not in ('header_json', 'simbad_objects')
+)
+
+
+def _configure_sqlite_connection(dbapi_connection, read_only: bool = False):
+    """Apply the connection pragmas from config to a new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        busy_timeout_ms = int(getattr(config, 'DATABASE_BUSY_TIMEOUT', 30) * 1000)
+        cursor.execute(f"PRAGMA busy_timeout = {busy_timeout_ms}")
+        if not read_only:
+            # WAL lets readers (GUI) run while a writer (scan, autopipe) commits;
+            # the mode is persistent, so read-only connections inherit it
+            cursor.execute(f"PRAGMA journal_mode = {getattr(config, 'DATABASE_JOURNAL_MODE', 'WAL')}")
+            # NORMAL is safe in WAL mode (a power loss may only lose the last commits)
+            cursor.execute(f"PRAGMA synchronous = {getattr(config, 'DATABASE_SYNCHRONOUS', 'NORMAL')}")
+        else:
+            cursor.execute("PRAGMA query_only = ON")
+        # Negative cache_size is in KiB
+        cursor.execute(f"PRAGMA cache_size = -{int(getattr(config, 'DATABASE_CACHE_SIZE_MB', 64) * 1024)}")
+        cursor.execute(f"PRAGMA mmap_size = {int(getattr(config, 'DATABASE_MMAP_SIZE_MB', 256) * 1024 * 1024)}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+    finally:
+        cursor.close()
+
 
 class DatabaseManager:
     """Manages database connections and operations for astro-pipelines."""
@@ -23,19 +58,51 @@ class DatabaseManager:
         self.db_path = db_path
         self.engine = None
         self.SessionLocal = None
+        self.read_engine = None
+        self.ReadSessionLocal = None
+        self._scoped_session = None
+        self._scoped_read_session = None
         self._initialize_database()
     
     def _initialize_database(self):
-        """Initialize the database engine and create tables if they don't exist."""
+        """Initialize the database engine, create tables if they don't exist and apply pending migrations."""
         try:
-            # Create SQLite engine
-            self.engine = create_engine(f'sqlite:///{self.db_path}', echo=False)
+            # Create SQLite engine. Connections are shared by the threads of the
+            # pool (GUI QThreads, autopipe workers), never used by two at once.
+            busy_timeout = getattr(config, 'DATABASE_BUSY_TIMEOUT', 30)
+            self.engine = create_engine(
+                f'sqlite:///{self.db_path}', echo=False,
+                connect_args={'timeout': busy_timeout, 'check_same_thread': False}
+            )
+            event.listen(self.engine, 'connect',
+                         lambda dbapi_connection, _: _configure_sqlite_connection(dbapi_connection))
             
             # Create all tables
             Base.metadata.create_all(self.engine)
             
-            # Create session factory
-            self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+            # Bring existing databases up to the current schema (indexes, new columns)
+            run_migrations(self.engine)
+            
+            # Create session factories. Objects stay usable after their session
+            # is closed, as the GUI keeps them around.
+            self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine,
+                                             expire_on_commit=False)
+            self._scoped_session = scoped_session(self.SessionLocal)
+            
+            # Read-only engine for queries, so lookups never take write locks. A
+            # file URL gives it a QueuePool: every thread checks out its own
+            # connection (an in-memory 'sqlite://' URL would get a
+            # SingletonThreadPool, which closes connections still in use once
+            # more than 5 threads read).
+            self.read_engine = create_engine(
+                f'sqlite:///file:{os.path.abspath(self.db_path)}?mode=ro&uri=true', echo=False,
+                connect_args={'timeout': busy_timeout, 'check_same_thread': False}
+            )
+            event.listen(self.read_engine, 'connect',
+                         lambda dbapi_connection, _: _configure_sqlite_connection(dbapi_connection, read_only=True))
+            self.ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.read_engine,
+                                                 expire_on_commit=False)
+            self._scoped_read_session = scoped_session(self.ReadSessionLocal)
             
             print(f"Database initialized at: {self.db_path}")
             
@@ -53,6 +120,53 @@ class DatabaseManager:
             raise RuntimeError("Database not initialized")
         return self.SessionLocal()
     
+    def get_read_session(self) -> Session:
+        """Get a new read-only database session.
+        
+        Read-only sessions use their own connections, opened with mode=ro:
+        in WAL mode they never wait for a writer, so GUI queries stay
+        responsive during scans.
+        
+        Returns:
+            SQLAlchemy session object (flush/commit raise an error)
+        """
+        if self.ReadSessionLocal is None:
+            raise RuntimeError("Database not initialized")
+        return self.ReadSessionLocal()
+    
+    @contextmanager
+    def session_scope(self, read_only: bool = False):
+        """Transactional session for the calling thread.
+        
+        Sessions are thread-local (scoped_session), so QThreads and worker
+        threads each get their own. Scopes can be nested within a thread: the
+        outermost one commits (or rolls back on error) and closes the session.
+        
+        Args:
+            read_only: Use a read-only connection (for queries)
+        
+        Usage:
+            with db_manager.session_scope() as session:
+                session.add(obj)
+        """
+        registry = self._scoped_read_session if read_only else self._scoped_session
+        if registry is None:
+            raise RuntimeError("Database not initialized")
+        if registry.registry.has():
+            # Nested scope: the enclosing scope owns the transaction
+            yield registry()
+            return
+        session = registry()
+        try:
+            yield session
+            if not read_only:
+                session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            registry.remove()
+    
     def add_fits_file(self, fits_data: dict) -> FitsFile:
         """Add a new FITS file to the database.
         
@@ -77,6 +191,54 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def add_fits_files(self, fits_data_list: list) -> int:
+        """Add several FITS files in a single transaction.
+        
+        Rows are inserted with one executemany INSERT instead of one ORM
+        object and one commit per file.
+        
+        Args:
+            fits_data_list: List of dictionaries containing FITS file data
+            
+        Returns:
+            Number of rows inserted
+        """
+        if not fits_data_list:
+            return 0
+        with self.session_scope() as session:
+            session.execute(insert(FitsFile), fits_data_list)
+        return len(fits_data_list)
+    
+    def update_fits_files(self, update_data_list: list) -> int:
+        """Update several FITS files in a single transaction.
+        
+        Args:
+            update_data_list: List of dictionaries, each with the 'id' of the
+                row to update and the fields to change
+            
+        Returns:
+            Number of rows updated
+        """
+        if not update_data_list:
+            return 0
+        with self.session_scope() as session:
+            session.execute(update(FitsFile), update_data_list)
+        return len(update_data_list)
+    
+    def get_fits_file_stats(self) -> dict:
+        """Get the recorded size and modification time of every FITS file.
+        
+        Returns:
+            Dictionary {path: (id, file_size, file_mtime)}; size and mtime are
+            None for files imported before they were recorded
+        """
+        session = self.get_read_session()
+        try:
+            rows = session.query(FitsFile.id, FitsFile.path, FitsFile.file_size, FitsFile.file_mtime)
+            return {row.path: (row.id, row.file_size, row.file_mtime) for row in rows}
+        finally:
+            session.close()
+    
     def get_fits_file_by_path(self, path: str) -> FitsFile:
         """Get a FITS file by its path.
         
@@ -86,7 +248,7 @@ class DatabaseManager:
         Returns:
             FitsFile object if found, None otherwise
         """
-        session = self.get_session()
+        session = self.get_read_session()
         try:
             return session.query(FitsFile).filter(FitsFile.path == path).first()
         finally:
@@ -95,15 +257,85 @@ class DatabaseManager:
     def get_all_fits_files(self) -> list:
         """Get all FITS files in the database.
         
+        header_json and simbad_objects are deferred; list views should use
+        get_fits_file_list, which does not build ORM objects at all.
+        
         Returns:
             List of all FitsFile objects
         """
-        session = self.get_session()
+        session = self.get_read_session()
         try:
             return session.query(FitsFile).all()
         finally:
             session.close()
     
+    def iter_fits_file_pages(self, columns: tuple = None, page_size: int = 5000):
+        """Stream selected columns of all FITS files, one page at a time.
+        
+        Only the requested columns are selected (no ORM objects, no header_json).
+        Pages are read by id ranges, each in a short read session, so memory
+        stays bounded and writers are never blocked for the whole listing.
+        
+        Args:
+            columns: Column names (default FITS_FILE_LIST_COLUMNS); 'id' is always included
+            page_size: Number of rows per page
+            
+        Yields:
+            Lists of rows, ordered by id; rows are named tuples (row.path, row.target...)
+        """
+        names = list(columns or FITS_FILE_LIST_COLUMNS)
+        if 'id' not in names:
+            names.insert(0, 'id')
+        selected = [getattr(FitsFile, name) for name in names]
+        last_id = 0
+        while True:
+            session = self.get_read_session()
+            try:
+                page = session.execute(
+                    select(*selected).where(FitsFile.id > last_id).order_by(FitsFile.id).limit(page_size)
+                ).all()
+            finally:
+                session.close()
+            if not page:
+                return
+            yield page
+            last_id = page[-1].id
+            if len(page) < page_size:
+                return
+    
+    def get_fits_file_list(self, columns: tuple = None, page_size: int = 5000) -> list:
+        """Get selected columns of all FITS files, for list views.
+        
+        Args:
+            columns: Column names (default FITS_FILE_LIST_COLUMNS)
+            page_size: Number of rows fetched per query
+            
+        Returns:
+            List of rows (named tuples) ordered by id
+        """
+        rows = []
+        for page in self.iter_fits_file_pages(columns, page_size):
+            rows.extend(page)
+        return rows
+    
+    def get_fits_file_header(self, fits_file_id: int) -> dict:
+        """Get the stored FITS header of a file.
+        
+        Args:
+            fits_file_id: ID of the FITS file
+            
+        Returns:
+            Header as {keyword: (value, comment)}, empty if not stored
+        """
+        session = self.get_read_session()
+        try:
+            header_json = session.execute(
+                select(FitsFile.header_json).where(FitsFile.id == fits_file_id)
+            ).scalar()
+        finally:
+            session.close()
+        return json.loads(header_json) if header_json else {}
+    
     def update_fits_file(self, fits_file_id: int, update_data: dict) -> bool:
         """Update an existing FITS file.
         
@@ -158,6 +390,9 @@ class DatabaseManager:
     def add_sources_to_fits_file(self, fits_file_id: int, sources_data: list) -> bool:
         """Add sources to a FITS file.
         
+        Sources are written with a single executemany INSERT rather than one
+        ORM object per source.
+        
         Args:
             fits_file_id: ID of the FITS file
             sources_data: List of dictionaries containing source data
@@ -167,14 +402,13 @@ class DatabaseManager:
         """
         session = self.get_session()
         try:
-            fits_file = session.query(FitsFile).filter(FitsFile.id == fits_file_id).first()
-            if not fits_file:
+            exists = session.query(FitsFile.id).filter(FitsFile.id == fits_file_id).first()
+            if not exists:
                 return False
             
-            for source_data in sources_data:
-                source_data['fits_file_id'] = fits_file_id
-                source = Source(**source_data)
-                session.add(source)
+            rows = [dict(source_data, fits_file_id=fits_file_id) for source_data in sources_data]
+            if rows:
+                session.execute(insert(Source), rows)
             
             session.commit()
             return True
@@ -185,6 +419,86 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def get_unanalyzed_fits_files(self, include_failed: bool = False, limit: int = None) -> list:
+        """Get (id, path) pairs of FITS files that have no source analysis yet.
+        
+        Args:
+            include_failed: Also return files whose previous analysis failed
+            limit: Maximum number of files to return (None for all)
+            
+        Returns:
+            List of (id, path) tuples ordered by observation date
+        """
+        session = self.get_read_session()
+        try:
+            statuses = ['not_analyzed', 'failed'] if include_failed else ['not_analyzed']
+            query = session.query(FitsFile.id, FitsFile.path).filter(
+                or_(FitsFile.analysis_status.is_(None), FitsFile.analysis_status.in_(statuses))
+            ).order_by(FitsFile.date_obs)
+            if limit:
+                query = query.limit(limit)
+            return [(row.id, row.path) for row in query.all()]
+        finally:
+            session.close()
+    
+    def save_source_analysis_results(self, results: list) -> int:
+        """Store the source analysis of several FITS files in one transaction.
+        
+        Each result replaces the previous sources of its file. Failed results
+        only mark the file as 'failed' so it is skipped by later batch runs.
+        
+        Args:
+            results: List of dictionaries with keys 'fits_file_id', 'success',
+                'hfr', 'sources_count', 'sources' (list of source dicts) and
+                'analysis_date'
+            
+        Returns:
+            Number of files updated
+        """
+        if not results:
+            return 0
+        session = self.get_session()
+        try:
+            file_ids = [r['fits_file_id'] for r in results]
+            session.execute(delete(Source).where(Source.fits_file_id.in_(file_ids)))
+            
+            file_rows = []
+            source_rows = []
+            for r in results:
+                if r.get('success'):
+                    file_rows.append({
+                        'id': r['fits_file_id'],
+                        'analysis_status': 'analyzed',
+                        'analysis_date': r['analysis_date'],
+                        'analysis_method': r.get('analysis_method', 'photutils'),
+                        'hfr': r.get('hfr'),
+                        'sources_count': r.get('sources_count', 0),
+                    })
+                    source_rows.extend(
+                        dict(source, fits_file_id=r['fits_file_id']) for source in r.get('sources', [])
+                    )
+                else:
+                    file_rows.append({
+                        'id': r['fits_file_id'],
+                        'analysis_status': 'failed',
+                        'analysis_date': r['analysis_date'],
+                        'analysis_method': r.get('analysis_method', 'photutils'),
+                        'hfr': None,
+                        'sources_count': None,
+                    })
+            
+            session.execute(update(FitsFile), file_rows)
+            if source_rows:
+                session.execute(insert(Source), source_rows)
+            session.commit()
+            return len(file_rows)
+        except SQLAlchemyError as e:
+            session.rollback()
+            print(f"Error saving source analysis results: {e}")
+            raise
+        finally:
+            session.close()
+    
     def get_sources_for_fits_file(self, fits_file_id: int) -> list:
         """Get all sources for a FITS file.
         
@@ -194,7 +508,7 @@ class DatabaseManager:
         Returns:
             List of Source objects
         """
-        session = self.get_session()
+        session = self.get_read_session()
         try:
             return session.query(Source).filter(Source.fits_file_id == fits_file_id).all()
         finally:
@@ -202,7 +516,7 @@ class DatabaseManager:
     
     def get_unique_targets(self) -> list:
         """Get all unique targets from the database."""
-        session = self.get_session()
+        session = self.get_read_session()
         try:
             return [row[0] for row in session.query(FitsFile.target).distinct().order_by(FitsFile.target).all() if row[0]]
         finally:
@@ -210,35 +524,49 @@ class DatabaseManager:
 
     def get_unique_dates(self) -> list:
         """Get all unique observation dates (YYYY-MM-DD) from the database."""
-        session = self.get_session()
+        return sorted(self.get_file_counts_by_date())
+
+    def get_unique_local_dates(self) -> list:
+        """Get all unique local observing nights (YYYY-MM-DD) from the database."""
+        return sorted(self.get_file_counts_by_date(local=True))
+
+    def get_file_counts_by_target(self) -> dict:
+        """Get the number of files of every target, in one GROUP BY query.
+        
+        Returns:
+            Dictionary {target: count}, ordered by target
+        """
+        session = self.get_read_session()
         try:
-            # Extract date part from datetime, return as string
-            dates = session.query(FitsFile.date_obs).distinct().all()
-            date_strs = set()
-            for (dt,) in dates:
-                if dt:
-                    date_strs.add(dt.strftime('%Y-%m-%d'))
-            return sorted(date_strs)
+            rows = session.query(FitsFile.target, func.count(FitsFile.id)) \
+                .filter(FitsFile.target.isnot(None), FitsFile.target != '') \
+                .group_by(FitsFile.target).order_by(FitsFile.target).all()
+            return {target: count for target, count in rows}
         finally:
             session.close()
 
-    def get_unique_local_dates(self) -> list:
-        """Get all unique observation dates (YYYY-MM-DD) in local time from the database."""
-        session = self.get_session()
+    def get_file_counts_by_date(self, local: bool = False) -> dict:
+        """Get the number of files of every date, in one GROUP BY query.
+        
+        Args:
+            local: Group by local observing night (the stored night_date column)
+                instead of UTC date
+            
+        Returns:
+            Dictionary {YYYY-MM-DD: count}, ordered by date
+        """
+        session = self.get_read_session()
         try:
-            dates = session.query(FitsFile.date_obs).distinct().all()
-            date_strs = set()
-            for (dt,) in dates:
-                if dt:
-                    dt_disp = to_display_time(dt)
-                    date_strs.add(dt_disp.strftime('%Y-%m-%d'))
-            return sorted(date_strs)
+            day = FitsFile.night_date if local else func.date(FitsFile.date_obs)
+            rows = session.query(day, func.count(FitsFile.id)) \
+                .filter(day.isnot(None)).group_by(day).order_by(day).all()
+            return {date: count for date, count in rows}
         finally:
             session.close()
 
     def get_file_count_by_target(self, target: str) -> int:
         """Get the number of files for a specific target."""
-        session = self.get_session()
+        session = self.get_read_session()
         try:
             return session.query(FitsFile).filter(FitsFile.target == target).count()
         finally:
@@ -246,12 +574,12 @@ class DatabaseManager:
 
     def get_file_count_by_date(self, date: str) -> int:
         """Get the number of files for a specific date."""
-        session = self.get_session()
+        session = self.get_read_session()
         try:
             # Convert date string to datetime for comparison
-            from datetime import datetime
+            from datetime import datetime, timedelta
             date_obj = datetime.strptime(date, '%Y-%m-%d')
-            next_date = datetime.strptime(date, '%Y-%m-%d').replace(day=date_obj.day + 1)
+            next_date = date_obj + timedelta(days=1)
             return session.query(FitsFile).filter(
                 FitsFile.date_obs >= date_obj,
                 FitsFile.date_obs < next_date
@@ -260,24 +588,316 @@ class DatabaseManager:
             session.close()
 
     def get_file_count_by_local_date(self, date: str) -> int:
-        """Get the number of files for a specific local date (YYYY-MM-DD)."""
-        session = self.get_session()
+        """Get the number of files for a specific local observing night (YYYY-MM-DD)."""
+        session = self.get_read_session()
         try:
-            from datetime import datetime, timedelta
-            files = session.query(FitsFile.date_obs).all()
-            count = 0
-            for (dt,) in files:
-                if dt:
-                    dt_disp = to_display_time(dt)
-                    if dt_disp.strftime('%Y-%m-%d') == date:
-                        count += 1
-            return count
+            return session.query(FitsFile).filter(FitsFile.night_date == date).count()
+        finally:
+            session.close()
+
+    def refresh_night_dates(self):
+        """Recompute the stored local night of every file (after a timezone change)."""
+        with self.engine.begin() as conn:
+            refresh_night_dates(conn)
+
+    def refresh_observation_runs(self) -> int:
+        """Update the observation runs affected by files added, changed or deleted since the last refresh.
+        
+        Returns:
+            Number of runs rebuilt
+        """
+        with self.engine.begin() as conn:
+            return refresh_runs(conn)
+
+    def rebuild_observation_runs(self) -> int:
+        """Re-group the whole library into observation runs.
+        
+        Returns:
+            Number of runs
+        """
+        with self.engine.begin() as conn:
+            return rebuild_runs(conn)
+
+    def get_observation_runs(self, limit: int = None, offset: int = 0, refresh: bool = False) -> list:
+        """Get observation run summaries, most recent first.
+        
+        Runs are brought up to date by scans and by the GUI loader thread, so
+        reads do not write by default.
+        
+        Args:
+            limit: Maximum number of runs (None for all)
+            offset: Number of runs to skip, for paging
+            refresh: Bring the runs up to date first (a write transaction)
+            
+        Returns:
+            List of ObservationRun rows (named tuples)
+        """
+        if refresh:
+            self.refresh_observation_runs()
+        session = self.get_read_session()
+        try:
+            query = select(*ObservationRun.__table__.columns) \
+                .order_by(ObservationRun.end_time.desc(), ObservationRun.id.desc()).offset(offset)
+            if limit is not None:
+                query = query.limit(limit)
+            return session.execute(query).all()
+        finally:
+            session.close()
+
+    def get_run_files(self, run_id: int, columns: tuple = None) -> list:
+        """Get the files of an observation run, most recent first.
+        
+        Args:
+            run_id: ID of the run
+            columns: Column names (default FITS_FILE_LIST_COLUMNS)
+            
+        Returns:
+            List of rows (named tuples)
+        """
+        selected = [getattr(FitsFile, name) for name in (columns or FITS_FILE_LIST_COLUMNS)]
+        session = self.get_read_session()
+        try:
+            return session.execute(
+                select(*selected).where(FitsFile.run_id == run_id)
+                .order_by(FitsFile.date_obs.desc(), FitsFile.id.desc())
+            ).all()
+        finally:
+            session.close()
+
+    def crossmatch_sources(self, target: str = None, run_id: int = None, by: str = 'target',
+                           radius_arcsec: float = None, reset: bool = False, verbose: bool = False) -> dict:
+        """Match detected sources across frames and store their object ids in Source.source_id.
+        
+        Args:
+            target: Only match the frames of this target
+            run_id: Only match the frames of this observation run
+            by: Matching groups when neither is given: 'target' or 'run'
+            radius_arcsec: Match radius (default config.CROSSMATCH_RADIUS)
+            reset: Re-match already matched sources too
+            verbose: Print progress
+            
+        Returns:
+            Dictionary with 'groups', 'sources', 'new_objects', 'frames' and 'elapsed'
+        """
+        if by == 'run' or run_id is not None:
+            self.refresh_observation_runs()
+        with self.engine.begin() as conn:
+            return crossmatch_sources(conn, target, run_id, by, radius_arcsec, reset, verbose)
+
+    def get_source_detections(self, source_id: str) -> list:
+        """Get the detections of a cross-matched object, in time order (light curve data).
+        
+        Args:
+            source_id: Object id assigned by crossmatch_sources
+            
+        Returns:
+            List of rows (named tuples) with the source measurements and the
+            date_obs, filter_name, exptime and path of their frame
+        """
+        session = self.get_read_session()
+        try:
+            return session.execute(
+                select(Source.id, Source.fits_file_id, Source.x, Source.y, Source.ra, Source.dec,
+                       Source.flux, Source.magnitude, Source.fwhm, FitsFile.date_obs,
+                       FitsFile.filter_name, FitsFile.exptime, FitsFile.path)
+                .join(FitsFile, FitsFile.id == Source.fits_file_id)
+                .where(Source.source_id == source_id)
+                .order_by(FitsFile.date_obs, Source.id)
+            ).all()
+        finally:
+            session.close()
+
+    def get_matched_objects(self, target: str = None, run_id: int = None, min_detections: int = 1,
+                            max_detections: int = None) -> list:
+        """Get the cross-matched objects with their number of detections and time span.
+        
+        Objects seen in only one or a few frames of a well-covered field are
+        candidates for moving or transient objects.
+        
+        Args:
+            target: Only objects detected in frames of this target
+            run_id: Only objects detected in frames of this observation run
+            min_detections, max_detections: Range of the number of detections
+            
+        Returns:
+            List of rows (source_id, detections, first_date, last_date), most detected first
+        """
+        detections = func.count(Source.id).label('detections')
+        query = select(Source.source_id, detections, func.min(FitsFile.date_obs).label('first_date'),
+                       func.max(FitsFile.date_obs).label('last_date')) \
+            .join(FitsFile, FitsFile.id == Source.fits_file_id) \
+            .where(Source.source_id.isnot(None)) \
+            .group_by(Source.source_id) \
+            .having(detections >= min_detections) \
+            .order_by(detections.desc(), Source.source_id)
+        if target is not None:
+            query = query.where(FitsFile.target == target)
+        if run_id is not None:
+            query = query.where(FitsFile.run_id == run_id)
+        if max_detections is not None:
+            query = query.having(detections <= max_detections)
+        session = self.get_read_session()
+        try:
+            return session.execute(query).all()
+        finally:
+            session.close()
+
+    def refresh_header_keywords(self) -> int:
+        """Index the header keywords of the files added or changed since the last refresh.
+        
+        Returns:
+            Number of files processed
+        """
+        with self.engine.begin() as conn:
+            return refresh_header_keywords(conn)
+
+    def rebuild_header_keywords(self) -> int:
+        """Re-index the header keywords of every file.
+        
+        Returns:
+            Number of files processed
+        """
+        with self.engine.begin() as conn:
+            queue_all_headers(conn)
+            return refresh_header_keywords(conn)
+
+    def get_header_keyword_names(self) -> list:
+        """Get the header keywords present in the library, sorted."""
+        self.refresh_header_keywords()
+        session = self.get_read_session()
+        try:
+            return session.execute(select(HeaderKeyword.keyword).distinct().order_by(HeaderKeyword.keyword)) \
+                .scalars().all()
+        finally:
+            session.close()
+
+    def query_fits_files(self, expression: str, columns: tuple = None, refresh: bool = False) -> list:
+        """Get the files matching a header filter such as "EXPTIME>=120 AND FILTER='L'".
+        
+        The keyword index is brought up to date by scans and by the GUI loader
+        thread, so queries do not write by default.
+        
+        Args:
+            expression: Filter expression (see lib/db/keywords.parse_header_filter)
+            columns: Column names (default FITS_FILE_LIST_COLUMNS)
+            refresh: Bring the keyword index up to date first (a write transaction)
+            
+        Returns:
+            List of rows (named tuples), most recent first
+            
+        Raises:
+            ValueError: If the expression is invalid
+        """
+        condition = parse_header_filter(expression)
+        if refresh:
+            self.refresh_header_keywords()
+        selected = [getattr(FitsFile, name) for name in (columns or FITS_FILE_LIST_COLUMNS)]
+        session = self.get_read_session()
+        try:
+            return session.execute(
+                select(*selected).where(condition).order_by(FitsFile.date_obs.desc(), FitsFile.id.desc())
+            ).all()
+        finally:
+            session.close()
+
+    def refresh_sky_index(self, verbose: bool = False) -> int:
+        """Index the footprints of the files added or moved since the last refresh.
+        
+        Returns:
+            Number of files processed
+        """
+        with self.engine.begin() as conn:
+            return refresh_sky_index(conn, verbose=verbose)
+
+    def rebuild_sky_index(self, verbose: bool = False) -> int:
+        """Recompute the footprint of every file.
+        
+        Returns:
+            Number of files processed
+        """
+        with self.engine.begin() as conn:
+            queue_all_frames(conn)
+            return refresh_sky_index(conn, verbose=verbose)
+
+    def find_frames_covering(self, ra: float, dec: float, radius: float = 0.0, start=None, end=None,
+                             columns: tuple = None, refresh: bool = False) -> list:
+        """Get the files whose footprint covers a sky position (or overlaps a cone).
+        
+        The sky index is brought up to date by scans and by the GUI loader
+        thread, so queries do not write by default.
+        
+        Args:
+            ra, dec: Position in degrees
+            radius: Cone radius in degrees (0 for a point)
+            start, end: Optional date_obs range (datetime)
+            columns: Column names (default FITS_FILE_LIST_COLUMNS)
+            refresh: Bring the sky index up to date first (a write transaction)
+            
+        Returns:
+            List of rows (named tuples), by date_obs
+        """
+        if refresh:
+            self.refresh_sky_index()
+        with self.read_engine.connect() as conn:
+            frame_ids = find_frame_ids(conn, ra, dec, radius, start, end)
+        return self._get_fits_file_rows(frame_ids, columns)
+
+    def find_frames_along_path(self, positions: list, time_tolerance=None, radius: float = 0.0,
+                               columns: tuple = None, refresh: bool = False) -> list:
+        """Get the files covering a moving position (e.g. an ephemeris) when they were taken.
+        
+        Args:
+            positions: List of (datetime, ra, dec)
+            time_tolerance: timedelta around each position (default: half the spacing of the positions)
+            radius: Search radius in degrees around each position
+            columns: Column names (default FITS_FILE_LIST_COLUMNS)
+            refresh: Bring the sky index up to date first (a write transaction)
+            
+        Returns:
+            List of rows (named tuples), by date_obs
+        """
+        from datetime import timedelta
+
+        positions = sorted(positions)
+        if refresh:
+            self.refresh_sky_index()
+        frame_ids = set()
+        with self.read_engine.connect() as conn:
+            for i, (time, ra, dec) in enumerate(positions):
+                tolerance = time_tolerance
+                if tolerance is None:
+                    neighbours = [positions[j][0] for j in (i - 1, i + 1) if 0 <= j < len(positions)]
+                    tolerance = max((abs(t - time) for t in neighbours), default=timedelta(hours=1)) / 2
+                frame_ids.update(find_frame_ids(conn, ra, dec, radius, time - tolerance, time + tolerance))
+        return self._get_fits_file_rows(frame_ids, columns)
+
+    def _get_fits_file_rows(self, file_ids, columns: tuple = None) -> list:
+        """Projected rows of the given files, by date_obs."""
+        file_ids = list(file_ids)
+        selected = [getattr(FitsFile, name) for name in (columns or FITS_FILE_LIST_COLUMNS)]
+        chunk = 900  # Stay under SQLite's bound parameter limit
+        session = self.get_read_session()
+        try:
+            # Sort the ids first so that the rows of consecutive chunks stay in order
+            dated = []
+            for i in range(0, len(file_ids), chunk):
+                dated.extend(session.execute(
+                    select(FitsFile.date_obs, FitsFile.id).where(FitsFile.id.in_(file_ids[i:i + chunk]))
+                ).all())
+            file_ids = [file_id for _, file_id in sorted(dated)]
+            rows = []
+            for i in range(0, len(file_ids), chunk):
+                rows.extend(session.execute(
+                    select(*selected).where(FitsFile.id.in_(file_ids[i:i + chunk]))
+                    .order_by(FitsFile.date_obs, FitsFile.id)
+                ).all())
+            return rows
         finally:
             session.close()
 
     def get_total_file_count(self) -> int:
         """Get the total number of files in the database."""
-        session = self.get_session()
+        session = self.get_read_session()
         try:
             return session.query(FitsFile).count()
         finally:
@@ -285,7 +905,7 @@ class DatabaseManager:
 
     def get_calibration_file_count(self, frame_type: str) -> int:
         """Get the number of calibration files of a specific type."""
-        session = self.get_session()
+        session = self.get_read_session()
         try:
             return session.query(CalibrationMaster).filter(CalibrationMaster.frame == frame_type).count()
         finally:
@@ -319,7 +939,7 @@ class DatabaseManager:
         Returns:
             CalibrationMaster object if found, None otherwise
         """
-        session = self.get_session()
+        session = self.get_read_session()
         try:
             return session.query(CalibrationMaster).filter(CalibrationMaster.path == path).first()
         finally:
@@ -334,7 +954,7 @@ class DatabaseManager:
         Returns:
             List of FitsFile objects for the target
         """
-        session = self.get_session()
+        session = self.get_read_session()
         try:
             return session.query(FitsFile).filter(FitsFile.target == target).all()
         finally:
@@ -610,6 +1230,11 @@ class DatabaseManager:
     
     def close(self):
         """Close the database connection."""
+        if self._scoped_session is not None:
+            self._scoped_session.remove()
+            self._scoped_read_session.remove()
+        if self.read_engine:
+            self.read_engine.dispose()
         if self.engine:
             self.engine.dispose()
 
@@ -0,0 +1,292 @@
+"""
+Schema migrations for the SQLite library.
+
+Base.metadata.create_all only creates missing tables: it never adds indexes or
+columns to an existing astropipes.db. Schema changes are therefore recorded
+here as numbered migrations, run in order by DatabaseManager._initialize_database.
+The versions already applied are kept in the schema_migrations table.
+
+Every step must be idempotent (CREATE INDEX IF NOT EXISTS, add_column checks
+the table first...): a fresh database already gets the current schema from the
+models, and the migrations then only record their version.
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+
+class Migration(NamedTuple):
+    """A numbered, idempotent schema change."""
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def create_index(conn: Connection, name: str, table: str, columns: List[str]):
+    """Create an index if it does not exist yet."""
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(columns)})'))
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    """Whether a table has a column."""
+    return any(row[1] == column for row in conn.execute(text(f'PRAGMA table_info({table})')))
+
+
+def add_column(conn: Connection, table: str, column: str, column_type: str):
+    """Add a column if the table does not have it yet."""
+    if not has_column(conn, table, column):
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'))
+
+
+def _add_library_indexes(conn: Connection):
+    create_index(conn, 'ix_fits_files_target', 'fits_files', ['target'])
+    create_index(conn, 'ix_fits_files_date_obs', 'fits_files', ['date_obs'])
+    create_index(conn, 'ix_fits_files_filter_binning', 'fits_files', ['filter_name', 'binning'])
+
+
+def _add_source_and_calibration_indexes(conn: Connection):
+    create_index(conn, 'ix_sources_fits_file_id', 'sources', ['fits_file_id'])
+    create_index(conn, 'ix_calibration_masters_bias_dark', 'calibration_masters',
+                 ['frame', 'binning', 'gain', 'offset', 'ccd_temp'])
+    create_index(conn, 'ix_calibration_masters_flat', 'calibration_masters',
+                 ['frame', 'binning', 'filter_name', 'date'])
+    # Give the query planner statistics to choose between the indexes
+    conn.execute(text('ANALYZE'))
+
+
+def _add_file_stat_columns(conn: Connection):
+    add_column(conn, 'fits_files', 'file_size', 'INTEGER')
+    add_column(conn, 'fits_files', 'file_mtime', 'FLOAT')
+
+
+# Local night of a frame: the local date at (local time - 12h), so a night
+# running past midnight stays on the date it started. 'localtime' uses the
+# timezone of the machine, like config.to_display_time.
+NIGHT_DATE_SQL = "date({date_obs}, 'localtime', '-12 hours')"
+
+
+def refresh_night_dates(conn: Connection):
+    """Recompute fits_files.night_date (e.g. after the machine timezone changed)."""
+    conn.execute(text(f"UPDATE fits_files SET night_date = {NIGHT_DATE_SQL.format(date_obs='date_obs')}"))
+
+
+def _add_night_date(conn: Connection):
+    add_column(conn, 'fits_files', 'night_date', 'VARCHAR')
+    create_index(conn, 'ix_fits_files_night_date', 'fits_files', ['night_date'])
+    # Triggers keep the column current for every writer (ORM, bulk inserts, raw SQL)
+    night_date = NIGHT_DATE_SQL.format(date_obs='NEW.date_obs')
+    for name, event in (('fits_files_night_date_insert', 'INSERT'),
+                        ('fits_files_night_date_update', 'UPDATE OF date_obs')):
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON fits_files FOR EACH ROW "
+            f"BEGIN UPDATE fits_files SET night_date = {night_date} WHERE id = NEW.id; END"
+        ))
+    refresh_night_dates(conn)
+
+
+def _add_observation_runs(conn: Connection):
+    from .runs import create_run_triggers, rebuild_runs
+    # The observation_runs tables themselves are created by Base.metadata.create_all
+    add_column(conn, 'fits_files', 'run_id', 'INTEGER')
+    create_index(conn, 'ix_fits_files_run_id', 'fits_files', ['run_id'])
+    create_run_triggers(conn)
+    rebuild_runs(conn)
+
+
+def _add_sky_index(conn: Connection):
+    from .sky import create_sky_index_triggers, queue_all_frames
+    # The sky index tables are created by Base.metadata.create_all. Existing
+    # frames are only queued: the index is built by the first refresh.
+    create_sky_index_triggers(conn)
+    queue_all_frames(conn)
+
+
+def _add_source_id_index(conn: Connection):
+    create_index(conn, 'ix_sources_source_id', 'sources', ['source_id'])
+
+
+def _add_header_keywords(conn: Connection):
+    from .keywords import create_header_keyword_triggers, queue_all_headers
+    # The header_keywords tables are created by Base.metadata.create_all;
+    # existing headers are indexed by the first refresh
+    create_header_keyword_triggers(conn)
+    queue_all_headers(conn)
+
+
+# Append new migrations at the end; never renumber or edit applied ones
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Index fits_files on target, date_obs and (filter_name, binning)", _add_library_indexes),
+    Migration(2, "Index sources on fits_file_id and calibration masters on matching columns",
+              _add_source_and_calibration_indexes),
+    Migration(3, "Record file size and modification time of fits_files for incremental scans",
+              _add_file_stat_columns),
+    Migration(4, "Add fits_files.night_date, maintained by triggers, for per-night counts", _add_night_date),
+    Migration(5, "Store observation runs and maintain them incrementally", _add_observation_runs),
+    Migration(6, "Index frame footprints on HEALPix pixels for sky position queries", _add_sky_index),
+    Migration(7, "Index sources on source_id for per-object detection lookups", _add_source_id_index),
+    Migration(8, "Index header keywords of fits_files for arbitrary keyword queries", _add_header_keywords),
+]
+
+
+def _ensure_migrations_table(conn: Connection):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version INTEGER PRIMARY KEY, description TEXT, applied_at TEXT)'
+    ))
+
+
+def get_schema_version(engine: Engine) -> int:
+    """Highest migration version applied to the database (0 if none)."""
+    with engine.begin() as conn:
+        _ensure_migrations_table(conn)
+        version = conn.execute(text('SELECT MAX(version) FROM schema_migrations')).scalar()
+    return version or 0
+
+
+def run_migrations(engine: Engine, migrations: Optional[List[Migration]] = None,
+                   verbose: bool = True) -> List[int]:
+    """
+    Apply the migrations that the database has not seen yet.
+
+    Each migration runs in its own transaction together with the record of its
+    version, so an interrupted upgrade resumes at the failed step next time.
+
+    Returns:
+        Versions applied by this call
+    """
+    migrations = sorted(migrations if migrations is not None else MIGRATIONS, key=lambda m: m.version)
+    with engine.begin() as conn:
+        _ensure_migrations_table(conn)
+        applied = {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+    newly_applied = []
+    for migration in migrations:
+        if migration.version in applied:
+            continue
+        start = time.time()
+        with engine.begin() as conn:
+            migration.apply(conn)
+            conn.execute(
+                text('INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)'),
+                {'v': migration.version, 'd': migration.description, 't': datetime.now().isoformat(timespec='seconds')}
+            )
+        newly_applied.append(migration.version)
+        if verbose:
+            print(f"Applied database migration {migration.version}: {migration.description} "
+                  f"({time.time() - start:.1f}s)")
+    return newly_applied
+
+
+def _create_synthetic_library(db_path: str, n_files: int, sources_per_file: int, n_masters: int, seed: int = 0):
+    """Fill a new database with a synthetic library (tables only, indexes dropped)."""
+    from sqlalchemy import create_engine
+    from .models import Base
+
+    engine = create_engine(f'sqlite:///{db_path}')
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    rng = random.Random(seed)
+    targets = [f"Target {i}" for i in range(400)]
+    filters = ['L', 'R', 'G', 'B', 'Ha', 'OIII', 'SII']
+    binnings = ['1x1', '2x2', '3x3']
+    start = datetime(2020, 1, 1)
+
+    conn = sqlite3.connect(db_path)
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='index' AND name LIKE 'ix_%'").fetchall():
+        conn.execute(f'DROP INDEX {name}')
+    conn.executemany(
+        'INSERT INTO fits_files (id, path, date_obs, target, filter_name, exptime, gain, offset, ccd_temp, binning, '
+        'size_x, size_y, analysis_status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        ((i, f"/data/{i // 1000}/frame_{i:07d}.fits",
+          (start + timedelta(minutes=3 * i + rng.random())).strftime('%Y-%m-%d %H:%M:%S.%f'),
+          rng.choice(targets), rng.choice(filters), rng.choice([60.0, 120.0, 300.0]), 100.0, 50.0,
+          rng.choice([-10.0, -15.0, -20.0]), rng.choice(binnings), 4096, 4096,
+          rng.choice(['analyzed', 'not_analyzed'])) for i in range(1, n_files + 1))
+    )
+    conn.executemany(
+        'INSERT INTO sources (fits_file_id, x, y, fwhm, flux) VALUES (?, ?, ?, ?, ?)',
+        ((i, rng.uniform(0, 4096), rng.uniform(0, 4096), 3.0, 1000.0)
+         for i in range(1, n_files + 1) for _ in range(sources_per_file))
+    )
+    conn.executemany(
+        'INSERT INTO calibration_masters (path, date, frame, filter_name, exptime, gain, offset, ccd_temp, binning) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        ((f"/calibration/master_{i}.fits", (start + timedelta(days=rng.randrange(1500))).strftime('%Y-%m-%d'),
+          rng.choice(['Bias', 'Dark', 'Flat']), rng.choice(filters), rng.choice([60.0, 120.0, 300.0]),
+          rng.choice([0.0, 100.0]), rng.choice([10.0, 50.0]), rng.choice([-10.0, -15.0, -20.0]),
+          rng.choice(binnings)) for i in range(n_masters))
+    )
+    conn.commit()
+    conn.close()
+
+
+def benchmark_queries(n_files: int = 200000, sources_per_file: int = 5, n_masters: int = 5000,
+                      repeat: int = 20, db_path: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Time the library's typical queries on a synthetic database, before and after the migrations.
+
+    Returns {query name: {'before': ms, 'after': ms}} and prints a summary table.
+    """
+    from sqlalchemy import create_engine
+
+    own_file = db_path is None
+    if own_file:
+        fd, db_path = tempfile.mkstemp(suffix='.db', prefix='astropipes_bench_')
+        os.close(fd)
+        os.remove(db_path)
+
+    queries = {
+        'count by target': ("SELECT COUNT(*) FROM fits_files WHERE target = :target", {'target': 'Target 42'}),
+        'count by date': ("SELECT COUNT(*) FROM fits_files WHERE date_obs >= :start AND date_obs < :end",
+                          {'start': '2020-06-01 00:00:00', 'end': '2020-06-02 00:00:00'}),
+        'filter + binning': ("SELECT id, path FROM fits_files WHERE filter_name = :f AND binning = :b "
+                             "ORDER BY date_obs LIMIT 100", {'f': 'Ha', 'b': '2x2'}),
+        'distinct targets': ("SELECT DISTINCT target FROM fits_files ORDER BY target", {}),
+        'sources of a file': ("SELECT * FROM sources WHERE fits_file_id = :id", {'id': n_files // 2}),
+        'bias lookup': ("SELECT * FROM calibration_masters WHERE frame = 'Bias' AND binning = :b AND gain = :g "
+                        "AND offset = :o AND ccd_temp BETWEEN :t0 AND :t1 ORDER BY date DESC",
+                        {'b': '1x1', 'g': 100.0, 'o': 50.0, 't0': -17.0, 't1': -13.0}),
+        'flat lookup': ("SELECT * FROM calibration_masters WHERE frame = 'Flat' AND binning = :b "
+                        "AND filter_name = :f AND date <= :d ORDER BY date DESC",
+                        {'b': '1x1', 'f': 'L', 'd': '2022-01-01'}),
+    }
+
+    def time_queries(engine) -> Dict[str, float]:
+        timings = {}
+        with engine.connect() as conn:
+            for name, (sql, params) in queries.items():
+                conn.execute(text(sql), params).fetchall()  # Warm the page cache
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    conn.execute(text(sql), params).fetchall()
+                timings[name] = (time.perf_counter() - start) / repeat * 1000
+        return timings
+
+    try:
+        print(f"Creating synthetic library: {n_files} files, {n_files * sources_per_file} sources, "
+              f"{n_masters} calibration masters...")
+        _create_synthetic_library(db_path, n_files, sources_per_file, n_masters)
+        engine = create_engine(f'sqlite:///{db_path}')
+        before = time_queries(engine)
+        run_migrations(engine)
+        after = time_queries(engine)
+        engine.dispose()
+    finally:
+        if own_file and os.path.exists(db_path):
+            os.remove(db_path)
+
+    results = {name: {'before': before[name], 'after': after[name]} for name in queries}
+    print(f"{'query':<20} {'before (ms)':>12} {'after (ms)':>11} {'speedup':>8}")
+    for name, r in results.items():
+        speedup = r['before'] / r['after'] if r['after'] else float('inf')
+        print(f"{name:<20} {r['before']:>12.2f} {r['after']:>11.2f} {speedup:>7.1f}x")
+    return results
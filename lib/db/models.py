@@ -1,12 +1,45 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Text
-from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy.ext.declarative import declarative_base
+import zlib
+
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Text, Index
+from sqlalchemy.orm import declarative_base, relationship, deferred
+from sqlalchemy.types import TypeDecorator
 
 Base = declarative_base()
 
+
+class CompressedText(TypeDecorator):
+    """
+    Text column for large JSON blobs, optionally stored zlib-compressed.
+    
+    With config.DATABASE_COMPRESS_HEADERS new values are written as compressed
+    BLOBs. Reads accept both forms, so compressed and plain rows can coexist.
+    """
+    impl = Text
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        import config
+        if value is None or not getattr(config, 'DATABASE_COMPRESS_HEADERS', False):
+            return value
+        return zlib.compress(value.encode('utf-8'), 6)
+    
+    def process_result_value(self, value, dialect):
+        if isinstance(value, bytes):
+            return zlib.decompress(value).decode('utf-8')
+        return value
+
+
 class FitsFile(Base):
     """Model representing a FITS file in the database."""
     __tablename__ = 'fits_files'
+    # Index names must match lib/db/migrations.py, which adds them to existing databases
+    __table_args__ = (
+        Index('ix_fits_files_target', 'target'),
+        Index('ix_fits_files_date_obs', 'date_obs'),
+        Index('ix_fits_files_filter_binning', 'filter_name', 'binning'),
+        Index('ix_fits_files_night_date', 'night_date'),
+        Index('ix_fits_files_run_id', 'run_id'),
+    )
     
     # Primary key
     id = Column(Integer, primary_key=True)
@@ -14,7 +47,12 @@ class FitsFile(Base):
     # File information
     path = Column(String, unique=True, nullable=False)
     date_obs = Column(DateTime, nullable=False)
+    # Local date of the evening the night started (local time - 12h), YYYY-MM-DD.
+    # Set by SQLite triggers on insert/update of date_obs (see lib/db/migrations.py)
+    night_date = Column(String)
     target = Column(String)
+    file_size = Column(Integer)  # Size in bytes when the header was last read
+    file_mtime = Column(Float)   # Modification time (epoch seconds) when the header was last read
     
     # Image parameters
     filter_name = Column(String)  # Astronomical filter (L, R, G, B, Ha, O, S, V, etc.)
@@ -36,10 +74,11 @@ class FitsFile(Base):
     wcs_type = Column(String)    # WCS solution type
     
     # Full FITS header (stored as JSON for complete flexibility)
-    header_json = Column(Text)  # Complete FITS header as JSON
+    # Deferred: only loaded when accessed, list views never need it
+    header_json = deferred(Column(CompressedText))  # Complete FITS header as JSON
     
     # SIMBAD objects (stored as JSON string for flexibility)
-    simbad_objects = Column(Text)  # JSON string of SIMBAD objects
+    simbad_objects = deferred(Column(CompressedText))  # JSON string of SIMBAD objects
     
     # Source analysis fields
     analysis_status = Column(String, default='not_analyzed')  # 'not_analyzed', 'analyzed', 'failed'
@@ -48,15 +87,100 @@ class FitsFile(Base):
     hfr = Column(Float)  # Half-Flux Radius (populated after source analysis)
     sources_count = Column(Integer)  # Number of detected sources (populated after source analysis)
     
+    # Observation run the file belongs to (maintained by lib/db/runs.py)
+    run_id = Column(Integer)
+    
     # Relationships
     sources = relationship("Source", back_populates="fits_file", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<FitsFile(id={self.id}, path='{self.path}', target='{self.target}')>"
 
+class ObservationRun(Base):
+    """
+    Model representing an observation run: consecutive frames of one target
+    with gaps under RUN_GAP_MINUTES, with precomputed summary values.
+    """
+    __tablename__ = 'observation_runs'
+    __table_args__ = (
+        Index('ix_observation_runs_start_time', 'start_time'),
+        Index('ix_observation_runs_end_time', 'end_time'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    target = Column(String)
+    start_time = Column(DateTime, nullable=False)  # date_obs of the first frame
+    end_time = Column(DateTime, nullable=False)  # date_obs of the last frame
+    file_count = Column(Integer)
+    filters = Column(Text)  # JSON list of the distinct filters
+    exposures = Column(Text)  # JSON list of the distinct exposure times
+    total_exptime = Column(Float)  # seconds
+    binning = Column(String)  # binning of the last frame
+    
+    def __repr__(self):
+        return f"<ObservationRun(id={self.id}, target='{self.target}', start_time='{self.start_time}', files={self.file_count})>"
+
+class ObservationRunChange(Base):
+    """Observation time of a FITS file added, changed or deleted since runs were last updated."""
+    __tablename__ = 'observation_run_changes'
+    
+    id = Column(Integer, primary_key=True)
+    date_obs = Column(DateTime)
+
+class SkyFootprint(Base):
+    """Sky footprint of a FITS file, indexed by the HEALPix pixels in sky_pixels (see lib/db/sky.py)."""
+    __tablename__ = 'sky_footprints'
+    
+    fits_file_id = Column(Integer, primary_key=True)
+    ra = Column(Float)  # Footprint center (degrees)
+    dec = Column(Float)
+    radius = Column(Float)  # Radius of the circle enclosing the footprint (degrees)
+    corners = Column(Text)  # JSON [[ra, dec] x 4] from the WCS, null when only center and scale are known
+
+class SkyPixel(Base):
+    """HEALPix pixel (nested, NSIDE from lib/db/sky.py) overlapped by the footprint of a FITS file."""
+    __tablename__ = 'sky_pixels'
+    __table_args__ = (
+        Index('ix_sky_pixels_fits_file_id', 'fits_file_id'),
+        {'sqlite_with_rowid': False},
+    )
+    
+    hpx = Column(Integer, primary_key=True)
+    fits_file_id = Column(Integer, primary_key=True)
+
+class SkyIndexChange(Base):
+    """FITS file whose sky footprint must be (re)computed."""
+    __tablename__ = 'sky_index_changes'
+    
+    fits_file_id = Column(Integer, primary_key=True)
+
+class HeaderKeyword(Base):
+    """One header card of a FITS file, for keyword queries (see lib/db/keywords.py)."""
+    __tablename__ = 'header_keywords'
+    __table_args__ = (
+        Index('ix_header_keywords_numeric', 'keyword', 'numeric_value'),
+        Index('ix_header_keywords_text', 'keyword', 'text_value'),
+        {'sqlite_with_rowid': False},
+    )
+    
+    fits_file_id = Column(Integer, primary_key=True)
+    keyword = Column(String, primary_key=True)
+    numeric_value = Column(Float)  # Null for non-numeric values
+    text_value = Column(String)  # Value as stored in header_json
+
+class HeaderKeywordChange(Base):
+    """FITS file whose header keywords must be (re)indexed."""
+    __tablename__ = 'header_keyword_changes'
+    
+    fits_file_id = Column(Integer, primary_key=True)
+
 class Source(Base):
     """Model representing a detected source in a FITS file."""
     __tablename__ = 'sources'
+    __table_args__ = (
+        Index('ix_sources_fits_file_id', 'fits_file_id'),
+        Index('ix_sources_source_id', 'source_id'),
+    )
     
     # Primary key
     id = Column(Integer, primary_key=True)
@@ -90,6 +214,12 @@ class Source(Base):
 class CalibrationMaster(Base):
     """Model representing a calibration master FITS file (e.g., master dark, flat, bias)."""
     __tablename__ = 'calibration_masters'
+    __table_args__ = (
+        # Bias/dark matching: equality on frame, binning, gain, offset, then a ccd_temp range
+        Index('ix_calibration_masters_bias_dark', 'frame', 'binning', 'gain', 'offset', 'ccd_temp'),
+        # Flat matching: frame, binning and filter, most recent first
+        Index('ix_calibration_masters_flat', 'frame', 'binning', 'filter_name', 'date'),
+    )
 
     # Primary key
     id = Column(Integer, primary_key=True)
@@ -115,7 +245,7 @@ class CalibrationMaster(Base):
     size_y = Column(Integer)  # NAXIS2
 
     # FITS header (stored as JSON)
-    header_json = Column(Text)  # Complete FITS header as JSON
+    header_json = Column(CompressedText)  # Complete FITS header as JSON
 
     # Number of images integrated to create this master file
     integration_count = Column(Integer)
@@ -0,0 +1,136 @@
+"""
+Observation runs: consecutive frames of one target, taken with gaps under
+RUN_GAP_MINUTES, stored with precomputed summaries in observation_runs.
+
+Runs are kept current incrementally. SQLite triggers (created by migration 5)
+record the date_obs of every fits_files row inserted, deleted, or whose
+date_obs or target changes, in observation_run_changes. refresh_runs() then
+re-groups only the frames between the nearest untouched runs on either side
+of those changes; everything outside that window keeps its runs.
+"""
+
+import json
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import bindparam, delete, func, insert, select, text, update
+from sqlalchemy.engine import Connection
+
+from .models import FitsFile, ObservationRun, ObservationRunChange
+
+# Frames of the same target further apart than this start a new run
+RUN_GAP_MINUTES = 30
+
+_RUN_FILE_COLUMNS = (FitsFile.id, FitsFile.date_obs, FitsFile.target, FitsFile.filter_name,
+                     FitsFile.exptime, FitsFile.binning)
+
+
+def group_runs(files: Sequence[Any]) -> List[List[Any]]:
+    """
+    Group frames sorted by date_obs into runs.
+
+    A frame joins the current run when it has the same target as the previous
+    frame and was taken at most RUN_GAP_MINUTES after it.
+    """
+    runs = []
+    current = []
+    for f in files:
+        if current:
+            last = current[-1]
+            gap = (f.date_obs - last.date_obs).total_seconds() / 60 \
+                if f.date_obs and last.date_obs else float('inf')
+            if f.target == last.target and gap <= RUN_GAP_MINUTES:
+                current.append(f)
+                continue
+            runs.append(current)
+        current = [f]
+    if current:
+        runs.append(current)
+    return runs
+
+
+def summarize_run(run_files: Sequence[Any]) -> Dict[str, Any]:
+    """observation_runs row of a run (frames sorted by date_obs)."""
+    exposures = [f.exptime for f in run_files if f.exptime]
+    return {
+        'target': run_files[0].target,
+        'start_time': run_files[0].date_obs,
+        'end_time': run_files[-1].date_obs,
+        'file_count': len(run_files),
+        'filters': json.dumps(sorted({f.filter_name for f in run_files if f.filter_name})),
+        'exposures': json.dumps(sorted(set(exposures))),
+        'total_exptime': float(sum(exposures)),
+        'binning': run_files[-1].binning,
+    }
+
+
+def refresh_runs(conn: Connection) -> int:
+    """
+    Update the runs affected by the pending changes.
+
+    Returns:
+        Number of runs (re)built
+    """
+    t_min, t_max, last_change = conn.execute(select(
+        func.min(ObservationRunChange.date_obs), func.max(ObservationRunChange.date_obs),
+        func.max(ObservationRunChange.id)
+    )).one()
+    if last_change is None:
+        return 0
+
+    # The closest runs entirely before and after the changes are unaffected,
+    # and so is everything beyond them: re-group from the start of the one
+    # before to the end of the one after.
+    start = end = None
+    if t_min is not None:
+        start = conn.execute(select(ObservationRun.start_time).where(ObservationRun.end_time < t_min)
+                             .order_by(ObservationRun.end_time.desc()).limit(1)).scalar()
+        end = conn.execute(select(ObservationRun.end_time).where(ObservationRun.start_time > t_max)
+                           .order_by(ObservationRun.start_time).limit(1)).scalar()
+
+    file_query = select(*_RUN_FILE_COLUMNS).order_by(FitsFile.date_obs, FitsFile.id)
+    run_delete = delete(ObservationRun)
+    if start is not None:
+        file_query = file_query.where(FitsFile.date_obs >= start)
+        run_delete = run_delete.where(ObservationRun.end_time >= start)
+    if end is not None:
+        file_query = file_query.where(FitsFile.date_obs <= end)
+        run_delete = run_delete.where(ObservationRun.start_time <= end)
+
+    files = conn.execute(file_query).all()
+    conn.execute(run_delete)
+
+    assignments = []
+    runs = group_runs(files)
+    for run_files in runs:
+        run_id = conn.execute(insert(ObservationRun).values(**summarize_run(run_files))).inserted_primary_key[0]
+        assignments.extend({'file_id': f.id, 'run_id': run_id} for f in run_files)
+    if assignments:
+        conn.execute(
+            update(FitsFile.__table__).where(FitsFile.__table__.c.id == bindparam('file_id'))
+            .values(run_id=bindparam('run_id')),
+            assignments
+        )
+
+    conn.execute(delete(ObservationRunChange).where(ObservationRunChange.id <= last_change))
+    return len(runs)
+
+
+def create_run_triggers(conn: Connection):
+    """Triggers recording the fits_files changes that affect runs."""
+    record = "INSERT INTO observation_run_changes (date_obs) VALUES ({});"
+    triggers = {
+        'fits_files_runs_insert': ('INSERT', record.format('NEW.date_obs')),
+        'fits_files_runs_delete': ('DELETE', record.format('OLD.date_obs')),
+        'fits_files_runs_update': ('UPDATE OF date_obs, target',
+                                   record.format('OLD.date_obs') + ' ' + record.format('NEW.date_obs')),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON fits_files "
+                          f"FOR EACH ROW BEGIN {body} END"))
+
+
+def rebuild_runs(conn: Connection) -> int:
+    """Re-group the whole library into runs."""
+    conn.execute(delete(ObservationRun))
+    conn.execute(insert(ObservationRunChange).values(date_obs=None))
+    return refresh_runs(conn)
@@ -4,31 +4,82 @@ FITS file scanner for importing files into the database.
 
 import os
 import json
+import time
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
 from .manager import get_db_manager
-from ..fits import get_fits_header_as_json
+from ..fits.rawheader import read_raw_header
 import config
 
 
+def _fits_file_row(path: str, filter_name: str) -> Dict[str, Any]:
+    """
+    Read the header of a FITS file and build its fits_files row.
+    
+    Runs in the scanner's worker processes, so it must not touch the database.
+    """
+    st = os.stat(path)
+    header = read_raw_header(path)
+    get_val = header.get
+
+    return {
+        'path': path,
+        'target': normalize_object_name(get_val('OBJECT')),  # Normalized OBJECT from header as target
+        'filter_name': filter_name,  # Use directory name as filter
+        'date_obs': FitsFileScanner._parse_date_obs(get_val('DATE-OBS')),
+        'exptime': get_val('EXPTIME'),
+        'gain': get_val('GAIN'),
+        'offset': get_val('OFFSET'),
+        'focus_position': get_val('FOCUSPOS'),
+        'ccd_temp': get_val('CCD-TEMP'),
+        'binning': FitsFileScanner._format_binning(get_val('XBINNING'), get_val('YBINNING')),
+        'size_x': get_val('NAXIS1'),
+        'size_y': get_val('NAXIS2'),
+        'image_scale': get_val('SCALE'),  # arcsec/pixel (was PIXSCALE)
+        'ra_center': get_val('CRVAL1'),  # Right Ascension of center
+        'dec_center': get_val('CRVAL2'),  # Declination of center
+        'wcs_type': get_val('CTYPE1'),  # WCS solution type
+        'header_json': json.dumps(header.to_json_dict()),  # Full header as JSON
+        'file_size': st.st_size,
+        'file_mtime': st.st_mtime,
+    }
+
+
+def _read_fits_file_worker(path: str, filter_name: str) -> Dict[str, Any]:
+    """Process pool entry point: the row of a file, or the error message."""
+    try:
+        return {'path': path, 'success': True, 'row': _fits_file_row(path, filter_name)}
+    except Exception as e:
+        return {'path': path, 'success': False, 'message': str(e)}
+
+
 class FitsFileScanner:
     """Scanner for importing FITS files into the database."""
     
-    def __init__(self, data_path: Optional[str] = None):
+    # Below this many headers to read, a process pool costs more than it saves
+    MIN_FILES_FOR_POOL = 64
+    
+    def __init__(self, data_path: Optional[str] = None, max_workers: Optional[int] = None,
+                 batch_size: int = 500, db_manager=None):
         """
         Initialize the scanner.
         
         Args:
             data_path: Path to scan for FITS files. If None, uses config.DATA_PATH.
+            max_workers: Number of header reader processes. If None, uses the CPU count.
+            batch_size: Number of rows written per transaction
+            db_manager: Database to import into (default: the global database manager)
         """
+        import config
         if data_path is None:
-            import config
             data_path = config.DATA_PATH
         
         self.data_path = Path(data_path)
-        self.db_manager = get_db_manager()
+        self.db_manager = db_manager or get_db_manager()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
         
         if not self.data_path.exists():
             raise FileNotFoundError(f"Data path does not exist: {self.data_path}")
@@ -37,12 +88,18 @@ class FitsFileScanner:
         """
         Scan the data directory and import FITS files into the database.
         
+        The recorded (path, size, mtime) of every known file is loaded once;
+        files whose size and mtime did not change are skipped without being
+        opened. Headers of new and modified files are read in a process pool
+        and the rows are written in batched transactions.
+        
         Args:
             verbose: Whether to print progress information
             
         Returns:
             Dictionary with scan results
         """
+        start = time.time()
         if verbose:
             print(f"Scanning directory: {self.data_path}")
             print(f"Expected structure: {self.data_path}/Target/Filter/file.fits")
@@ -51,17 +108,21 @@ class FitsFileScanner:
         results = {
             'total_files_found': 0,
             'files_imported': 0,
+            'files_updated': 0,
             'files_skipped': 0,
             'errors': [],
             'targets_found': set(),
-            'filters_found': set()
+            'filters_found': set(),
+            'elapsed': 0.0,
+            'files_per_second': 0.0,
         }
         
+        known = self.db_manager.get_fits_file_stats()
+        to_read = []     # (path, filter_name) of new or modified files
+        backfill = []    # Stats of files imported before size/mtime were recorded
+        
         # Walk through the directory structure
-        for target_dir in self.data_path.iterdir():
-            if not target_dir.is_dir():
-                continue
-                
+        for target_dir in self._subdirectories(self.data_path):
             target_name = target_dir.name
             results['targets_found'].add(target_name)
             
@@ -69,95 +130,141 @@ class FitsFileScanner:
                 print(f"Processing target: {target_name}")
             
             # Look for filter subdirectories
-            for filter_dir in target_dir.iterdir():
-                if not filter_dir.is_dir():
-                    continue
-                    
+            for filter_dir in self._subdirectories(target_dir):
                 filter_name = filter_dir.name
                 results['filters_found'].add(filter_name)
                 
-                if verbose:
-                    print(f"  Processing filter: {filter_name}")
-                
                 # Look for FITS files
-                for fits_file in filter_dir.glob("*.fits"):
+                new_in_filter = 0
+                for entry in os.scandir(filter_dir):
+                    if not entry.name.endswith('.fits') or not entry.is_file():
+                        continue
                     results['total_files_found'] += 1
+                    path = str(filter_dir / entry.name)
                     
-                    if verbose:
-                        print(f"    Processing: {fits_file.name}")
+                    record = known.get(path)
+                    if record is None:
+                        to_read.append((path, filter_name))
+                        new_in_filter += 1
+                        continue
                     
+                    file_id, size, mtime = record
                     try:
-                        success = self._process_fits_file(fits_file, target_name, filter_name)
-                        if success:
-                            results['files_imported'] += 1
-                        else:
-                            results['files_skipped'] += 1
-                    except Exception as e:
-                        error_msg = f"Error processing {fits_file}: {e}"
-                        results['errors'].append(error_msg)
-                        if verbose:
-                            print(f"{error_msg}")
+                        st = entry.stat()
+                    except OSError as e:
+                        results['errors'].append(f"Error processing {path}: {e}")
+                        continue
+                    if size is None or mtime is None:
+                        # Imported by an older scanner: keep the row, start tracking the file
+                        backfill.append({'id': file_id, 'file_size': st.st_size, 'file_mtime': st.st_mtime})
+                        results['files_skipped'] += 1
+                    elif st.st_size != size or st.st_mtime != mtime:
+                        to_read.append((path, filter_name))
+                    else:
+                        results['files_skipped'] += 1
+                
+                if verbose:
+                    print(f"  Processing filter: {filter_name} ({new_in_filter} new)")
+        
+        if backfill:
+            for i in range(0, len(backfill), self.batch_size):
+                self.db_manager.update_fits_files(backfill[i:i + self.batch_size])
+        
+        if to_read:
+            self._import_files(to_read, known, results, verbose)
+        
+        # Bring the observation runs, the keyword index and the sky index up to date here,
+        # so the GUI only reads them
+        self.db_manager.refresh_observation_runs()
+        self.db_manager.refresh_header_keywords()
+        self.db_manager.refresh_sky_index()
         
         # Convert sets to lists for JSON serialization
         results['targets_found'] = list(results['targets_found'])
         results['filters_found'] = list(results['filters_found'])
+        results['elapsed'] = time.time() - start
+        if results['elapsed'] > 0:
+            results['files_per_second'] = results['total_files_found'] / results['elapsed']
         
         if verbose:
             self._print_summary(results)
         
         return results
     
-    def _process_fits_file(self, fits_file: Path, target_name: str, filter_name: str) -> bool:
-        """
-        Process a single FITS file and add it to the database.
+    @staticmethod
+    def _subdirectories(path: Path) -> List[Path]:
+        return sorted(Path(entry.path) for entry in os.scandir(path) if entry.is_dir())
+    
+    def _import_files(self, to_read: List[tuple], known: Dict[str, tuple],
+                      results: Dict[str, Any], verbose: bool):
+        """Read the headers of new/modified files and write their rows in batches."""
+        use_pool = self.max_workers > 1 and len(to_read) >= self.MIN_FILES_FOR_POOL
+        if verbose:
+            workers = f"{self.max_workers} processes" if use_pool else "1 process"
+            print(f"\nReading {len(to_read)} new or modified header(s) with {workers}...")
         
-        Args:
-            fits_file: Path to the FITS file
-            target_name: Name of the target (from directory structure)
-            filter_name: Name of the filter (from directory structure)
-            
-        Returns:
-            True if file was imported, False if it was skipped (already exists)
-        """
-        # Check if file already exists in database
-        existing_file = self.db_manager.get_fits_file_by_path(str(fits_file))
-        if existing_file:
-            return False  # File already exists
+        inserts, updates = [], []
         
-        # Parse FITS header
-        header_dict = get_fits_header_as_json(str(fits_file))
+        def flush():
+            for rows, write, counter in ((inserts, self.db_manager.add_fits_files, 'files_imported'),
+                                         (updates, self.db_manager.update_fits_files, 'files_updated')):
+                try:
+                    results[counter] += write(rows)
+                except Exception:
+                    # One bad row fails the whole batch: write them one by one to isolate it
+                    for row in rows:
+                        try:
+                            results[counter] += write([row])
+                        except Exception as e:
+                            error_msg = f"Error processing {row['path']}: {e}"
+                            results['errors'].append(error_msg)
+                            if verbose:
+                                print(error_msg)
+                rows.clear()
         
-        # Extract key information from header
-        def get_val(key):
-            v = header_dict.get(key)
-            return v[0] if isinstance(v, tuple) else v
-
-        fits_data = {
-            'path': str(fits_file),
-            'target': normalize_object_name(get_val('OBJECT')),  # Normalized OBJECT from header as target
-            'filter_name': filter_name,  # Use directory name as filter
-            'date_obs': self._parse_date_obs(get_val('DATE-OBS')),
-            'exptime': get_val('EXPTIME'),
-            'gain': get_val('GAIN'),
-            'offset': get_val('OFFSET'),
-            'focus_position': get_val('FOCUSPOS'),
-            'ccd_temp': get_val('CCD-TEMP'),
-            'binning': self._format_binning(get_val('XBINNING'), get_val('YBINNING')),
-            'size_x': get_val('NAXIS1'),
-            'size_y': get_val('NAXIS2'),
-            'image_scale': get_val('SCALE'),  # arcsec/pixel (was PIXSCALE)
-            'ra_center': get_val('CRVAL1'),  # Right Ascension of center
-            'dec_center': get_val('CRVAL2'),  # Declination of center
-            'wcs_type': get_val('CTYPE1'),  # WCS solution type
-            'header_json': json.dumps(header_dict),  # Full header as JSON
-            'simbad_objects': '[]'  # Empty array for now
-        }
+        if use_pool:
+            from concurrent.futures import ProcessPoolExecutor
+            from multiprocessing import get_context
+            # Spawned workers do not inherit the parent state (Qt, open DB connections)
+            executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=get_context('spawn'))
+            chunksize = max(1, min(256, len(to_read) // (self.max_workers * 4)))
+            outcomes = executor.map(_read_fits_file_worker, [p for p, _ in to_read],
+                                    [f for _, f in to_read], chunksize=chunksize)
+        else:
+            executor = None
+            outcomes = (_read_fits_file_worker(path, filter_name) for path, filter_name in to_read)
         
-        # Add to database
-        self.db_manager.add_fits_file(fits_data)
-        return True
+        read_start = time.time()
+        try:
+            for done, outcome in enumerate(outcomes, start=1):
+                if not outcome['success']:
+                    error_msg = f"Error processing {outcome['path']}: {outcome['message']}"
+                    results['errors'].append(error_msg)
+                    if verbose:
+                        print(error_msg)
+                    continue
+                row = outcome['row']
+                row['simbad_objects'] = '[]'  # Empty array for now
+                record = known.get(row['path'])
+                if record is None:
+                    inserts.append(row)
+                else:
+                    # Header-derived fields only; analysis results are kept
+                    row['id'] = record[0]
+                    del row['simbad_objects']
+                    updates.append(row)
+                if len(inserts) + len(updates) >= self.batch_size:
+                    flush()
+                    if verbose:
+                        rate = done / (time.time() - read_start)
+                        print(f"  [{done}/{len(to_read)}] {rate:.0f} headers/s")
+            flush()
+        finally:
+            if executor is not None:
+                executor.shutdown()
     
-    def _parse_date_obs(self, date_obs: Any) -> Optional[datetime]:
+    @staticmethod
+    def _parse_date_obs(date_obs: Any) -> Optional[datetime]:
         """
         Parse the DATE-OBS header value into a datetime object.
         
@@ -183,7 +290,8 @@ class FitsFileScanner:
         except Exception:
             return None
     
-    def _format_binning(self, xbin: Any, ybin: Any) -> str:
+    @staticmethod
+    def _format_binning(xbin: Any, ybin: Any) -> str:
         """
         Format binning information as a string.
         
@@ -205,8 +313,11 @@ class FitsFileScanner:
         print("=" * 60)
         print(f"Total files found: {results['total_files_found']}")
         print(f"Files imported: {results['files_imported']}")
-        print(f"Files skipped (already in DB): {results['files_skipped']}")
+        print(f"Files updated (modified on disk): {results.get('files_updated', 0)}")
+        print(f"Files skipped (unchanged): {results['files_skipped']}")
         print(f"Errors: {len(results['errors'])}")
+        if results.get('elapsed'):
+            print(f"Elapsed: {results['elapsed']:.1f}s ({results['files_per_second']:.0f} files/s)")
         
         if results['targets_found']:
             print(f"\nTargets found: {', '.join(sorted(results['targets_found']))}")
@@ -275,10 +386,8 @@ class CalibrationMasterScanner:
         existing = self.db_manager.get_calibration_master_by_path(str(fits_file))
         if existing:
             return False  # File already exists
-        header_dict = get_fits_header_as_json(str(fits_file))
-        def get_val(key):
-            v = header_dict.get(key)
-            return v[0] if isinstance(v, tuple) else v
+        header = read_raw_header(str(fits_file))
+        get_val = header.get
         # Parse date (date only, no time)
         date_obs = get_val('DATE-OBS')
         date_str = None
@@ -302,7 +411,7 @@ class CalibrationMasterScanner:
             'binning': self._format_binning(get_val('XBINNING'), get_val('YBINNING')),
             'size_x': get_val('NAXIS1'),
             'size_y': get_val('NAXIS2'),
-            'header_json': json.dumps(header_dict),
+            'header_json': json.dumps(header.to_json_dict()),
             'integration_count': get_val('NIMAGES'),
         }
         self.db_manager.add_calibration_master(master_data)
@@ -328,19 +437,81 @@ class CalibrationMasterScanner:
             for error in results['errors']:
                 print(f"  - {error}")
 
-def scan_fits_library(data_path: Optional[str] = None, verbose: bool = True) -> Dict[str, Any]:
+def scan_fits_library(data_path: Optional[str] = None, verbose: bool = True,
+                      max_workers: Optional[int] = None) -> Dict[str, Any]:
     """
     Convenience function to scan the FITS library.
     
     Args:
         data_path: Path to scan for FITS files. If None, uses config.DATA_PATH.
         verbose: Whether to print progress information
+        max_workers: Number of header reader processes. If None, uses the CPU count.
         
     Returns:
         Dictionary with scan results
     """
-    scanner = FitsFileScanner(data_path)
-    return scanner.scan_directory(verbose) 
+    scanner = FitsFileScanner(data_path, max_workers=max_workers)
+    return scanner.scan_directory(verbose)
+
+
+def benchmark_scanner(n_files: int = 2000, max_workers: Optional[int] = None,
+                      root: Optional[str] = None) -> Dict[str, float]:
+    """
+    Time the library scanner on a synthetic Target/Filter tree of small FITS files.
+    
+    Measures a first import serially and with the process pool (each into a
+    fresh temporary database), then a rescan of the unchanged tree, which
+    should not open any file. Returns files/s for each run and prints them.
+    """
+    import shutil
+    import tempfile
+    import numpy as np
+    from astropy.io import fits
+    from .manager import DatabaseManager
+    
+    own_root = root is None
+    root = root or tempfile.mkdtemp(prefix='astropipes_scan_bench_')
+    tree = os.path.join(root, 'data')
+    workers = max_workers or os.cpu_count() or 1
+    
+    def scan(db_name, workers):
+        manager = DatabaseManager(os.path.join(root, db_name))
+        try:
+            scanner = FitsFileScanner(tree, max_workers=workers, db_manager=manager)
+            results = scanner.scan_directory(verbose=False)
+        finally:
+            manager.close()
+        return results
+    
+    try:
+        print(f"Creating synthetic library: {n_files} files in {tree}...")
+        data = np.zeros((64, 64), dtype=np.uint16)
+        for i in range(n_files):
+            directory = os.path.join(tree, f"Target {i % 20}", ['L', 'R', 'G', 'B', 'Ha'][i % 5])
+            os.makedirs(directory, exist_ok=True)
+            header = fits.Header()
+            header['OBJECT'] = f"Target {i % 20}"
+            header['DATE-OBS'] = f"2024-01-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00"
+            header['EXPTIME'] = 300.0
+            header['GAIN'] = 100
+            header['OFFSET'] = 50
+            header['CCD-TEMP'] = -15.0
+            header['XBINNING'] = 1
+            header['YBINNING'] = 1
+            fits.PrimaryHDU(data, header).writeto(os.path.join(directory, f"frame_{i:06d}.fits"))
+        
+        timings = {}
+        runs = [('serial import', 'serial.db', 1), (f'parallel import ({workers})', 'parallel.db', workers),
+                ('unchanged rescan', 'parallel.db', workers)]
+        for name, db_name, run_workers in runs:
+            results = scan(db_name, run_workers)
+            timings[name] = results['files_per_second']
+            print(f"{name:<24} {results['elapsed']:>7.2f}s {results['files_per_second']:>10.0f} files/s  "
+                  f"(imported {results['files_imported']}, skipped {results['files_skipped']})")
+    finally:
+        if own_root:
+            shutil.rmtree(root, ignore_errors=True)
+    return timings
 
 def scan_calibration_masters(calibration_path: Optional[str] = None, verbose: bool = True) -> Dict[str, Any]:
     """
@@ -374,7 +545,7 @@ def is_file_in_database(file_path: str) -> bool:
     db_manager = get_db_manager()
     
     try:
-        session = db_manager.get_session()
+        session = db_manager.get_read_session()
         
         # Check in FitsFile table
         fits_file = session.query(FitsFile).filter(FitsFile.path == file_path).first()
@@ -416,7 +587,7 @@ def get_file_database_info(file_path: str) -> Optional[Dict[str, Any]]:
     db_manager = get_db_manager()
     
     try:
-        session = db_manager.get_session()
+        session = db_manager.get_read_session()
         
         # Check in FitsFile table
         fits_file = session.query(FitsFile).filter(FitsFile.path == file_path).first()
@@ -472,7 +643,6 @@ def rescan_single_file(file_path: str) -> Dict[str, Any]:
     """
     from lib.db.manager import get_db_manager
     from lib.db.models import FitsFile, CalibrationMaster
-    from astropy.io import fits
     from astropy.wcs import WCS
     from astropy.wcs.utils import proj_plane_pixel_scales
     from datetime import datetime
@@ -499,67 +669,66 @@ def rescan_single_file(file_path: str) -> Dict[str, Any]:
             }
         
         # Read FITS header
-        with fits.open(file_path) as hdu:
-            header = hdu[0].header
-            data = hdu[0].data
-            
-            # Get basic file info
-            file_size = os.path.getsize(file_path)
-            file_mtime = datetime.fromtimestamp(os.path.getmtime(file_path))
-            
-            # Extract header values with defaults
-            date_obs_str = header.get('DATE-OBS', '')
-            target = normalize_object_name(header.get('OBJECT', ''))
-            filter_name = header.get('FILTER', '')
-            exptime = header.get('EXPTIME', 0.0)
-            gain = header.get('GAIN', 0.0)
-            offset = header.get('OFFSET', 0.0)
-            focus_position = header.get('FOCUSPOS', 0)
-            ccd_temp = header.get('CCD-TEMP', 0.0)
-            
-            # Handle binning - convert to strings first
-            xbin = str(header.get('XBINNING', 1))
-            ybin = str(header.get('YBINNING', 1))
-            binning = f"{xbin}x{ybin}"
-            
-            # Image dimensions
-            size_x = header.get('NAXIS1', 0)
-            size_y = header.get('NAXIS2', 0)
-            
-            # WCS information
-            # wcs_type = 'none'
-            image_scale = None
-            ra_center = None
-            dec_center = None
-            
-            wcs_type = header.get('CTYPE1', None)
-            
+        header = read_raw_header(file_path)
+        
+        # Get basic file info
+        file_size = os.path.getsize(file_path)
+        file_mtime = datetime.fromtimestamp(os.path.getmtime(file_path))
+        
+        # Extract header values with defaults
+        date_obs_str = header.get('DATE-OBS', '')
+        target = normalize_object_name(header.get('OBJECT', ''))
+        filter_name = header.get('FILTER', '')
+        exptime = header.get('EXPTIME', 0.0)
+        gain = header.get('GAIN', 0.0)
+        offset = header.get('OFFSET', 0.0)
+        focus_position = header.get('FOCUSPOS', 0)
+        ccd_temp = header.get('CCD-TEMP', 0.0)
+        
+        # Handle binning - convert to strings first
+        xbin = str(header.get('XBINNING', 1))
+        ybin = str(header.get('YBINNING', 1))
+        binning = f"{xbin}x{ybin}"
+        
+        # Image dimensions
+        size_x = header.get('NAXIS1', 0)
+        size_y = header.get('NAXIS2', 0)
+        
+        # WCS information
+        # wcs_type = 'none'
+        image_scale = None
+        ra_center = None
+        dec_center = None
+        
+        wcs_type = header.get('CTYPE1', None)
+        
+        try:
+            # Only a header with a WCS needs the full astropy parse
+            wcs = WCS(header.to_astropy()) if wcs_type else None
+            if wcs is not None and wcs.is_celestial:
+                # Calculate pixel scale
+                pixel_scales = proj_plane_pixel_scales(wcs)
+                image_scale = pixel_scales[0] * 3600  # Convert to arcsec/pixel
+                # Get center coordinates
+                center_x = size_x / 2
+                center_y = size_y / 2
+                ra_center, dec_center = wcs.all_pix2world(center_x, center_y, 0)
+        except:
+            pass
+        
+        # Parse date
+        date_obs = None
+        if date_obs_str:
             try:
-                wcs = WCS(header)
-                if wcs.is_celestial:
-                    # Calculate pixel scale
-                    pixel_scales = proj_plane_pixel_scales(wcs)
-                    image_scale = pixel_scales[0] * 3600  # Convert to arcsec/pixel
-                    # Get center coordinates
-                    center_x = size_x / 2
-                    center_y = size_y / 2
-                    ra_center, dec_center = wcs.all_pix2world(center_x, center_y, 0)
+                # Try different date formats
+                for fmt in ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%d %H:%M:%S']:
+                    try:
+                        date_obs = datetime.strptime(date_obs_str, fmt)
+                        break
+                    except ValueError:
+                        continue
             except:
                 pass
-            
-            # Parse date
-            date_obs = None
-            if date_obs_str:
-                try:
-                    # Try different date formats
-                    for fmt in ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%d %H:%M:%S']:
-                        try:
-                            date_obs = datetime.strptime(date_obs_str, fmt)
-                            break
-                        except ValueError:
-                            continue
-                except:
-                    pass
         
         session = db_manager.get_session()
         
@@ -584,6 +753,10 @@ def rescan_single_file(file_path: str) -> Dict[str, Any]:
                     fits_file.ra_center = ra_center
                     fits_file.dec_center = dec_center
                     fits_file.wcs_type = wcs_type
+                    fits_file.file_size = file_size
+                    fits_file.file_mtime = os.path.getmtime(file_path)
+                    # Keep the stored header current too: the sky index reads the WCS from it
+                    fits_file.header_json = json.dumps(header.to_json_dict())
                     
                     session.commit()
                     
@@ -0,0 +1,295 @@
+"""
+HEALPix sky index of the library, for footprint queries.
+
+The footprint of every frame (from the WCS in its stored header, or from its
+center, size and image scale) is recorded in sky_footprints, and the nested
+HEALPix pixels it overlaps in sky_pixels. "Which frames cover this point or
+cone (at this time)?" is then an index lookup on the pixels of the query
+cone, followed by an exact test against the few candidate footprints.
+
+Frames are (re)indexed incrementally: SQLite triggers (created by migration 6)
+queue the id of every frame inserted or whose position changes in
+sky_index_changes, and drop the index rows of deleted frames.
+refresh_sky_index() processes the queue.
+"""
+
+import json
+import time
+import warnings
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import astropy.units as u
+from astropy_healpix import HEALPix
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.engine import Connection
+
+from .models import FitsFile, SkyFootprint, SkyIndexChange, SkyPixel
+
+# Pixel resolution about 55 arcmin: a typical frame overlaps 10-30 pixels.
+# Changing it requires rebuild_sky_index().
+NSIDE = 64
+
+_healpix = HEALPix(nside=NSIDE, order='nested')
+# Cone searches only return pixels whose center is inside the cone: widen
+# cones by a pixel so that every pixel touching them is included
+_MARGIN = _healpix.pixel_resolution.to_value(u.deg)
+
+_FOOTPRINT_COLUMNS = (FitsFile.id, FitsFile.header_json, FitsFile.ra_center, FitsFile.dec_center,
+                      FitsFile.image_scale, FitsFile.size_x, FitsFile.size_y)
+
+
+def _header_from_json(header_json: str):
+    """astropy Header from a stored header_json (values are stored as strings)."""
+    from astropy.io import fits
+
+    header = fits.Header()
+    for keyword, (value, comment) in json.loads(header_json).items():
+        if keyword in ('', 'COMMENT', 'HISTORY') or len(keyword) > 8:
+            continue
+        if value in ('True', 'False'):
+            value = value == 'True'
+        else:
+            for cast in (int, float):
+                try:
+                    value = cast(value)
+                    break
+                except (TypeError, ValueError):
+                    continue
+        header[keyword] = value
+    return header
+
+
+def _separation(ra1, dec1, ra2, dec2):
+    """Angular separation in degrees (arrays broadcast)."""
+    ra1, dec1, ra2, dec2 = map(np.radians, (ra1, dec1, ra2, dec2))
+    sin_ddec = np.sin((dec2 - dec1) / 2)
+    sin_dra = np.sin((ra2 - ra1) / 2)
+    a = sin_ddec ** 2 + np.cos(dec1) * np.cos(dec2) * sin_dra ** 2
+    return np.degrees(2 * np.arcsin(np.sqrt(np.clip(a, 0, 1))))
+
+
+def frame_footprint(frame: Any) -> Optional[Dict[str, Any]]:
+    """
+    Footprint of a frame: {'ra', 'dec', 'radius', 'corners'}, or None without astrometry.
+
+    The WCS of the stored header gives the four corners; otherwise the
+    footprint is the circle around ra/dec_center enclosing an image of
+    size_x x size_y pixels of image_scale arcsec.
+    """
+    if frame.header_json:
+        try:
+            from astropy.wcs import WCS
+
+            header = _header_from_json(frame.header_json)
+            nx, ny = header.get('NAXIS1'), header.get('NAXIS2')
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                wcs = WCS(header)
+            if wcs.has_celestial and nx and ny:
+                wcs = wcs.celestial
+                corners = wcs.calc_footprint(axes=(nx, ny))
+                ra, dec = (float(v) for v in wcs.all_pix2world((nx - 1) / 2, (ny - 1) / 2, 0))
+                radius = float(np.max(_separation(ra, dec, corners[:, 0], corners[:, 1])))
+                if np.isfinite(radius):
+                    return {'ra': ra % 360, 'dec': dec, 'radius': radius,
+                            'corners': json.dumps(np.round(corners, 7).tolist())}
+        except Exception:
+            pass  # Invalid WCS: fall back to center and scale
+
+    if None in (frame.ra_center, frame.dec_center, frame.image_scale, frame.size_x, frame.size_y):
+        return None
+    radius = float(np.hypot(frame.size_x, frame.size_y) / 2 * frame.image_scale / 3600)
+    return {'ra': float(frame.ra_center) % 360, 'dec': float(frame.dec_center), 'radius': radius, 'corners': None}
+
+
+def footprint_pixels(ra: float, dec: float, radius: float) -> np.ndarray:
+    """HEALPix pixels overlapped by a circle (degrees)."""
+    return _healpix.cone_search_lonlat(ra * u.deg, dec * u.deg, (radius + _MARGIN) * u.deg)
+
+
+def _index_frames(conn: Connection, frame_ids: Sequence[int]) -> int:
+    """(Re)compute the footprint and pixels of some frames. Returns the number indexed."""
+    frames = conn.execute(select(*_FOOTPRINT_COLUMNS).where(FitsFile.id.in_(frame_ids))).all()
+    conn.execute(delete(SkyPixel).where(SkyPixel.fits_file_id.in_(frame_ids)))
+    conn.execute(delete(SkyFootprint).where(SkyFootprint.fits_file_id.in_(frame_ids)))
+
+    footprints, pixels = [], []
+    for frame in frames:
+        footprint = frame_footprint(frame)
+        if footprint is None:
+            continue
+        footprints.append(dict(footprint, fits_file_id=frame.id))
+        pixels.extend({'hpx': int(hpx), 'fits_file_id': frame.id}
+                      for hpx in footprint_pixels(footprint['ra'], footprint['dec'], footprint['radius']))
+    if footprints:
+        conn.execute(insert(SkyFootprint), footprints)
+        conn.execute(insert(SkyPixel), pixels)
+    return len(footprints)
+
+
+def refresh_sky_index(conn: Connection, batch_size: int = 2000, verbose: bool = False) -> int:
+    """
+    Index the frames queued in sky_index_changes.
+
+    Returns:
+        Number of frames processed
+    """
+    processed = 0
+    start = time.time()
+    while True:
+        frame_ids = conn.execute(select(SkyIndexChange.fits_file_id).limit(batch_size)).scalars().all()
+        if not frame_ids:
+            break
+        _index_frames(conn, frame_ids)
+        conn.execute(delete(SkyIndexChange).where(SkyIndexChange.fits_file_id.in_(frame_ids)))
+        processed += len(frame_ids)
+        if verbose:
+            print(f"  Sky index: {processed} frames ({processed / (time.time() - start):.0f} frames/s)")
+    return processed
+
+
+def create_sky_index_triggers(conn: Connection):
+    """Triggers queuing new/moved frames and dropping the index rows of deleted ones."""
+    queue = "INSERT OR IGNORE INTO sky_index_changes (fits_file_id) VALUES (NEW.id);"
+    triggers = {
+        'fits_files_sky_insert': ('INSERT', queue),
+        'fits_files_sky_update': ('UPDATE OF ra_center, dec_center, image_scale, size_x, size_y, header_json',
+                                  queue),
+        'fits_files_sky_delete': ('DELETE', "DELETE FROM sky_pixels WHERE fits_file_id = OLD.id; "
+                                            "DELETE FROM sky_footprints WHERE fits_file_id = OLD.id; "
+                                            "DELETE FROM sky_index_changes WHERE fits_file_id = OLD.id;"),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON fits_files "
+                          f"FOR EACH ROW BEGIN {body} END"))
+
+
+def queue_all_frames(conn: Connection):
+    """Queue every frame for (re)indexing."""
+    conn.execute(text("INSERT OR IGNORE INTO sky_index_changes (fits_file_id) SELECT id FROM fits_files"))
+
+
+def _gnomonic(ra, dec, ra0, dec0):
+    """Tangent-plane coordinates (degrees) around (ra0, dec0); arrays broadcast."""
+    ra, dec, ra0, dec0 = map(np.radians, (ra, dec, ra0, dec0))
+    cos_c = np.sin(dec0) * np.sin(dec) + np.cos(dec0) * np.cos(dec) * np.cos(ra - ra0)
+    x = np.cos(dec) * np.sin(ra - ra0) / cos_c
+    y = (np.cos(dec0) * np.sin(dec) - np.sin(dec0) * np.cos(dec) * np.cos(ra - ra0)) / cos_c
+    return np.degrees(x), np.degrees(y)
+
+
+def footprint_intersects(footprint: Any, ra: float, dec: float, radius: float = 0.0) -> bool:
+    """Whether a stored footprint overlaps the cone (ra, dec, radius)."""
+    separation = float(_separation(footprint.ra, footprint.dec, ra, dec))
+    if separation > footprint.radius + radius:
+        return False
+    if not footprint.corners:
+        return True
+    corners = np.array(json.loads(footprint.corners))
+    # Point in polygon (or within radius of an edge) in the frame's tangent plane
+    cx, cy = _gnomonic(corners[:, 0], corners[:, 1], footprint.ra, footprint.dec)
+    px, py = _gnomonic(ra, dec, footprint.ra, footprint.dec)
+    inside = False
+    for i in range(len(cx)):
+        j = i - 1
+        if (cy[i] > py) != (cy[j] > py) and px < (cx[j] - cx[i]) * (py - cy[i]) / (cy[j] - cy[i]) + cx[i]:
+            inside = not inside
+    if inside or radius <= 0:
+        return inside
+    for i in range(len(cx)):
+        j = i - 1
+        ex, ey = cx[i] - cx[j], cy[i] - cy[j]
+        t = np.clip(((px - cx[j]) * ex + (py - cy[j]) * ey) / (ex * ex + ey * ey or 1), 0, 1)
+        if np.hypot(px - cx[j] - t * ex, py - cy[j] - t * ey) <= radius:
+            return True
+    return False
+
+
+def find_frame_ids(conn: Connection, ra: float, dec: float, radius: float = 0.0,
+                   start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[int]:
+    """
+    Ids of the frames whose footprint overlaps a point or cone, optionally taken between start and end.
+
+    Args:
+        ra, dec: Position (degrees)
+        radius: Cone radius (degrees), 0 for a point
+        start, end: Observation time range (date_obs)
+    """
+    pixels = [int(p) for p in footprint_pixels(ra, dec, radius)]
+    query = select(SkyFootprint.fits_file_id, SkyFootprint.ra, SkyFootprint.dec, SkyFootprint.radius,
+                   SkyFootprint.corners) \
+        .where(SkyFootprint.fits_file_id.in_(
+            select(SkyPixel.fits_file_id).where(SkyPixel.hpx.in_(pixels)).distinct()
+        ))
+    if start is not None or end is not None:
+        query = query.join(FitsFile, FitsFile.id == SkyFootprint.fits_file_id)
+        if start is not None:
+            query = query.where(FitsFile.date_obs >= start)
+        if end is not None:
+            query = query.where(FitsFile.date_obs <= end)
+    return [row.fits_file_id for row in conn.execute(query) if footprint_intersects(row, ra, dec, radius)]
+
+
+def benchmark_sky_index(n_frames: int = 200000, n_queries: int = 200, db_path: Optional[str] = None,
+                        seed: int = 0) -> Dict[str, float]:
+    """
+    Time the sky index on a synthetic library of 1-degree frames around a few hundred fields.
+
+    Returns and prints the build rate and the mean point and cone query times.
+    """
+    import os
+    import tempfile
+    from .manager import DatabaseManager
+
+    rng = np.random.default_rng(seed)
+    own_dir = None
+    if db_path is None:
+        own_dir = tempfile.mkdtemp(prefix='astropipes_sky_bench_')
+        db_path = os.path.join(own_dir, 'sky.db')
+    manager = DatabaseManager(db_path)
+    try:
+        fields = np.column_stack([rng.uniform(0, 360, 500), np.degrees(np.arcsin(rng.uniform(-0.9, 0.9, 500)))])
+        field_index = rng.integers(0, len(fields), n_frames)
+        centers = fields[field_index] + rng.normal(0, 0.05, (n_frames, 2))
+        base = datetime(2020, 1, 1)
+        rows = [{'path': f'/bench/{i}.fits', 'target': f'F{field_index[i]}',
+                 'date_obs': base + timedelta(minutes=5 * i), 'ra_center': float(centers[i, 0] % 360),
+                 'dec_center': float(centers[i, 1]), 'image_scale': 1.2, 'size_x': 3000, 'size_y': 2000}
+                for i in range(n_frames)]
+        print(f"Creating synthetic library: {n_frames} frames...")
+        for i in range(0, n_frames, 5000):
+            manager.add_fits_files(rows[i:i + 5000])
+
+        build_start = time.perf_counter()
+        indexed = manager.refresh_sky_index()
+        build_time = time.perf_counter() - build_start
+
+        def timed(radius, window):
+            elapsed, found = 0.0, 0
+            with manager.read_engine.connect() as conn:
+                for _ in range(n_queries):
+                    ra, dec = fields[rng.integers(0, len(fields))] + rng.normal(0, 0.2, 2)
+                    start = end = None
+                    if window:
+                        start = base + timedelta(minutes=float(rng.uniform(0, 5 * n_frames)))
+                        end = start + timedelta(days=30)
+                    t0 = time.perf_counter()
+                    found += len(find_frame_ids(conn, ra % 360, dec, radius, start, end))
+                    elapsed += time.perf_counter() - t0
+            return elapsed / n_queries * 1000, found / n_queries
+
+        results = {'build_frames_per_s': indexed / build_time if build_time else 0.0}
+        for name, radius, window in (('point', 0.0, False), ('cone 0.5 deg', 0.5, False),
+                                     ('point, 30 days', 0.0, True)):
+            ms, found = timed(radius, window)
+            results[name] = ms
+            print(f"{name:<16} {ms:>8.2f} ms/query  ({found:.0f} frames found on average)")
+        print(f"Index build: {results['build_frames_per_s']:.0f} frames/s")
+        return results
+    finally:
+        manager.close()
+        if own_dir:
+            import shutil
+            shutil.rmtree(own_dir, ignore_errors=True)
@@ -3,14 +3,19 @@ FITS file utilities for astro-pipelines.
 """
 
 from .header import get_fits_header_as_json, get_fits_header_json_string, set_fits_header_value
+from .rawheader import RawHeader, read_raw_header, read_header_values, fits_file_complete
 from .wcs import (
     extract_wcs_from_file,
     extract_wcs_from_astrometry_net,
     validate_wcs_solution,
     apply_wcs_to_fits,
+    restore_wcs_backup,
+    has_wcs_backup,
     extract_existing_wcs_info,
+    extract_existing_wcs_info_from_header,
     create_wcs_from_file,
     validate_fits_file,
+    estimate_star_count,
     extract_existing_wcs_from_header,
     has_complete_wcs_solution,
     get_platesolving_constraints,
@@ -19,7 +24,16 @@ from .wcs import (
     WCSApplicationError,
     ImageValidationError
 )
+from .compression import (
+    write_image,
+    write_ccddata,
+    read_ccddata,
+    read_image_header,
+    image_hdu_index,
+    CompressionError
+)
 from .calibration import CalibrationManager
+from .artifacts import ArtifactStore, get_artifact_store
 from .integration import (
     integrate_with_motion_tracking,
     integrate_standard,
@@ -33,13 +47,21 @@ __all__ = [
     'get_fits_header_as_json', 
     'get_fits_header_json_string',
     'set_fits_header_value',
+    'RawHeader',
+    'read_raw_header',
+    'read_header_values',
+    'fits_file_complete',
     'extract_wcs_from_file',
     'extract_wcs_from_astrometry_net',
     'validate_wcs_solution',
     'apply_wcs_to_fits',
+    'restore_wcs_backup',
+    'has_wcs_backup',
     'extract_existing_wcs_info',
+    'extract_existing_wcs_info_from_header',
     'create_wcs_from_file',
     'validate_fits_file',
+    'estimate_star_count',
     'extract_existing_wcs_from_header',
     'has_complete_wcs_solution',
     'get_platesolving_constraints',
@@ -47,7 +69,15 @@ __all__ = [
     'WCSExtractionError',
     'WCSApplicationError',
     'ImageValidationError',
+    'write_image',
+    'write_ccddata',
+    'read_ccddata',
+    'read_image_header',
+    'image_hdu_index',
+    'CompressionError',
     'CalibrationManager',
+    'ArtifactStore',
+    'get_artifact_store',
     'integrate_with_motion_tracking',
     'integrate_standard',
     'calculate_motion_shifts',
@@ -0,0 +1,278 @@
+"""
+Content-addressed store for derived products (calibrated frames, plate
+solutions, stacks...).
+
+An artifact is stored under a key hashed from everything that determines it:
+the identity of the input files, the processing parameters and the version of
+the code producing it (a hash of its source file). Producers look the key up
+before computing and store their result afterwards, so identical work is done
+once. The store is bounded in size; least recently used artifacts are evicted
+first. Hit/miss counters are kept on disk so they cover all processes (CLI,
+GUI, autopipe) sharing the store.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+
+DEFAULT_STORE_PATH = '/tmp/astropipes/store'
+DEFAULT_STORE_MAX_SIZE = 20 * 1024 ** 3
+
+_code_versions: Dict[str, str] = {}
+
+
+def file_identity(path: str) -> str:
+    """Cheap identity of a file: resolved path, size and modification time."""
+    st = os.stat(path)
+    return f"{os.path.realpath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def data_digest(path: str, hdu_index: Optional[int] = None) -> str:
+    """
+    Hash of the data unit of a FITS HDU (by default the image HDU).
+
+    Unlike file_identity it does not change when only the header is updated
+    (e.g. when a WCS solution is written), so it identifies the image itself.
+    """
+    from astropy.io import fits
+    from lib.fits.compression import image_hdu_index
+
+    with fits.open(path) as hdul:
+        if hdu_index is None:
+            hdu_index = image_hdu_index(hdul)
+        info = hdul.fileinfo(hdu_index)
+        offset, span = info['datLoc'], info['datSpan']
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        remaining = span
+        while remaining > 0:
+            chunk = f.read(min(remaining, 8 * 1024 * 1024))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def code_version(producer: Callable) -> str:
+    """Hash of the source file defining producer; changes whenever that module is edited."""
+    source = inspect.getsourcefile(producer)
+    if source not in _code_versions:
+        with open(source, 'rb') as f:
+            _code_versions[source] = hashlib.sha1(f.read()).hexdigest()[:12]
+    return _code_versions[source]
+
+
+class ArtifactStore:
+    """Size-bounded, LRU-evicted store of derived files, addressed by input hashes."""
+
+    METRICS_FILE = 'metrics.json'
+
+    def __init__(self, root: Optional[str] = None, max_size: Optional[int] = None):
+        """
+        Initialize the store.
+
+        Args:
+            root: Store directory (default config.ARTIFACT_STORE_PATH)
+            max_size: Size limit in bytes (default config.ARTIFACT_STORE_MAX_SIZE)
+        """
+        self.root = Path(root or getattr(config, 'ARTIFACT_STORE_PATH', DEFAULT_STORE_PATH))
+        self.max_size = max_size or getattr(config, 'ARTIFACT_STORE_MAX_SIZE', DEFAULT_STORE_MAX_SIZE)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def make_key(self, kind: str, inputs: List[str], params: Optional[Dict[str, Any]] = None,
+                 producer: Optional[Callable] = None) -> str:
+        """
+        Key of an artifact.
+
+        Args:
+            kind: Artifact kind ('calibrated', 'solved', 'stacked'...)
+            inputs: Identities of the input files (file_identity or data_digest)
+            params: Processing parameters (must be JSON serializable)
+            producer: Function computing the artifact; its module's source hash is part of the key
+        """
+        description = {
+            'kind': kind,
+            'inputs': list(inputs),
+            'params': params or {},
+            'code': code_version(producer) if producer is not None else None,
+        }
+        encoded = json.dumps(description, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, kind: str, key: str, ext: str) -> Path:
+        return self.root / kind / key[:2] / f"{key}{ext}"
+
+    def get(self, kind: str, key: str, ext: str = '.fits') -> Optional[str]:
+        """Path of a stored artifact, or None. Counts a hit or a miss."""
+        path = self._path(kind, key, ext)
+        if path.exists():
+            try:
+                os.utime(path)  # Mark as recently used
+            except OSError:
+                pass
+            self._count(kind, 'hits')
+            return str(path)
+        self._count(kind, 'misses')
+        return None
+
+    def get_json(self, kind: str, key: str) -> Optional[Any]:
+        """Stored JSON artifact, or None."""
+        path = self.get(kind, key, '.json')
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_with(self, kind: str, key: str, write: Callable[[str], None], ext: str = '.fits') -> str:
+        """
+        Store an artifact produced by write(path).
+
+        The file is written under a temporary name and renamed into place, so
+        readers never see a partial artifact.
+        """
+        path = self._path(kind, key, ext)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp{ext}")
+        try:
+            write(str(temp_path))
+            os.replace(temp_path, path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+        self._count(kind, 'stores')
+        self.evict()
+        return str(path)
+
+    def put(self, kind: str, key: str, source_path: str, ext: Optional[str] = None) -> str:
+        """Store a copy of an existing file."""
+        ext = ext if ext is not None else ''.join(Path(source_path).suffixes[-1:]) or '.fits'
+        return self.put_with(kind, key, lambda path: shutil.copyfile(source_path, path), ext)
+
+    def put_json(self, kind: str, key: str, value: Any) -> str:
+        """Store a small JSON artifact (e.g. a plate solution)."""
+        def write(path):
+            with open(path, 'w') as f:
+                json.dump(value, f)
+        return self.put_with(kind, key, write, '.json')
+
+    def _entries(self) -> List[os.DirEntry]:
+        entries = []
+        for kind_dir in self.root.iterdir():
+            if not kind_dir.is_dir():
+                continue
+            for prefix_dir in kind_dir.iterdir():
+                if prefix_dir.is_dir():
+                    entries.extend(e for e in os.scandir(prefix_dir) if e.is_file() and not e.name.startswith('.'))
+        return entries
+
+    def evict(self, max_size: Optional[int] = None) -> int:
+        """Delete least recently used artifacts until the store fits in max_size. Returns bytes freed."""
+        max_size = max_size if max_size is not None else self.max_size
+        with self._lock:
+            entries = []
+            for entry in self._entries():
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue  # Removed by another process meanwhile
+                entries.append((st.st_mtime, st.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            freed = 0
+            evicted = {}
+            for _, size, path in sorted(entries):
+                if total - freed <= max_size:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                freed += size
+                kind = Path(path).parent.parent.name
+                evicted[kind] = evicted.get(kind, 0) + 1
+        for kind, count in evicted.items():
+            self._count(kind, 'evictions', count)
+        return freed
+
+    def clear(self):
+        """Delete every artifact (metrics are kept)."""
+        for entry in self._entries():
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _count(self, kind: str, counter: str, amount: int = 1):
+        """Add to a persistent counter (best effort: concurrent processes may lose an update)."""
+        with self._lock:
+            metrics = self._read_metrics()
+            kind_metrics = metrics.setdefault(kind, {})
+            kind_metrics[counter] = kind_metrics.get(counter, 0) + amount
+            metrics_path = self.root / self.METRICS_FILE
+            temp_path = metrics_path.with_name(f".{self.METRICS_FILE}.{os.getpid()}.tmp")
+            try:
+                with open(temp_path, 'w') as f:
+                    json.dump(metrics, f)
+                os.replace(temp_path, metrics_path)
+            except OSError:
+                pass
+
+    def _read_metrics(self) -> Dict[str, Dict[str, int]]:
+        try:
+            with open(self.root / self.METRICS_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-kind hit/miss/store/eviction counters, artifact count and size, plus a 'total' entry."""
+        stats = {kind: dict(counters) for kind, counters in self._read_metrics().items()}
+        for entry in self._entries():
+            kind = Path(entry.path).parent.parent.name
+            kind_stats = stats.setdefault(kind, {})
+            kind_stats['count'] = kind_stats.get('count', 0) + 1
+            kind_stats['bytes'] = kind_stats.get('bytes', 0) + entry.stat().st_size
+        total = {}
+        for kind_stats in stats.values():
+            for name in ('hits', 'misses', 'stores', 'evictions', 'count', 'bytes'):
+                kind_stats.setdefault(name, 0)
+                total[name] = total.get(name, 0) + kind_stats[name]
+        stats['total'] = total
+        for kind_stats in stats.values():
+            lookups = kind_stats.get('hits', 0) + kind_stats.get('misses', 0)
+            kind_stats['hit_rate'] = kind_stats.get('hits', 0) / lookups if lookups else 0.0
+        return stats
+
+    def format_stats(self) -> str:
+        """Human-readable summary of stats()."""
+        lines = []
+        for kind, s in sorted(self.stats().items(), key=lambda item: item[0] == 'total'):
+            lines.append(f"{kind:<12} {s['count']:>6} files {s['bytes'] / 1024 ** 2:>10.1f} MB   "
+                         f"hits {s['hits']:>6}  misses {s['misses']:>6}  ({s['hit_rate'] * 100:.0f}% hit rate)  "
+                         f"evicted {s['evictions']}")
+        lines.append(f"Size limit: {self.max_size / 1024 ** 3:.1f} GB ({self.root})")
+        return '\n'.join(lines)
+
+
+# Global store instance
+_artifact_store = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Get the artifact store instance."""
+    global _artifact_store
+    if _artifact_store is None:
+        _artifact_store = ArtifactStore()
+    return _artifact_store
@@ -19,6 +19,9 @@ from astropy.io import fits
 
 from lib.db.manager import get_db_manager
 from lib.db.models import CalibrationMaster, FitsFile
+from lib.fits.artifacts import get_artifact_store, file_identity
+from lib.fits.compression import (read_ccddata, read_image_header, update_image_header,
+                                  image_hdu_index, write_ccddata, output_compression)
 import config
 
 
@@ -43,7 +46,7 @@ class CalibrationManager:
         Returns:
             CalibrationMaster object if found, None otherwise
         """
-        session = self.db_manager.get_session()
+        session = self.db_manager.get_read_session()
         try:
             # Get tolerance values from config
             ccd_temp_tolerance = 2  # From config.TESTED_FITS_CARDS
@@ -108,7 +111,7 @@ class CalibrationManager:
         Returns:
             CalibrationMaster object if found, None otherwise
         """
-        session = self.db_manager.get_session()
+        session = self.db_manager.get_read_session()
         try:
             # Get tolerance values from config
             ccd_temp_tolerance = 2  # From config.TESTED_FITS_CARDS
@@ -185,7 +188,7 @@ class CalibrationManager:
         Returns:
             CalibrationMaster object if found, None otherwise
         """
-        session = self.db_manager.get_session()
+        session = self.db_manager.get_read_session()
         try:
             # Build base query constraints
             constraints = [
@@ -302,7 +305,7 @@ class CalibrationManager:
         Returns:
             CCDData object
         """
-        return CCDData.read(image_path, unit='adu')
+        return read_ccddata(image_path, unit='adu')
     
     def _create_temp_dir(self) -> Path:
         """
@@ -396,19 +399,19 @@ class CalibrationManager:
             original_path: Path to original FITS file
             calibrated_path: Path to calibrated FITS file
         """
-        with fits.open(original_path) as orig, fits.open(calibrated_path, mode='update') as cal:
+        orig_header = read_image_header(original_path)
+        with update_image_header(calibrated_path) as cal_header:
             wcs_keys = ['CTYPE1', 'CTYPE2', 'CRPIX1', 'CRPIX2', 'CRVAL1', 'CRVAL2', 'CD1_1', 'CD1_2', 'CD2_1', 'CD2_2']
             copied_keys = []
             for key in wcs_keys:
-                if key in orig[0].header:
-                    cal[0].header[key] = orig[0].header[key]
+                if key in orig_header:
+                    cal_header[key] = orig_header[key]
                     copied_keys.append(key)
             removed_keys = []
             for key in ['CDELT1', 'CDELT2', 'CROTA1', 'CROTA2']:
-                if key in cal[0].header:
-                    del cal[0].header[key]
+                if key in cal_header:
+                    del cal_header[key]
                     removed_keys.append(key)
-            cal.flush()
     
     def _add_origfile_header(self, calibrated_path: str, original_path: str):
         """
@@ -419,9 +422,7 @@ class CalibrationManager:
             original_path: Path to the original raw file
         """
         try:
-            with fits.open(calibrated_path, mode='update') as hdul:
-                header = hdul[0].header
-                
+            with update_image_header(calibrated_path) as header:
                 # Convert to absolute paths for reliability
                 original_path = os.path.abspath(original_path)
                 
@@ -455,7 +456,7 @@ class CalibrationManager:
         """
         try:
             with fits.open(file_path) as hdul:
-                header = hdul[0].header
+                header = hdul[image_hdu_index(hdul)].header
                 
                 # Extract required metadata from header
                 # Use get() with defaults for optional fields
@@ -569,6 +570,37 @@ class CalibrationManager:
         # Create temporary directory
         temp_dir = self._create_temp_dir()
         
+        result = {
+            'success': True,
+            'original_path': file_path,
+            'masters_used': masters,
+            'applied_calibrations': available_masters,
+            'missing_masters': missing_masters
+        }
+        
+        # The same frame calibrated with the same masters is served from the artifact store
+        cache_key = None
+        try:
+            store = get_artifact_store()
+            inputs = [file_path] + [masters[step].path for step in ('bias', 'dark', 'flat')
+                                    if steps.get(step) and masters.get(step)]
+            cache_key = store.make_key('calibrated', [file_identity(path) for path in inputs],
+                                       {'steps': available_masters, 'output': output_compression()},
+                                       producer=CalibrationManager.calibrate_file)
+            cached_path = store.get('calibrated', cache_key)
+            if cached_path:
+                new_filename = os.path.basename(file_path)
+                for step, prefix in (('bias', 'b_'), ('dark', 'd_'), ('flat', 'f_')):
+                    if step in available_masters:
+                        new_filename = f"{prefix}{new_filename}"
+                output_path = temp_dir / new_filename
+                shutil.copyfile(cached_path, output_path)
+                print(f"{Style.BRIGHT + Fore.GREEN}Using cached calibration: {output_path}{Style.RESET_ALL}")
+                result.update({'calibrated_path': str(output_path), 'filename': new_filename})
+                return result
+        except Exception as e:
+            print(f"{Style.BRIGHT + Fore.YELLOW}Warning: artifact store unavailable: {e}{Style.RESET_ALL}")
+        
         try:
             # Start with the original image
             calibrated_image = self._extract_ccd(file_path)
@@ -590,7 +622,7 @@ class CalibrationManager:
             # Write the calibrated image
             output_path = temp_dir / new_filename
             print(f"{Style.BRIGHT + Fore.GREEN}Writing calibrated image: {output_path}{Style.RESET_ALL}")
-            calibrated_image.write(output_path, overwrite=True)
+            write_ccddata(calibrated_image, str(output_path))
             
             # Add ORIGFILE header for database lookup
             try:
@@ -606,15 +638,14 @@ class CalibrationManager:
             except Exception as e:
                 print(f"{Style.BRIGHT + Fore.YELLOW}Warning: Could not restore WCS header: {e}{Style.RESET_ALL}")
             
-            return {
-                'success': True,
-                'original_path': file_path,
-                'calibrated_path': str(output_path),
-                'filename': new_filename,
-                'masters_used': masters,
-                'applied_calibrations': available_masters,
-                'missing_masters': missing_masters
-            }
+            if cache_key is not None:
+                try:
+                    get_artifact_store().put('calibrated', cache_key, str(output_path))
+                except Exception as e:
+                    print(f"{Style.BRIGHT + Fore.YELLOW}Warning: Could not store calibrated image: {e}{Style.RESET_ALL}")
+            
+            result.update({'calibrated_path': str(output_path), 'filename': new_filename})
+            return result
             
         except Exception as e:
             print(f"{Style.BRIGHT + Fore.RED}Error during calibration: {e}{Style.RESET_ALL}")
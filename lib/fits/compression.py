@@ -0,0 +1,248 @@
+"""
+Tile-compressed FITS output and compression-aware reading.
+
+Products (calibrated, aligned and stacked frames) can be written as
+tile-compressed images (an empty primary HDU followed by a CompImageHDU)
+instead of a plain float32 primary image. In such files the image is in the
+first extension, so readers should locate it with image_hdu_index() or use the
+read_* helpers below rather than assuming HDU 0.
+
+Header-only edits of compressed files (WCS solutions, ORIGFILE...) go through
+update_image_header(), which edits the raw binary table header: updating the
+header through the CompImageHDU would make astropy recompress, and therefore
+requantize, the pixels.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from astropy.io import fits
+
+import config
+
+# Short names accepted by the writers and the command line
+COMPRESSION_TYPES = {
+    'rice': 'RICE_1',
+    'gzip': 'GZIP_1',
+    'gzip2': 'GZIP_2',
+    'hcompress': 'HCOMPRESS_1',
+}
+
+# Lossless float compression (quantize level 0) is only possible with these
+LOSSLESS_FLOAT_TYPES = ('GZIP_1', 'GZIP_2')
+
+DEFAULT_QUANTIZE_LEVEL = 16.0
+
+
+class CompressionError(Exception):
+    """Raised when an invalid output compression is requested."""
+    pass
+
+
+def output_compression(compression: Optional[str] = None,
+                       quantize_level: Optional[float] = None) -> Optional[Dict[str, object]]:
+    """
+    Resolve the output compression settings.
+
+    Args:
+        compression: 'rice', 'gzip', 'gzip2', 'hcompress' or 'none'
+            (default config.OUTPUT_COMPRESSION)
+        quantize_level: Float quantization level: the quantization step is the
+            image noise divided by this value. 0 keeps floats exact (gzip only).
+            Default config.OUTPUT_QUANTIZE_LEVEL.
+
+    Returns:
+        CompImageHDU keyword arguments, or None for uncompressed output
+    """
+    if compression is None:
+        compression = getattr(config, 'OUTPUT_COMPRESSION', None)
+    if not compression or str(compression).lower() == 'none':
+        return None
+
+    name = str(compression).lower()
+    if name in COMPRESSION_TYPES:
+        compression_type = COMPRESSION_TYPES[name]
+    elif str(compression).upper() in COMPRESSION_TYPES.values():
+        compression_type = str(compression).upper()
+    else:
+        raise CompressionError(f"Unknown compression '{compression}' "
+                               f"(expected one of: none, {', '.join(COMPRESSION_TYPES)})")
+
+    if quantize_level is None:
+        quantize_level = getattr(config, 'OUTPUT_QUANTIZE_LEVEL', DEFAULT_QUANTIZE_LEVEL)
+    quantize_level = float(quantize_level)
+    if quantize_level == 0 and compression_type not in LOSSLESS_FLOAT_TYPES:
+        raise CompressionError(f"{compression_type} cannot store floats losslessly; "
+                               f"use gzip or a non-zero quantize level")
+
+    return {
+        'compression_type': compression_type,
+        'quantize_level': quantize_level,
+        # Dither seed derived from the data, so identical inputs give identical files
+        'dither_seed': -1,
+    }
+
+
+def image_hdu_index(hdul: fits.HDUList) -> int:
+    """Index of the image HDU: 0 for plain files, the first image extension otherwise."""
+    if hdul[0].header.get('NAXIS', 0) > 0:
+        return 0
+    for index, hdu in enumerate(hdul[1:], start=1):
+        if isinstance(hdu, fits.CompImageHDU) or (isinstance(hdu, fits.ImageHDU) and hdu.header.get('NAXIS', 0) > 0):
+            return index
+    return 0
+
+
+def _raw_image_hdu_index(hdul: fits.HDUList) -> int:
+    """Image HDU index in a file opened with disable_image_compression=True."""
+    if hdul[0].header.get('NAXIS', 0) > 0:
+        return 0
+    for index, hdu in enumerate(hdul[1:], start=1):
+        if hdu.header.get('ZIMAGE', False) or (isinstance(hdu, fits.ImageHDU) and hdu.header.get('NAXIS', 0) > 0):
+            return index
+    return 0
+
+
+def is_compressed(fits_file_path: str) -> bool:
+    """Whether the image of a FITS file is tile compressed."""
+    with fits.open(fits_file_path) as hdul:
+        return isinstance(hdul[image_hdu_index(hdul)], fits.CompImageHDU)
+
+
+def read_image_header(fits_file_path: str) -> fits.Header:
+    """Header of the image HDU (the image header, also for compressed files)."""
+    with fits.open(fits_file_path) as hdul:
+        return hdul[image_hdu_index(hdul)].header.copy()
+
+
+def read_image_data(fits_file_path: str) -> np.ndarray:
+    """Pixel data of the image HDU, decompressed if needed."""
+    with fits.open(fits_file_path) as hdul:
+        return np.array(hdul[image_hdu_index(hdul)].data)
+
+
+def read_ccddata(fits_file_path: str, unit: str = 'adu'):
+    """
+    CCDData.read that also finds tile-compressed images (it only looks for
+    plain ImageHDU extensions when the primary HDU is empty).
+    """
+    from astropy.nddata import CCDData
+
+    with fits.open(fits_file_path) as hdul:
+        index = image_hdu_index(hdul)
+    return CCDData.read(fits_file_path, hdu=index, unit=unit)
+
+
+@contextmanager
+def update_image_header(fits_file_path: str) -> Iterator[fits.Header]:
+    """
+    Open the image header of a FITS file for in-place update.
+
+    For compressed files the header of the underlying binary table is edited,
+    so the compressed pixels are left untouched. Only non-structural keywords
+    should be changed this way (NAXISn, BITPIX... describe the table there).
+    """
+    with fits.open(fits_file_path, mode='update', disable_image_compression=True) as hdul:
+        yield hdul[_raw_image_hdu_index(hdul)].header
+
+
+def make_image_hdul(data: np.ndarray, header: Optional[fits.Header] = None,
+                    compression: Optional[str] = None,
+                    quantize_level: Optional[float] = None) -> fits.HDUList:
+    """HDU list holding an image, tile compressed according to the output settings."""
+    settings = output_compression(compression, quantize_level)
+    if settings is None:
+        return fits.HDUList([fits.PrimaryHDU(data, header)])
+    return fits.HDUList([fits.PrimaryHDU(), fits.CompImageHDU(data, header, **settings)])
+
+
+def write_image(fits_file_path: str, data: np.ndarray, header: Optional[fits.Header] = None,
+                compression: Optional[str] = None, quantize_level: Optional[float] = None,
+                overwrite: bool = True):
+    """Write an image, tile compressed according to the output settings."""
+    make_image_hdul(data, header, compression, quantize_level).writeto(fits_file_path, overwrite=overwrite)
+
+
+def write_ccddata(ccd, fits_file_path: str, compression: Optional[str] = None,
+                  quantize_level: Optional[float] = None, overwrite: bool = True):
+    """
+    CCDData.write with optional tile compression.
+
+    Without compression this is exactly ccd.write(). With compression the
+    primary image is moved to a CompImageHDU; mask/uncertainty extensions, if
+    any, are kept as they are.
+    """
+    settings = output_compression(compression, quantize_level)
+    if settings is None:
+        ccd.write(fits_file_path, overwrite=overwrite)
+        return
+    hdul = ccd.to_hdu()
+    primary = hdul[0]
+    compressed = fits.CompImageHDU(primary.data, primary.header, **settings)
+    fits.HDUList([fits.PrimaryHDU(), compressed] + list(hdul[1:])).writeto(fits_file_path, overwrite=overwrite)
+
+
+def benchmark_compression(fits_files: List[str], compressions: Optional[List[str]] = None,
+                          quantize_level: Optional[float] = None,
+                          output_dir: str = "/tmp/astropipes/compression_benchmark") -> List[Dict[str, float]]:
+    """
+    Measure write/read throughput and size ratio of each output compression.
+
+    Every file is rewritten as a float32 image (like our products) with each
+    compression, then read back. Throughput is in MB/s of uncompressed pixels.
+    Returns one result dict per compression and prints a summary table.
+    """
+    compressions = compressions or ['none'] + list(COMPRESSION_TYPES)
+    os.makedirs(output_dir, exist_ok=True)
+
+    images = []
+    for path in fits_files:
+        with fits.open(path) as hdul:
+            hdu = hdul[image_hdu_index(hdul)]
+            images.append((np.asarray(hdu.data, dtype=np.float32), hdu.header.copy()))
+    raw_bytes = sum(data.nbytes for data, _ in images)
+
+    results = []
+    for compression in compressions:
+        try:
+            output_compression(compression, quantize_level)
+        except CompressionError as e:
+            print(f"Skipping {compression}: {e}")
+            continue
+        write_time = read_time = 0.0
+        file_bytes = 0
+        max_error = 0.0
+        for i, (data, header) in enumerate(images):
+            path = os.path.join(output_dir, f"bench_{compression}_{i}.fits")
+            start = time.perf_counter()
+            write_image(path, data, header, compression, quantize_level)
+            write_time += time.perf_counter() - start
+            file_bytes += os.path.getsize(path)
+
+            start = time.perf_counter()
+            read_back = read_image_data(path)
+            read_time += time.perf_counter() - start
+            finite = np.isfinite(data)
+            if finite.any():
+                max_error = max(max_error, float(np.max(np.abs(read_back[finite] - data[finite]))))
+            os.remove(path)
+
+        results.append({
+            'compression': compression,
+            'ratio': file_bytes / raw_bytes if raw_bytes else 0.0,
+            'write_mb_s': raw_bytes / 1024 ** 2 / write_time if write_time else 0.0,
+            'read_mb_s': raw_bytes / 1024 ** 2 / read_time if read_time else 0.0,
+            'max_error': max_error,
+        })
+
+    level = quantize_level if quantize_level is not None else \
+        getattr(config, 'OUTPUT_QUANTIZE_LEVEL', DEFAULT_QUANTIZE_LEVEL)
+    print(f"{len(images)} file(s), {raw_bytes / 1024 ** 2:.1f} MB of float32 pixels, quantize level {level}")
+    print(f"{'compression':<12} {'size':>8} {'write MB/s':>11} {'read MB/s':>10} {'max error':>12}")
+    for r in results:
+        print(f"{r['compression']:<12} {r['ratio'] * 100:>7.1f}% {r['write_mb_s']:>11.1f} "
+              f"{r['read_mb_s']:>10.1f} {r['max_error']:>12.4g}")
+    return results
@@ -3,9 +3,11 @@ FITS header parsing utilities.
 """
 
 import json
-from astropy.io import fits
 from typing import Dict, Any
 
+from .compression import update_image_header
+from .rawheader import read_raw_header
+
 
 def get_fits_header_as_json(fits_file_path: str) -> Dict[str, Any]:
     """
@@ -13,18 +15,7 @@ def get_fits_header_as_json(fits_file_path: str) -> Dict[str, Any]:
     Each key maps to a (value, comment) tuple.
     """
     try:
-        with fits.open(fits_file_path) as hdul:
-            header = hdul[0].header
-            header_dict = {}
-            for card in header.cards:
-                key = card.keyword
-                value = card.value
-                comment = card.comment
-                # Convert special FITS objects to strings
-                if hasattr(value, '__str__'):
-                    value = str(value)
-                header_dict[key] = (value, comment)
-            return header_dict
+        return read_raw_header(fits_file_path).to_json_dict()
     except FileNotFoundError:
         raise FileNotFoundError(f"FITS file not found: {fits_file_path}")
     except OSError as e:
@@ -67,13 +58,11 @@ def set_fits_header_value(fits_file_path: str, key: str, value: str, comment: st
         OSError: If the file can't be opened for update
     """
     try:
-        with fits.open(fits_file_path, mode='update') as hdul:
-            header = hdul[0].header
+        with update_image_header(fits_file_path) as header:
             if comment is not None:
                 header[key] = (value, comment)
             else:
                 header[key] = value
-            hdul.flush()
     except FileNotFoundError:
         raise FileNotFoundError(f"FITS file not found: {fits_file_path}")
     except OSError as e:
@@ -32,6 +32,8 @@ ENABLE_CHUNKED_PROCESSING = INTEGRATION_ENABLE_CHUNKED
 
 # Import ephemeris functionality
 from lib.sci.orbit import predict_position_findorb
+from lib.fits.artifacts import get_artifact_store, file_identity
+from lib.fits.compression import read_image_header, read_ccddata, write_ccddata, image_hdu_index, output_compression
 
 
 class MotionTrackingIntegrationError(Exception):
@@ -62,7 +64,7 @@ def check_sequence_consistency(files: List[str]) -> bool:
     headers = []
     for file_path in files:
         try:
-            header = fits.getheader(file_path, ext=0)
+            header = read_image_header(file_path)
             headers.append(header)
         except Exception as e:
             print(f"Warning: Could not read header from {file_path}: {e}")
@@ -125,7 +127,7 @@ def extract_ccd_data(file_path: str) -> ccdp.CCDData:
         CCDData object
     """
     try:
-        return ccdp.CCDData.read(file_path, unit='adu')
+        return read_ccddata(file_path, unit='adu')
     except Exception as e:
         raise MotionTrackingIntegrationError(f"Could not read {file_path}: {e}")
 
@@ -145,7 +147,7 @@ def get_observation_time(file_path: str) -> Optional[str]:
         ISO format observation time string, or None if not found
     """
     try:
-        header = fits.getheader(file_path, ext=0)
+        header = read_image_header(file_path)
         date_obs = header.get('DATE-OBS')
         
         if not date_obs:
@@ -187,7 +189,7 @@ def get_mid_exposure_time(file_path: str) -> Optional[str]:
         ISO format mid-exposure time string, or None if not found
     """
     try:
-        header = fits.getheader(file_path, ext=0)
+        header = read_image_header(file_path)
         date_obs = header.get('DATE-OBS')
         
         if not date_obs:
@@ -258,7 +260,7 @@ def compute_mid_observation_time(files: List[str]) -> Optional[str]:
 
         for fp in files:
             try:
-                hdr = fits.getheader(fp, ext=0)
+                hdr = read_image_header(fp)
             except Exception:
                 continue
 
@@ -356,7 +358,7 @@ def compute_mid_wcs(files: List[str]) -> Optional[Tuple[float, float]]:
 
         for fp in files:
             try:
-                hdr = fits.getheader(fp, ext=0)
+                hdr = read_image_header(fp)
             except Exception:
                 continue
 
@@ -590,7 +592,7 @@ def calculate_motion_shifts(files: List[str], object_name: str,
             print(f"  Using standard PA interpretation: cos({avg_motion_pa:.1f}°) for RA, sin({avg_motion_pa:.1f}°) for Dec")
         
         try:
-            wcs = WCS(fits.getheader(file_path, ext=0))
+            wcs = WCS(read_image_header(file_path))
             if wcs.is_celestial:
                 # Get pixel scale for debugging
                 pixel_scale = wcs.pixel_scale_matrix.diagonal()
@@ -1039,11 +1041,10 @@ def integrate_chunked(files: List[str],
         # Update DATE-OBS and WCS to the midpoint of the observing window
         # Always attempt to propagate WCS from one of the input frames
         try:
-            from astropy.io import fits as _fits_
             base_hdr = None
             for _fp in files:
                 try:
-                    _hdr_tmp = _fits_.getheader(_fp, ext=0)
+                    _hdr_tmp = read_image_header(_fp)
                 except Exception:
                     continue
                 if 'CRVAL1' in _hdr_tmp and 'CRVAL2' in _hdr_tmp:
@@ -1092,7 +1093,7 @@ def integrate_chunked(files: List[str],
         # Save if requested
         if output_path:
             print(f"Saving integrated image to {output_path}")
-            final_stack.write(output_path, overwrite=True)
+            write_ccddata(final_stack, output_path)
         
         if progress_callback:
             progress_callback(1.0)
@@ -1103,6 +1104,43 @@ def integrate_chunked(files: List[str],
         raise MotionTrackingIntegrationError(f"Error during chunk combination: {e}")
 
 
+def _stack_cache_key(kind: str, files: List[str], params: Dict, producer: Callable) -> Optional[str]:
+    """Artifact store key of a stack, or None if the store cannot be used."""
+    try:
+        return get_artifact_store().make_key(kind, [file_identity(f) for f in files], params, producer)
+    except Exception as e:
+        print(f"Warning: artifact store unavailable: {e}")
+        return None
+
+
+def _load_cached_stack(kind: str, key: Optional[str], output_path: Optional[str]) -> Optional[ccdp.CCDData]:
+    """Stack stored under key (also copied to output_path), or None."""
+    if key is None:
+        return None
+    cached_path = get_artifact_store().get(kind, key)
+    if cached_path is None:
+        return None
+    print(f"✓ Using stored integration result ({cached_path})")
+    if output_path:
+        import shutil
+        shutil.copyfile(cached_path, output_path)
+    return read_ccddata(cached_path, unit='adu')
+
+
+def _store_stack(kind: str, key: Optional[str], stack: ccdp.CCDData, output_path: Optional[str]):
+    """Keep an integration result in the artifact store."""
+    if key is None:
+        return
+    try:
+        store = get_artifact_store()
+        if output_path:
+            store.put(kind, key, output_path)
+        else:
+            store.put_with(kind, key, lambda path: write_ccddata(stack, path))
+    except Exception as e:
+        print(f"Warning: could not store integration result: {e}")
+
+
 def integrate_with_motion_tracking(files: List[str], 
                                  object_name: str,
                                  reference_time: Optional[str] = None,
@@ -1181,6 +1219,21 @@ def integrate_with_motion_tracking(files: List[str],
             memory_limit=memory_limit
         )
     
+    # Stacks are only reused when the ephemerides are given: positions fetched
+    # from FindOrb may change as the orbit is refined
+    cache_key = None
+    if ephemerides_data is not None and scale is None:
+        cache_key = _stack_cache_key('stacked', files, {
+            'object_name': object_name, 'reference_time': reference_time, 'method': method,
+            'sigma_clip': sigma_clip, 'sigma': [SIGMA_LOW, SIGMA_HIGH], 'ephemerides': ephemerides_data,
+            'output': output_compression(),
+        }, integrate_with_motion_tracking)
+        cached = _load_cached_stack('stacked', cache_key, output_path)
+        if cached is not None:
+            if progress_callback:
+                progress_callback(1.0)
+            return cached
+    
     print(f"\nIntegrating {len(files)} images with motion tracking for {object_name}")
     
     # Check sequence consistency
@@ -1304,11 +1357,10 @@ def integrate_with_motion_tracking(files: List[str],
         # Update DATE-OBS and WCS to the midpoint of the observing window
         # Always attempt to propagate WCS from one of the input frames
         try:
-            from astropy.io import fits as _fits_
             base_hdr = None
             for _fp in files:
                 try:
-                    _hdr_tmp = _fits_.getheader(_fp, ext=0)
+                    _hdr_tmp = read_image_header(_fp)
                 except Exception:
                     continue
                 if 'CRVAL1' in _hdr_tmp and 'CRVAL2' in _hdr_tmp:
@@ -1352,7 +1404,8 @@ def integrate_with_motion_tracking(files: List[str],
         # Save if requested
         if output_path:
             print(f"Saving integrated image to {output_path}")
-            stack.write(output_path, overwrite=True)
+            write_ccddata(stack, output_path)
+        _store_stack('stacked', cache_key, stack, output_path)
         
         if progress_callback:
             progress_callback(1.0)
@@ -1398,6 +1451,19 @@ def integrate_standard(files: List[str],
     if not files:
         raise MotionTrackingIntegrationError("No input files provided")
     
+    # A custom scale function cannot be part of the key, so those stacks are not stored
+    cache_key = None
+    if scale is None:
+        cache_key = _stack_cache_key('stacked', files, {
+            'method': method, 'sigma_clip': sigma_clip, 'sigma': [SIGMA_LOW, SIGMA_HIGH],
+            'output': output_compression(),
+        }, integrate_standard)
+        cached = _load_cached_stack('stacked', cache_key, output_path)
+        if cached is not None:
+            if progress_callback:
+                progress_callback(1.0)
+            return cached
+    
     print(f"\nIntegrating {len(files)} images (standard method)")
     
     # Check sequence consistency
@@ -1466,7 +1532,8 @@ def integrate_standard(files: List[str],
         # Save if requested
         if output_path:
             print(f"Saving integrated image to {output_path}")
-            stack.write(output_path, overwrite=True)
+            write_ccddata(stack, output_path)
+        _store_stack('stacked', cache_key, stack, output_path)
         
         if progress_callback:
             progress_callback(1.0)
@@ -1577,8 +1644,8 @@ def compute_object_positions_from_motion_tracked(
         
         # Read the stacked image header
         with fits.open(stacked_image_path) as hdul:
-            header = hdul[0].header
-            stacked_data = hdul[0].data
+            header = hdul[image_hdu_index(hdul)].header
+            stacked_data = hdul[image_hdu_index(hdul)].data
             
         # Check if this is a motion tracked image
         motion_tracked = header.get('MOTION_TRACKED', False)
@@ -1677,7 +1744,7 @@ def compute_object_positions_from_motion_tracked(
             original_dec = None
             try:
                 with fits.open(file_path) as orig_hdul:
-                    orig_header = orig_hdul[0].header
+                    orig_header = orig_hdul[image_hdu_index(orig_hdul)].header
                     orig_wcs = WCS(orig_header)
                     if orig_wcs.is_celestial:
                         # Convert original pixel coordinates to sky coordinates
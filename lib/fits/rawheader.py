@@ -0,0 +1,265 @@
+"""
+Fast header-only reader for metadata ingestion.
+
+Library scans only need about twenty keywords per file, but fits.open builds
+a full astropy Header (one Card object per card, with verification) before a
+single value can be read. read_raw_header() instead reads the 2880-byte
+header blocks up to the END card and keeps the raw cards; a card is only
+parsed, with a minimal parser, when its keyword is asked for. The full card
+list (for header_json) is parsed on demand by to_json_dict().
+
+Cards the minimal parser does not handle (HIERARCH, CONTINUE long strings,
+complex or undefined values, malformed cards) fall back to astropy, as do
+tile-compressed files, whose image header is reconstructed by astropy from
+the binary table extension.
+
+fits_file_complete() uses the same block reader to tell whether a file that
+is being written (e.g. by the camera) is complete.
+"""
+
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from astropy.io import fits
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+
+_COMMENTARY_KEYWORDS = ('COMMENT', 'HISTORY', '')
+_KEYWORD_RE = re.compile(r'^[A-Z0-9_-]*$')
+_INT_RE = re.compile(r'^[+-]?\d+$')
+_FLOAT_RE = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([EeDd][+-]?\d+)?$')
+
+
+class _UnsupportedCard(Exception):
+    """A card the minimal parser leaves to astropy."""
+    pass
+
+
+def _parse_card(card: str) -> Tuple[str, Any, str]:
+    """Parse one 80-character card into (keyword, value, comment)."""
+    keyword = card[:8].rstrip()
+    if not _KEYWORD_RE.match(keyword) or keyword in ('HIERARCH', 'CONTINUE'):
+        raise _UnsupportedCard(keyword)
+
+    if card[8:10] != '= ':
+        if keyword in _COMMENTARY_KEYWORDS:
+            return keyword, card[8:].rstrip(), ''
+        raise _UnsupportedCard(keyword)
+
+    field = card[10:].lstrip()
+    if field.startswith("'"):
+        # String value: '' is an escaped quote, trailing spaces are not significant
+        end = 1
+        while True:
+            end = field.find("'", end)
+            if end < 0:
+                raise _UnsupportedCard(keyword)
+            if field[end + 1:end + 2] == "'":
+                end += 2
+                continue
+            break
+        value = field[1:end].replace("''", "'").rstrip()
+        if value.endswith('&'):
+            raise _UnsupportedCard(keyword)  # Possibly continued on CONTINUE cards
+        rest = field[end + 1:].strip()
+        if rest and not rest.startswith('/'):
+            raise _UnsupportedCard(keyword)
+        return keyword, value, rest[1:].strip()
+
+    value_str, _, comment = field.partition('/')
+    value_str = value_str.strip()
+    if value_str == 'T':
+        value = True
+    elif value_str == 'F':
+        value = False
+    elif _INT_RE.match(value_str):
+        value = int(value_str)
+    elif _FLOAT_RE.match(value_str):
+        value = float(value_str.replace('D', 'E').replace('d', 'e'))
+    else:
+        raise _UnsupportedCard(keyword)  # Undefined, complex or invalid values
+    return keyword, value, comment.strip()
+
+
+class RawHeader:
+    """Header cards of a FITS file, parsed on demand."""
+
+    def __init__(self, raw: bytes):
+        """
+        Args:
+            raw: Header blocks (or any whole number of cards), END card included or not
+        """
+        self.raw = raw
+        text = raw.decode('ascii', errors='replace')
+        self._cards: List[str] = []
+        for start in range(0, len(text), CARD_SIZE):
+            card = text[start:start + CARD_SIZE]
+            if card.rstrip() == 'END':
+                break
+            self._cards.append(card)
+        self._index: Optional[Dict[str, int]] = None
+        self._astropy: Optional[fits.Header] = None
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def __contains__(self, keyword: str) -> bool:
+        keyword = keyword.upper()
+        if keyword in self._keyword_index():
+            return True
+        return self._has_hierarch() and keyword in self.to_astropy()
+
+    def _keyword_index(self) -> Dict[str, int]:
+        """Position of the first card of each keyword."""
+        if self._index is None:
+            self._index = {}
+            for position, card in enumerate(self._cards):
+                self._index.setdefault(card[:8].rstrip(), position)
+        return self._index
+
+    def _has_hierarch(self) -> bool:
+        """Whether the header has HIERARCH cards, whose keywords are not in the index."""
+        return 'HIERARCH' in self._keyword_index()
+
+    def to_astropy(self) -> fits.Header:
+        """The header as an astropy Header (parsed once, then cached)."""
+        if self._astropy is None:
+            self._astropy = fits.Header.fromstring(''.join(self._cards))
+        return self._astropy
+
+    def get(self, keyword: str, default: Any = None) -> Any:
+        """Typed value of the first card with this keyword, like Header.get."""
+        keyword = keyword.upper()
+        position = self._keyword_index().get(keyword)
+        if position is None:
+            # HIERARCH keywords ('ESO DET', short or long) are only known to astropy
+            return self.to_astropy().get(keyword, default) if self._has_hierarch() else default
+        try:
+            return _parse_card(self._cards[position])[1]
+        except _UnsupportedCard:
+            value = self.to_astropy().get(keyword, default)
+            return default if isinstance(value, fits.card.Undefined) else value
+
+    def values(self, keywords: Iterable[str]) -> Dict[str, Any]:
+        """Typed values of several keywords (None for missing ones)."""
+        return {keyword: self.get(keyword) for keyword in keywords}
+
+    def to_json_dict(self) -> Dict[str, Tuple[str, str]]:
+        """
+        Every card as {keyword: (str(value), comment)}, exactly as get_fits_header_as_json
+        returns it (a repeated keyword keeps its first position and its last value).
+        """
+        header_dict = {}
+        try:
+            for card in self._cards:
+                keyword, value, comment = _parse_card(card)
+                header_dict[keyword] = (str(value), comment)
+        except _UnsupportedCard:
+            return header_to_json_dict(self.to_astropy())
+        return header_dict
+
+
+def header_to_json_dict(header: fits.Header) -> Dict[str, Tuple[str, str]]:
+    """{keyword: (str(value), comment)} of an astropy Header."""
+    header_dict = {}
+    for card in header.cards:
+        header_dict[card.keyword] = (str(card.value), card.comment)
+    return header_dict
+
+
+def _read_header_blocks(f) -> bytes:
+    """Read header blocks from the current position up to the one holding END."""
+    blocks = []
+    while True:
+        block = f.read(BLOCK_SIZE)
+        if len(block) < BLOCK_SIZE:
+            raise OSError("Truncated FITS header (no END card)")
+        blocks.append(block)
+        for start in range(0, BLOCK_SIZE, CARD_SIZE):
+            if block[start:start + 3] == b'END' and not block[start + 3:start + CARD_SIZE].strip():
+                return b''.join(blocks)
+
+
+def read_raw_header(fits_file_path: str) -> RawHeader:
+    """
+    Header of the image HDU of a FITS file, read without fits.open.
+
+    For plain files this is the primary header. When the primary HDU holds no
+    image (tile-compressed products), the image header is taken from astropy.
+
+    Raises:
+        FileNotFoundError: If the FITS file doesn't exist
+        OSError: If the file is not a FITS file
+    """
+    with open(fits_file_path, 'rb') as f:
+        if f.read(9) != b'SIMPLE  =':
+            raise OSError(f"Not a FITS file: {fits_file_path}")
+        f.seek(0)
+        header = RawHeader(_read_header_blocks(f))
+
+    if header.get('NAXIS', 0) == 0 and header.get('EXTEND', False):
+        from .compression import image_hdu_index
+        with fits.open(fits_file_path) as hdul:
+            index = image_hdu_index(hdul)
+            if index != 0:
+                header = RawHeader(hdul[index].header.tostring().encode('ascii'))
+    return header
+
+
+def read_header_values(fits_file_path: str, keywords: Iterable[str]) -> Dict[str, Any]:
+    """Typed values of the given keywords in the image header (None for missing ones)."""
+    return read_raw_header(fits_file_path).values(keywords)
+
+
+def _data_size(header: RawHeader) -> int:
+    """Size in bytes of the data unit described by a header (without padding)."""
+    naxis = header.get('NAXIS', 0) or 0
+    if naxis == 0:
+        return 0
+    # In random groups files NAXIS1 = 0 is not a dimension
+    first_axis = 2 if header.get('GROUPS', False) and header.get('NAXIS1') == 0 else 1
+    elements = 1
+    for axis in range(first_axis, naxis + 1):
+        elements *= header.get(f'NAXIS{axis}', 0) or 0
+    bytes_per_element = abs(header.get('BITPIX', 8) or 8) // 8
+    return bytes_per_element * header.get('GCOUNT', 1) * (header.get('PCOUNT', 0) + elements)
+
+
+def fits_file_complete(fits_file_path: str) -> bool:
+    """
+    Whether a FITS file is completely written.
+
+    Walks the HDUs: every header must end with an END card, and the file must
+    hold the data length announced by the last header (NAXISn, BITPIX, PCOUNT,
+    GCOUNT). A file still being written fails one of these checks. Only the
+    headers are read.
+    """
+    try:
+        size = os.path.getsize(fits_file_path)
+        with open(fits_file_path, 'rb') as f:
+            if f.read(9) != b'SIMPLE  =':
+                return False
+            offset = 0
+            while True:
+                f.seek(offset)
+                header_bytes = _read_header_blocks(f)
+                header = RawHeader(header_bytes)
+                data_end = offset + len(header_bytes) + _data_size(header)
+                if size < data_end:
+                    return False
+                empty_primary = offset == 0 and data_end == len(header_bytes) and header.get('EXTEND', False)
+                offset = data_end + (-data_end % BLOCK_SIZE)
+                if offset >= size:
+                    # An empty primary HDU announcing extensions (compressed
+                    # images) is not complete until the extension is written.
+                    # The last data unit may be written without its padding.
+                    return not empty_primary
+                f.seek(offset)
+                start = f.read(8)
+                if start != b'XTENSION':
+                    # Trailing bytes after the last HDU, unless an extension is being written
+                    return not (empty_primary or b'XTENSION'.startswith(start))
+    except OSError:
+        return False
@@ -8,11 +8,14 @@ from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
 import logging
 
+import numpy as np
 from astropy.io import fits
 from astropy.wcs import WCS
 import warnings
 from colorama import Style, Fore
 
+from .compression import image_hdu_index, read_image_header, update_image_header
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -38,6 +41,15 @@ class ImageValidationError(Exception):
     pass
 
 
+# Image pre-screen: statistics are computed on a strided subsample of about
+# PRESCREEN_SAMPLE_PIXELS pixels, stars are counted on a binned copy of the image
+PRESCREEN_SAMPLE_PIXELS = 250000
+PRESCREEN_BINNING = 4
+PRESCREEN_DETECTION_SIGMA = 5.0
+# Frames with fewer stars than this (clouds, dome flats...) are not worth a solve-field run
+PRESCREEN_MIN_STARS = 5
+
+
 class ImageValidationResult:
     """Result of image validation with detailed information."""
     
@@ -46,7 +58,8 @@ class ImageValidationResult:
                  existing_wcs: Optional[Dict[str, Union[str, float, int]]] = None,
                  ra_center: Optional[float] = None,
                  dec_center: Optional[float] = None,
-                 pixel_scale: Optional[float] = None):
+                 pixel_scale: Optional[float] = None,
+                 star_count: Optional[int] = None):
         self.is_valid = is_valid
         self.reason = reason
         self.image_shape = image_shape
@@ -54,6 +67,7 @@ class ImageValidationResult:
         self.ra_center = ra_center
         self.dec_center = dec_center
         self.pixel_scale = pixel_scale
+        self.star_count = star_count
     
     def __str__(self):
         status = "VALID" if self.is_valid else "INVALID"
@@ -61,7 +75,72 @@ class ImageValidationResult:
         return f"{status}{shape_str}: {self.reason}"
 
 
-def validate_fits_file(fits_file_path: str) -> ImageValidationResult:
+def _subsample_stats(raw: np.ndarray, bscale: float = 1.0, bzero: float = 0.0) -> Tuple[float, float, float, float]:
+    """
+    Min, max, mean and standard deviation of an image from a strided subsample.
+    
+    raw is the unscaled (possibly memory-mapped) data; only the sampled pixels
+    are read and converted.
+    """
+    step = max(1, int(np.sqrt(raw.size / PRESCREEN_SAMPLE_PIXELS)))
+    sample = raw[::step, ::step].astype(np.float32) * np.float32(bscale) + np.float32(bzero)
+    return (float(np.nanmin(sample)), float(np.nanmax(sample)),
+            float(np.nanmean(sample)), float(np.nanstd(sample)))
+
+
+def estimate_star_count(data: np.ndarray, binning: int = PRESCREEN_BINNING,
+                        nsigma: float = PRESCREEN_DETECTION_SIGMA) -> int:
+    """
+    Cheap star-count proxy: local maxima above the background on a binned image.
+    
+    The image is block-averaged by binning, a coarse block-median background is
+    subtracted and local maxima (3x3) more than nsigma above the noise are
+    counted. Hot pixels and cosmic rays count too, so this is only meant to tell
+    a star field from a frame without stars.
+    
+    Parameters:
+    -----------
+    data : np.ndarray
+        2D image data, scaled or not (the count does not depend on a linear scaling)
+    binning : int
+        Binning factor applied before counting
+    nsigma : float
+        Detection threshold in units of the background noise
+        
+    Returns:
+    --------
+    int
+        Number of local maxima above the threshold
+    """
+    from scipy.ndimage import maximum_filter
+    
+    height, width = data.shape[0] // binning, data.shape[1] // binning
+    if height < 3 or width < 3:
+        return 0
+    binned = data[:height * binning, :width * binning].reshape(height, binning, width, binning)
+    binned = binned.mean(axis=(1, 3), dtype=np.float32)
+    
+    # Background on a coarse grid of block medians, expanded back to the binned size
+    box = max(1, min(16, height // 4, width // 4))
+    grid_h, grid_w = height // box, width // box
+    grid = np.nanmedian(binned[:grid_h * box, :grid_w * box].reshape(grid_h, box, grid_w, box), axis=(1, 3))
+    background = np.repeat(np.repeat(grid, box, axis=0), box, axis=1)
+    background = np.pad(background, ((0, height - background.shape[0]), (0, width - background.shape[1])), mode='edge')
+    residual = binned - background
+    
+    # Noise from the median absolute deviation of the residual
+    step = max(1, int(np.sqrt(residual.size / PRESCREEN_SAMPLE_PIXELS)))
+    sample = residual[::step, ::step]
+    sigma = 1.4826 * float(np.nanmedian(np.abs(sample - np.nanmedian(sample))))
+    if not np.isfinite(sigma) or sigma <= 0:
+        return 0
+    
+    residual = np.nan_to_num(residual, nan=0.0)
+    peaks = (residual > nsigma * sigma) & (residual == maximum_filter(residual, size=3))
+    return int(np.count_nonzero(peaks))
+
+
+def validate_fits_file(fits_file_path: str, min_stars: int = PRESCREEN_MIN_STARS) -> ImageValidationResult:
     """
     Validate if a file is a valid FITS file suitable for platesolving.
     
@@ -70,11 +149,18 @@ def validate_fits_file(fits_file_path: str) -> ImageValidationResult:
     - File is a valid FITS format
     - Contains 2D image data
     - Has reasonable dimensions and data characteristics
+    - Shows enough stars to be worth solving
+    
+    The check is meant to be cheap: statistics come from a subsample of the
+    image, the data is read without scaling it to float64 and the header is
+    parsed once.
     
     Parameters:
     -----------
     fits_file_path : str
         Path to the FITS file to validate
+    min_stars : int
+        Minimum star-count proxy (see estimate_star_count); 0 disables the check
         
     Returns:
     --------
@@ -98,8 +184,8 @@ def validate_fits_file(fits_file_path: str) -> ImageValidationResult:
         
         print(f"Validating FITS file: {fits_file_path}")
         
-        # Open and validate FITS structure
-        with fits.open(fits_file_path) as hdul:
+        # Open and validate FITS structure; raw data is memory-mapped and left unscaled
+        with fits.open(fits_file_path, do_not_scale_image_data=True) as hdul:
             # Check if file has any HDUs
             if len(hdul) == 0:
                 return ImageValidationResult(
@@ -107,26 +193,27 @@ def validate_fits_file(fits_file_path: str) -> ImageValidationResult:
                     reason="No HDUs found in FITS file"
                 )
             
-            # Get primary HDU
-            primary_hdu = hdul[0]
+            # Get the image HDU (the first extension of tile-compressed files)
+            primary_hdu = hdul[image_hdu_index(hdul)]
+            header = primary_hdu.header
             
             # Check if primary HDU has data
             if primary_hdu.data is None:
                 return ImageValidationResult(
                     is_valid=False, 
-                    reason="No data found in primary HDU"
+                    reason="No image data found in FITS file"
                 )
             
             # Check data dimensionality
-            data = primary_hdu.data
-            if len(data.shape) != 2:
+            raw = primary_hdu.data
+            if len(raw.shape) != 2:
                 return ImageValidationResult(
                     is_valid=False, 
-                    reason=f"Expected 2D image, got {len(data.shape)}D data"
+                    reason=f"Expected 2D image, got {len(raw.shape)}D data"
                 )
             
             # Check image dimensions
-            height, width = data.shape
+            height, width = raw.shape
             if height < 100 or width < 100:
                 return ImageValidationResult(
                     is_valid=False, 
@@ -134,37 +221,50 @@ def validate_fits_file(fits_file_path: str) -> ImageValidationResult:
                 )
             
             # Check for reasonable data range and contrast
-            data_min = float(data.min())
-            data_max = float(data.max())
-            data_mean = float(data.mean())
-            data_std = float(data.std())
+            bscale = float(header.get('BSCALE', 1.0))
+            bzero = float(header.get('BZERO', 0.0))
+            data_min, data_max, data_mean, data_std = _subsample_stats(raw, bscale, bzero)
             
             print(f"   Image stats: {width}x{height}, min={data_min:.1f}, max={data_max:.1f}, mean={data_mean:.1f}, std={data_std:.2f}")
-        
-        # Check for no contrast (all pixels same value)
-        if data_min == data_max:
-            return ImageValidationResult(
-                is_valid=False, 
-                reason="Image has no contrast (all pixels have same value)"
-            )
-        
-        # Check for very low contrast
-        if data_std < 1.0:
-            return ImageValidationResult(
-                is_valid=False, 
-                reason=f"Image has very low contrast (std={data_std:.2f})"
-            )
-        
-        # Check for reasonable signal levels
-        if data_mean < 10 or data_max < 50:
-            return ImageValidationResult(
-                is_valid=False, 
-                reason=f"Image appears too dark (mean={data_mean:.1f}, max={data_max:.1f})"
-            )
-        
-        # Extract existing WCS information
-        existing_wcs = extract_existing_wcs_from_header(primary_hdu.header)
-        ra_center, dec_center, pixel_scale = extract_existing_wcs_info(fits_file_path)
+            
+            # Check for no contrast (all pixels same value)
+            if data_min == data_max:
+                return ImageValidationResult(
+                    is_valid=False, 
+                    reason="Image has no contrast (all pixels have same value)"
+                )
+            
+            # Check for very low contrast
+            if data_std < 1.0:
+                return ImageValidationResult(
+                    is_valid=False, 
+                    reason=f"Image has very low contrast (std={data_std:.2f})"
+                )
+            
+            # Check for reasonable signal levels
+            if data_mean < 10 or data_max < 50:
+                return ImageValidationResult(
+                    is_valid=False, 
+                    reason=f"Image appears too dark (mean={data_mean:.1f}, max={data_max:.1f})"
+                )
+            
+            # Reject frames without stars before solve-field spends its whole timeout on them
+            star_count = None
+            if min_stars > 0:
+                star_count = estimate_star_count(raw)
+                print(f"   Star count estimate: {star_count}")
+                if star_count < min_stars:
+                    return ImageValidationResult(
+                        is_valid=False, 
+                        reason=f"Too few stars detected ({star_count}, minimum {min_stars}); "
+                               f"clouded out or not a sky frame?",
+                        image_shape=(height, width),
+                        star_count=star_count
+                    )
+            
+            # Extract existing WCS information
+            existing_wcs = extract_existing_wcs_from_header(header)
+            ra_center, dec_center, pixel_scale = extract_existing_wcs_info_from_header(header)
         
         print(f"{Style.BRIGHT + Fore.GREEN}   Image appears valid for platesolving{Style.RESET_ALL}")
         
@@ -175,7 +275,8 @@ def validate_fits_file(fits_file_path: str) -> ImageValidationResult:
             existing_wcs=existing_wcs,
             ra_center=ra_center,
             dec_center=dec_center,
-            pixel_scale=pixel_scale
+            pixel_scale=pixel_scale,
+            star_count=star_count
         )
             
     except Exception as e:
@@ -472,11 +573,78 @@ def validate_wcs_solution(wcs_data: Dict[str, Union[str, float, int]]) -> bool:
         return False
 
 
+# Keywords of the previous solution removed before a new one is written
+WCS_KEYWORDS_TO_REMOVE = [
+    'CRPIX1', 'CRPIX2', 'CRVAL1', 'CRVAL2',
+    'CD1_1', 'CD1_2', 'CD2_1', 'CD2_2',
+    'CTYPE1', 'CTYPE2', 'CUNIT1', 'CUNIT2',
+    'LONPOLE', 'LATPOLE',
+    'PC1_1', 'PC1_2', 'PC2_1', 'PC2_2',
+    'CDELT1', 'CDELT2', 'CROTA1', 'CROTA2'
+]
+
+PLATESOLVED_HISTORY = 'Plate solved with astrometry.net'
+
+# Sidecar file holding the header cards replaced by apply_wcs_to_fits, one JSON entry per line
+WCS_JOURNAL_SUFFIX = '.wcsjournal'
+
+# Blank cards reserved when a header has to grow, so that later solutions fit in place
+HEADER_SPARE_CARDS = 36
+
+
+def get_wcs_journal_path(fits_file_path: str) -> str:
+    """Path of the WCS journal sidecar of a FITS file."""
+    return fits_file_path + WCS_JOURNAL_SUFFIX
+
+
+def has_wcs_backup(fits_file_path: str) -> bool:
+    """Whether apply_wcs_to_fits journaled header cards that can be restored."""
+    return os.path.exists(get_wcs_journal_path(fits_file_path))
+
+
+def _journal_header_cards(fits_file_path: str, header: fits.Header, keywords: List[str]):
+    """Append the current state of the given keywords to the WCS journal."""
+    import json
+    from datetime import datetime
+    
+    cards = []
+    absent = []
+    for keyword in keywords:
+        if keyword in header:
+            value = header[keyword]
+            if isinstance(value, (str, int, float, bool)):
+                cards.append([keyword, value, header.comments[keyword]])
+        else:
+            absent.append(keyword)
+    
+    entry = {'date': datetime.now().isoformat(timespec='seconds'), 'cards': cards, 'absent': absent}
+    with open(get_wcs_journal_path(fits_file_path), 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def _fit_header_in_place(header: fits.Header, capacity: int):
+    """
+    Keep the header within its original size so astropy rewrites it in place.
+    
+    Trailing blank cards are used up first. If the header still has to grow, the
+    file gets rewritten once and spare blank cards are reserved for next time.
+    """
+    while len(header.tostring()) > capacity and len(header) and \
+            header.cards[-1].keyword == '' and header.cards[-1].value == '':
+        del header[-1]
+    if len(header.tostring()) > capacity:
+        for _ in range(HEADER_SPARE_CARDS):
+            header.append(fits.Card(), bottom=True, end=True)
+
+
 def apply_wcs_to_fits(fits_file_path: str, wcs_data: Dict[str, Union[str, float, int]], 
                      backup_original: bool = True) -> None:
     """
     Apply WCS solution to a FITS file header.
     
+    Only the header is written: as long as the new cards fit in the existing
+    header blocks (spare blank cards included) the data is left untouched.
+    
     Parameters:
     -----------
     fits_file_path : str
@@ -484,7 +652,8 @@ def apply_wcs_to_fits(fits_file_path: str, wcs_data: Dict[str, Union[str, float,
     wcs_data : Dict[str, Union[str, float, int]]
         Dictionary containing WCS header cards and their values
     backup_original : bool
-        Whether to create a backup of the original file
+        Whether to journal the replaced header cards so that restore_wcs_backup
+        can put them back
         
     Raises:
     -------
@@ -496,29 +665,18 @@ def apply_wcs_to_fits(fits_file_path: str, wcs_data: Dict[str, Union[str, float,
         if not validate_wcs_solution(wcs_data):
             raise WCSApplicationError("Invalid WCS solution")
         
-        # Create backup if requested
-        if backup_original:
-            backup_path = fits_file_path + '.backup'
-            if not os.path.exists(backup_path):
-                import shutil
-                shutil.copy2(fits_file_path, backup_path)
-                # logger.info(f"Created backup: {backup_path}") # Debug info removed
-        
-        # Open the FITS file in update mode
-        with fits.open(fits_file_path, mode='update') as hdul:
-            header = hdul[0].header
+        # Open the image header in update mode; the data is never accessed
+        # (nor recompressed, for tile-compressed files)
+        with update_image_header(fits_file_path) as header:
+            capacity = len(header.tostring())
             
-            # Remove existing WCS keywords that might conflict
-            wcs_keywords_to_remove = [
-                'CRPIX1', 'CRPIX2', 'CRVAL1', 'CRVAL2',
-                'CD1_1', 'CD1_2', 'CD2_1', 'CD2_2',
-                'CTYPE1', 'CTYPE2', 'CUNIT1', 'CUNIT2',
-                'LONPOLE', 'LATPOLE',
-                'PC1_1', 'PC1_2', 'PC2_1', 'PC2_2',
-                'CDELT1', 'CDELT2', 'CROTA1', 'CROTA2'
-            ]
+            # Save the cards about to change before touching them
+            if backup_original:
+                keywords = list(dict.fromkeys(WCS_KEYWORDS_TO_REMOVE + list(wcs_data.keys())))
+                _journal_header_cards(fits_file_path, header, keywords)
             
-            for keyword in wcs_keywords_to_remove:
+            # Remove existing WCS keywords that might conflict
+            for keyword in WCS_KEYWORDS_TO_REMOVE:
                 if keyword in header:
                     del header[keyword]
                     # logger.debug(f"Removed existing {keyword}") # Debug info removed
@@ -531,10 +689,9 @@ def apply_wcs_to_fits(fits_file_path: str, wcs_data: Dict[str, Union[str, float,
                 # logger.debug(f"Updated {keyword}: {value}") # Debug info removed
             
             # Add a comment indicating the file was plate solved
-            header['HISTORY'] = 'Plate solved with astrometry.net'
+            header['HISTORY'] = PLATESOLVED_HISTORY
             
-            # Flush changes to disk
-            hdul.flush()
+            _fit_header_in_place(header, capacity)
         
         # logger.info(f"Successfully updated {keywords_updated} WCS headers in {fits_file_path}") # Debug info removed
         
@@ -542,6 +699,72 @@ def apply_wcs_to_fits(fits_file_path: str, wcs_data: Dict[str, Union[str, float,
         raise WCSApplicationError(f"Error applying WCS to {fits_file_path}: {e}")
 
 
+def restore_wcs_backup(fits_file_path: str, original: bool = False) -> int:
+    """
+    Put back the header cards journaled by apply_wcs_to_fits.
+    
+    Parameters:
+    -----------
+    fits_file_path : str
+        Path to the FITS file to restore
+    original : bool
+        Restore the header as it was before the first journaled solution and
+        remove the journal. By default only the last solution is undone.
+        
+    Returns:
+    --------
+    int
+        Number of journal entries undone
+        
+    Raises:
+    -------
+    WCSApplicationError
+        If there is no journal or the header cannot be restored
+    """
+    import json
+    
+    journal_path = get_wcs_journal_path(fits_file_path)
+    if not os.path.exists(journal_path):
+        raise WCSApplicationError(f"No WCS backup found for {fits_file_path}")
+    
+    try:
+        with open(journal_path) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        if not entries:
+            os.remove(journal_path)
+            raise WCSApplicationError(f"WCS backup of {fits_file_path} is empty")
+        
+        undo = entries if original else entries[-1:]
+        with update_image_header(fits_file_path) as header:
+            capacity = len(header.tostring())
+            # Undo the most recent solution first
+            for entry in reversed(undo):
+                for keyword in entry['absent']:
+                    if keyword in header:
+                        del header[keyword]
+                for keyword, value, comment in entry['cards']:
+                    header[keyword] = (value, comment)
+                history = [i for i, card in enumerate(header.cards)
+                           if card.keyword == 'HISTORY' and card.value == PLATESOLVED_HISTORY]
+                if history:
+                    del header[history[-1]]
+            _fit_header_in_place(header, capacity)
+        
+        remaining = entries[:len(entries) - len(undo)]
+        if remaining:
+            with open(journal_path, 'w') as f:
+                for entry in remaining:
+                    f.write(json.dumps(entry) + '\n')
+        else:
+            os.remove(journal_path)
+        return len(undo)
+        
+    except WCSApplicationError:
+        raise
+    except Exception as e:
+        raise WCSApplicationError(f"Error restoring WCS backup of {fits_file_path}: {e}")
+
+
 def extract_existing_wcs_info(fits_file_path: str) -> Tuple[Optional[float], Optional[float], Optional[float]]:
     """
     Extract existing WCS information from a FITS file header.
@@ -560,9 +783,28 @@ def extract_existing_wcs_info(fits_file_path: str) -> Tuple[Optional[float], Opt
         - pixel_scale: Pixel scale in arcsec/pixel (None if not found)
     """
     try:
-        with fits.open(fits_file_path) as hdul:
-            header = hdul[0].header
-            
+        header = read_image_header(fits_file_path)
+    except Exception as e:
+        # logger.warning(f"Error extracting existing WCS info from {fits_file_path}: {e}") # Debug info removed
+        return None, None, None
+    return extract_existing_wcs_info_from_header(header)
+
+
+def extract_existing_wcs_info_from_header(header: fits.Header) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+    """
+    Extract existing WCS information from an already loaded FITS header.
+    
+    Parameters:
+    -----------
+    header : fits.Header
+        FITS header object
+        
+    Returns:
+    --------
+    Tuple[Optional[float], Optional[float], Optional[float]]
+        (ra_center, dec_center, pixel_scale), None for values not found
+    """
+    try:
         ra_center = None
         dec_center = None
         pixel_scale = None
@@ -589,7 +831,6 @@ def extract_existing_wcs_info(fits_file_path: str) -> Tuple[Optional[float], Opt
         return ra_center, dec_center, pixel_scale
         
     except Exception as e:
-        # logger.warning(f"Error extracting existing WCS info from {fits_file_path}: {e}") # Debug info removed
         return None, None, None
 
 
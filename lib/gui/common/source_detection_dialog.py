@@ -6,7 +6,7 @@ A dialog for customizing source detection parameters before execution.
 
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, 
                               QSpinBox, QDoubleSpinBox, QCheckBox, QPushButton, 
-                              QLabel, QGroupBox, QDialogButtonBox)
+                              QLabel, QGroupBox, QDialogButtonBox, QComboBox)
 from PyQt6.QtCore import Qt
 
 
@@ -32,7 +32,8 @@ class SourceDetectionDialog(QDialog):
                 'deblend': False,
                 'connectivity': 8,
                 'background_box_size': 100,
-                'background_filter_size': 5
+                'background_filter_size': 5,
+                'background_mode': 'scalar'
             }
         
         self.params = default_params.copy()
@@ -129,17 +130,25 @@ class SourceDetectionDialog(QDialog):
         background_group = QGroupBox("Background Estimation")
         background_layout = QFormLayout(background_group)
         
+        self.background_mode = QComboBox()
+        self.background_mode.addItem("Scalar (global level)", 'scalar')
+        self.background_mode.addItem("Mesh (Background2D, downsampled)", 'mesh')
+        mode_index = self.background_mode.findData(self.params.get('background_mode', 'scalar'))
+        self.background_mode.setCurrentIndex(max(0, mode_index))
+        self.background_mode.setToolTip("Scalar is fastest; mesh follows background gradients (uses box and filter size)")
+        background_layout.addRow("Background Mode:", self.background_mode)
+        
         self.background_box_size = QSpinBox()
         self.background_box_size.setRange(10, 500)
         self.background_box_size.setValue(self.params['background_box_size'])
-        self.background_box_size.setToolTip("Box size for background estimation")
+        self.background_box_size.setToolTip("Box size for background estimation (mesh mode)")
         background_layout.addRow("Background Box Size:", self.background_box_size)
         
         self.background_filter_size = QSpinBox()
         self.background_filter_size.setRange(3, 21)
         self.background_filter_size.setSingleStep(2)  # Keep odd numbers
         self.background_filter_size.setValue(self.params['background_filter_size'])
-        self.background_filter_size.setToolTip("Filter size for background estimation (must be odd)")
+        self.background_filter_size.setToolTip("Filter size for background estimation (mesh mode, must be odd)")
         background_layout.addRow("Background Filter Size:", self.background_filter_size)
         
         layout.addWidget(background_group)
@@ -164,7 +173,8 @@ class SourceDetectionDialog(QDialog):
             'deblend': self.deblend.isChecked(),
             'connectivity': self.connectivity.value(),
             'background_box_size': self.background_box_size.value(),
-            'background_filter_size': self.background_filter_size.value()
+            'background_filter_size': self.background_filter_size.value(),
+            'background_mode': self.background_mode.currentData()
         }
     
     def accept(self):
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Source Analysis Thread
+Runs batch source analysis of the library in a background thread for the GUI.
+"""
+
+import io
+from contextlib import redirect_stdout
+from PyQt6.QtCore import QThread, pyqtSignal
+from colorama import Fore, Style
+
+from lib.db.analyze import SourceAnalyzer
+
+
+class _SignalWriter(io.TextIOBase):
+    """File-like object forwarding each written line to a Qt signal."""
+
+    def __init__(self, signal):
+        super().__init__()
+        self.signal = signal
+        self._buffer = ''
+
+    def write(self, text):
+        self._buffer += text
+        if '\n' in self._buffer:
+            lines, self._buffer = self._buffer.rsplit('\n', 1)
+            self.signal.emit(lines + '\n')
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            self.signal.emit(self._buffer)
+            self._buffer = ''
+
+
+class SourceAnalysisThread(QThread):
+    """Thread for running source detection on all un-analyzed frames."""
+
+    output = pyqtSignal(str)  # Emit analysis progress
+    finished = pyqtSignal(dict)  # Emit analysis summary
+
+    def __init__(self, max_workers=None, include_failed=False):
+        super().__init__()
+        self.analyzer = SourceAnalyzer(max_workers=max_workers, include_failed=include_failed)
+
+    def run(self):
+        """Run the batch analysis."""
+        writer = _SignalWriter(self.output)
+        try:
+            with redirect_stdout(writer):
+                results = self.analyzer.analyze_library()
+            writer.flush()
+            self.finished.emit(results)
+        except Exception as e:
+            writer.flush()
+            self.output.emit(f"{Style.BRIGHT + Fore.RED}Error during source analysis: {e}{Style.RESET_ALL}\n")
+            self.finished.emit({'error': str(e)})
+
+    def stop(self):
+        """Stop after the frames currently being processed; finished frames stay committed."""
+        self.analyzer.stop()
@@ -2,7 +2,7 @@ from PyQt6.QtWidgets import QMenu
 from PyQt6.QtGui import QAction, QFont
 from colorama import Fore, Style
 from lib.gui.common.console_window import ConsoleOutputWindow
-from .platesolving_thread import PlatesolvingThread
+from .platesolving_thread import BatchPlatesolvingThread
 from .calibration_thread import CalibrationThread
 
 def build_single_file_menu(parent=None, show_header_callback=None, show_image_callback=None, solve_image_callback=None, calibrate_and_compare_callback=None):
@@ -99,53 +99,34 @@ def build_sidebar_target_menu(parent=None, target_name=None, show_info_callback=
 
 def platesolve_multiple_files(parent, files, on_all_finished=None):
     """
-    Platesolve a list of FITS files sequentially, showing output in a console window.
+    Platesolve a list of FITS files through the shared solver pool, showing progress in a console window.
     parent: the parent widget (for dialog parenting)
     files: list of file objects (must have .path)
     on_all_finished: optional callback to call when all files are done
     """
     console_window = ConsoleOutputWindow("Platesolving All Files", parent)
     console_window.show_and_raise()
-    queue = list(files)
-    results = []
-    cancelled = {"flag": False}
     # Ensure threads are kept alive
     if not hasattr(parent, '_platesolving_threads'):
         parent._platesolving_threads = []
 
-    def next_in_queue():
-        if cancelled["flag"]:
-            console_window.append_text("\nPlatesolving cancelled by user.\n")
-            if on_all_finished:
-                on_all_finished(results)
-            return
-        if not queue:
-            console_window.append_text("\nAll files platesolved.\n")
-            if on_all_finished:
-                on_all_finished(results)
-            return
-        fits_file = queue.pop(0)
-        fits_path = fits_file.path
-        console_window.append_text(f"\nPlatesolving: {fits_path}\n")
-        thread = PlatesolvingThread(fits_path)
-        parent._platesolving_threads.append(thread)
-        thread.output.connect(console_window.append_text)
-        thread.finished.connect(lambda result: on_finished(result))
-        def on_finished(result):
-            results.append(result)
-            msg = parent._format_platesolving_result(result) if hasattr(parent, '_format_platesolving_result') else str(result)
-            console_window.append_text(f"\n{msg}\n")
-            # Remove thread from list
-            if thread in parent._platesolving_threads:
-                parent._platesolving_threads.remove(thread)
-            next_in_queue()
-        thread.start()
-    
+    thread = BatchPlatesolvingThread([fits_file.path for fits_file in files])
+    parent._platesolving_threads.append(thread)
+    thread.output.connect(console_window.append_text)
+
+    def on_finished(results):
+        solved = sum(1 for result in results if result is not None and result.success)
+        console_window.append_text(f"\nAll files platesolved ({solved}/{len(results)} solved).\n")
+        # Remove thread from list
+        if thread in parent._platesolving_threads:
+            parent._platesolving_threads.remove(thread)
+        if on_all_finished:
+            on_all_finished(results)
+
+    thread.finished.connect(on_finished)
     # Connect cancel button
-    console_window.cancel_requested.connect(lambda: setattr(cancelled, 'flag', True))
-    
-    # Start the process
-    next_in_queue()
+    console_window.cancel_requested.connect(thread.stop)
+    thread.start()
 
 def calibrate_and_compare_file(parent, fits_file, show_image_callback=None, show_both_callback=None):
     """
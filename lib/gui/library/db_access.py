@@ -19,7 +19,12 @@ class DatabaseLoaderThread(QThread):
     def run(self):
         try:
             db_manager = get_db_manager(self.db_path)
-            fits_files = db_manager.get_all_fits_files()
+            # Derived tables are refreshed here (a write), never on the GUI thread
+            db_manager.refresh_observation_runs()
+            db_manager.refresh_header_keywords()
+            db_manager.refresh_sky_index()
+            # Displayed columns only, read in pages
+            fits_files = db_manager.get_fits_file_list()
             self.data_loaded.emit(fits_files)
         except Exception as e:
             self.error_occurred.emit(str(e))
@@ -69,6 +74,7 @@ class DatabaseScannerThread(QThread):
             # Combine results for summary
             summary = {
                 'files_imported': fits_results.get('files_imported', 0),
+                'files_updated': fits_results.get('files_updated', 0),
                 'files_skipped': fits_results.get('files_skipped', 0),
                 'total_files_found': fits_results.get('total_files_found', 0),
                 'calib_imported': calib_results.get('files_imported', 0),
@@ -118,10 +124,13 @@ def refresh_database():
 def cleanup_temp_directories():
     """
     Delete all files in /tmp/astropipes/solved, /tmp/astropipes/calibrated, /tmp/astropipes/stacked, and /tmp/astropipes/aligned.
+    The artifact store is kept (it is what makes reprocessing fast) but trimmed to its size limit.
+    Returns the artifact store summary.
     """
     import shutil
     import glob
     import os
+    from lib.fits.artifacts import get_artifact_store
     temp_dirs = ["/tmp/astropipes/solved", "/tmp/astropipes/calibrated", "/tmp/astropipes/stacked", "/tmp/astropipes/aligned"]
     for temp_dir in temp_dirs:
         if os.path.exists(temp_dir):
@@ -132,4 +141,7 @@ def cleanup_temp_directories():
                     elif os.path.isdir(filename):
                         shutil.rmtree(filename)
                 except Exception as e:
-                    print(f"Failed to delete {filename}: {e}") 
\ No newline at end of file
+                    print(f"Failed to delete {filename}: {e}")
+    store = get_artifact_store()
+    store.evict()
+    return store.format_stats()
@@ -380,7 +380,8 @@ class AstroLibraryGUI(QMainWindow):
             self.scan_for_files,
             self.open_settings_dialog,
             self.refresh_database,
-            self.cleanup_temp_directories
+            self.cleanup_temp_directories,
+            self.analyze_library_sources
         )
         
         # Create central widget
@@ -412,7 +413,21 @@ class AstroLibraryGUI(QMainWindow):
         self.right_stack.addWidget(self.master_darks_table)  # index 2: Master darks
         self.right_stack.addWidget(self.master_bias_table)   # index 3: Master bias
         self.right_stack.addWidget(self.master_flats_table)  # index 4: Master flats
-        splitter.addWidget(self.right_stack)
+        
+        # Header keyword filter above the tables, evaluated by SQLite
+        right_panel = QWidget()
+        right_layout = QVBoxLayout(right_panel)
+        right_layout.setContentsMargins(0, 0, 0, 0)
+        right_layout.setSpacing(0)
+        self.header_filter_edit = QLineEdit()
+        self.header_filter_edit.setPlaceholderText("Header filter, e.g. EXPTIME>=120 AND FILTER='L' (Enter to apply)")
+        self.header_filter_edit.setClearButtonEnabled(True)
+        self.header_filter_edit.returnPressed.connect(self.apply_header_filter)
+        self.header_filter_edit.textChanged.connect(lambda text: text or self.apply_header_filter())
+        self.header_filter_ids = None  # IDs of the files matching the header filter, None without filter
+        right_layout.addWidget(self.header_filter_edit)
+        right_layout.addWidget(self.right_stack)
+        splitter.addWidget(right_panel)
         splitter.setStretchFactor(1, 1)  # Make right panel expand more
         splitter.setSizes([self.left_panel.minimumWidth(), 1000])  # Left panel at min width
         
@@ -468,28 +483,68 @@ class AstroLibraryGUI(QMainWindow):
     def on_data_loaded(self, fits_files):
         """Handle loaded database data."""
         self.fits_files = fits_files
+        # The matching files may have changed since the filter was run (rescan, new headers)
+        self._update_header_filter_ids()
         self.table_widget.populate_table(fits_files)
         # If main_table_widget is visible, repopulate it with the correct filter
         if self.right_stack.currentIndex() == 1:
-            if self.last_menu_category == "target":
-                filtered = [f for f in self.fits_files if f.target == self.last_menu_value]
-                self.main_table_widget.populate_table(filtered)
-            elif self.last_menu_category == "date":
-                from config import TIME_DISPLAY_MODE, to_display_time
-                if TIME_DISPLAY_MODE == 'Local':
-                    filtered = [
-                        f for f in self.fits_files
-                        if f.date_obs and to_display_time(f.date_obs).strftime('%Y-%m-%d') == self.last_menu_value
-                    ]
-                else:
-                    filtered = [
-                        f for f in self.fits_files
-                        if f.date_obs and f.date_obs.strftime('%Y-%m-%d') == self.last_menu_value
-                    ]
-                self.main_table_widget.populate_table(filtered)
+            self.main_table_widget.populate_table(
+                self._filtered_files(self.last_menu_category, self.last_menu_value)
+            )
         self.update_status_bar()
         self.progress_bar.setVisible(False)
     
+    def _filtered_files(self, category, value):
+        """Files of the selected target or date (all files otherwise) that match the header filter."""
+        if category == "target":
+            files = [f for f in self.fits_files if f.target == value]
+        elif category == "date":
+            from config import TIME_DISPLAY_MODE
+            if TIME_DISPLAY_MODE == 'Local':
+                files = [f for f in self.fits_files if f.night_date == value]
+            else:
+                files = [
+                    f for f in self.fits_files
+                    if f.date_obs and f.date_obs.strftime('%Y-%m-%d') == value
+                ]
+        else:
+            files = self.fits_files
+        if self.header_filter_ids is not None:
+            files = [f for f in files if f.id in self.header_filter_ids]
+        return files
+    
+    def _update_header_filter_ids(self):
+        """Run the header filter query. Returns False if the expression is invalid."""
+        expression = self.header_filter_edit.text().strip()
+        if not expression:
+            self.header_filter_ids = None
+            return True
+        try:
+            # Read only: the keyword index is refreshed by scans and the loader thread
+            rows = get_db_manager().query_fits_files(expression, columns=('id',), refresh=False)
+        except ValueError as e:
+            self.status_label.setText(f"   {e}")
+            return False
+        self.header_filter_ids = {row.id for row in rows}
+        return True
+    
+    def apply_header_filter(self):
+        """Run the header filter query and show the matching files."""
+        expression = self.header_filter_edit.text().strip()
+        if not expression and self.header_filter_ids is None:
+            return
+        if not self._update_header_filter_ids():
+            return
+        if self.last_menu_category in ("target", "date"):
+            category, value = self.last_menu_category, self.last_menu_value
+        else:
+            # Outside a target or date, the filter applies to the whole library
+            category, value = None, None
+        if expression or self.right_stack.currentIndex() == 1:
+            self.main_table_widget.populate_table(self._filtered_files(category, value))
+            self.right_stack.setCurrentIndex(1)
+        self.update_status_bar()
+    
     def on_database_error(self, error_message):
         """Handle database loading errors."""
         self.status_label.setText("Database error")
@@ -508,41 +563,26 @@ class AstroLibraryGUI(QMainWindow):
         self.last_menu_value = value
         if category == "obslog":
             self.right_stack.setCurrentIndex(0)
-        elif category == "target":
-            filtered = [f for f in self.fits_files if f.target == value]
-            self.main_table_widget.populate_table(filtered)
-            self.right_stack.setCurrentIndex(1)
-        elif category == "date":
-            from config import TIME_DISPLAY_MODE, to_display_time
-            if TIME_DISPLAY_MODE == 'Local':
-                filtered = [
-                    f for f in self.fits_files
-                    if f.date_obs and to_display_time(f.date_obs).strftime('%Y-%m-%d') == value
-                ]
-            else:
-                filtered = [
-                    f for f in self.fits_files
-                    if f.date_obs and f.date_obs.strftime('%Y-%m-%d') == value
-                ]
-            self.main_table_widget.populate_table(filtered)
+        elif category in ("target", "date"):
+            self.main_table_widget.populate_table(self._filtered_files(category, value))
             self.right_stack.setCurrentIndex(1)
         elif category == "darks":
             db = get_db_manager()
-            session = db.get_session()
+            session = db.get_read_session()
             darks = session.query(CalibrationMaster).filter_by(frame="Dark").all()
             session.close()
             self.master_darks_table.populate(darks)
             self.right_stack.setCurrentIndex(2)
         elif category == "bias":
             db = get_db_manager()
-            session = db.get_session()
+            session = db.get_read_session()
             biases = session.query(CalibrationMaster).filter_by(frame="Bias").all()
             session.close()
             self.master_bias_table.populate(biases)
             self.right_stack.setCurrentIndex(3)
         elif category == "flats":
             db = get_db_manager()
-            session = db.get_session()
+            session = db.get_read_session()
             flats = session.query(CalibrationMaster).filter_by(frame="Flat").all()
             session.close()
             self.master_flats_table.populate(flats)
@@ -580,6 +620,7 @@ class AstroLibraryGUI(QMainWindow):
         msg = (
             "Scan completed successfully!\n\n"
             f"Files imported: {results.get('files_imported', 0)}\n"
+            f"Files updated: {results.get('files_updated', 0)}\n"
             f"Files skipped: {results.get('files_skipped', 0)}\n"
             f"Total files found: {results.get('total_files_found', 0)}\n\n"
             f"Calibration masters imported: {results.get('calib_imported', 0)}\n"
@@ -603,6 +644,44 @@ class AstroLibraryGUI(QMainWindow):
             self.console_window.close_button.setEnabled(True)
         QMessageBox.critical(self, "Scan Error", f"Error during scan: {error_message}")
 
+    def analyze_library_sources(self):
+        """Run source detection on all frames that have not been analyzed yet."""
+        from .analysis_thread import SourceAnalysisThread
+        if getattr(self, 'analysis_thread', None) is not None and self.analysis_thread.isRunning():
+            QMessageBox.information(self, "Source Analysis", "Source analysis is already running.")
+            return
+        if self.console_window is not None:
+            self.console_window.close()
+        self.console_window = ConsoleOutputWindow(title="Source Analysis Output", parent=self)
+        self.console_window.clear_output()
+        self.console_window.show_and_raise()
+        self.status_label.setText("Analyzing sources...")
+        self.analysis_thread = SourceAnalysisThread()
+        self.analysis_thread.output.connect(self.console_window.append_text)
+        self.analysis_thread.finished.connect(self.on_analysis_completed)
+        self.console_window.cancel_requested.connect(self.analysis_thread.stop)
+        self.analysis_thread.start()
+
+    def on_analysis_completed(self, results):
+        """Handle batch source analysis completion."""
+        if self.console_window:
+            self.console_window.close_button.setEnabled(True)
+        if 'error' in results:
+            self.status_label.setText("Source analysis failed")
+            QMessageBox.critical(self, "Source Analysis Error", f"Error during source analysis: {results['error']}")
+            return
+        self.status_label.setText("Source analysis completed")
+        msg = (
+            f"Frames analyzed: {results.get('frames_analyzed', 0)}\n"
+            f"Frames failed: {results.get('frames_failed', 0)}\n"
+            f"Sources found: {results.get('sources_found', 0)}\n"
+            f"Throughput: {results.get('frames_per_minute', 0.0):.1f} frames/min"
+        )
+        if results.get('cancelled'):
+            msg = "Source analysis cancelled. Run it again to resume.\n\n" + msg
+        QMessageBox.information(self, "Source Analysis Complete", msg)
+        self.load_database()
+
     def open_settings_dialog(self):
         dlg = SettingsDialog(self)
         dlg.settings_changed.connect(self.on_settings_changed)
@@ -648,11 +727,12 @@ class AstroLibraryGUI(QMainWindow):
             QMessageBox.critical(self, "Refresh Failed", f"Failed to refresh database: {e}")
 
     def cleanup_temp_directories(self):
-        """Delete all files in /tmp/astropipes/solved, /tmp/astropipes/calibrated, /tmp/astropipes/stacked, and /tmp/astropipes/aligned."""
+        """Delete all files in /tmp/astropipes/solved, /tmp/astropipes/calibrated, /tmp/astropipes/stacked, and /tmp/astropipes/aligned, and trim the artifact store."""
         from . import db_access
         try:
-            db_access.cleanup_temp_directories()
-            QMessageBox.information(self, "Cleanup Complete", "Temporary directories have been cleaned up.")
+            store_summary = db_access.cleanup_temp_directories()
+            QMessageBox.information(self, "Cleanup Complete",
+                                    f"Temporary directories have been cleaned up.\n\nArtifact store:\n{store_summary}")
         except Exception as e:
             QMessageBox.critical(self, "Cleanup Failed", f"Failed to clean up temp directories: {e}")
 
@@ -1,7 +1,7 @@
 from PyQt6.QtWidgets import QMenuBar
 from PyQt6.QtGui import QAction
 
-def create_menu_bar(parent, on_exit, on_scan, on_settings=None, on_refresh=None, on_cleanup=None):
+def create_menu_bar(parent, on_exit, on_scan, on_settings=None, on_refresh=None, on_cleanup=None, on_analyze=None):
     """Create the menu bar with File and Database menus, and connect actions to callbacks."""
     menubar = parent.menuBar() if hasattr(parent, 'menuBar') else QMenuBar(parent)
 
@@ -22,6 +22,10 @@ def create_menu_bar(parent, on_exit, on_scan, on_settings=None, on_refresh=None,
     scan_action = QAction("Scan for new files", parent)
     scan_action.triggered.connect(on_scan)
     db_menu.addAction(scan_action)
+    if on_analyze is not None:
+        analyze_action = QAction("Analyze sources in library", parent)
+        analyze_action.triggered.connect(on_analyze)
+        db_menu.addAction(analyze_action)
     if on_refresh is not None:
         refresh_action = QAction("Refresh database", parent)
         refresh_action.triggered.connect(on_refresh)
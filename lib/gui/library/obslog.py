@@ -6,7 +6,6 @@ Observation log table widget for displaying FITS files grouped by runs.
 import sys
 import os
 import subprocess
-from datetime import datetime
 from PyQt6.QtWidgets import (
     QTableWidget, QTableWidgetItem, QHeaderView, QLabel, QVBoxLayout, QHBoxLayout, QWidget, QMenu, QMessageBox, QFrame
 )
@@ -28,6 +27,7 @@ from lib.gui.common.console_window import ConsoleOutputWindow, RealTimeStringIO
 import signal
 from .platesolving_thread import PlatesolvingThread
 from config import to_display_time
+from lib.db import get_db_manager
 from astropipes import VIEWER_PATH
 
 
@@ -130,10 +130,15 @@ class FitsTableWidget(QTableWidget):
     selection_changed = pyqtSignal(list)  # Emits list of selected fits_file_ids
     platesolving_completed = pyqtSignal()
     
+    # Runs loaded per page; the next page is loaded when scrolling near the bottom
+    RUNS_PAGE_SIZE = 100
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.fits_files = []
         self.run_groups = []
+        self.all_runs_loaded = False
+        self.run_files = {}  # Files of the runs loaded so far, by run id
         self.expanded_runs = set()  # Track which runs are expanded
         self.init_table()
     
@@ -205,110 +210,85 @@ class FitsTableWidget(QTableWidget):
         # Connect selection change and cell click
         self.itemSelectionChanged.connect(self._on_selection_changed)
         self.cellClicked.connect(self._on_cell_clicked)
-    
-    def _group_files_by_runs(self, fits_files):
-        """Group FITS files by runs based on target and time proximity."""
-        if not fits_files:
-            return []
-        
-        # Sort files by date_obs (most recent first)
-        sorted_files = sorted(fits_files, key=lambda x: x.date_obs or datetime.min, reverse=True)
-        
-        runs = []
-        current_run = []
-        
-        for file in sorted_files:
-            if not current_run:
-                current_run = [file]
-            else:
-                # Check if this file belongs to the same run
-                last_file = current_run[-1]
-                
-                # Same target and within 30 minutes of the last file
-                same_target = file.target == last_file.target
-                time_diff = abs((file.date_obs - last_file.date_obs).total_seconds() / 60) if file.date_obs and last_file.date_obs else float('inf')
-                within_time_window = time_diff <= 30  # 30 minutes threshold
-                
-                if same_target and within_time_window:
-                    current_run.append(file)
-                else:
-                    # End current run and start new one
-                    if current_run:
-                        runs.append(current_run)
-                    current_run = [file]
-        
-        # Add the last run
-        if current_run:
-            runs.append(current_run)
         
-        return runs
+        # Load more runs when scrolling near the bottom
+        self.verticalScrollBar().valueChanged.connect(self._on_scroll)
     
-    def _create_run_summary_data(self, run_files):
-        """Create summary data for a run."""
-        count = len(run_files)
-        target = run_files[0].target if run_files else "Unknown"
-        filters = [f.filter_name for f in run_files if f.filter_name]
-        exposures = [f.exptime for f in run_files if f.exptime]
-        total_seconds = sum(exposures) if exposures else 0
-        total_minutes = round(total_seconds / 60)
-        binning = run_files[0].binning if run_files and hasattr(run_files[0], 'binning') else "-"
-        # Use the oldest image (last in run_files) for date and time
-        if run_files and hasattr(run_files[-1], 'date_obs') and run_files[-1].date_obs:
-            dt = run_files[-1].date_obs
-            if isinstance(dt, str):
-                date_time_str = dt
-                date_str = dt.split()[0]
-            else:
-                dt_disp = to_display_time(dt)
-                date_time_str = dt_disp.strftime("%Y-%m-%d %H:%M:%S") if dt_disp else "-"
-                date_str = dt_disp.strftime("%Y-%m-%d") if dt_disp else "-"
-        else:
-            date_time_str = "-"
-            date_str = "-"
+    def _create_run_summary_data(self, run):
+        """Create summary data for a stored observation run."""
+        # Date and time of the oldest image of the run
+        dt_disp = to_display_time(run.start_time) if run.start_time else None
         return {
-            'count': count,
-            'target': target,
-            'filters': filters,
-            'exposures': exposures,
-            'total_minutes': total_minutes,
-            'binning': binning,
-            'date_str': date_str,
-            'date_time_str': date_time_str,
-            'files': run_files
+            'run_id': run.id,
+            'count': run.file_count,
+            'target': run.target or "Unknown",
+            'filters': json.loads(run.filters or '[]'),
+            'exposures': json.loads(run.exposures or '[]'),
+            'total_minutes': round((run.total_exptime or 0) / 60),
+            'binning': run.binning or "-",
+            'date_str': dt_disp.strftime("%Y-%m-%d") if dt_disp else "-",
+            'date_time_str': dt_disp.strftime("%Y-%m-%d %H:%M:%S") if dt_disp else "-",
         }
     
+    def _get_run_files(self, data):
+        """Files of a run summary row, loaded from the database on first use."""
+        run_id = data['run_data']['run_id']
+        if run_id not in self.run_files:
+            self.run_files[run_id] = get_db_manager().get_run_files(run_id)
+        return self.run_files[run_id]
+    
     def populate_table(self, fits_files):
-        """Populate the table with FITS files grouped by runs."""
+        """Populate the table with the first page of observation runs (files are loaded when a run is expanded)."""
         self.fits_files = fits_files
         self.expanded_runs.clear()
-        
-        # Group files by runs
-        self.run_groups = self._group_files_by_runs(fits_files)
-        
-        # Calculate total rows needed (one row per run, plus expanded files)
-        total_rows = len(self.run_groups)
-        self.setRowCount(total_rows)
+        self.run_files.clear()
+        self.run_groups = []
+        self.all_runs_loaded = False
+        self.setRowCount(0)
         
         # Set row height for run summary rows
         self.verticalHeader().setDefaultSectionSize(60)  # Double height
         
-        # Populate each run as a summary row
-        for row, run_files in enumerate(self.run_groups):
-            self._add_run_summary_row(row, run_files)
-        self._apply_striping()
+        # Run summaries are stored in the database, brought up to date by the loader thread
+        self.load_more_runs()
         
         # Collapse all runs by default, expand only the most recent (first) run
         if self.run_groups:
             self._expand_run(0)
+    
+    def load_more_runs(self):
+        """Append the next page of runs as summary rows. Returns the number of runs added."""
+        if self.all_runs_loaded:
+            return 0
+        runs = get_db_manager().get_observation_runs(limit=self.RUNS_PAGE_SIZE, offset=len(self.run_groups))
+        if len(runs) < self.RUNS_PAGE_SIZE:
+            self.all_runs_loaded = True
+        if not runs:
+            return 0
+        
+        # Runs are appended after the last row, below any expanded run
+        first_row = self.rowCount()
+        self.setRowCount(first_row + len(runs))
+        for i, run in enumerate(runs):
+            self._add_run_summary_row(first_row + i, run)
+        self.run_groups.extend(runs)
+        self._apply_striping()
+        return len(runs)
+    
+    def _on_scroll(self, value):
+        """Load the next page of runs when the scroll bar gets near the bottom."""
+        scroll_bar = self.verticalScrollBar()
+        if not self.all_runs_loaded and value >= scroll_bar.maximum() - scroll_bar.pageStep():
+            self.load_more_runs()
 
-    def _add_run_summary_row(self, row, run_files):
+    def _add_run_summary_row(self, row, run):
         """Add a run summary row to the table."""
         # Set double row height for run summary rows
         self.verticalHeader().setSectionResizeMode(row, QHeaderView.ResizeMode.Fixed)
         self.setRowHeight(row, 60)  # Double height
         
         # Create run summary data
-        run_data = self._create_run_summary_data(run_files)
+        run_data = self._create_run_summary_data(run)
         
         # Create custom widget for the summary
         summary_widget = RunSummaryWidget(run_data)
@@ -321,11 +301,11 @@ class FitsTableWidget(QTableWidget):
         self._set_run_row_style(row)
         
         # Store the run data for selection handling
-        if run_files:
-            # Create a hidden item to store the run data
+        if run.file_count:
+            # Create a hidden item to store the run data (files are loaded on expand)
             hidden_item = QTableWidgetItem()
             hidden_item.setData(Qt.ItemDataRole.UserRole, {
-                'run_files': run_files,
+                'run_files': None,
                 'run_data': run_data,
                 'is_run_summary': True,
                 'run_index': row
@@ -586,7 +566,7 @@ class FitsTableWidget(QTableWidget):
         if not data or 'run_files' not in data:
             return
         
-        run_files = data['run_files']
+        run_files = self._get_run_files(data)
         
         # Update the visual indicator
         widget = self.cellWidget(run_index, 0)
@@ -614,7 +594,7 @@ class FitsTableWidget(QTableWidget):
         if not data or 'run_files' not in data:
             return
         
-        run_files = data['run_files']
+        run_files = self._get_run_files(data)
         
         # Update the visual indicator
         widget = self.cellWidget(run_index, 0)
@@ -677,7 +657,7 @@ class FitsTableWidget(QTableWidget):
                 data = item.data(Qt.ItemDataRole.UserRole)
                 if data:
                     if 'is_run_summary' in data and 'run_files' in data:
-                        selected_file_ids.extend([f.id for f in data['run_files']])
+                        selected_file_ids.extend([f.id for f in self._get_run_files(data)])
                     elif 'is_file' in data and 'fits_file' in data:
                         selected_file_ids.append(data['fits_file'].id)
         
@@ -1,6 +1,7 @@
-import signal
+import threading
 from PyQt6.QtCore import QThread, pyqtSignal
-from lib.sci.platesolving import solve_single_image, PlatesolvingResult
+from lib.sci.platesolving import solve_single_image, PlatesolvingResult, terminate_process_group
+from lib.sci.solver_pool import get_solver_pool, SolveJob
 
 class PlatesolvingThread(QThread):
     output = pyqtSignal(str)
@@ -20,7 +21,8 @@ class PlatesolvingThread(QThread):
         if self._process is not None:
             try:
                 self.output.emit("\nCancelling platesolving...\n")
-                self._process.send_signal(signal.SIGINT)
+                # solve-field runs in its own process group; kill it off the GUI thread
+                threading.Thread(target=terminate_process_group, args=(self._process,), daemon=True).start()
             except Exception as e:
                 self.output.emit(f"\nError sending cancel signal: {e}\n")
 
@@ -30,4 +32,40 @@ class PlatesolvingThread(QThread):
         def process_callback(process):
             self.set_process(process)
         result = solve_single_image(self.fits_file_path, output_callback=output_callback, process_callback=process_callback)
-        self.finished.emit(result) 
\ No newline at end of file
+        self.finished.emit(result)
+
+
+class BatchPlatesolvingThread(QThread):
+    """Solve several files concurrently through the shared solver pool."""
+
+    output = pyqtSignal(str)
+    job_status = pyqtSignal(object)  # Emits SolveJob on every status change
+    finished = pyqtSignal(list)  # Emits the PlatesolvingResult of each file, in input order
+
+    def __init__(self, fits_file_paths):
+        super().__init__()
+        self.fits_file_paths = list(fits_file_paths)
+        self.pool = get_solver_pool()
+        self._jobs = []
+
+    def stop(self):
+        self.output.emit("\nCancelling platesolving...\n")
+        threading.Thread(target=self.pool.cancel_jobs, args=(list(self._jobs),), daemon=True).start()
+
+    def run(self):
+        total = len(self.fits_file_paths)
+        finished = []
+
+        def status_callback(job):
+            if job.status in SolveJob.FINAL_STATES:
+                finished.append(job)
+                self.output.emit(f"[{len(finished)}/{total}] {job}\n")
+            elif job.status == SolveJob.RUNNING:
+                self.output.emit(f"Solving {job.name}... ({self.pool.status_line()})\n")
+            self.job_status.emit(job)
+
+        self.output.emit(f"Platesolving {total} file(s) with up to {self.pool.max_workers} "
+                         f"concurrent solve-field processes (timeout {self.pool.timeout}s)\n")
+        self._jobs = [self.pool.submit(path, status_callback=status_callback) for path in self.fits_file_paths]
+        results = [job.wait() for job in self._jobs]
+        self.finished.emit(results)
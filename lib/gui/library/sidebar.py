@@ -72,20 +72,7 @@ class LeftPanel(QWidget):
         self.menu_tree.expandItem(self.calibration_item)
 
         # Populate targets and dates immediately
-        for target in db.get_unique_targets():
-            count = db.get_file_count_by_target(target)
-            item = QTreeWidgetItem(self.targets_item, [f"{target} ({count})"])
-            item.setForeground(0, self.darker_brush)
-        if TIME_DISPLAY_MODE == 'Local':
-            for date in reversed(db.get_unique_local_dates()):
-                count = db.get_file_count_by_local_date(date)
-                item = QTreeWidgetItem(self.dates_item, [f"{date} ({count})"])
-                item.setForeground(0, self.darker_brush)
-        else:
-            for date in reversed(db.get_unique_dates()):
-                count = db.get_file_count_by_date(date)
-                item = QTreeWidgetItem(self.dates_item, [f"{date} ({count})"])
-                item.setForeground(0, self.darker_brush)
+        self._add_target_and_date_items(db)
 
         # Expand both Targets and Dates by default
         self.menu_tree.expandItem(self.targets_item)
@@ -205,21 +192,18 @@ class LeftPanel(QWidget):
         db = get_db_manager()
         
         # Refresh target counts
+        target_counts = db.get_file_counts_by_target()
         for i in range(self.targets_item.childCount()):
             child = self.targets_item.child(i)
             target_name = child.text(0).split(" (")[0]
-            count = db.get_file_count_by_target(target_name)
-            child.setText(0, f"{target_name} ({count})")
+            child.setText(0, f"{target_name} ({target_counts.get(target_name, 0)})")
         
         # Refresh date counts
+        date_counts = db.get_file_counts_by_date(local=TIME_DISPLAY_MODE == 'Local')
         for i in range(self.dates_item.childCount()):
             child = self.dates_item.child(i)
             date_name = child.text(0).split(" (")[0]
-            if TIME_DISPLAY_MODE == 'Local':
-                count = db.get_file_count_by_local_date(date_name)
-            else:
-                count = db.get_file_count_by_date(date_name)
-            child.setText(0, f"{date_name} ({count})")
+            child.setText(0, f"{date_name} ({date_counts.get(date_name, 0)})")
         
         # Refresh calibration counts
         bias_count = db.get_calibration_file_count("Bias")
@@ -229,28 +213,24 @@ class LeftPanel(QWidget):
         self.darks_item.setText(0, f"Darks ({darks_count})")
         self.flats_item.setText(0, f"Flats ({flats_count})") 
 
+    def _add_target_and_date_items(self, db):
+        """Add the target and date items with their counts (one GROUP BY query each)."""
+        for target, count in db.get_file_counts_by_target().items():
+            item = QTreeWidgetItem(self.targets_item, [f"{target} ({count})"])
+            item.setForeground(0, self.darker_brush)
+        date_counts = db.get_file_counts_by_date(local=TIME_DISPLAY_MODE == 'Local')
+        for date in reversed(list(date_counts)):
+            item = QTreeWidgetItem(self.dates_item, [f"{date} ({date_counts[date]})"])
+            item.setForeground(0, self.darker_brush)
+
     def repopulate_targets_and_dates(self):
         """Clear and repopulate the targets and dates lists from the database."""
         db = get_db_manager()
         # Remove all children from targets and dates
         self.targets_item.takeChildren()
         self.dates_item.takeChildren()
-        # Repopulate targets
-        for target in db.get_unique_targets():
-            count = db.get_file_count_by_target(target)
-            item = QTreeWidgetItem(self.targets_item, [f"{target} ({count})"])
-            item.setForeground(0, self.darker_brush)
-        # Repopulate dates
-        if TIME_DISPLAY_MODE == 'Local':
-            for date in reversed(db.get_unique_local_dates()):
-                count = db.get_file_count_by_local_date(date)
-                item = QTreeWidgetItem(self.dates_item, [f"{date} ({count})"])
-                item.setForeground(0, self.darker_brush)
-        else:
-            for date in reversed(db.get_unique_dates()):
-                count = db.get_file_count_by_date(date)
-                item = QTreeWidgetItem(self.dates_item, [f"{date} ({count})"])
-                item.setForeground(0, self.darker_brush)
+        # Repopulate targets and dates
+        self._add_target_and_date_items(db)
         # Expand both Targets and Dates by default
         self.menu_tree.expandItem(self.targets_item)
         self.menu_tree.expandItem(self.dates_item) 
\ No newline at end of file
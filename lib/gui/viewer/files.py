@@ -4,6 +4,7 @@ from PyQt6.QtWidgets import QFileDialog, QMessageBox, QTableWidgetItem, QDialog,
 from astropy.io import fits
 from lib.gui.common.header_window import HeaderViewer
 from lib.fits.header import get_fits_header_as_json
+from lib.fits.compression import image_hdu_index
 
 
 class FileOperationsMixin:
@@ -160,8 +161,8 @@ class FileOperationsMixin:
         try:
             from astropy.wcs import WCS
             with fits.open(fits_path) as hdul:
-                image_data = hdul[0].data
-                header = hdul[0].header
+                image_data = hdul[image_hdu_index(hdul)].data
+                header = hdul[image_hdu_index(hdul)].header
                 try:
                     wcs = WCS(header)
                 except Exception:
@@ -245,8 +246,8 @@ class FileOperationsMixin:
             else:
                 from astropy.wcs import WCS
                 with fits.open(fits_path) as hdul:
-                    image_data = hdul[0].data
-                    header = hdul[0].header
+                    image_data = hdul[image_hdu_index(hdul)].data
+                    header = hdul[image_hdu_index(hdul)].header
                     try:
                         wcs = WCS(header)
                     except Exception:
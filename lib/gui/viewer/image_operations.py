@@ -409,7 +409,7 @@ class ImageOperationsMixin:
             # Create temporary directory for aligned files
             import tempfile
             import os
-            from astropy.io import fits
+            from lib.fits.compression import write_image
             
             # Create the base aligned directory
             base_aligned_dir = "/tmp/astropipes/aligned"
@@ -452,8 +452,7 @@ class ImageOperationsMixin:
                     aligned_path = os.path.join(temp_dir, aligned_filename)
                     
                     # Create FITS file with aligned data and updated header
-                    hdu = fits.PrimaryHDU(aligned_datas[i], new_header)
-                    hdu.writeto(aligned_path, overwrite=True)
+                    write_image(aligned_path, aligned_datas[i], new_header)
                     
                     new_file_paths.append(aligned_path)
                     
@@ -530,69 +529,44 @@ class ImageOperationsMixin:
     def platesolve_all_images(self):
         """Platesolve all loaded images using astrometry.net."""
         from lib.gui.common.console_window import ConsoleOutputWindow
-        from lib.gui.library.platesolving_thread import PlatesolvingThread
+        from lib.gui.library.platesolving_thread import BatchPlatesolvingThread
         
-        # Minimal wrapper for .path attribute
-        class FilePathObj:
-            def __init__(self, path):
-                self.path = path
-        
-        files = [FilePathObj(p) for p in self.loaded_files]
-        if not files:
+        if not self.loaded_files:
             QMessageBox.warning(self, "No files", "No FITS files loaded to platesolve.")
             return
         
         console_window = ConsoleOutputWindow("Platesolving All Files", self)
         console_window.show_and_raise()
-        queue = list(files)
-        results = []
-        cancelled = {"flag": False}
         
         if not hasattr(self, '_platesolving_threads'):
             self._platesolving_threads = []
         
-        def next_in_queue():
-            if cancelled["flag"]:
-                console_window.append_text("\nPlatesolving cancelled by user.\n")
-                return
-            if not queue:
-                console_window.append_text("\nAll files platesolved.\n")
-                # Reload all loaded files after platesolving
-                current_index = self.current_file_index
-                loaded_files_copy = list(self.loaded_files)
-                self._preloaded_fits.clear()
-                for path in loaded_files_copy:
-                    self._preload_fits_file(path)
-                # Try to restore the current file index
-                if loaded_files_copy:
-                    self.current_file_index = min(current_index, len(loaded_files_copy) - 1)
-                    self.load_fits(loaded_files_copy[self.current_file_index], restore_view=True)
-                self.update_navigation_buttons()
-                self.update_image_count_label()
-                self.update_align_button_visibility()
-                self.update_platesolve_button_visibility()
-                return
-            
-            fits_file = queue.pop(0)
-            fits_path = fits_file.path
-            console_window.append_text(f"\nPlatesolving: {fits_path}\n")
-            thread = PlatesolvingThread(fits_path)
-            self._platesolving_threads.append(thread)
-            thread.output.connect(console_window.append_text)
-            
-            def on_finished(result):
-                results.append(result)
-                msg = self._format_platesolving_result(result)
-                console_window.append_text(f"\n{msg}\n")
-                if thread in self._platesolving_threads:
-                    self._platesolving_threads.remove(thread)
-                next_in_queue()
-            
-            thread.finished.connect(on_finished)
-            thread.start()
-        
-        console_window.cancel_requested.connect(lambda: cancelled.update({"flag": True}))
-        next_in_queue()
+        thread = BatchPlatesolvingThread(self.loaded_files)
+        self._platesolving_threads.append(thread)
+        thread.output.connect(console_window.append_text)
+        
+        def on_finished(results):
+            if thread in self._platesolving_threads:
+                self._platesolving_threads.remove(thread)
+            console_window.append_text("\nAll files platesolved.\n")
+            # Reload all loaded files after platesolving
+            current_index = self.current_file_index
+            loaded_files_copy = list(self.loaded_files)
+            self._preloaded_fits.clear()
+            for path in loaded_files_copy:
+                self._preload_fits_file(path)
+            # Try to restore the current file index
+            if loaded_files_copy:
+                self.current_file_index = min(current_index, len(loaded_files_copy) - 1)
+                self.load_fits(loaded_files_copy[self.current_file_index], restore_view=True)
+            self.update_navigation_buttons()
+            self.update_image_count_label()
+            self.update_align_button_visibility()
+            self.update_platesolve_button_visibility()
+        
+        thread.finished.connect(on_finished)
+        console_window.cancel_requested.connect(thread.stop)
+        thread.start()
 
     def calibrate_all_images(self):
         """Calibrate all loaded images using bias, dark, and flat frames."""
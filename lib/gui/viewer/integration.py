@@ -6,6 +6,7 @@ from PyQt6.QtCore import QThread, QObject, pyqtSignal
 from PyQt6.QtWidgets import QMessageBox, QDialog
 from lib.gui.viewer.orbital_elements import OrbitComputationDialog, OrbitComputationWorker, OrbitDataWindow
 from lib.gui.common.console_window import ConsoleOutputWindow
+from lib.fits.compression import image_hdu_index
 from config import MOTION_TRACKING_SIGMA_CLIP, MOTION_TRACKING_METHOD, MOTION_TRACKING_CREATE_BOTH_STACKS
 
 
@@ -156,7 +157,7 @@ class IntegrationMixin:
                 try:
                     from astropy.io import fits
                     with fits.open(current_file_path) as hdul:
-                        header = hdul[0].header
+                        header = hdul[image_hdu_index(hdul)].header
                         target_name = header.get('OBJECT', '').strip()
                 except Exception:
                     pass
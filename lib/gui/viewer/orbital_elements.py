@@ -15,6 +15,7 @@ import re
 from datetime import datetime, timedelta
 import json
 from scipy.optimize import least_squares
+from lib.fits.compression import image_hdu_index, update_image_header
 
 class OrbitDataWindow(QMainWindow):
     row_selected = pyqtSignal(int, object)  # row index, ephemeris tuple
@@ -384,7 +385,7 @@ class OrbitDataWindow(QMainWindow):
             try:
                 from astropy.io import fits
                 with fits.open(file_path) as hdul:
-                    header = hdul[0].header
+                    header = hdul[image_hdu_index(hdul)].header
                     
                     # Check if this is a stacked image by looking for COMBINED header
                     combined = header.get('COMBINED', False)
@@ -457,7 +458,7 @@ class OrbitDataWindow(QMainWindow):
             try:
                 from astropy.io import fits
                 with fits.open(file_path) as hdul:
-                    header = hdul[0].header
+                    header = hdul[image_hdu_index(hdul)].header
                     date_obs = header.get('DATE-OBS')
             except Exception:
                 pass
@@ -889,7 +890,7 @@ class OrbitDataWindow(QMainWindow):
                 try:
                     from astropy.io import fits
                     with fits.open(file_path) as hdul:
-                        header = hdul[0].header
+                        header = hdul[image_hdu_index(hdul)].header
                         # Check for motion tracking flag or other stacking indicators
                         if header.get('MOTION_TRACKED', False) or 'STACK' in file_path.upper():
                             is_stacked = True
@@ -1068,7 +1069,7 @@ class OrbitDataWindow(QMainWindow):
                     try:
                         from astropy.io import fits
                         with fits.open(file_path) as hdul:
-                            header = hdul[0].header
+                            header = hdul[image_hdu_index(hdul)].header
                             if header.get('MOTION_TRACKED', False) or 'STACK' in file_path.upper():
                                 is_stacked = True
                     except Exception:
@@ -1449,7 +1450,7 @@ class OrbitDataWindow(QMainWindow):
         for file_path in loaded_files:
             try:
                 with fits.open(file_path) as hdul:
-                    header = hdul[0].header
+                    header = hdul[image_hdu_index(hdul)].header
                     meas_json = header.get('MEAS_POS')
                     if not meas_json:
                         continue
@@ -1503,7 +1504,7 @@ class OrbitDataWindow(QMainWindow):
                 orig_path = pos['file_path']
                 try:
                     with fits.open(orig_path) as hdul_o:
-                        date_obs_orig = hdul_o[0].header.get('DATE-OBS')
+                        date_obs_orig = hdul_o[image_hdu_index(hdul_o)].header.get('DATE-OBS')
                     if not date_obs_orig:
                         continue
                     t = Time(date_obs_orig, format='isot', scale='utc')
@@ -1897,9 +1898,8 @@ class SubstacksGenerationWorker(QObject):
             from astropy.io import fits
             import json
             x, y = self._parse_coordinates(object_position)
-            with fits.open(fits_path, mode='update') as hdul:
-                hdul[0].header['MEAS_POS'] = json.dumps([float(x), float(y)])
-                hdul.flush()
+            with update_image_header(fits_path) as header:
+                header['MEAS_POS'] = json.dumps([float(x), float(y)])
         except Exception as exc:
             print(f"Warning: could not write MEAS_POS to {fits_path}: {exc}")
 
@@ -2041,7 +2041,7 @@ class OrbitComputationWorker(QObject):
                 try:
                     from astropy.io import fits
                     with fits.open(fits_path) as hdul:
-                        header = hdul[0].header
+                        header = hdul[image_hdu_index(hdul)].header
                         date_obs = header.get('DATE-OBS')
                         exp_sec = header.get('EXPTIME') or header.get('EXPOSURE') or header.get('EXP TIME') or 0.0
                         print(f"[DEBUG] DATE-OBS from header: {date_obs}, EXPTIME: {exp_sec}")
@@ -2,32 +2,45 @@ import sys
 import os
 import logging
 import threading
-import queue
 from PyQt6.QtCore import QThread, pyqtSignal, QTimer
 from PyQt6.QtWidgets import QDialog, QMessageBox
-from lib.sci.sources import detect_sources_in_image
+from lib.sci.sources import (detect_sources_in_image, detect_sources_tiled, default_detection_parameters,
+                             use_tiled_detection)
 from lib.gui.common.sources_window import SourcesResultWindow
 from lib.gui.common.console_window import ConsoleOutputWindow
+from lib.fits.compression import image_hdu_index
 from lib.gui.common.source_detection_dialog import SourceDetectionDialog
 from lib.gui.common.gaia_detection_results_window import GaiaDetectionResultWindow
 from lib.gui.viewer.catalogs import GaiaSearchDialog
 
 
 class SourceDetectionThread(QThread):
-    """Thread for running source detection with console output."""
+    """Thread for running source detection with console output.
+    
+    Cancellation is cooperative: stop() sets an event that the detection code
+    checks between steps (and between tiles for tiled detection). The timeout
+    sets the same event, so a timed-out detection stops instead of being left
+    running in the background.
+    """
     
     # Signals
     detection_complete = pyqtSignal(object)  # SourceDetectionResult
     output_received = pyqtSignal(str)  # Console output
     error_occurred = pyqtSignal(str)  # Error message
     
-    def __init__(self, image_data, wcs=None, timeout=300, **kwargs):  # 5 minute timeout
+    def __init__(self, image_data, wcs=None, timeout=300, tiled=None, **kwargs):  # 5 minute timeout
         super().__init__()
         self.image_data = image_data
         self.wcs = wcs
         self.kwargs = kwargs
         self.timeout = timeout
+        # Use tiled detection only where it is faster (large deblended frames), unless told otherwise
+        if tiled is None:
+            tiled = use_tiled_detection(image_data.shape, kwargs.get('deblend', True))
+        self.tiled = tiled
+        self._cancel_event = threading.Event()
         self._stop_requested = False
+        self._timed_out = False
         
     def run(self):
         """Run source detection in a separate thread."""
@@ -74,45 +87,32 @@ class SourceDetectionThread(QThread):
             signal_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
             logging.getLogger().addHandler(signal_handler)
             
+            # The timeout requests a cooperative stop, like the Cancel button
+            timeout_timer = threading.Timer(self.timeout, self._on_timeout)
+            timeout_timer.daemon = True
+            timeout_timer.start()
+            
             try:
-                # Run source detection with timeout using threading.Timer
-                import threading
-                import queue
-                
-                # Create a queue to communicate between threads
-                result_queue = queue.Queue()
-                error_queue = queue.Queue()
-                
-                def run_detection():
-                    try:
-                        # Debug: log the parameters being used
-                        print(f"DEBUG: Using parameters: {self.kwargs}")
-                        result = detect_sources_in_image(self.image_data, wcs=self.wcs, **self.kwargs)
-                        result_queue.put(result)
-                    except Exception as e:
-                        error_queue.put(e)
-                
-                # Start detection in a separate thread
-                detection_thread = threading.Thread(target=run_detection)
-                detection_thread.daemon = True
-                detection_thread.start()
+                print(f"DEBUG: Using parameters: {self.kwargs}")
+                if self.tiled:
+                    print("Using tiled parallel detection for large image")
+                    result = detect_sources_tiled(self.image_data, wcs=self.wcs,
+                                                  cancel_event=self._cancel_event, **self.kwargs)
+                else:
+                    result = detect_sources_in_image(self.image_data, wcs=self.wcs,
+                                                     cancel_event=self._cancel_event, **self.kwargs)
                 
-                # Wait for result with timeout
-                try:
-                    result = result_queue.get(timeout=self.timeout)
-                    self.detection_complete.emit(result)
-                except queue.Empty:
-                    # Timeout occurred
+                if self._timed_out:
                     self.error_occurred.emit(f"Source detection timed out after {self.timeout} seconds")
-                except Exception as e:
-                    # Check if there was an error in the detection thread
-                    try:
-                        error = error_queue.get_nowait()
-                        self.error_occurred.emit(str(error))
-                    except queue.Empty:
-                        self.error_occurred.emit(str(e))
+                elif self._stop_requested:
+                    self.error_occurred.emit("Source detection cancelled")
+                else:
+                    self.detection_complete.emit(result)
                 
+            except Exception as e:
+                self.error_occurred.emit(str(e))
             finally:
+                timeout_timer.cancel()
                 # Restore original streams
                 sys.stdout = old_stdout
                 sys.stderr = old_stderr
@@ -121,9 +121,15 @@ class SourceDetectionThread(QThread):
         except Exception as e:
             self.error_occurred.emit(str(e))
     
+    def _on_timeout(self):
+        """Stop the detection when the timeout expires."""
+        self._timed_out = True
+        self._cancel_event.set()
+    
     def stop(self):
         """Request thread to stop."""
         self._stop_requested = True
+        self._cancel_event.set()
 
 
 class SourceDetectionMixin:
@@ -142,49 +148,8 @@ class SourceDetectionMixin:
         img_height, img_width = self.image_data.shape
         max_dim = max(img_height, img_width)
         
-        # Determine default parameters based on image size
-        if max_dim > 3000:
-            # For very large images, use very conservative parameters
-            bg_box_size = 200
-            bg_filter_size = 7
-            threshold_sigma = 3.0
-            npixels = 10
-            min_area = 20
-            min_snr = 5.0
-            deblend = False
-        elif max_dim > 1000:
-            # For large images, use conservative parameters
-            bg_box_size = min(100, max_dim // 20)
-            bg_filter_size = 5
-            threshold_sigma = 2.5
-            npixels = 8
-            min_area = 15
-            min_snr = 4.0
-            deblend = False
-        else:
-            # For smaller images, use moderately conservative parameters
-            bg_box_size = 25
-            bg_filter_size = 3
-            threshold_sigma = 2.0
-            npixels = 5
-            min_area = 8
-            min_snr = 3.0
-            deblend = True
-        
         # Create default parameters for dialog
-        default_params = {
-            'threshold_sigma': threshold_sigma,
-            'npixels': npixels,
-            'min_area': min_area,
-            'min_snr': min_snr,
-            'max_area': 1000,
-            'min_eccentricity': 0.0,
-            'max_eccentricity': 0.9,
-            'deblend': deblend,
-            'connectivity': 8,
-            'background_box_size': bg_box_size,
-            'background_filter_size': bg_filter_size
-        }
+        default_params = default_detection_parameters(self.image_data.shape)
         
         # Show parameter dialog
         dialog = SourceDetectionDialog(self, default_params)
@@ -222,8 +187,6 @@ class SourceDetectionMixin:
         # Start detection
         self.console_window.append_text("Starting source detection...\n")
         self.console_window.append_text(f"Image data shape: {self.image_data.shape}\n")
-        self.console_window.append_text(f"Image data min/max: {self.image_data.min():.2f} / {self.image_data.max():.2f}\n")
-        self.console_window.append_text(f"Image data mean/std: {self.image_data.mean():.2f} / {self.image_data.std():.2f}\n")
         
         if wcs is not None:
             self.console_window.append_text(f"WCS available: {wcs}\n")
@@ -233,6 +196,7 @@ class SourceDetectionMixin:
         self.console_window.append_text(f"Using user-selected parameters:\n")
         self.console_window.append_text(f"  Background box size: {params['background_box_size']}\n")
         self.console_window.append_text(f"  Background filter size: {params['background_filter_size']}\n")
+        self.console_window.append_text(f"  Background mode: {params['background_mode']}\n")
         self.console_window.append_text(f"  Threshold sigma: {params['threshold_sigma']} (higher = fewer sources)\n")
         self.console_window.append_text(f"  Min pixels: {params['npixels']} (more = fewer sources)\n")
         self.console_window.append_text(f"  Min area: {params['min_area']} (larger = fewer sources)\n")
@@ -262,10 +226,9 @@ class SourceDetectionMixin:
     def cancel_source_detection(self):
         """Cancel the source detection process."""
         if hasattr(self, 'detection_thread') and self.detection_thread.isRunning():
+            # Cooperative cancel: the thread stops at the next step or tile boundary
             self.detection_thread.stop()
-            self.detection_thread.quit()
-            self.detection_thread.wait()
-            self.console_window.append_text("\nSource detection cancelled by user.\n")
+            self.console_window.append_text("\nCancelling source detection...\n")
         
         # Stop progress timer
         if hasattr(self, 'progress_timer'):
@@ -472,7 +435,7 @@ class SourceDetectionMixin:
             from lib.db.models import FitsFile
             
             db_manager = get_db_manager()
-            session = db_manager.get_session()
+            session = db_manager.get_read_session()
             
             try:
                 fits_file = session.query(FitsFile).filter(FitsFile.path == file_path).first()
@@ -514,7 +477,7 @@ class SourceDetectionMixin:
             from astropy.io import fits
             
             with fits.open(file_path) as hdul:
-                header = hdul[0].header
+                header = hdul[image_hdu_index(hdul)].header
                 
                 # Check for common header keywords that might contain original file path
                 for keyword in ['ORIGFILE', 'ORIGPATH', 'ORIGINAL', 'SOURCE', 'PARENT']:
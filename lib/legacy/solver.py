@@ -337,97 +337,26 @@ def get_job_results(jobid, original_filename):
 
 
 def solve_online(options, key):
-    """Wrapper function for the whole online solving process."""
+    """Wrapper function for the whole online solving process.
 
-    session_data = open_session(key)
-    if session_data is None:
-        print(f"{Style.BRIGHT}Failed to open session with Astrometry.net{Style.RESET_ALL}")
-        return
-        
-    session = session_data["session"]
-    i = 1
-    for filename in options.files:
-        count = str(i) + "/" + str(len(options.files))
-        print(f"\n{Style.BRIGHT}Processing {count}: {filename}{Style.RESET_ALL}")
-        
-        # Validate image before attempting to solve
-        if config.SOLVER_VALIDATE_IMAGES:
+    All files are submitted at once and polled together by the asynchronous
+    client in lib.sci.online_solver.
+    """
+    from lib.sci.online_solver import solve_online_batch, constraints_from_options
+
+    files = list(options.files)
+    if config.SOLVER_VALIDATE_IMAGES:
+        valid_files = []
+        for filename in files:
             is_valid, reason = validate_image_for_solving(filename)
-            if not is_valid:
+            if is_valid:
+                valid_files.append(filename)
+            else:
                 print(f"{Style.BRIGHT}Skipping {filename}: {reason}{Style.RESET_ALL}")
-                i += 1
-                continue
-        
-        # Submit file
-        try:
-            subid = submit_file(filename, session, options)["subid"]
-        except Exception as e:
-            print(f"{Style.BRIGHT}Error submitting {filename}: {e}{Style.RESET_ALL}")
-            i += 1
-            continue
-        
-        # Wait for job to start with timeout
-        start_time = time.time()
-        sub_status = get_submission_status(subid)
-        while (sub_status is None or 
-               sub_status.get("jobs") == [] or 
-               sub_status.get("jobs") == [None]):
-            
-            if time.time() - start_time > config.SOLVER_ONLINE_TIMEOUT:
-                print(f"{Style.BRIGHT}Timeout waiting for job {count} to start{Style.RESET_ALL}")
-                break
-                
-            print(
-                time.strftime("%x %X")
-                + " | Waiting for job "
-                + count
-                + " to start..."
-            )
-            time.sleep(config.SOLVER_ONLINE_POLL_INTERVAL)
-            sub_status = get_submission_status(subid)
-            
-        if sub_status is None or sub_status.get("jobs") == [] or sub_status.get("jobs") == [None]:
-            print(f"{Style.BRIGHT}Failed to start job for {filename}{Style.RESET_ALL}")
-            i += 1
-            continue
-            
-        print(time.strftime("%x %X") + " | Job " + count + " has started.")
-        jobid = sub_status["jobs"][0]
-        
-        # Monitor job status with timeout
-        start_time = time.time()
-        job_status = get_job_status(jobid)
-        while job_status is not None and job_status.get("status") == "solving":
-            
-            if time.time() - start_time > config.SOLVER_ONLINE_TIMEOUT:
-                print(f"{Style.BRIGHT}Timeout solving {filename}{Style.RESET_ALL}")
-                break
-                
-            print(
-                time.strftime("%x %X")
-                + " | Status: "
-                + job_status.get("status", "unknown")
-                + " image "
-                + count
-            )
-            time.sleep(config.SOLVER_ONLINE_POLL_INTERVAL)
-            job_status = get_job_status(jobid)
-            
-        if job_status is None:
-            print(f"{Style.BRIGHT}Error checking job status for {filename}{Style.RESET_ALL}")
-            i += 1
-            continue
-            
-        if job_status.get("status") == "success":
-            try:
-                get_job_results(jobid, filename)
-                print(f"{Style.BRIGHT}Successfully solved {filename}{Style.RESET_ALL}")
-            except Exception as e:
-                print(f"{Style.BRIGHT}Error applying solution to {filename}: {e}{Style.RESET_ALL}")
-        else:
-            print(f"\n{Style.BRIGHT}Failed to solve {filename} - Status: {job_status.get('status', 'unknown')}{Style.RESET_ALL}")
-            
-        i += 1
+        files = valid_files
+
+    if files:
+        solve_online_batch(files, api_key=key, constraints=constraints_from_options(options))
 
 
 def solver_cleanup():
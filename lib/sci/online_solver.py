@@ -0,0 +1,398 @@
+"""
+Asynchronous client for the online astrometry.net (nova) solver.
+
+All frames are uploaded up front (a few at a time), then a single polling loop
+checks the status of every pending submission and job on each round, over one
+pooled HTTP session. The polling interval stays short while frames are still
+being uploaded, then backs off while nothing changes. As soon as a job succeeds, downloading its WCS file and
+applying it to the frame runs as a separate task, while the other jobs are
+still being polled.
+
+The HTTP calls go through requests (already a dependency) in worker threads,
+so the client needs no extra async HTTP library. api_url can point to a local
+mock of the nova API for testing.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from colorama import Style, Fore
+
+import config
+from lib.sci.platesolving import PlatesolvingResult, _rescan_if_in_database
+from lib.fits.wcs import (
+    validate_fits_file,
+    get_platesolving_constraints,
+    extract_wcs_from_file,
+    apply_wcs_to_fits,
+)
+
+
+class NovaAPIError(Exception):
+    """Exception raised when the astrometry.net API returns an error."""
+    pass
+
+
+class NovaClient:
+    """Thin asyncio wrapper around the astrometry.net JSON API, sharing one HTTP session."""
+
+    def __init__(self, api_key: str, api_url: Optional[str] = None, max_connections: int = 8):
+        """
+        Initialize the client.
+
+        Parameters:
+        -----------
+        api_key : str
+            astrometry.net API key
+        api_url : str, optional
+            Base URL of the service (default config.ASTROMETRY_API_URL)
+        max_connections : int
+            Maximum number of simultaneous HTTP requests (and pooled connections)
+        """
+        self.api_key = api_key
+        self.api_url = (api_url or getattr(config, 'ASTROMETRY_API_URL', 'http://nova.astrometry.net')).rstrip('/')
+        self.session_key: Optional[str] = None
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self._http.mount('http://', adapter)
+        self._http.mount('https://', adapter)
+        self._slots = asyncio.Semaphore(max_connections)
+
+    def close(self):
+        self._http.close()
+
+    async def _post(self, path: str, timeout: float = 30, **kwargs) -> requests.Response:
+        async with self._slots:
+            return await asyncio.to_thread(self._http.post, f"{self.api_url}{path}", timeout=timeout, **kwargs)
+
+    async def _post_json(self, path: str, timeout: float = 30, **kwargs) -> Dict:
+        response = await self._post(path, timeout, **kwargs)
+        response.raise_for_status()
+        result = response.json()
+        if result.get('status') == 'error':
+            raise NovaAPIError(result.get('errormessage', 'unknown error'))
+        return result
+
+    async def login(self) -> str:
+        """Open an API session and return its key."""
+        result = await self._post_json('/api/login', data={'request-json': json.dumps({'apikey': self.api_key})})
+        self.session_key = result['session']
+        return self.session_key
+
+    async def upload(self, fits_file_path: str, options: Dict[str, Union[str, float]]) -> int:
+        """Upload a frame with the given solving options; returns the submission id."""
+        request_json = {
+            'session': self.session_key,
+            'publicly_visible': 'n',
+            'allow_modifications': 'n',
+            'allow_commercial_use': 'n',
+        }
+        request_json.update(options)
+        # Read in a worker thread, so large frames do not block the polling loop
+        content = await asyncio.to_thread(Path(fits_file_path).read_bytes)
+        files = [
+            ('request-json', (None, json.dumps(request_json), 'text/plain')),
+            ('file', (os.path.basename(fits_file_path), content, 'application/octet-stream')),
+        ]
+        result = await self._post_json('/api/upload', timeout=300, files=files)
+        return result['subid']
+
+    async def submission_status(self, subid: int) -> Dict:
+        return await self._post_json(f'/api/submissions/{subid}')
+
+    async def job_status(self, jobid: int) -> Dict:
+        return await self._post_json(f'/api/jobs/{jobid}')
+
+    async def job_info(self, jobid: int) -> Dict:
+        return await self._post_json(f'/api/jobs/{jobid}/info')
+
+    async def download_wcs(self, jobid: int, destination: str) -> str:
+        """Download the WCS file of a solved job."""
+        async with self._slots:
+            response = await asyncio.to_thread(self._http.get, f"{self.api_url}/wcs_file/{jobid}", timeout=60)
+        response.raise_for_status()
+        await asyncio.to_thread(Path(destination).write_bytes, response.content)
+        return destination
+
+
+class OnlineSolveJob:
+    """State of one frame going through the online solver."""
+
+    VALIDATING = 'validating'
+    UPLOADING = 'uploading'
+    QUEUED = 'queued'        # Uploaded, waiting for the server to start a job
+    SOLVING = 'solving'
+    APPLYING = 'applying'    # Solved, WCS being downloaded and applied
+    SOLVED = 'solved'
+    FAILED = 'failed'
+    TIMEOUT = 'timeout'
+
+    FINAL_STATES = (SOLVED, FAILED, TIMEOUT)
+
+    def __init__(self, fits_file_path: str):
+        self.fits_file_path = fits_file_path
+        self.status = OnlineSolveJob.VALIDATING
+        self.message = ''
+        self.subid: Optional[int] = None
+        self.jobid: Optional[int] = None
+        self.submitted: Optional[float] = None
+        self.result: Optional[PlatesolvingResult] = None
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.fits_file_path)
+
+    def __str__(self):
+        text = f"{self.name}: {self.status}"
+        if self.jobid is not None:
+            text += f" (job {self.jobid})"
+        if self.message:
+            text += f" - {self.message}"
+        return text
+
+
+def _nova_options(constraints: Dict[str, Union[float, bool]]) -> Dict[str, Union[str, float]]:
+    """Translate platesolving constraints into astrometry.net upload options."""
+    options = {}
+    if not constraints.get('blind', True):
+        if constraints.get('ra') is not None and constraints.get('dec') is not None:
+            options['center_ra'] = float(constraints['ra'])
+            options['center_dec'] = float(constraints['dec'])
+            if constraints.get('radius') is not None:
+                options['radius'] = float(constraints['radius'])
+    if constraints.get('scale_est') is not None:
+        options['scale_units'] = constraints.get('scale_units', 'arcsecperpix')
+        options['scale_type'] = 'ev'
+        options['scale_est'] = float(constraints['scale_est'])
+        if constraints.get('scale_err') is not None:
+            options['scale_err'] = float(constraints['scale_err'])
+    return options
+
+
+def constraints_from_options(options) -> Dict[str, Union[float, bool, str]]:
+    """
+    Build solving constraints from the command line options of platesolve.py
+    (ra, dec, radius, blind, scaleEst in arcminutes of field width, scaleErr in percent).
+    """
+    constraints = {'blind': bool(getattr(options, 'blind', False))}
+    if not constraints['blind'] and getattr(options, 'ra', None) is not None \
+            and getattr(options, 'dec', None) is not None:
+        constraints['ra'] = float(options.ra)
+        constraints['dec'] = float(options.dec)
+        if getattr(options, 'radius', None):
+            constraints['radius'] = float(options.radius)
+    else:
+        constraints['blind'] = True
+    if getattr(options, 'scaleEst', None):
+        constraints['scale_units'] = 'arcminwidth'
+        constraints['scale_est'] = float(options.scaleEst)
+        if getattr(options, 'scaleErr', None):
+            constraints['scale_err'] = float(options.scaleErr)
+    return constraints
+
+
+async def solve_online_async(fits_files: List[str],
+                             api_key: Optional[str] = None,
+                             api_url: Optional[str] = None,
+                             constraints: Optional[Dict[str, Union[float, bool]]] = None,
+                             apply_solution: bool = True,
+                             max_uploads: int = 4,
+                             max_connections: int = 8,
+                             timeout: Optional[float] = None,
+                             min_poll_interval: float = 2.0,
+                             max_poll_interval: Optional[float] = None,
+                             status_callback: Optional[Callable[[OnlineSolveJob], None]] = None) -> List[OnlineSolveJob]:
+    """
+    Solve several frames with the online astrometry.net service concurrently.
+
+    Parameters:
+    -----------
+    fits_files : List[str]
+        Frames to solve
+    api_key : str, optional
+        API key (default config.ASTROMETRY_KEY)
+    api_url : str, optional
+        Base URL of the service (default config.ASTROMETRY_API_URL)
+    constraints : Dict[str, Union[float, bool]], optional
+        Constraints used for all frames instead of the ones read from each header
+    apply_solution : bool
+        Write the solutions into the frames (the solved WCS files are discarded otherwise)
+    max_uploads : int
+        Number of simultaneous uploads
+    max_connections : int
+        Number of simultaneous HTTP requests
+    timeout : float, optional
+        Time limit per frame after upload, in seconds (default config.SOLVER_ONLINE_TIMEOUT)
+    min_poll_interval, max_poll_interval : float
+        Bounds of the adaptive polling interval; once every frame is uploaded,
+        the interval doubles after a round where no job changed state and drops
+        back when one did
+        (default maximum config.SOLVER_ONLINE_POLL_INTERVAL * 6)
+    status_callback : callable, optional
+        Called with the OnlineSolveJob on every status change
+
+    Returns:
+    --------
+    List[OnlineSolveJob]
+        One job per input frame, in input order
+    """
+    timeout = timeout if timeout is not None else config.SOLVER_ONLINE_TIMEOUT
+    if max_poll_interval is None:
+        max_poll_interval = max(min_poll_interval, config.SOLVER_ONLINE_POLL_INTERVAL * 6)
+
+    jobs = [OnlineSolveJob(path) for path in fits_files]
+    client = NovaClient(api_key or config.ASTROMETRY_KEY, api_url, max_connections)
+    upload_slots = asyncio.Semaphore(max_uploads)
+    apply_tasks = []
+    temp_dir = tempfile.mkdtemp(prefix='astropipes-nova-')
+
+    def set_status(job, status, message=''):
+        job.status = status
+        job.message = message
+        if job.status in OnlineSolveJob.FINAL_STATES and job.result is None:
+            job.result = PlatesolvingResult(success=False, message=message, timed_out=(status == OnlineSolveJob.TIMEOUT))
+        if status_callback:
+            status_callback(job)
+
+    async def submit(job):
+        if constraints is not None:
+            job_constraints = constraints
+        else:
+            validation = await asyncio.to_thread(validate_fits_file, job.fits_file_path)
+            if not validation.is_valid:
+                set_status(job, OnlineSolveJob.FAILED, f"Image validation failed: {validation.reason}")
+                return
+            job_constraints = get_platesolving_constraints(validation)
+        async with upload_slots:
+            set_status(job, OnlineSolveJob.UPLOADING)
+            try:
+                job.subid = await client.upload(job.fits_file_path, _nova_options(job_constraints))
+            except Exception as e:
+                set_status(job, OnlineSolveJob.FAILED, f"Upload failed: {e}")
+                return
+        job.submitted = time.time()
+        set_status(job, OnlineSolveJob.QUEUED, f"submission {job.subid}")
+
+    async def finish(job):
+        """Download and apply the WCS of a solved job."""
+        try:
+            info = await client.job_info(job.jobid)
+            calibration = info.get('calibration') or {}
+            if apply_solution:
+                wcs_path = os.path.join(temp_dir, f"{job.jobid}.wcs")
+                await client.download_wcs(job.jobid, wcs_path)
+                wcs_data = await asyncio.to_thread(extract_wcs_from_file, wcs_path)
+                await asyncio.to_thread(apply_wcs_to_fits, job.fits_file_path, wcs_data)
+                os.remove(wcs_path)
+                await asyncio.to_thread(_rescan_if_in_database, job.fits_file_path)
+            job.result = PlatesolvingResult(
+                success=True,
+                message="Image successfully solved",
+                ra_center=calibration.get('ra'),
+                dec_center=calibration.get('dec'),
+                pixel_scale=calibration.get('pixscale'),
+                orientation=calibration.get('orientation'),
+                radius=calibration.get('radius'),
+                method='astrometry.net'
+            )
+            set_status(job, OnlineSolveJob.SOLVED)
+        except Exception as e:
+            set_status(job, OnlineSolveJob.FAILED, f"Error applying solution: {e}")
+
+    async def poll(job):
+        """Check one pending job; returns True if its state changed."""
+        try:
+            if job.jobid is None:
+                status = await client.submission_status(job.subid)
+                started = [jobid for jobid in status.get('jobs', []) if jobid is not None]
+                if not started:
+                    return False
+                job.jobid = started[0]
+                set_status(job, OnlineSolveJob.SOLVING)
+                return True
+            status = (await client.job_status(job.jobid)).get('status')
+        except Exception:
+            # Transient network errors: try again on the next round
+            return False
+        if status == 'success':
+            set_status(job, OnlineSolveJob.APPLYING)
+            apply_tasks.append(asyncio.create_task(finish(job)))
+            return True
+        if status == 'failure':
+            set_status(job, OnlineSolveJob.FAILED, "astrometry.net could not solve the image")
+            return True
+        return False
+
+    try:
+        await client.login()
+        submissions = asyncio.gather(*(submit(job) for job in jobs))
+
+        # Poll every pending job each round while the uploads are still going
+        interval = min_poll_interval
+        while True:
+            uploads_done = submissions.done()
+            pending = [job for job in jobs if job.status in (OnlineSolveJob.QUEUED, OnlineSolveJob.SOLVING)]
+            if uploads_done and not pending:
+                break
+            now = time.time()
+            for job in pending:
+                if now - job.submitted > timeout:
+                    set_status(job, OnlineSolveJob.TIMEOUT, f"No solution after {timeout:.0f}s")
+            pending = [job for job in pending if job.status not in OnlineSolveJob.FINAL_STATES]
+            changed = any(await asyncio.gather(*(poll(job) for job in pending)))
+            # Back off only once every frame is uploaded: jobs submitted late are polled quickly too
+            if changed or not uploads_done:
+                interval = min_poll_interval
+            else:
+                interval = min(interval * 2, max_poll_interval)
+            still_pending = any(job.status in (OnlineSolveJob.QUEUED, OnlineSolveJob.SOLVING) for job in jobs)
+            if still_pending or not submissions.done():
+                await asyncio.sleep(interval)
+
+        await submissions
+        if apply_tasks:
+            await asyncio.gather(*apply_tasks)
+    except Exception as e:
+        for job in jobs:
+            if job.status not in OnlineSolveJob.FINAL_STATES:
+                set_status(job, OnlineSolveJob.FAILED, f"Online solving error: {e}")
+    finally:
+        client.close()
+        try:
+            os.rmdir(temp_dir)
+        except OSError:
+            pass
+
+    return jobs
+
+
+def solve_online_batch(fits_files: List[str], verbose: bool = True, **kwargs) -> List[OnlineSolveJob]:
+    """
+    Blocking wrapper around solve_online_async, printing job status changes.
+
+    Keyword arguments are passed on to solve_online_async.
+    """
+    if verbose and 'status_callback' not in kwargs:
+        def report(job):
+            if job.status == OnlineSolveJob.SOLVED:
+                print(f"{Style.BRIGHT + Fore.GREEN}{time.strftime('%x %X')} | {job}{Style.RESET_ALL}")
+            elif job.status in OnlineSolveJob.FINAL_STATES:
+                print(f"{Style.BRIGHT + Fore.RED}{time.strftime('%x %X')} | {job}{Style.RESET_ALL}")
+            else:
+                print(f"{time.strftime('%x %X')} | {job}")
+        kwargs['status_callback'] = report
+
+    start = time.time()
+    jobs = asyncio.run(solve_online_async(fits_files, **kwargs))
+
+    if verbose:
+        solved = sum(1 for job in jobs if job.status == OnlineSolveJob.SOLVED)
+        print(f"\n{Style.BRIGHT}Solved {solved}/{len(jobs)} frames online in {time.time() - start:.1f}s{Style.RESET_ALL}")
+    return jobs
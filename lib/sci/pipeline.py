@@ -0,0 +1,282 @@
+"""
+Staged processing pipeline with bounded queues.
+
+A pipeline is a chain of stages (autopipe: ingest -> calibrate -> solve ->
+analyze -> database). Each stage has its own worker threads and a bounded
+input queue, so different frames are in different stages at the same time:
+frame N+1 is calibrated while frame N is being solved. When a stage falls
+behind, its queue fills up and the workers of the previous stage block on
+it (backpressure) instead of piling up work in memory.
+
+Every task records when it entered and left each stage, which gives the
+per-stage wait and service times and the end-to-end latency of each frame.
+"""
+
+import threading
+import time
+from queue import Queue, Empty, Full
+from typing import Any, Callable, Dict, List, Optional
+
+# Number of latency samples kept per stage for the percentiles
+_SAMPLES = 500
+
+
+class PipelineTask:
+    """One item (a frame) going through the pipeline."""
+
+    def __init__(self, path: str, created: Optional[float] = None):
+        self.path = path
+        self.created = created if created is not None else time.time()
+        self.data: Dict[str, Any] = {}  # Stage outputs (calibrated path, solve result...)
+        self.timings: Dict[str, Dict[str, float]] = {}  # {stage: {'queued', 'started', 'finished'}}
+        self.failed_stage: Optional[str] = None
+        self.message = ''
+        self.finished: Optional[float] = None
+
+    @property
+    def latency(self) -> Optional[float]:
+        """End-to-end time in seconds, from creation to the end of the last stage."""
+        return self.finished - self.created if self.finished is not None else None
+
+    def stage_time(self, stage: str) -> Optional[float]:
+        """Time spent in a stage, waiting in its queue included."""
+        timing = self.timings.get(stage, {})
+        if 'finished' not in timing:
+            return None
+        return timing['finished'] - timing['queued']
+
+    def format_timings(self) -> str:
+        """'ingest 2.0s, calibrate 3.1s, solve 25.0s (queued 3.0s)...'"""
+        parts = []
+        for stage, timing in self.timings.items():
+            if 'finished' not in timing:
+                continue
+            text = f"{stage} {timing['finished'] - timing['started']:.1f}s"
+            wait = timing['started'] - timing['queued']
+            if wait >= 0.1:
+                text += f" (queued {wait:.1f}s)"
+            parts.append(text)
+        return ", ".join(parts)
+
+
+class Stage:
+    """A pipeline step: func(task) run by a pool of worker threads on a bounded queue."""
+
+    def __init__(self, name: str, func: Callable[[PipelineTask], Optional[bool]],
+                 workers: int = 1, queue_size: int = 8):
+        """
+        Args:
+            name: Stage name, used in logs and metrics
+            func: Processes a task in place. Returning False stops the task there
+                (skipped, not failed); raising marks it failed.
+            workers: Number of worker threads
+            queue_size: Capacity of the input queue (backpressure beyond it)
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.queue: Queue = Queue(maxsize=max(1, int(queue_size)))
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0
+        self.max_depth = 0
+        self.blocked_time = 0.0  # Time the previous stage spent waiting for room in the queue
+        self._wait_times: List[float] = []
+        self._service_times: List[float] = []
+
+    def _record(self, wait: float, service: float, failed: bool):
+        with self._lock:
+            self.processed += 1
+            self.failed += int(failed)
+            for samples, value in ((self._wait_times, wait), (self._service_times, service)):
+                samples.append(value)
+                if len(samples) > _SAMPLES:
+                    del samples[0]
+
+    def metrics(self) -> Dict[str, float]:
+        """Counters, queue depth and mean/95th percentile wait and service times (seconds)."""
+        with self._lock:
+            def percentile(samples, q):
+                if not samples:
+                    return 0.0
+                ordered = sorted(samples)
+                return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            return {
+                'processed': self.processed,
+                'failed': self.failed,
+                'busy': self.busy,
+                'workers': self.workers,
+                'depth': self.queue.qsize(),
+                'max_depth': self.max_depth,
+                'blocked_time': self.blocked_time,
+                'wait_mean': sum(self._wait_times) / len(self._wait_times) if self._wait_times else 0.0,
+                'wait_p95': percentile(self._wait_times, 0.95),
+                'service_mean': sum(self._service_times) / len(self._service_times) if self._service_times else 0.0,
+                'service_p95': percentile(self._service_times, 0.95),
+            }
+
+
+class StagedPipeline:
+    """Chain of stages connected by bounded queues."""
+
+    def __init__(self, stages: List[Stage],
+                 on_complete: Optional[Callable[[PipelineTask], None]] = None,
+                 on_failure: Optional[Callable[[PipelineTask], None]] = None):
+        """
+        Args:
+            stages: Stages in processing order
+            on_complete: Called with each task that went through every stage (or stopped early)
+            on_failure: Called with each task whose stage raised (task.failed_stage, task.message)
+        """
+        self.stages = stages
+        self.on_complete = on_complete
+        self.on_failure = on_failure
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._in_flight = 0
+        self._idle = threading.Condition()
+        self.latencies: List[float] = []
+
+    def start(self):
+        """Start the worker threads of every stage."""
+        if self._threads:
+            return
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(target=self._worker_loop, args=(index,),
+                                          name=f"{stage.name}-{n + 1}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _put(self, stage: Stage, task: PipelineTask, timeout: Optional[float] = None) -> bool:
+        """Queue a task on a stage, blocking while its queue is full. False if stopped or timed out."""
+        task.timings[stage.name] = {'queued': time.time()}
+        deadline = time.time() + timeout if timeout is not None else None
+        start = time.time()
+        while not self._stopping.is_set():
+            try:
+                stage.queue.put(task, timeout=0.2)
+                break
+            except Full:
+                if deadline is not None and time.time() >= deadline:
+                    return False
+        else:
+            return False
+        with stage._lock:
+            stage.blocked_time += time.time() - start
+            stage.max_depth = max(stage.max_depth, stage.queue.qsize())
+        return True
+
+    def submit(self, task: PipelineTask, timeout: Optional[float] = None) -> bool:
+        """
+        Feed a task to the first stage. Blocks while that stage's queue is full.
+
+        Returns:
+            False if the pipeline is stopping or the timeout expired
+        """
+        self.start()
+        with self._idle:
+            self._in_flight += 1
+        if self._put(self.stages[0], task, timeout):
+            return True
+        self._task_done()
+        return False
+
+    def _task_done(self):
+        with self._idle:
+            self._in_flight -= 1
+            self._idle.notify_all()
+
+    def _worker_loop(self, index: int):
+        stage = self.stages[index]
+        while not self._stopping.is_set():
+            try:
+                task = stage.queue.get(timeout=0.2)
+            except Empty:
+                continue
+            timing = task.timings[stage.name]
+            timing['started'] = time.time()
+            with stage._lock:
+                stage.busy += 1
+            failed = False
+            try:
+                proceed = stage.func(task) is not False
+            except Exception as e:
+                proceed, failed = False, True
+                task.failed_stage = stage.name
+                task.message = str(e)
+            timing['finished'] = time.time()
+            with stage._lock:
+                stage.busy -= 1
+            stage._record(timing['started'] - timing['queued'], timing['finished'] - timing['started'], failed)
+
+            if proceed and index + 1 < len(self.stages):
+                if not self._put(self.stages[index + 1], task):
+                    self._task_done()  # Stopping
+                continue
+
+            task.finished = time.time()
+            with self._idle:
+                self.latencies.append(task.latency)
+                if len(self.latencies) > _SAMPLES:
+                    del self.latencies[0]
+            callback = self.on_failure if failed else self.on_complete
+            if callback:
+                try:
+                    callback(task)
+                except Exception:
+                    pass
+            self._task_done()
+
+    def in_flight(self) -> int:
+        """Number of tasks submitted and not finished yet."""
+        with self._idle:
+            return self._in_flight
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted task is finished. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout)
+
+    def stop(self, wait: bool = True, drain: bool = False, timeout: Optional[float] = None):
+        """
+        Stop the workers.
+
+        Args:
+            wait: Wait for the worker threads to exit
+            drain: Finish the queued tasks first
+            timeout: Limit for draining, in seconds
+        """
+        if drain:
+            self.join(timeout)
+        self._stopping.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage metrics, plus an 'end_to_end' entry with latency mean and 95th percentile."""
+        metrics = {stage.name: stage.metrics() for stage in self.stages}
+        with self._idle:
+            latencies = sorted(self.latencies)
+        metrics['end_to_end'] = {
+            'count': len(latencies),
+            'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+            'p95': latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0,
+        }
+        return metrics
+
+    def format_metrics(self) -> str:
+        """Human-readable table of metrics()."""
+        metrics = self.metrics()
+        lines = [f"{'stage':<10} {'workers':>7} {'done':>6} {'failed':>6} {'queued':>6} {'max':>4} "
+                 f"{'wait mean/p95 (s)':>18} {'service mean/p95 (s)':>21} {'blocked (s)':>11}"]
+        for stage in self.stages:
+            m = metrics[stage.name]
+            lines.append(f"{stage.name:<10} {m['workers']:>7} {m['processed']:>6} {m['failed']:>6} {m['depth']:>6} "
+                         f"{m['max_depth']:>4} {m['wait_mean']:>9.1f}/{m['wait_p95']:<8.1f} "
+                         f"{m['service_mean']:>10.1f}/{m['service_p95']:<10.1f} {m['blocked_time']:>11.1f}")
+        e2e = metrics['end_to_end']
+        lines.append(f"End-to-end latency: mean {e2e['mean']:.1f}s, p95 {e2e['p95']:.1f}s ({e2e['count']} frames)")
+        return '\n'.join(lines)
@@ -7,7 +7,10 @@ from astropy.wcs import WCS
 import xml.etree.ElementTree as ET
 from typing import List, Dict, Optional, Tuple, Union
 import logging
+import math
 import os
+import signal
+import threading
 import time
 from pathlib import Path
 import subprocess
@@ -28,6 +31,10 @@ from lib.fits.wcs import (
     WCSExtractionError,
     WCSApplicationError
 )
+from lib.fits.artifacts import get_artifact_store, data_digest
+from lib.fits.compression import (image_hdu_index, is_compressed, read_image_data,
+                                  read_image_header, write_image)
+from lib.fits.rawheader import read_raw_header
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -51,7 +58,9 @@ class PlatesolvingResult:
                  dec_center: Optional[float] = None,
                  pixel_scale: Optional[float] = None,
                  orientation: Optional[float] = None,
-                 radius: Optional[float] = None):
+                 radius: Optional[float] = None,
+                 method: Optional[str] = None,
+                 timed_out: bool = False):
         self.success = success
         self.message = message
         self.wcs_file_path = wcs_file_path
@@ -60,6 +69,8 @@ class PlatesolvingResult:
         self.pixel_scale = pixel_scale
         self.orientation = orientation
         self.radius = radius
+        self.method = method  # 'solve-field', 'hinted' or 'transform' for sequence solving
+        self.timed_out = timed_out
     
     def __str__(self):
         status = "SUCCESS" if self.success else "FAILED"
@@ -75,11 +86,38 @@ class PlatesolvingResult:
         return result
 
 
+def terminate_process_group(process: subprocess.Popen, grace_period: float = 3.0):
+    """
+    Terminate a process started with start_new_session=True and all its children.
+    
+    SIGTERM is sent to the whole process group first; whatever is still alive
+    after grace_period seconds is killed with SIGKILL.
+    """
+    if process.poll() is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=grace_period)
+        except TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+    except ProcessLookupError:
+        # Already gone
+        pass
+
+
 class AstrometryEngine:
     """Interface to the astrometry.net solve-field engine."""
     
+    # Minimum number of extracted stars for the star-list path; below that the
+    # full image is handed to solve-field
+    STAR_LIST_MIN_STARS = 10
+    
     def __init__(self, solve_field_path: str = "solve-field", 
-                 output_dir: str = "/tmp/astropipes/solved", timeout: int = 300):
+                 output_dir: str = "/tmp/astropipes/solved", timeout: int = 300,
+                 use_star_list: bool = False, star_list_max_stars: int = 300,
+                 star_list_downsample: int = 2):
         """
         Initialize the astrometry engine interface.
         
@@ -91,10 +129,20 @@ class AstrometryEngine:
             Directory for temporary output files
         timeout : int
             Timeout in seconds for solve-field execution
+        use_star_list : bool
+            Extract the brightest stars with our own detector and pass solve-field
+            an xylist instead of the image, so it skips its image2xy extraction
+        star_list_max_stars : int
+            Number of brightest stars written to the xylist
+        star_list_downsample : int
+            Downsampling factor used for star extraction
         """
         self.solve_field_path = solve_field_path
         self.output_dir = output_dir
         self.timeout = timeout
+        self.use_star_list = use_star_list
+        self.star_list_max_stars = star_list_max_stars
+        self.star_list_downsample = star_list_downsample
         
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
@@ -119,19 +167,47 @@ class AstrometryEngine:
             # Generate output filenames
             base_name = Path(fits_file_path).stem
             new_filename = os.path.join(self.output_dir, f"{base_name}.new")
+            solution_filename = new_filename
             
-            # Build solve-field command
-            cmd = [
-                self.solve_field_path,
-                "--dir", self.output_dir,
-                "--no-plots",
-                "--no-verify",
-                "--overwrite",
-                "--downsample", "2",
-                # "-t", "3",
-                "--new-fits", new_filename,
-                fits_file_path
-            ]
+            star_list = self._write_star_list(fits_file_path, output_callback) if self.use_star_list else None
+            
+            if star_list is not None:
+                # solve-field only has to match the given stars against the index
+                xyls_path, width, height = star_list
+                solution_filename = os.path.join(self.output_dir, f"{base_name}.wcs")
+                cmd = [
+                    self.solve_field_path,
+                    "--dir", self.output_dir,
+                    "--out", base_name,
+                    "--no-plots",
+                    "--no-verify",
+                    "--overwrite",
+                    "--x-column", "X",
+                    "--y-column", "Y",
+                    "--sort-column", "FLUX",
+                    "--width", str(width),
+                    "--height", str(height),
+                    xyls_path
+                ]
+            else:
+                # solve-field cannot read tile-compressed images: give it a plain copy
+                solve_input = fits_file_path
+                if is_compressed(fits_file_path):
+                    solve_input = os.path.join(self.output_dir, f"{base_name}.plain.fits")
+                    write_image(solve_input, read_image_data(fits_file_path),
+                                read_image_header(fits_file_path), compression='none')
+                # Build solve-field command
+                cmd = [
+                    self.solve_field_path,
+                    "--dir", self.output_dir,
+                    "--no-plots",
+                    "--no-verify",
+                    "--overwrite",
+                    "--downsample", "2",
+                    # "-t", "3",
+                    "--new-fits", new_filename,
+                    solve_input
+                ]
             
             # Add constraints if not blind solving
             if not constraints.get('blind', True):
@@ -143,10 +219,26 @@ class AstrometryEngine:
                     cmd.extend(["--radius", str(constraints['radius'])])
                 # Note: solve-field doesn't use scale constraints for offline solving
                 # Scale constraints are only used for online astrometry.net
-            else:
+            elif star_list is None:
                 # Blind solving - add guess-scale option
                 cmd.append("--guess-scale")
             
+            # Explicit scale bounds (e.g. from an already solved neighbour frame)
+            if constraints.get('scale_low') is not None and constraints.get('scale_high') is not None:
+                cmd.extend([
+                    "--scale-units", "arcsecperpix",
+                    "--scale-low", f"{constraints['scale_low']:.4f}",
+                    "--scale-high", f"{constraints['scale_high']:.4f}"
+                ])
+            # An xylist carries no header for --guess-scale, so pass the scale hint explicitly
+            elif star_list is not None and constraints.get('scale_est') is not None:
+                margin = 1.0 + (constraints.get('scale_err') or 0.0) / 100.0
+                cmd.extend([
+                    "--scale-units", "arcsecperpix",
+                    "--scale-low", f"{constraints['scale_est'] / margin:.4f}",
+                    "--scale-high", f"{constraints['scale_est'] * margin:.4f}"
+                ])
+            
             # Debug: Show the exact command being executed
             if output_callback:
                 output_callback(f"   Command: {' '.join(cmd)}\n")
@@ -160,41 +252,53 @@ class AstrometryEngine:
             else:
                 print(f"{Style.BRIGHT + Fore.BLUE}Running solve-field...{Style.RESET_ALL}")
             
-            # Run solve-field and capture output in real-time
+            # Run solve-field in its own process group so that a timeout or cancel
+            # also takes down the helpers it spawns (astrometry-engine, image2xy...)
             process = subprocess.Popen(
                 cmd, 
                 stdout=subprocess.PIPE, 
                 stderr=subprocess.STDOUT, 
                 text=True, 
                 bufsize=1, 
-                universal_newlines=True
+                universal_newlines=True,
+                start_new_session=True
             )
             if process_callback:
                 process_callback(process)
             
-            # Read output in real-time
-            for line in process.stdout:
-                if output_callback:
-                    output_callback(line)
-                else:
-                    print(line, end='')
+            # Read output in real-time on a separate thread so the wait below can time out
+            def pump_output():
+                for line in process.stdout:
+                    if output_callback:
+                        output_callback(line)
+                    else:
+                        print(line, end='')
+            reader = threading.Thread(target=pump_output, daemon=True)
+            reader.start()
             
-            # Wait for process to complete
-            return_code = process.poll()
+            # Wait for process to complete, enforcing the wall-clock timeout
+            try:
+                return_code = process.wait(timeout=self.timeout)
+            except BaseException:
+                # Timeout, KeyboardInterrupt...: never leave solve-field running
+                terminate_process_group(process)
+                reader.join(timeout=1.0)
+                raise
+            reader.join()
             solve_time = time.time() - start_time
             
             if return_code != 0:
                 raise subprocess.CalledProcessError(return_code, cmd)
             
-            # Check if .new file was created
-            if os.path.exists(new_filename):
+            # Check if the solution file (.new, or .wcs for star lists) was created
+            if os.path.exists(solution_filename):
                 if output_callback:
-                    output_callback(f"   Solution file generated: {new_filename}\n")
+                    output_callback(f"   Solution file generated: {solution_filename}\n")
                 else:
-                    print(f"   Solution file generated: {new_filename}")
+                    print(f"   Solution file generated: {solution_filename}")
                 
                 # Extract solution information
-                solution_info = self._extract_solution_info(new_filename, fits_file_path)
+                solution_info = self._extract_solution_info(solution_filename, fits_file_path)
                 
                 # Don't clean up yet - the file is needed for WCS application
                 # Cleanup will be done after WCS application in solve_single_image
@@ -202,7 +306,7 @@ class AstrometryEngine:
                 return PlatesolvingResult(
                     success=True,
                     message="Image successfully solved",
-                    wcs_file_path=new_filename,
+                    wcs_file_path=solution_filename,
                     ra_center=solution_info.get('ra_center'),
                     dec_center=solution_info.get('dec_center'),
                     pixel_scale=solution_info.get('pixel_scale'),
@@ -225,7 +329,8 @@ class AstrometryEngine:
             self._cleanup_temp_files(Path(fits_file_path).stem)
             return PlatesolvingResult(
                 success=False,
-                message=f"solve-field timed out after {self.timeout}s"
+                message=f"solve-field timed out after {self.timeout}s",
+                timed_out=True
             )
         except Exception as e:
             logger.error(f"Error running solve-field: {e}")
@@ -235,6 +340,58 @@ class AstrometryEngine:
                 message=f"Error running solve-field: {e}"
             )
     
+    def _write_star_list(self, fits_file_path: str, output_callback=None) -> Optional[Tuple[str, int, int]]:
+        """
+        Write the brightest stars of an image to an xylist FITS table.
+        
+        Parameters:
+        -----------
+        fits_file_path : str
+            Path to the FITS file to solve
+            
+        Returns:
+        --------
+        Optional[Tuple[str, int, int]]
+            (xylist path, image width, image height), or None if too few stars
+            were found and the image itself should be solved
+        """
+        from astropy.io import fits
+        from lib.sci.sources import extract_star_list
+        
+        def report(message):
+            if output_callback:
+                output_callback(f"   {message}\n")
+            else:
+                print(f"   {message}")
+        
+        try:
+            start_time = time.time()
+            image = np.asarray(fits.getdata(fits_file_path), dtype=np.float32)
+            height, width = image.shape
+            x, y, flux = extract_star_list(image, self.star_list_max_stars, self.star_list_downsample)
+            
+            if len(x) < self.STAR_LIST_MIN_STARS:
+                report(f"Only {len(x)} stars extracted, solving the full image instead")
+                return None
+            
+            # xylist pixel coordinates follow the FITS convention (first pixel centre is 1,1)
+            table = fits.BinTableHDU.from_columns([
+                fits.Column(name='X', format='E', array=x + 1.0),
+                fits.Column(name='Y', format='E', array=y + 1.0),
+                fits.Column(name='FLUX', format='E', array=flux),
+            ])
+            table.header['IMAGEW'] = width
+            table.header['IMAGEH'] = height
+            xyls_path = os.path.join(self.output_dir, f"{Path(fits_file_path).stem}-stars.xyls")
+            fits.HDUList([fits.PrimaryHDU(), table]).writeto(xyls_path, overwrite=True)
+            
+            report(f"Extracted {len(x)} stars in {time.time() - start_time:.2f}s: {xyls_path}")
+            return xyls_path, width, height
+            
+        except Exception as e:
+            report(f"Star extraction failed ({e}), solving the full image instead")
+            return None
+    
     def _extract_solution_info(self, solution_file_path: str, original_file_path: str) -> Dict[str, Union[float, int]]:
         """
         Extract solution information from the solution file.
@@ -263,7 +420,7 @@ class AstrometryEngine:
             
             # Get image dimensions from original file
             with fits.open(original_file_path) as hdul:
-                image_shape = hdul[0].data.shape
+                image_shape = hdul[image_hdu_index(hdul)].data.shape
             
             # Calculate center coordinates
             center_x = image_shape[1] / 2
@@ -327,7 +484,8 @@ class AstrometryEngine:
         base_name : str
             Base name of the input file (without extension)
         """
-        temp_extensions = ['.xyls', '.axy', '.corr', '.match', '.rdls', '.solved', '.new']
+        temp_extensions = ['.xyls', '-stars.xyls', '-indx.xyls', '.axy', '.corr', '.match', '.rdls',
+                           '.solved', '.new', '.wcs']
         
         for ext in temp_extensions:
             temp_file = os.path.join(self.output_dir, f"{base_name}{ext}")
@@ -339,13 +497,35 @@ class AstrometryEngine:
                     logger.warning(f"Could not remove {temp_file}: {e}")
 
 
+def _header_has_wcs(fits_file_path: str, wcs_data: Dict[str, Union[str, float, int]]) -> bool:
+    """Whether the image header already holds every card of a WCS solution."""
+    try:
+        header = read_raw_header(fits_file_path)
+    except OSError:
+        return False
+    for keyword, value in wcs_data.items():
+        current = header.get(keyword)
+        if current is None:
+            return False
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if isinstance(current, bool) or not isinstance(current, (int, float)) or \
+                    not math.isclose(current, value, rel_tol=1e-9, abs_tol=1e-12):
+                return False
+        elif str(current).strip() != str(value).strip():
+            return False
+    return True
+
+
 def solve_single_image(fits_file_path: str, 
                       solve_field_path: str = "solve-field",
                       output_dir: str = "/tmp/astropipes/solved",
                       timeout: int = 300,
                       apply_solution: bool = True,
                       output_callback=None,
-                      process_callback=None) -> PlatesolvingResult:
+                      process_callback=None,
+                      use_star_list: bool = False,
+                      constraints: Optional[Dict[str, Union[float, bool]]] = None,
+                      use_cache: bool = True) -> PlatesolvingResult:
     """
     Solve a single FITS image using the complete platesolving pipeline.
     
@@ -368,6 +548,13 @@ def solve_single_image(fits_file_path: str,
         Timeout in seconds for solve-field execution
     apply_solution : bool
         Whether to apply the solution to the original FITS file
+    use_star_list : bool
+        Feed solve-field a star list extracted by our detector instead of the image
+    constraints : Dict[str, Union[float, bool]], optional
+        Solving constraints to use instead of the ones derived from the header
+    use_cache : bool
+        Reuse the solution stored for the same image data. With False the image
+        is always solved, and the new solution replaces the stored one.
         
     Returns:
     --------
@@ -375,6 +562,32 @@ def solve_single_image(fits_file_path: str,
         Result of the platesolving operation
     """
     try:
+        # Step 0: An image whose data was already solved gets the stored solution back
+        cache_key = None
+        if apply_solution:
+            try:
+                store = get_artifact_store()
+                cache_key = store.make_key('solved', [data_digest(fits_file_path)], producer=solve_single_image)
+                cached = store.get_json('solved', cache_key) if use_cache else None
+                if cached:
+                    # Nothing to write (nor to journal) if the file already carries the solution
+                    if not _header_has_wcs(fits_file_path, cached['wcs']):
+                        apply_wcs_to_fits(fits_file_path, cached['wcs'])
+                        _rescan_if_in_database(fits_file_path)
+                    message = f"Reused stored solution for {fits_file_path}"
+                    if output_callback:
+                        output_callback(f"{Style.BRIGHT + Fore.GREEN}{message}{Style.RESET_ALL}\n")
+                    else:
+                        print(f"{Style.BRIGHT + Fore.GREEN}{message}{Style.RESET_ALL}")
+                    return PlatesolvingResult(success=True, message="Image solved (stored solution)",
+                                              method='cache', **cached['info'])
+            except Exception as e:
+                cache_key = None
+                if output_callback:
+                    output_callback(f"   Artifact store unavailable: {e}\n")
+                else:
+                    print(f"   Artifact store unavailable: {e}")
+        
         # Step 1: Validate the FITS file
         if output_callback:
             output_callback(f"{Style.BRIGHT + Fore.BLUE}Validating FITS file...{Style.RESET_ALL}\n")
@@ -403,14 +616,15 @@ def solve_single_image(fits_file_path: str,
             output_callback(f"{Style.BRIGHT + Fore.BLUE}Generating solving constraints...{Style.RESET_ALL}\n")
         else:
             print(f"{Style.BRIGHT + Fore.BLUE}Generating solving constraints...{Style.RESET_ALL}")
-        constraints = get_platesolving_constraints(validation_result)
+        if constraints is None:
+            constraints = get_platesolving_constraints(validation_result)
         
         # Step 3: Run astrometry.net engine
         if output_callback:
             output_callback(f"{Style.BRIGHT + Fore.BLUE}Running astrometry.net engine...{Style.RESET_ALL}\n")
         else:
             print(f"{Style.BRIGHT + Fore.BLUE}Running astrometry.net engine...{Style.RESET_ALL}")
-        engine = AstrometryEngine(solve_field_path, output_dir, timeout)
+        engine = AstrometryEngine(solve_field_path, output_dir, timeout, use_star_list=use_star_list)
         solve_result = engine.solve_image(fits_file_path, constraints, output_callback, process_callback)
         
         if not solve_result.success:
@@ -429,7 +643,15 @@ def solve_single_image(fits_file_path: str,
                 print(f"{Style.BRIGHT + Fore.BLUE}Applying solution to original file...{Style.RESET_ALL}")
             try:
                 wcs_data = extract_wcs_from_file(solve_result.wcs_file_path)
-                apply_wcs_to_fits(fits_file_path, wcs_data, backup_original=False)
+                apply_wcs_to_fits(fits_file_path, wcs_data)
+                if cache_key is not None:
+                    info = {name: getattr(solve_result, name) for name in
+                            ('ra_center', 'dec_center', 'pixel_scale', 'orientation', 'radius')}
+                    info = {name: float(value) if value is not None else None for name, value in info.items()}
+                    try:
+                        get_artifact_store().put_json('solved', cache_key, {'wcs': wcs_data, 'info': info})
+                    except Exception as e:
+                        logger.warning(f"Could not store solution: {e}")
                 if output_callback:
                     output_callback(f"   Successfully applied WCS solution to {fits_file_path}\n")
                 else:
@@ -579,4 +801,292 @@ def solve_single_image(fits_file_path: str,
         return PlatesolvingResult(
             success=False,
             message=f"Error in platesolving pipeline: {e}"
-        ) 
\ No newline at end of file
+        ) 
+
+
+def _read_celestial_wcs(fits_file_path: str) -> Optional[WCS]:
+    """Return the celestial WCS stored in a FITS header, or None."""
+    try:
+        wcs = WCS(read_image_header(fits_file_path)).celestial
+        return wcs if wcs.has_celestial and wcs.wcs.ctype[0].startswith('RA') else None
+    except Exception:
+        return None
+
+
+def _compose_wcs(reference_wcs: WCS, matrix: np.ndarray, offset: np.ndarray) -> WCS:
+    """
+    Build the TAN WCS of a frame from a solved reference frame and the affine
+    transform mapping the frame's pixels onto the reference pixels
+    (p_ref = matrix @ p + offset, 0-based). SIP distortion terms are dropped.
+    """
+    crpix_ref = reference_wcs.wcs.crpix - 1.0
+    crpix = np.linalg.solve(matrix, crpix_ref - offset) + 1.0
+    
+    wcs = WCS(naxis=2)
+    wcs.wcs.ctype = [ctype.replace('-SIP', '') for ctype in reference_wcs.wcs.ctype]
+    wcs.wcs.crval = reference_wcs.wcs.crval
+    wcs.wcs.crpix = crpix
+    wcs.wcs.cd = reference_wcs.pixel_scale_matrix @ matrix
+    wcs.wcs.cunit = ['deg', 'deg']
+    return wcs
+
+
+def _wcs_header_cards(wcs: WCS) -> Dict[str, Union[str, float]]:
+    """WCS keywords of a TAN solution in the form expected by apply_wcs_to_fits."""
+    cd = wcs.wcs.cd
+    return {
+        'CTYPE1': wcs.wcs.ctype[0], 'CTYPE2': wcs.wcs.ctype[1],
+        'CUNIT1': 'deg', 'CUNIT2': 'deg',
+        'CRVAL1': float(wcs.wcs.crval[0]), 'CRVAL2': float(wcs.wcs.crval[1]),
+        'CRPIX1': float(wcs.wcs.crpix[0]), 'CRPIX2': float(wcs.wcs.crpix[1]),
+        'CD1_1': float(cd[0, 0]), 'CD1_2': float(cd[0, 1]),
+        'CD2_1': float(cd[1, 0]), 'CD2_2': float(cd[1, 1]),
+    }
+
+
+def _neighbor_constraints(neighbor_wcs: WCS, shape: Tuple[int, int],
+                          center_wcs: Optional[WCS] = None) -> Dict[str, Union[float, bool]]:
+    """
+    Tight solve-field hints from a solved neighbour frame: its centre (or the
+    centre predicted by center_wcs), twice its field radius and its pixel scale ±10%.
+    """
+    from astropy.wcs.utils import proj_plane_pixel_scales
+    
+    center = (center_wcs or neighbor_wcs).pixel_to_world((shape[1] - 1) / 2.0, (shape[0] - 1) / 2.0)
+    scale = float(np.mean(proj_plane_pixel_scales(neighbor_wcs))) * 3600.0
+    field_radius = np.hypot(shape[0], shape[1]) / 2.0 * scale / 3600.0
+    return {
+        'blind': False,
+        'ra': float(center.ra.deg),
+        'dec': float(center.dec.deg),
+        'radius': max(2.0 * field_radius, 0.1),
+        'scale_est': scale,
+        'scale_err': 10.0,
+        'scale_low': scale * 0.9,
+        'scale_high': scale * 1.1,
+    }
+
+
+def solve_sequence(fits_files: List[str],
+                   solve_field_path: str = "solve-field",
+                   output_dir: str = "/tmp/astropipes/solved",
+                   timeout: int = 300,
+                   use_star_list: bool = False,
+                   max_residual: float = 1.0,
+                   min_matches: int = 10,
+                   output_callback=None) -> List[PlatesolvingResult]:
+    """
+    Solve a sequence of frames of the same field, propagating solutions.
+    
+    The first frame that solves with its own header hints becomes the anchor.
+    Every other frame, taken outwards from the anchor, is then solved from its
+    nearest solved neighbour:
+    1. Stars of both frames are matched (astroalign). With at least min_matches
+       matches and an RMS residual below max_residual pixels, the frame's WCS
+       is the neighbour's WCS composed with the transform and solve-field is
+       not run at all.
+    2. Otherwise solve-field runs with tight --ra/--dec/--radius and
+       --scale-low/--scale-high hints derived from the neighbour.
+    Solutions are written to the files as with solve_single_image.
+    
+    Parameters:
+    -----------
+    fits_files : List[str]
+        Frames of the sequence, in acquisition order
+    solve_field_path : str
+        Path to the solve-field executable
+    output_dir : str
+        Directory for temporary output files
+    timeout : int
+        Timeout in seconds for solve-field execution
+    use_star_list : bool
+        Feed solve-field a star list extracted by our detector instead of the image
+    max_residual : float
+        Maximum RMS residual (pixels) of the star match for a composed solution
+    min_matches : int
+        Minimum number of matched stars for a composed solution
+        
+    Returns:
+    --------
+    List[PlatesolvingResult]
+        One result per input file, in input order; `method` tells how it was solved
+    """
+    from astropy.io import fits
+    from lib.fits.align import check_astroalign_available
+    from lib.sci.sources import extract_star_list
+    
+    def report(message):
+        if output_callback:
+            output_callback(message + "\n")
+        else:
+            print(message)
+    
+    def solve_with_solve_field(index, constraints=None, method='solve-field'):
+        result = solve_single_image(fits_files[index], solve_field_path, output_dir, timeout,
+                                    apply_solution=True, output_callback=output_callback,
+                                    use_star_list=use_star_list, constraints=constraints)
+        result.method = method
+        if result.success:
+            solutions[index] = _read_celestial_wcs(fits_files[index])
+        return result
+    
+    star_lists = {}
+    
+    def stars(index):
+        if index not in star_lists:
+            image = np.asarray(fits.getdata(fits_files[index]), dtype=np.float32)
+            x, y, _ = extract_star_list(image, max_stars=100)
+            star_lists[index] = (image.shape, np.column_stack([x, y]))
+        return star_lists[index]
+    
+    n_files = len(fits_files)
+    results: List[Optional[PlatesolvingResult]] = [None] * n_files
+    solutions: List[Optional[WCS]] = [None] * n_files
+    
+    # Anchor: first frame that solves with its own header hints
+    anchor = None
+    for index in range(n_files):
+        report(f"{Style.BRIGHT + Fore.CYAN}[{index + 1}/{n_files}] Solving anchor candidate "
+               f"{os.path.basename(fits_files[index])}{Style.RESET_ALL}")
+        results[index] = solve_with_solve_field(index)
+        if results[index].success and solutions[index] is not None:
+            anchor = index
+            break
+    
+    if anchor is None:
+        return [r or PlatesolvingResult(success=False, message="No frame of the sequence could be solved")
+                for r in results]
+    
+    use_transforms = check_astroalign_available()
+    if not use_transforms:
+        report(f"{Style.BRIGHT + Fore.YELLOW}astroalign not available, using hinted solve-field only{Style.RESET_ALL}")
+    
+    order = list(range(anchor + 1, n_files)) + list(range(anchor - 1, -1, -1))
+    for index in order:
+        solved = [j for j in range(n_files) if solutions[j] is not None]
+        neighbor = min(solved, key=lambda j: abs(j - index))
+        name = os.path.basename(fits_files[index])
+        report(f"{Style.BRIGHT + Fore.CYAN}[{index + 1}/{n_files}] {name} "
+               f"(neighbour: {os.path.basename(fits_files[neighbor])}){Style.RESET_ALL}")
+        
+        composed = None
+        try:
+            shape, frame_stars = stars(index)
+        except Exception as e:
+            report(f"   Star extraction failed: {e}")
+            shape, frame_stars = fits.getdata(fits_files[index]).shape, None
+        
+        if use_transforms and frame_stars is not None and len(frame_stars) >= min_matches:
+            try:
+                import astroalign
+                _, neighbor_stars = stars(neighbor)
+                transform, (matched, matched_ref) = astroalign.find_transform(frame_stars, neighbor_stars)
+                residual = float(np.sqrt(np.mean(np.sum((transform(matched) - matched_ref) ** 2, axis=1))))
+                composed = _compose_wcs(solutions[neighbor], transform.params[:2, :2], transform.params[:2, 2])
+                report(f"   Star match: {len(matched)} stars, RMS residual {residual:.2f} px")
+                
+                if len(matched) >= min_matches and residual <= max_residual:
+                    apply_wcs_to_fits(fits_files[index], _wcs_header_cards(composed))
+                    solutions[index] = composed
+                    center = composed.pixel_to_world((shape[1] - 1) / 2.0, (shape[0] - 1) / 2.0)
+                    results[index] = PlatesolvingResult(
+                        success=True,
+                        message=f"Solution composed from {os.path.basename(fits_files[neighbor])} "
+                                f"({len(matched)} stars, RMS {residual:.2f} px)",
+                        ra_center=float(center.ra.deg),
+                        dec_center=float(center.dec.deg),
+                        pixel_scale=float(np.sqrt(abs(np.linalg.det(composed.wcs.cd)))) * 3600.0,
+                        method='transform'
+                    )
+                    _rescan_if_in_database(fits_files[index])
+                    report(f"{Style.BRIGHT + Fore.GREEN}   {results[index].message}{Style.RESET_ALL}")
+                    continue
+                report("   Residuals too high, verifying with solve-field")
+            except Exception as e:
+                report(f"   Star match failed: {e}")
+        
+        constraints = _neighbor_constraints(solutions[neighbor], shape, composed)
+        results[index] = solve_with_solve_field(index, constraints, method='hinted')
+    
+    solved_count = sum(1 for r in results if r.success)
+    by_method = {}
+    for r in results:
+        if r.success:
+            by_method[r.method] = by_method.get(r.method, 0) + 1
+    report(f"{Style.BRIGHT + Fore.BLUE}Sequence solved: {solved_count}/{n_files} "
+           f"({', '.join(f'{k}: {v}' for k, v in sorted(by_method.items()))}){Style.RESET_ALL}")
+    return results
+
+
+def _rescan_if_in_database(fits_file_path: str):
+    """Refresh the database entry of a file whose WCS was updated."""
+    try:
+        from lib.db.scan import is_file_in_database, rescan_single_file
+        if is_file_in_database(fits_file_path):
+            rescan_single_file(fits_file_path)
+    except Exception as e:
+        print(f"   Error checking/updating database: {e}")
+
+
+def benchmark_star_list_solving(fits_files: List[str],
+                                solve_field_path: str = "solve-field",
+                                output_dir: str = "/tmp/astropipes/solved",
+                                timeout: int = 300) -> Dict[str, Dict[str, float]]:
+    """
+    Compare solve times of the image path and the star-list path.
+    
+    Each file is solved twice with the same constraints, once by handing the
+    image to solve-field and once with a star list from our detector. Nothing
+    is written back to the files.
+    
+    Parameters:
+    -----------
+    fits_files : List[str]
+        FITS files to solve
+    solve_field_path : str
+        Path to the solve-field executable
+    output_dir : str
+        Directory for temporary output files
+    timeout : int
+        Timeout in seconds for solve-field execution
+        
+    Returns:
+    --------
+    Dict[str, Dict[str, float]]
+        For 'image' and 'star_list': number of solved frames and the median and
+        worst-case solve times in seconds
+    """
+    timings = {'image': [], 'star_list': []}
+    solved = {'image': 0, 'star_list': 0}
+    
+    for fits_file_path in fits_files:
+        validation_result = validate_fits_file(fits_file_path)
+        if not validation_result.is_valid:
+            print(f"{Style.BRIGHT + Fore.RED}Skipping {fits_file_path}: {validation_result.reason}{Style.RESET_ALL}")
+            continue
+        constraints = get_platesolving_constraints(validation_result)
+        
+        for method, use_star_list in (('image', False), ('star_list', True)):
+            engine = AstrometryEngine(solve_field_path, output_dir, timeout, use_star_list=use_star_list)
+            start_time = time.time()
+            result = engine.solve_image(fits_file_path, constraints, output_callback=lambda text: None)
+            elapsed = time.time() - start_time
+            engine._cleanup_temp_files(Path(fits_file_path).stem)
+            
+            timings[method].append(elapsed)
+            solved[method] += int(result.success)
+            status = "solved" if result.success else "failed"
+            print(f"   {os.path.basename(fits_file_path)} [{method}]: {status} in {elapsed:.2f}s")
+    
+    summary = {}
+    print(f"\n{Style.BRIGHT + Fore.BLUE}Solve time benchmark ({len(timings['image'])} frames){Style.RESET_ALL}")
+    for method, values in timings.items():
+        summary[method] = {
+            'solved': solved[method],
+            'median': float(np.median(values)) if values else 0.0,
+            'worst': float(np.max(values)) if values else 0.0,
+        }
+        print(f"   {method:10s} solved {solved[method]}/{len(values)}, "
+              f"median {summary[method]['median']:.2f}s, worst {summary[method]['worst']:.2f}s")
+    
+    return summary
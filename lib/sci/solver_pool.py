@@ -0,0 +1,371 @@
+"""
+Concurrent plate-solving worker pool.
+
+solve-field is single threaded for most of its run, so several files can be
+solved at the same time. The pool keeps one job queue that the CLI, the GUI and
+autopipe all submit to, runs up to K solve-field processes concurrently and
+enforces a hard wall-clock timeout on each of them (the whole solve-field
+process group is killed). Every job carries its own status, which callers can
+follow through a status callback or by polling SolverPool.jobs().
+
+K defaults to the number of cores, reduced when the astrometry.net index files
+would not fit in the available memory K times over.
+"""
+
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from queue import Queue, Empty
+from typing import Callable, Dict, List, Optional, Union
+
+import config
+from lib.sci.platesolving import PlatesolvingResult, solve_single_image, terminate_process_group
+
+
+def _index_size(index_path: Optional[str]) -> int:
+    """Total size in bytes of the astrometry.net index files in index_path."""
+    if not index_path or not os.path.isdir(index_path):
+        return 0
+    return sum(p.stat().st_size for p in Path(index_path).rglob('index-*.fits') if p.is_file())
+
+
+def _available_memory() -> int:
+    """Available physical memory in bytes, or 0 if it cannot be determined."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+def default_solver_workers(index_path: Optional[str] = None) -> int:
+    """
+    Number of concurrent solve-field processes for this machine.
+
+    Each solve-field process may load the whole index set, so the number of
+    cores is capped by how many copies of the index files fit in memory.
+    """
+    workers = os.cpu_count() or 1
+    index_bytes = _index_size(index_path)
+    available = _available_memory()
+    if index_bytes and available:
+        workers = min(workers, available // index_bytes)
+    return max(1, workers)
+
+
+class SolveJob:
+    """A single file queued in the solver pool."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SOLVED = 'solved'
+    FAILED = 'failed'
+    TIMEOUT = 'timeout'
+    CANCELLED = 'cancelled'
+
+    FINAL_STATES = (SOLVED, FAILED, TIMEOUT, CANCELLED)
+
+    def __init__(self, job_id: int, fits_file_path: str,
+                 constraints: Optional[Dict[str, Union[float, bool]]] = None,
+                 apply_solution: bool = True,
+                 status_callback: Optional[Callable[['SolveJob'], None]] = None,
+                 output_callback: Optional[Callable[['SolveJob', str], None]] = None,
+                 use_cache: bool = True):
+        self.id = job_id
+        self.fits_file_path = fits_file_path
+        self.constraints = constraints
+        self.apply_solution = apply_solution
+        self.use_cache = use_cache
+        self.status_callback = status_callback
+        self.output_callback = output_callback
+        self.status = SolveJob.QUEUED
+        self.message = ''
+        self.result: Optional[PlatesolvingResult] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.log = deque(maxlen=50)  # Last solve-field output lines, for failure reports
+        self._process = None
+        self._cancel_requested = False
+        self._done = threading.Event()
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.fits_file_path)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        """Solving time in seconds (so far, if still running)."""
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[PlatesolvingResult]:
+        """Block until the job is finished and return its result."""
+        self._done.wait(timeout)
+        return self.result
+
+    def __str__(self):
+        text = f"{self.name}: {self.status}"
+        if self.elapsed is not None:
+            text += f" ({self.elapsed:.1f}s)"
+        if self.message and self.status != SolveJob.SOLVED:
+            text += f" - {self.message}"
+        return text
+
+
+class SolverPool:
+    """Shared queue of plate-solving jobs executed by a fixed set of workers."""
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 solve_field_path: str = "solve-field",
+                 output_dir: str = "/tmp/astropipes/solved",
+                 timeout: Optional[int] = None,
+                 use_star_list: bool = False):
+        """
+        Initialize the pool. Workers are started on the first submission.
+
+        Parameters:
+        -----------
+        max_workers : int, optional
+            Number of concurrent solve-field processes. Defaults to
+            config.SOLVER_MAX_CONCURRENT, or default_solver_workers() if unset.
+        solve_field_path : str
+            Path to the solve-field executable (a stub script works for testing)
+        output_dir : str
+            Directory for temporary output files; each job gets its own subdirectory
+        timeout : int, optional
+            Wall-clock limit in seconds per job (default config.SOLVER_OFFLINE_TIMEOUT)
+        use_star_list : bool
+            Feed solve-field a star list extracted by our detector instead of the image
+        """
+        if max_workers is None:
+            max_workers = getattr(config, 'SOLVER_MAX_CONCURRENT', None) or \
+                default_solver_workers(getattr(config, 'SOLVER_INDEX_PATH', None))
+        self.max_workers = max(1, int(max_workers))
+        self.solve_field_path = solve_field_path
+        self.output_dir = output_dir
+        self.timeout = timeout if timeout is not None else config.SOLVER_OFFLINE_TIMEOUT
+        self.use_star_list = use_star_list
+
+        self._queue: Queue = Queue()
+        self._jobs: List[SolveJob] = []
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+        self._next_id = 1
+        self._shutdown = False
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker_loop, name=f"solver-{len(self._workers) + 1}",
+                                      daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def submit(self, fits_file_path: str,
+               constraints: Optional[Dict[str, Union[float, bool]]] = None,
+               apply_solution: bool = True,
+               status_callback: Optional[Callable[[SolveJob], None]] = None,
+               output_callback: Optional[Callable[[SolveJob, str], None]] = None,
+               use_cache: bool = True) -> SolveJob:
+        """
+        Queue a file for solving.
+
+        status_callback(job) is called from a worker thread on every status change;
+        output_callback(job, line) receives the solve-field output of the job.
+        Without an output callback the output is only kept in job.log, since
+        concurrent jobs printing to the terminal would interleave.
+        use_cache=False solves the file even if a solution is stored for its data.
+        """
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Solver pool has been shut down")
+            job = SolveJob(self._next_id, fits_file_path, constraints, apply_solution,
+                           status_callback, output_callback, use_cache)
+            self._next_id += 1
+            self._jobs.append(job)
+            self._start_workers()
+        self._notify(job)
+        self._queue.put(job)
+        return job
+
+    def solve_files(self, fits_files: List[str],
+                    status_callback: Optional[Callable[[SolveJob], None]] = None,
+                    constraints: Optional[Dict[str, Union[float, bool]]] = None,
+                    use_cache: bool = True) -> List[SolveJob]:
+        """Submit several files and wait until all of them are finished."""
+        jobs = [self.submit(path, constraints=constraints, status_callback=status_callback, use_cache=use_cache)
+                for path in fits_files]
+        for job in jobs:
+            job.wait()
+        return jobs
+
+    def cancel(self, job: SolveJob):
+        """Cancel a job: queued jobs are skipped, running ones have their process group killed."""
+        with self._lock:
+            if job.done:
+                return
+            job._cancel_requested = True
+            process = job._process
+        if process is not None:
+            terminate_process_group(process)
+
+    def cancel_jobs(self, jobs: List[SolveJob]):
+        """Cancel several jobs, e.g. everything a GUI batch submitted."""
+        for job in jobs:
+            self.cancel(job)
+
+    def cancel_all(self):
+        """Cancel every job that is not finished yet."""
+        self.cancel_jobs(self.jobs())
+
+    def jobs(self) -> List[SolveJob]:
+        """Snapshot of all jobs submitted to the pool."""
+        with self._lock:
+            return list(self._jobs)
+
+    def status_counts(self) -> Dict[str, int]:
+        """Number of jobs in each state."""
+        counts = {state: 0 for state in (SolveJob.QUEUED, SolveJob.RUNNING) + SolveJob.FINAL_STATES}
+        for job in self.jobs():
+            counts[job.status] += 1
+        return counts
+
+    def status_line(self) -> str:
+        """One-line summary of the queue, for live status displays."""
+        counts = self.status_counts()
+        return ", ".join(f"{state}: {count}" for state, count in counts.items() if count)
+
+    def clear_finished(self):
+        """Forget finished jobs (long-running processes such as autopipe)."""
+        with self._lock:
+            self._jobs = [job for job in self._jobs if not job.done]
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        """Stop accepting jobs and let the workers exit once the queue is drained."""
+        with self._lock:
+            self._shutdown = True
+            workers = list(self._workers)
+        if cancel_pending:
+            self.cancel_all()
+        for _ in workers:
+            self._queue.put(None)
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def _notify(self, job: SolveJob):
+        if job.status_callback:
+            try:
+                job.status_callback(job)
+            except Exception:
+                pass
+
+    def _finish(self, job: SolveJob, status: str, message: str = '',
+                result: Optional[PlatesolvingResult] = None):
+        with self._lock:
+            job.status = status
+            job.message = message
+            job.result = result if result is not None else PlatesolvingResult(success=False, message=message)
+            job.finished = time.time()
+            job._process = None
+        self._notify(job)
+        job._done.set()
+
+    def _worker_loop(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=1.0)
+            except Empty:
+                if self._shutdown:
+                    return
+                continue
+            if job is None:
+                return
+            try:
+                self._run_job(job)
+            except Exception as e:
+                self._finish(job, SolveJob.FAILED, f"Error in solver worker: {e}")
+
+    def _run_job(self, job: SolveJob):
+        with self._lock:
+            if job._cancel_requested:
+                cancelled = True
+            else:
+                cancelled = False
+                job.status = SolveJob.RUNNING
+                job.started = time.time()
+        if cancelled:
+            self._finish(job, SolveJob.CANCELLED, "Cancelled before start")
+            return
+        self._notify(job)
+
+        def output_callback(line):
+            job.log.append(line)
+            if job.output_callback:
+                job.output_callback(job, line)
+
+        def process_callback(process):
+            with self._lock:
+                job._process = process
+                cancel_now = job._cancel_requested
+            if cancel_now:
+                terminate_process_group(process)
+
+        # A private directory per job: two files with the same name solved at the
+        # same time would otherwise overwrite each other's solve-field outputs
+        job_dir = os.path.join(self.output_dir, f"job-{os.getpid()}-{job.id}")
+        os.makedirs(job_dir, exist_ok=True)
+        try:
+            result = solve_single_image(
+                job.fits_file_path,
+                solve_field_path=self.solve_field_path,
+                output_dir=job_dir,
+                timeout=self.timeout,
+                apply_solution=job.apply_solution,
+                output_callback=output_callback,
+                process_callback=process_callback,
+                use_star_list=self.use_star_list,
+                constraints=job.constraints,
+                use_cache=job.use_cache
+            )
+        finally:
+            # Without apply_solution the caller still needs the solution file
+            if job.apply_solution:
+                shutil.rmtree(job_dir, ignore_errors=True)
+
+        if job._cancel_requested:
+            self._finish(job, SolveJob.CANCELLED, "Cancelled", result)
+        elif result.success:
+            self._finish(job, SolveJob.SOLVED, result.message, result)
+        elif getattr(result, 'timed_out', False):
+            self._finish(job, SolveJob.TIMEOUT, result.message, result)
+        else:
+            self._finish(job, SolveJob.FAILED, result.message, result)
+
+
+# Global solver pool instance
+_solver_pool = None
+_solver_pool_lock = threading.Lock()
+
+
+def get_solver_pool() -> SolverPool:
+    """Get the solver pool shared by everything running in this process."""
+    global _solver_pool
+    with _solver_pool_lock:
+        if _solver_pool is None:
+            _solver_pool = SolverPool()
+        return _solver_pool
@@ -15,10 +15,10 @@ from astropy import units as u
 from astropy.wcs import WCS
 from astropy.stats import sigma_clipped_stats
 from photutils.background import Background2D, MedianBackground
-from photutils.segmentation import detect_sources, detect_threshold, SourceCatalog
+from photutils.segmentation import detect_sources, SourceCatalog
 from photutils.centroids import centroid_com, centroid_1dg, centroid_2dg
 from photutils.aperture import CircularAperture, aperture_photometry
-from typing import List, Dict, Optional, Tuple, Union
+from typing import Any, List, Dict, Optional, Tuple, Union
 import logging
 import time
 import os
@@ -86,15 +86,353 @@ def get_image_scale_from_wcs(wcs):
     return None
 
 
+# Frames at least this large (in pixels along their longest side) are worth
+# detecting with the tiled, multi-process driver when deblending. Starting the
+# worker processes costs a few seconds: a 6000x4000 frame is still faster in
+# a single process, with or without deblending.
+TILED_DETECTION_MIN_SIZE = 8000
+
+# Number of randomly sampled pixels used for global background statistics
+BACKGROUND_SAMPLE_SIZE = 200000
+# Number of image rows processed at a time when subtracting a mesh background
+BACKGROUND_STRIP_ROWS = 256
+
+
+def use_tiled_detection(shape: Tuple[int, int], deblend: bool = True) -> bool:
+    """
+    Whether detect_sources_tiled is expected to beat detect_sources_in_image.
+
+    Tiling only pays off when deblending (the costly, per-segment step) a very
+    large frame on more than one CPU.
+    """
+    return bool(deblend) and (os.cpu_count() or 1) > 1 and max(shape) >= TILED_DETECTION_MIN_SIZE
+
+
+def default_detection_parameters(shape: Tuple[int, int]) -> Dict[str, Any]:
+    """
+    Return source detection parameters suited to an image of the given shape.
+
+    Larger frames get coarser background meshes and stricter thresholds so that
+    detection stays fast and is not dominated by noise peaks.
+
+    Parameters:
+    -----------
+    shape : tuple
+        Image shape (height, width)
+
+    Returns:
+    --------
+    dict
+        Keyword arguments for detect_sources_in_image
+    """
+    max_dim = max(shape)
+
+    if max_dim > 3000:
+        # For very large images, use very conservative parameters
+        params = {'background_box_size': 200, 'background_filter_size': 7, 'threshold_sigma': 3.0,
+                  'npixels': 10, 'min_area': 20, 'min_snr': 5.0, 'deblend': False}
+    elif max_dim > 1000:
+        # For large images, use conservative parameters
+        params = {'background_box_size': min(100, max_dim // 20), 'background_filter_size': 5,
+                  'threshold_sigma': 2.5, 'npixels': 8, 'min_area': 15, 'min_snr': 4.0,
+                  'deblend': False}
+    else:
+        # For smaller images, use moderately conservative parameters
+        params = {'background_box_size': 25, 'background_filter_size': 3, 'threshold_sigma': 2.0,
+                  'npixels': 5, 'min_area': 8, 'min_snr': 3.0, 'deblend': True}
+
+    params.update({
+        'max_area': 1000,
+        'min_eccentricity': 0.0,
+        'max_eccentricity': 0.9,
+        'connectivity': 8,
+    })
+    return params
+
+
+def sample_image_pixels(image: np.ndarray, sample_size: int = BACKGROUND_SAMPLE_SIZE,
+                        seed: int = 0) -> np.ndarray:
+    """
+    Draw a random subsample of the finite pixels of an image.
+
+    Parameters:
+    -----------
+    image : np.ndarray
+        Input image
+    sample_size : int
+        Number of pixels to draw (all pixels are used for smaller images)
+    seed : int
+        Seed of the random generator, so repeated runs give identical statistics
+
+    Returns:
+    --------
+    np.ndarray : 1D array of finite pixel values
+    """
+    if image.size <= sample_size:
+        sample = np.asarray(image, dtype=np.float64).ravel()
+    else:
+        rng = np.random.default_rng(seed)
+        indices = rng.integers(0, image.size, size=sample_size)
+        sample = np.asarray(image.flat[indices], dtype=np.float64)
+    return sample[np.isfinite(sample)]
+
+
+def block_average(image: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Downsample an image by averaging factor x factor pixel blocks.
+
+    Edge rows/columns that do not fill a whole block are dropped. One row of
+    blocks is processed at a time to keep temporaries small.
+    """
+    factor = max(1, int(factor))
+    ny, nx = image.shape[0] // factor, image.shape[1] // factor
+    small = np.empty((ny, nx), dtype=np.float32)
+    for row in range(ny):
+        block = np.asarray(image[row * factor:(row + 1) * factor, :nx * factor], dtype=np.float32)
+        small[row] = block.reshape(factor, nx, factor).mean(axis=(0, 2))
+    return small
+
+
+def _linear_weights(coords: np.ndarray, n_nodes: int, factor: int):
+    """Indices and weights for linear interpolation from a downsampled grid."""
+    # Node j of the downsampled grid sits at the centre of its block in full resolution
+    positions = (coords - (factor - 1) / 2.0) / factor
+    positions = np.clip(positions, 0, n_nodes - 1)
+    i0 = np.floor(positions).astype(np.intp)
+    i1 = np.minimum(i0 + 1, n_nodes - 1)
+    weights = positions - i0
+    return i0, i1, weights
+
+
+class SourceBackground:
+    """
+    Background model used for source detection.
+
+    Two modes are available:
+    - 'scalar': a single sigma-clipped median and standard deviation computed
+      from a random pixel subsample. No full-size array is ever allocated.
+    - 'mesh': photutils Background2D computed on a block-averaged copy of the
+      image (downsampled by `downsample`). The full-resolution background is
+      interpolated lazily, strip by strip or at given positions.
+
+    In both modes the detection noise level (`rms`) is a single value: the
+    sigma-clipped standard deviation for 'scalar', the median of the RMS mesh
+    for 'mesh'.
+    """
+
+    MODES = ('scalar', 'mesh')
+
+    def __init__(self, image: np.ndarray, mode: str = 'scalar',
+                 box_size: int = 50, filter_size: int = 3, downsample: int = 4,
+                 sample_size: int = BACKGROUND_SAMPLE_SIZE, sigma: float = 3.0):
+        if mode not in self.MODES:
+            raise SourceDetectionError(f"Unknown background mode '{mode}' (expected one of {self.MODES})")
+
+        self.mode = mode
+        self.shape = image.shape
+        self.downsample = max(1, int(downsample))
+        self.mesh = None
+        self.rms_mesh = None
+
+        sample = sample_image_pixels(image, sample_size)
+        if sample.size == 0:
+            raise SourceDetectionError("Image contains no finite pixels")
+        self.mean, self.median, self.std = (float(v) for v in sigma_clipped_stats(sample, sigma=sigma))
+        self.rms = self.std
+
+        if mode == 'mesh':
+            self._compute_mesh(image, box_size, filter_size, sigma)
+
+    def _compute_mesh(self, image, box_size, filter_size, sigma):
+        """Run Background2D on a block-averaged version of the image."""
+        from astropy.stats import SigmaClip
+
+        factor = self.downsample
+        ny, nx = self.shape[0] // factor, self.shape[1] // factor
+        if ny < 2 or nx < 2:
+            raise SourceDetectionError(f"Image too small for a mesh background with downsample={factor}")
+
+        small = block_average(image, factor)
+
+        small_box = max(2, int(round(box_size / factor)))
+        small_box = min(small_box, ny, nx)
+        bkg = Background2D(small, box_size=small_box, filter_size=filter_size,
+                           sigma_clip=SigmaClip(sigma=sigma),
+                           bkg_estimator=MedianBackground())
+        self.mesh = np.asarray(bkg.background, dtype=np.float32)
+        self.rms_mesh = np.asarray(bkg.background_rms, dtype=np.float32)
+        self.median = float(np.median(self.mesh))
+        # Block averaging lowers the pixel noise by ~factor, scale it back up
+        self.rms = float(np.median(self.rms_mesh)) * factor
+
+    def _interpolate_rows(self, mesh: np.ndarray, y0: int, y1: int) -> np.ndarray:
+        """Bilinear interpolation of a mesh onto full-resolution rows [y0, y1)."""
+        factor = self.downsample
+        yi0, yi1, wy = _linear_weights(np.arange(y0, y1), mesh.shape[0], factor)
+        xi0, xi1, wx = _linear_weights(np.arange(self.shape[1]), mesh.shape[1], factor)
+        wy = wy[:, None].astype(np.float32)
+        rows = mesh[yi0] * (1 - wy) + mesh[yi1] * wy
+        wx = wx.astype(np.float32)
+        return rows[:, xi0] * (1 - wx) + rows[:, xi1] * wx
+
+    def background_rows(self, y0: int, y1: int) -> np.ndarray:
+        """Background for full-resolution image rows [y0, y1)."""
+        if self.mode == 'scalar':
+            return np.full((y1 - y0, self.shape[1]), self.median, dtype=np.float32)
+        return self._interpolate_rows(self.mesh, y0, y1)
+
+    def background_at(self, x, y) -> np.ndarray:
+        """Background level at pixel positions (x, y)."""
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        if self.mode == 'scalar':
+            return np.full(x.shape, self.median)
+        factor = self.downsample
+        yi0, yi1, wy = _linear_weights(y, self.mesh.shape[0], factor)
+        xi0, xi1, wx = _linear_weights(x, self.mesh.shape[1], factor)
+        return ((self.mesh[yi0, xi0] * (1 - wx) + self.mesh[yi0, xi1] * wx) * (1 - wy) +
+                (self.mesh[yi1, xi0] * (1 - wx) + self.mesh[yi1, xi1] * wx) * wy)
+
+    def subtract_from(self, image: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Return a float32 background-subtracted copy of the image.
+
+        Only one full-size array (the result, or `out` when given) is used; the
+        mesh background is subtracted in strips of BACKGROUND_STRIP_ROWS rows.
+        """
+        if out is None:
+            cleaned = image.astype(np.float32)
+        else:
+            cleaned = out
+            cleaned[...] = image
+        if self.mode == 'scalar':
+            cleaned -= np.float32(self.median)
+            return cleaned
+        for y0 in range(0, self.shape[0], BACKGROUND_STRIP_ROWS):
+            y1 = min(y0 + BACKGROUND_STRIP_ROWS, self.shape[0])
+            cleaned[y0:y1] -= self.background_rows(y0, y1)
+        return cleaned
+
+    def log_debug_statistics(self, image_cleaned: np.ndarray):
+        """Log background and cleaned image statistics (only when DEBUG logging is enabled)."""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        if self.mode == 'mesh':
+            logger.debug(f"Background mesh mean: {np.mean(self.mesh):.2f}")
+            logger.debug(f"Background mesh std: {np.std(self.mesh):.2f}")
+            logger.debug(f"Background mesh min/max: {np.min(self.mesh):.2f} / {np.max(self.mesh):.2f}")
+        else:
+            logger.debug(f"Background level: {self.median:.2f}")
+        logger.debug(f"Cleaned image mean: {np.mean(image_cleaned):.2f}")
+        logger.debug(f"Cleaned image std: {np.std(image_cleaned):.2f}")
+        logger.debug(f"Cleaned image min/max: {np.min(image_cleaned):.2f} / {np.max(image_cleaned):.2f}")
+
+
+def calculate_sources_hfr_fwhm(image, segment_map, labels=None, background=0.0) -> Dict[str, np.ndarray]:
+    """
+    Calculate flux-weighted centroids, HFR and FWHM of many sources at once.
+    
+    Only the pixels belonging to a segment are visited, once, however many
+    sources there are: they are grouped by label, sorted by distance to their
+    source's flux-weighted centroid and accumulated in a single pass. Negative
+    (background-subtracted) pixel values are given zero weight.
+    
+    Parameters:
+    -----------
+    image : np.ndarray
+        2D image array
+    segment_map : SegmentationImage or np.ndarray
+        Segmentation map from photutils (or a plain label array)
+    labels : array-like, optional
+        Labels of the sources to measure. Defaults to all labels of the map,
+        in increasing order (the order of a SourceCatalog).
+    background : float or array-like
+        Background level to subtract, either a scalar or one value per label
+        
+    Returns:
+    --------
+    dict : 'labels', 'xcentroid', 'ycentroid', 'hfr' and 'fwhm' arrays, one
+        entry per label (HFR and FWHM in pixels, 0 for empty segments)
+    """
+    seg = np.asarray(getattr(segment_map, 'data', segment_map))
+    if labels is None:
+        labels = getattr(segment_map, 'labels', None)
+        if labels is None:
+            labels = np.unique(seg[seg > 0])
+    labels = np.atleast_1d(np.asarray(labels, dtype=np.intp))
+    n = len(labels)
+    result = {
+        'labels': labels,
+        'xcentroid': np.full(n, np.nan),
+        'ycentroid': np.full(n, np.nan),
+        'hfr': np.zeros(n),
+        'fwhm': np.zeros(n),
+    }
+    if n == 0:
+        return result
+
+    # Position of each label in the output arrays (-1 for labels not requested)
+    lookup = np.full(max(int(seg.max()), int(labels.max())) + 1, -1, dtype=np.intp)
+    lookup[labels] = np.arange(n)
+
+    ys, xs = np.nonzero(seg > 0)
+    group = lookup[seg[ys, xs]]
+    selected = group >= 0
+    ys, xs, group = ys[selected], xs[selected], group[selected]
+
+    background = np.broadcast_to(np.asarray(background, dtype=np.float64), (n,))
+    weights = np.asarray(image[ys, xs], dtype=np.float64) - background[group]
+    weights = np.clip(np.nan_to_num(weights), 0, None)
+
+    counts = np.bincount(group, minlength=n)
+    total = np.bincount(group, weights=weights, minlength=n)
+    has_flux = total > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Flux-weighted centroids, falling back to the geometric centre for empty segments
+        xc = np.where(has_flux, np.bincount(group, weights=weights * xs, minlength=n) / total,
+                      np.bincount(group, weights=xs, minlength=n) / counts)
+        yc = np.where(has_flux, np.bincount(group, weights=weights * ys, minlength=n) / total,
+                      np.bincount(group, weights=ys, minlength=n) / counts)
+    result['xcentroid'], result['ycentroid'] = xc, yc
+
+    r2 = (xs - xc[group]) ** 2 + (ys - yc[group]) ** 2
+
+    # FWHM from the flux-weighted second moment (<r^2> = 2 sigma^2 for a Gaussian)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        second_moment = np.bincount(group, weights=weights * r2, minlength=n) / total
+    result['fwhm'] = np.where(has_flux, 2.355 * np.sqrt(np.clip(second_moment / 2.0, 0, None)), 0.0)
+
+    # HFR: radius at which the cumulative flux of each group reaches half its total.
+    # Weights are non-negative, so the cumulative sum over all groups is monotonic
+    # and one searchsorted call finds every group's half-flux pixel.
+    order = np.lexsort((r2, group))
+    r2_sorted = r2[order]
+    cumulative = np.cumsum(weights[order])
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    offsets = np.where(starts > 0, cumulative[np.maximum(starts - 1, 0)], 0.0)
+    half_index = np.searchsorted(cumulative, offsets + total / 2.0, side='left')
+    half_index = np.clip(half_index, starts, np.maximum(ends - 1, starts))
+    valid = has_flux & (counts > 0)
+    result['hfr'][valid] = np.sqrt(r2_sorted[half_index[valid]])
+
+    return result
+
+
 def calculate_source_hfr_fwhm(image, segment_map, source_id, background=0.0):
     """
-    Calculate HFR and FWHM for a specific source using more accurate methods.
+    Calculate HFR and FWHM for a specific source.
+    
+    Only the bounding box of the source's segment is measured (taken from the
+    cached slices of a SegmentationImage, or located with find_objects for a
+    plain label array). Use calculate_sources_hfr_fwhm to measure a whole
+    catalog in one pass.
     
     Parameters:
     -----------
     image : np.ndarray
         2D image array
-    segment_map : np.ndarray
+    segment_map : SegmentationImage or np.ndarray
         Segmentation map from photutils
     source_id : int
         Source ID in the segmentation map
@@ -106,71 +444,21 @@ def calculate_source_hfr_fwhm(image, segment_map, source_id, background=0.0):
     tuple : (hfr, fwhm) in pixels
     """
     try:
-        # Create mask for this source
-        source_mask = (segment_map == source_id)
-        
-        if not np.any(source_mask):
-            return 0.0, 0.0
-        
-        # Get source region
-        y_coords, x_coords = np.where(source_mask)
-        y_min, y_max = y_coords.min(), y_coords.max()
-        x_min, x_max = x_coords.min(), x_coords.max()
-        
-        # Extract source region
-        source_region = image[y_min:y_max+1, x_min:x_max+1].copy()
-        source_mask_region = source_mask[y_min:y_max+1, x_min:x_max+1]
-        
-        # Subtract background
-        source_region = source_region - background
-        
-        # Calculate HFR (half flux radius)
-        total_flux = np.sum(source_region * source_mask_region)
-        half_flux = total_flux / 2.0
-        
-        if half_flux <= 0:
-            return 0.0, 0.0
-        
-        # Find radius containing half the flux
-        center_y, center_x = (y_max + y_min) / 2, (x_max + x_min) / 2
-        
-        # Calculate radial profile
-        y_grid, x_grid = np.ogrid[y_min:y_max+1, x_min:x_max+1]
-        r = np.sqrt((x_grid - center_x)**2 + (y_grid - center_y)**2)
-        
-        # Sort by radius and accumulate flux
-        r_flat = r.flatten()
-        flux_flat = source_region.flatten()
-        mask_flat = source_mask_region.flatten()
-        
-        # Only consider pixels in the source
-        valid_indices = mask_flat > 0
-        r_valid = r_flat[valid_indices]
-        flux_valid = flux_flat[valid_indices]
-        
-        if len(r_valid) == 0:
-            return 0.0, 0.0
-        
-        # Sort by radius
-        sort_indices = np.argsort(r_valid)
-        r_sorted = r_valid[sort_indices]
-        flux_sorted = flux_valid[sort_indices]
-        
-        # Find cumulative flux
-        cumulative_flux = np.cumsum(flux_sorted)
-        
-        # Find radius at half flux
-        half_flux_index = np.searchsorted(cumulative_flux, half_flux)
-        if half_flux_index < len(r_sorted):
-            hfr = r_sorted[half_flux_index]
+        if hasattr(segment_map, 'get_index'):
+            bbox = segment_map.slices[segment_map.get_index(source_id)]
+            seg = segment_map.data
         else:
-            hfr = r_sorted[-1]
+            from scipy.ndimage import find_objects
+            seg = np.asarray(segment_map)
+            found = find_objects(seg, max_label=source_id)
+            bbox = found[source_id - 1] if len(found) >= source_id else None
         
-        # Calculate FWHM (simplified approach)
-        # Use the semimajor axis from photutils if available, otherwise estimate
-        fwhm = 2.355 * np.sqrt(np.var(r_valid))  # Approximate FWHM
+        if bbox is None:
+            return 0.0, 0.0
         
-        return hfr, fwhm
+        measured = calculate_sources_hfr_fwhm(image[bbox], seg[bbox], labels=[source_id],
+                                              background=background)
+        return float(measured['hfr'][0]), float(measured['fwhm'][0])
         
     except Exception as e:
         logger.warning(f"Error calculating HFR/FWHM for source {source_id}: {e}")
@@ -234,15 +522,17 @@ class SourceDetectionResult:
     
     def __init__(self, success: bool, message: str = "", 
                  sources: List[DetectedSource] = None,
-                 background: Optional[np.ndarray] = None,
-                 background_rms: Optional[np.ndarray] = None,
+                 background: Optional[float] = None,
+                 background_rms: Optional[float] = None,
                  segmentation_map: Optional[np.ndarray] = None,
-                 detection_threshold: Optional[float] = None):
+                 detection_threshold: Optional[float] = None,
+                 background_model: Optional[SourceBackground] = None):
         self.success = success
         self.message = message
         self.sources = sources if sources is not None else []
-        self.background = background
-        self.background_rms = background_rms
+        self.background = background  # global background level
+        self.background_rms = background_rms  # global background noise
+        self.background_model = background_model
         self.segmentation_map = segmentation_map
         self.detection_threshold = detection_threshold
     
@@ -288,6 +578,134 @@ class SourceDetectionResult:
         }
 
 
+class SourceDetectionCancelled(SourceDetectionError):
+    """Exception raised when source detection is cancelled by the caller."""
+    pass
+
+
+def _check_cancelled(cancel_event):
+    """Raise SourceDetectionCancelled if the cancel event has been set."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise SourceDetectionCancelled("Source detection cancelled")
+
+
+def _segment_image(data: np.ndarray, threshold, npixels: int, connectivity: int,
+                   deblend: bool, deblend_nthresh: int, deblend_cont: float):
+    """Run detect_sources (and optionally deblend_sources) on background-subtracted data."""
+    segment_map = detect_sources(data, threshold, npixels=npixels, connectivity=connectivity)
+    if segment_map is None or segment_map.nlabels == 0 or not deblend:
+        return segment_map
+    from photutils.segmentation import deblend_sources
+    return deblend_sources(data, segment_map, npixels=npixels, nlevels=deblend_nthresh,
+                           contrast=deblend_cont, progress_bar=False)
+
+
+def _catalog_properties(cat, data: Optional[np.ndarray] = None, segment_map=None) -> Dict[str, np.ndarray]:
+    """
+    Extract the source properties used by the pipeline from a SourceCatalog
+    as plain float arrays (one entry per source).
+
+    When the catalog has no half_light_radius, the HFR is measured from the
+    (background-subtracted) data and segment_map if they are given.
+    """
+    def column(name):
+        values = getattr(cat, name)
+        values = getattr(values, 'value', values)
+        return np.atleast_1d(np.asarray(values, dtype=np.float64))
+
+    props = {name: column(name) for name in (
+        'area', 'eccentricity', 'segment_flux', 'xcentroid', 'ycentroid',
+        'max_value', 'semimajor_sigma', 'semiminor_sigma', 'fwhm')}
+    props['orientation'] = np.atleast_1d(np.asarray(cat.orientation.to(u.deg).value, dtype=np.float64))
+    # Note: HFR is the RADIUS containing half the flux, not diameter
+    if hasattr(cat, 'half_light_radius'):
+        props['hfr'] = column('half_light_radius')
+    elif data is not None and segment_map is not None:
+        props['hfr'] = calculate_sources_hfr_fwhm(data, segment_map, labels=cat.labels)['hfr']
+    else:
+        props['hfr'] = np.zeros_like(props['area'])
+    return props
+
+
+def _build_detected_sources(props: Dict[str, np.ndarray], backgrounds: np.ndarray,
+                            wcs: Optional[WCS], min_area: int, max_area: Optional[int],
+                            min_eccentricity: float, max_eccentricity: float,
+                            min_snr: float) -> Tuple[List[DetectedSource], int]:
+    """
+    Apply the detection filters to catalog properties and build DetectedSource objects.
+
+    Returns:
+    --------
+    tuple : (list of DetectedSource, number of filtered out sources)
+    """
+    props = {key: np.nan_to_num(values) for key, values in props.items()}
+    area = props['area']
+    flux = props['segment_flux']
+    backgrounds = np.asarray(backgrounds, dtype=np.float64)
+
+    # If HFR is not available, estimate it from the area
+    # (typical source profiles have an HFR smaller than their geometric radius)
+    hfr = np.where((props['hfr'] == 0.0) & (area > 0),
+                   0.5 * np.sqrt(np.clip(area, 0, None) / np.pi), props['hfr'])
+    # If FWHM is not available, estimate it from the sigma values (FWHM ≈ 2.355 * σ for Gaussian)
+    fwhm = np.where((props['fwhm'] == 0.0) & (props['semimajor_sigma'] > 0),
+                    2.355 * props['semimajor_sigma'], props['fwhm'])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        snr = flux / np.sqrt(flux + area * backgrounds)
+    snr = np.nan_to_num(snr)
+
+    keep = (area >= min_area)
+    if max_area is not None:
+        keep &= (area <= max_area)
+    keep &= (props['eccentricity'] >= min_eccentricity) & (props['eccentricity'] <= max_eccentricity)
+    keep &= (snr >= min_snr)
+    indices = np.flatnonzero(keep)
+
+    # Get image scale from WCS if available
+    image_scale = get_image_scale_from_wcs(wcs)
+    if image_scale is None:
+        # Default to 1 arcsec/pixel (common for many amateur setups)
+        image_scale = 1.0
+        logger.info("Using default image scale: 1.0 arcsec/pixel")
+    else:
+        logger.info(f"Using image scale from WCS: {image_scale:.3f} arcsec/pixel")
+
+    # Convert pixel coordinates to sky coordinates if WCS is available
+    ras = decs = None
+    if wcs is not None and len(indices) > 0:
+        try:
+            sky_coords = wcs.pixel_to_world(props['xcentroid'][indices], props['ycentroid'][indices])
+            ras, decs = sky_coords.ra.deg, sky_coords.dec.deg
+        except Exception as e:
+            logger.warning(f"Could not convert source coordinates: {e}")
+
+    sources = []
+    for n, i in enumerate(indices):
+        sources.append(DetectedSource(
+            id=int(i) + 1,
+            x=float(props['xcentroid'][i]),
+            y=float(props['ycentroid'][i]),
+            ra=float(ras[n]) if ras is not None else None,
+            dec=float(decs[n]) if decs is not None else None,
+            flux=float(flux[i]),
+            area=float(area[i]),
+            eccentricity=float(props['eccentricity'][i]),
+            semimajor_axis=float(props['semimajor_sigma'][i]),
+            semiminor_axis=float(props['semiminor_sigma'][i]),
+            orientation=float(props['orientation'][i]),
+            peak_value=float(props['max_value'][i]),
+            background=float(backgrounds[i]),
+            snr=float(snr[i]),
+            hfr=float(hfr[i]),
+            fwhm=float(fwhm[i]),
+            hfr_arcsec=float(hfr[i]) * image_scale,
+            fwhm_arcsec=float(fwhm[i]) * image_scale
+        ))
+
+    return sources, len(area) - len(indices)
+
+
 def detect_sources_in_image(image: np.ndarray, 
                            wcs: Optional[WCS] = None,
                            threshold_sigma: float = 2.0,
@@ -302,7 +720,10 @@ def detect_sources_in_image(image: np.ndarray,
                            max_area: Optional[int] = None,
                            min_eccentricity: float = 0.0,
                            max_eccentricity: float = 1.0,
-                           min_snr: float = 3.0) -> SourceDetectionResult:
+                           min_snr: float = 3.0,
+                           background_mode: str = 'scalar',
+                           background_downsample: int = 4,
+                           cancel_event=None) -> SourceDetectionResult:
     """
     Detect sources in an astronomical image using photutils.
     
@@ -325,9 +746,9 @@ def detect_sources_in_image(image: np.ndarray,
     deblend_cont : float
         Minimum contrast ratio for deblending
     background_box_size : int
-        Box size for background estimation
+        Box size for background estimation ('mesh' mode only)
     background_filter_size : int
-        Filter size for background estimation
+        Filter size for background estimation ('mesh' mode only)
     min_area : int
         Minimum area in pixels for a source
     max_area : Optional[int]
@@ -338,7 +759,15 @@ def detect_sources_in_image(image: np.ndarray,
         Maximum eccentricity for a source
     min_snr : float
         Minimum signal-to-noise ratio for a source
-    
+    background_mode : str
+        'scalar' for a single global background level, 'mesh' for a
+        Background2D model computed on a downsampled grid (see SourceBackground)
+    background_downsample : int
+        Downsampling factor of the 'mesh' background grid
+    cancel_event : Optional[threading.Event]
+        When set, detection stops at the next step boundary and returns a
+        failed result with a "cancelled" message
+
     Returns:
     --------
     SourceDetectionResult
@@ -358,7 +787,8 @@ def detect_sources_in_image(image: np.ndarray,
         logger.info(f"  min_eccentricity={min_eccentricity}")
         logger.info(f"  max_eccentricity={max_eccentricity}")
         logger.info(f"  min_snr={min_snr}")
-        
+        logger.info(f"  background_mode={background_mode}")
+
         # Validate input
         if image is None or image.size == 0:
             raise SourceDetectionError("Input image is empty or None")
@@ -377,76 +807,40 @@ def detect_sources_in_image(image: np.ndarray,
         
         # Estimate background
         logger.info("Step 1: Estimating background...")
-        logger.info(f"Using box_size={background_box_size}, filter_size={background_filter_size}")
-        
-        # Always use simple background estimation for reliability
-        logger.info("Using simple background estimation with sigma-clipped stats")
+        if background_mode == 'mesh':
+            logger.info(f"Using mesh background: box_size={background_box_size}, "
+                        f"filter_size={background_filter_size}, downsample={background_downsample}")
+        else:
+            logger.info("Using scalar background from sigma-clipped stats of a pixel subsample")
         start_time = time.time()
-        
-        logger.info("Computing sigma-clipped statistics...")
-        logger.info("This may take a while for large images...")
-        background_mean, background_median, background_std = sigma_clipped_stats(image, sigma=3.0)
+        bkg = SourceBackground(image, mode=background_mode,
+                               box_size=background_box_size,
+                               filter_size=background_filter_size,
+                               downsample=background_downsample)
         logger.info(f"Background estimation completed in {time.time() - start_time:.2f} seconds")
         logger.info(f"Memory usage after background estimation: {get_memory_usage():.1f} MB")
-        logger.info(f"Simple background estimation: mean={background_mean:.2f}, median={background_median:.2f}, std={background_std:.2f}")
-        
-        # Create a simple background array
-        logger.info("Creating background arrays...")
-        start_time = time.time()
-        bkg_background = np.full_like(image, background_median)
-        bkg_background_rms = np.full_like(image, background_std)
-        logger.info(f"Background arrays created in {time.time() - start_time:.2f} seconds")
-        logger.info(f"Memory usage after background arrays: {get_memory_usage():.1f} MB")
-        
-        # Create a simple background object for compatibility
-        class SimpleBackground:
-            def __init__(self, background, background_rms):
-                self.background = background
-                self.background_rms = background_rms
-        
-        bkg = SimpleBackground(bkg_background, bkg_background_rms)
-        
-        logger.info("Background estimation completed")
-        
-        # Debug: print background statistics
-        logger.info(f"Background mean: {np.mean(bkg.background):.2f}")
-        logger.info(f"Background std: {np.std(bkg.background):.2f}")
-        logger.info(f"Background min/max: {np.min(bkg.background):.2f} / {np.max(bkg.background):.2f}")
+        logger.info(f"Background estimation: mean={bkg.mean:.2f}, median={bkg.median:.2f}, rms={bkg.rms:.2f}")
         
         # Subtract background
+        _check_cancelled(cancel_event)
         logger.info("Step 2: Subtracting background...")
         start_time = time.time()
-        logger.info("Subtracting background from image...")
-        image_cleaned = image - bkg.background
+        image_cleaned = bkg.subtract_from(image)
         logger.info(f"Background subtraction completed in {time.time() - start_time:.2f} seconds")
         logger.info(f"Memory usage after background subtraction: {get_memory_usage():.1f} MB")
         
-        # Debug: print cleaned image statistics
-        logger.info(f"Cleaned image mean: {np.mean(image_cleaned):.2f}")
-        logger.info(f"Cleaned image std: {np.std(image_cleaned):.2f}")
-        logger.info(f"Cleaned image min/max: {np.min(image_cleaned):.2f} / {np.max(image_cleaned):.2f}")
+        bkg.log_debug_statistics(image_cleaned)
         
-        # Calculate detection threshold
+        # Calculate detection threshold from the background noise estimate
+        # (detect_threshold would run another sigma-clipping pass over the full image)
         logger.info("Step 3: Calculating detection threshold...")
         logger.info(f"Using threshold_sigma={threshold_sigma}")
-        start_time = time.time()
-        
-        logger.info("Calling detect_threshold...")
-        logger.info("This is often the slowest step for large images...")
-        threshold = detect_threshold(image_cleaned, nsigma=threshold_sigma)
-        logger.info(f"Threshold calculation completed in {time.time() - start_time:.2f} seconds")
-        logger.info(f"Memory usage after threshold calculation: {get_memory_usage():.1f} MB")
-        
-        # If threshold is an array, use the mean
-        if hasattr(threshold, '__len__') and len(threshold) > 1:
-            threshold_value = float(np.mean(threshold))
-            logger.info(f"Threshold is an array with {len(threshold)} elements")
-        else:
-            threshold_value = float(threshold)
+        threshold = threshold_sigma * bkg.rms
+        threshold_value = float(threshold)
         logger.info(f"Detection threshold: {threshold_value:.4f}")
         
         # Debug: check if threshold is reasonable
-        max_cleaned = np.max(image_cleaned)
+        max_cleaned = float(np.nanmax(image_cleaned))
         logger.info(f"Max value in cleaned image: {max_cleaned:.2f}")
         if threshold_value > max_cleaned:
             logger.warning(f"Threshold ({threshold_value:.2f}) is higher than max cleaned value ({max_cleaned:.2f})")
@@ -456,6 +850,7 @@ def detect_sources_in_image(image: np.ndarray,
             threshold = threshold_value
         
         # Detect sources
+        _check_cancelled(cancel_event)
         logger.info("Step 4: Detecting sources...")
         logger.info(f"Using npixels={npixels}, connectivity={connectivity}")
         start_time = time.time()
@@ -486,6 +881,7 @@ def detect_sources_in_image(image: np.ndarray,
         
         # Deblend sources if requested
         if deblend:
+            _check_cancelled(cancel_event)
             logger.info("Step 5: Deblending sources...")
             logger.info(f"Using deblend_nthresh={deblend_nthresh}, deblend_cont={deblend_cont}")
             start_time = time.time()
@@ -500,11 +896,12 @@ def detect_sources_in_image(image: np.ndarray,
             logger.info(f"After deblending: {segment_map.nlabels} sources")
         
         # Extract source properties
+        _check_cancelled(cancel_event)
         logger.info("Step 6: Extracting source properties...")
         start_time = time.time()
         logger.info("Creating SourceCatalog...")
         logger.info("This step analyzes each detected source...")
-        cat = SourceCatalog(image_cleaned, segment_map, background=bkg.background)
+        cat = SourceCatalog(image_cleaned, segment_map)
         logger.info(f"Source catalog creation completed in {time.time() - start_time:.2f} seconds")
         logger.info(f"Memory usage after catalog creation: {get_memory_usage():.1f} MB")
         
@@ -514,132 +911,16 @@ def detect_sources_in_image(image: np.ndarray,
         logger.info("Step 7: Filtering sources...")
         logger.info(f"Filtering criteria: min_area={min_area}, min_snr={min_snr}")
         start_time = time.time()
-        sources = []
-        filtered_count = 0
-        
-        logger.info("Processing source properties...")
-        logger.info(f"Will process {len(cat)} sources...")
-        
-        # More frequent progress updates for large catalogs
-        progress_interval = max(1, len(cat) // 20)  # Show progress ~20 times
+        _check_cancelled(cancel_event)
         
-        for i, prop in enumerate(cat):
-            if i % progress_interval == 0:  # Log progress more frequently
-                logger.info(f"Processing source {i+1}/{len(cat)} ({i/len(cat)*100:.1f}%)...")
-            
-            # Convert properties to scalar values
-            area = float(prop.area.value) if hasattr(prop.area, 'value') else float(prop.area)
-            eccentricity = float(prop.eccentricity.value) if hasattr(prop.eccentricity, 'value') else float(prop.eccentricity)
-            segment_flux = float(prop.segment_flux.value) if hasattr(prop.segment_flux, 'value') else float(prop.segment_flux)
-            background_mean = float(prop.background_mean.value) if hasattr(prop.background_mean, 'value') else float(prop.background_mean)
-            xcentroid = float(prop.xcentroid.value) if hasattr(prop.xcentroid, 'value') else float(prop.xcentroid)
-            ycentroid = float(prop.ycentroid.value) if hasattr(prop.ycentroid, 'value') else float(prop.ycentroid)
-            max_value = float(prop.max_value.value) if hasattr(prop.max_value, 'value') else float(prop.max_value)
-            semimajor_sigma = float(prop.semimajor_sigma.value) if hasattr(prop.semimajor_sigma, 'value') else float(prop.semimajor_sigma)
-            semiminor_sigma = float(prop.semiminor_sigma.value) if hasattr(prop.semiminor_sigma, 'value') else float(prop.semiminor_sigma)
-            orientation = float(prop.orientation.to(u.deg).value)
-            
-            # Extract HFR and FWHM if available
-            hfr = 0.0
-            fwhm = 0.0
-            
-            # Try to get HFR (half flux radius) from photutils
-            # Note: HFR is the RADIUS containing half the flux, not diameter
-            if hasattr(prop, 'half_light_radius'):
-                try:
-                    hfr = float(prop.half_light_radius.value) if hasattr(prop.half_light_radius, 'value') else float(prop.half_light_radius)
-                    logger.debug(f"Source {i}: HFR from photutils: {hfr:.3f} pixels")
-                except:
-                    hfr = 0.0
-            
-            # Try to get FWHM
-            if hasattr(prop, 'fwhm'):
-                try:
-                    fwhm = float(prop.fwhm.value) if hasattr(prop.fwhm, 'value') else float(prop.fwhm)
-                except:
-                    fwhm = 0.0
-            
-            # If HFR is not available, estimate it from the area
-            if hfr == 0.0 and area > 0:
-                # More accurate HFR estimation: typically HFR ≈ 0.5 * sqrt(area)
-                # This is based on typical source profiles where HFR is smaller than geometric radius
-                hfr = 0.5 * np.sqrt(area / np.pi)  # Conservative estimate for HFR
-                logger.debug(f"Source {i}: HFR estimated from area: {hfr:.3f} pixels (area={area:.1f})")
-            
-            # If FWHM is not available, estimate it from the sigma values
-            if fwhm == 0.0 and semimajor_sigma > 0:
-                fwhm = 2.355 * semimajor_sigma  # FWHM ≈ 2.355 * σ for Gaussian
-            
-            # Calculate arcsecond values from pixel values
-            hfr_arcsec = 0.0
-            fwhm_arcsec = 0.0
-            
-            # Get image scale from WCS if available
-            image_scale = get_image_scale_from_wcs(wcs)
-            
-            # If no WCS scale, use a default value (common for many telescopes)
-            if image_scale is None:
-                # Default to 1 arcsec/pixel (common for many amateur setups)
-                # This can be overridden by the user or extracted from FITS headers
-                image_scale = 1.0
-                logger.info("Using default image scale: 1.0 arcsec/pixel")
-            else:
-                logger.info(f"Using image scale from WCS: {image_scale:.3f} arcsec/pixel")
-            
-            # Convert pixel values to arcseconds
-            hfr_arcsec = hfr * image_scale
-            fwhm_arcsec = fwhm * image_scale
-            
-            # Apply filters
-            if area < min_area:
-                filtered_count += 1
-                continue
-            if max_area is not None and area > max_area:
-                filtered_count += 1
-                continue
-            if eccentricity < min_eccentricity or eccentricity > max_eccentricity:
-                filtered_count += 1
-                continue
-            
-            # Calculate SNR
-            snr = segment_flux / np.sqrt(segment_flux + area * background_mean)
-            
-            if snr < min_snr:
-                filtered_count += 1
-                continue
-            
-            # Convert pixel coordinates to sky coordinates if WCS is available
-            ra, dec = None, None
-            if wcs is not None:
-                try:
-                    sky_coords = wcs.pixel_to_world(xcentroid, ycentroid)
-                    ra = sky_coords.ra.deg
-                    dec = sky_coords.dec.deg
-                except Exception as e:
-                    logger.warning(f"Could not convert coordinates for source {i}: {e}")
-            
-            # Create source object
-            source = DetectedSource(
-                id=i + 1,
-                x=xcentroid,
-                y=ycentroid,
-                ra=ra,
-                dec=dec,
-                flux=segment_flux,
-                area=area,
-                eccentricity=eccentricity,
-                semimajor_axis=semimajor_sigma,
-                semiminor_axis=semiminor_sigma,
-                orientation=orientation,
-                peak_value=max_value,
-                background=background_mean,
-                snr=snr,
-                hfr=hfr,
-                fwhm=fwhm,
-                hfr_arcsec=hfr_arcsec,
-                fwhm_arcsec=fwhm_arcsec
-            )
-            sources.append(source)
+        props = _catalog_properties(cat, image_cleaned, segment_map)
+        # Background level under each source, evaluated from the background model
+        backgrounds = bkg.background_at(props['xcentroid'], props['ycentroid'])
+        sources, filtered_count = _build_detected_sources(
+            props, backgrounds, wcs,
+            min_area=min_area, max_area=max_area,
+            min_eccentricity=min_eccentricity, max_eccentricity=max_eccentricity,
+            min_snr=min_snr)
         
         logger.info(f"Source filtering completed in {time.time() - start_time:.2f} seconds")
         logger.info(f"Memory usage after filtering: {get_memory_usage():.1f} MB")
@@ -655,12 +936,16 @@ def detect_sources_in_image(image: np.ndarray,
             success=True,
             message=f"Successfully detected {len(sources)} sources",
             sources=sources,
-            background=bkg.background,
-            background_rms=bkg.background_rms,
+            background=bkg.median,
+            background_rms=bkg.rms,
             segmentation_map=segment_map.data,
-            detection_threshold=threshold
+            detection_threshold=threshold,
+            background_model=bkg
         )
         
+    except SourceDetectionCancelled as e:
+        logger.info("Source detection cancelled")
+        return SourceDetectionResult(success=False, message=str(e))
     except Exception as e:
         logger.error(f"Source detection failed: {e}")
         import traceback
@@ -671,8 +956,252 @@ def detect_sources_in_image(image: np.ndarray,
         )
 
 
+def _tile_layout(shape: Tuple[int, int], tile_size: int, overlap: int) -> List[Tuple[int, ...]]:
+    """
+    Split an image into tiles.
+
+    Each tile owns a 'core' region; cores partition the image. The tile itself
+    is the core grown by `overlap` pixels on every side (clipped to the image),
+    so a source near a core edge is still seen whole by the tile owning it.
+
+    Returns:
+    --------
+    list : (y0, y1, x0, x1, core_y0, core_y1, core_x0, core_x1) tuples
+    """
+    ny, nx = shape
+    tiles = []
+    for cy0 in range(0, ny, tile_size):
+        cy1 = min(cy0 + tile_size, ny)
+        for cx0 in range(0, nx, tile_size):
+            cx1 = min(cx0 + tile_size, nx)
+            tiles.append((max(0, cy0 - overlap), min(ny, cy1 + overlap),
+                          max(0, cx0 - overlap), min(nx, cx1 + overlap),
+                          cy0, cy1, cx0, cx1))
+    return tiles
+
+
+def _detect_tile_worker(shm_name: str, shape: Tuple[int, int], tile: Tuple[int, ...],
+                        threshold: float, npixels: int, connectivity: int, deblend: bool,
+                        deblend_nthresh: int, deblend_cont: float) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Process pool worker: detect, deblend and measure the sources of one tile of
+    the background-subtracted image held in shared memory.
+
+    Only sources whose centroid falls in the tile core are returned, with
+    centroids converted to full-frame coordinates.
+    """
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        image = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        y0, y1, x0, x1, cy0, cy1, cx0, cx1 = tile
+        # Copy the tile out so no view on the shared buffer outlives this call
+        data = np.array(image[y0:y1, x0:x1])
+        del image
+    finally:
+        shm.close()
+
+    segment_map = _segment_image(data, threshold, npixels, connectivity,
+                                 deblend, deblend_nthresh, deblend_cont)
+    if segment_map is None or segment_map.nlabels == 0:
+        return None
+
+    props = _catalog_properties(SourceCatalog(data, segment_map), data, segment_map)
+    props['xcentroid'] += x0
+    props['ycentroid'] += y0
+    # Drop duplicates: sources centred in the overlap belong to a neighbouring tile
+    owned = ((props['xcentroid'] >= cx0) & (props['xcentroid'] < cx1) &
+             (props['ycentroid'] >= cy0) & (props['ycentroid'] < cy1))
+    return {key: values[owned] for key, values in props.items()}
+
+
+def detect_sources_tiled(image: np.ndarray,
+                         wcs: Optional[WCS] = None,
+                         tile_size: int = 2048,
+                         overlap: int = 64,
+                         max_workers: Optional[int] = None,
+                         cancel_event=None,
+                         progress_callback=None,
+                         threshold_sigma: float = 2.0,
+                         npixels: int = 5,
+                         connectivity: int = 8,
+                         deblend: bool = True,
+                         deblend_nthresh: int = 32,
+                         deblend_cont: float = 0.005,
+                         background_box_size: int = 50,
+                         background_filter_size: int = 3,
+                         min_area: int = 5,
+                         max_area: Optional[int] = None,
+                         min_eccentricity: float = 0.0,
+                         max_eccentricity: float = 1.0,
+                         min_snr: float = 3.0,
+                         background_mode: str = 'scalar',
+                         background_downsample: int = 4) -> SourceDetectionResult:
+    """
+    Detect sources in a large image by processing overlapping tiles in parallel.
+
+    The background is modelled once for the whole frame, the background-subtracted
+    image is placed in shared memory, and each tile is detected, deblended and
+    measured in a separate process. Results are merged by keeping, for every
+    source, only the detection from the tile whose core contains its centroid.
+    Detection parameters are the same as for detect_sources_in_image.
+
+    Parameters:
+    -----------
+    image : np.ndarray
+        Input image as a 2D numpy array
+    wcs : Optional[WCS]
+        World Coordinate System object for converting pixel to sky coordinates
+    tile_size : int
+        Size in pixels of the tile cores
+    overlap : int
+        Margin in pixels added around each core; should exceed the size of the
+        largest source to be measured
+    max_workers : Optional[int]
+        Number of worker processes (defaults to the CPU count, capped at the
+        number of tiles)
+    cancel_event : Optional[threading.Event]
+        When set, pending tiles are cancelled and a failed result is returned
+    progress_callback : Optional[callable]
+        Called as progress_callback(done_tiles, total_tiles)
+
+    Returns:
+    --------
+    SourceDetectionResult
+        Object containing detection results; segmentation_map is None since
+        the tile segmentation maps are not merged
+    """
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+    from multiprocessing import get_context, shared_memory
+
+    shm = None
+    try:
+        if image is None or image.size == 0:
+            raise SourceDetectionError("Input image is empty or None")
+        if len(image.shape) != 2:
+            raise SourceDetectionError("Input image must be 2D")
+
+        logger.info("=" * 60)
+        logger.info("STARTING TILED SOURCE DETECTION")
+        logger.info("=" * 60)
+        logger.info(f"Image shape: {image.shape}, tile size: {tile_size}, overlap: {overlap}")
+
+        start_time = time.time()
+        bkg = SourceBackground(image, mode=background_mode,
+                               box_size=background_box_size,
+                               filter_size=background_filter_size,
+                               downsample=background_downsample)
+        logger.info(f"Background estimation: median={bkg.median:.2f}, rms={bkg.rms:.2f} "
+                    f"({time.time() - start_time:.2f} seconds)")
+        _check_cancelled(cancel_event)
+
+        # Background-subtracted pixels go straight into shared memory for the workers
+        shm = shared_memory.SharedMemory(create=True, size=image.size * np.dtype(np.float32).itemsize)
+        shared_image = np.ndarray(image.shape, dtype=np.float32, buffer=shm.buf)
+        bkg.subtract_from(image, out=shared_image)
+        bkg.log_debug_statistics(shared_image)
+        threshold = threshold_sigma * bkg.rms
+        del shared_image
+        logger.info(f"Detection threshold: {threshold:.4f}")
+        _check_cancelled(cancel_event)
+
+        tiles = _tile_layout(image.shape, tile_size, overlap)
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        max_workers = max(1, min(max_workers, len(tiles)))
+        logger.info(f"Processing {len(tiles)} tiles with {max_workers} worker processes")
+
+        tile_results = []
+        # 'spawn' avoids forking a process that may be running Qt threads
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context('spawn'))
+        cancelled = False
+        try:
+            pending = {executor.submit(_detect_tile_worker, shm.name, image.shape, tile, threshold,
+                                       npixels, connectivity, deblend, deblend_nthresh, deblend_cont)
+                       for tile in tiles}
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                if cancel_event is not None and cancel_event.is_set():
+                    cancelled = True
+                    raise SourceDetectionCancelled("Source detection cancelled")
+                for future in done:
+                    props = future.result()
+                    if props is not None:
+                        tile_results.append(props)
+                if done:
+                    completed = len(tiles) - len(pending)
+                    logger.info(f"Tiles completed: {completed}/{len(tiles)}")
+                    if progress_callback is not None:
+                        progress_callback(completed, len(tiles))
+        finally:
+            # On cancellation, return right away: queued tiles are dropped and
+            # tiles already running finish in the background
+            executor.shutdown(wait=not cancelled, cancel_futures=True)
+
+        logger.info(f"Tile detection completed in {time.time() - start_time:.2f} seconds")
+
+        if not tile_results:
+            return SourceDetectionResult(
+                success=True,
+                message="No sources detected above threshold",
+                detection_threshold=threshold,
+                background=bkg.median,
+                background_rms=bkg.rms,
+                background_model=bkg
+            )
+
+        # Merge tiles in a stable (row-major) order so ids are reproducible
+        props = {key: np.concatenate([result[key] for result in tile_results])
+                 for key in tile_results[0]}
+        order = np.lexsort((props['xcentroid'], props['ycentroid']))
+        props = {key: values[order] for key, values in props.items()}
+
+        backgrounds = bkg.background_at(props['xcentroid'], props['ycentroid'])
+        sources, filtered_count = _build_detected_sources(
+            props, backgrounds, wcs,
+            min_area=min_area, max_area=max_area,
+            min_eccentricity=min_eccentricity, max_eccentricity=max_eccentricity,
+            min_snr=min_snr)
+
+        logger.info(f"Filtered out {filtered_count} sources, kept {len(sources)} sources")
+        logger.info("=" * 60)
+        logger.info("TILED SOURCE DETECTION COMPLETED")
+        logger.info(f"Total sources detected: {len(sources)} in {time.time() - start_time:.2f} seconds")
+        logger.info("=" * 60)
+
+        return SourceDetectionResult(
+            success=True,
+            message=f"Successfully detected {len(sources)} sources",
+            sources=sources,
+            background=bkg.median,
+            background_rms=bkg.rms,
+            detection_threshold=threshold,
+            background_model=bkg
+        )
+
+    except SourceDetectionCancelled as e:
+        logger.info("Source detection cancelled")
+        return SourceDetectionResult(success=False, message=str(e))
+    except Exception as e:
+        logger.error(f"Tiled source detection failed: {e}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return SourceDetectionResult(
+            success=False,
+            message=f"Source detection failed: {str(e)}"
+        )
+    finally:
+        if shm is not None:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+            shm.unlink()
+
+
 def detect_sources_from_fits(fits_file_path: str,
-                            extension: int = 0,
+                            extension: Optional[int] = None,
                             **kwargs) -> SourceDetectionResult:
     """
     Detect sources from a FITS file.
@@ -681,8 +1210,9 @@ def detect_sources_from_fits(fits_file_path: str,
     -----------
     fits_file_path : str
         Path to the FITS file
-    extension : int
-        FITS extension to use (0 for primary)
+    extension : int, optional
+        FITS extension to use (default: the image HDU, which is the first
+        extension of tile-compressed files)
     **kwargs
         Additional arguments passed to detect_sources_in_image
     
@@ -693,9 +1223,12 @@ def detect_sources_from_fits(fits_file_path: str,
     """
     try:
         from astropy.io import fits
+        from lib.fits.compression import image_hdu_index
         
         # Read FITS file
         with fits.open(fits_file_path) as hdul:
+            if extension is None:
+                extension = image_hdu_index(hdul)
             image = hdul[extension].data
             header = hdul[extension].header
             
@@ -717,17 +1250,126 @@ def detect_sources_from_fits(fits_file_path: str,
         )
 
 
-def aperture_photometry_sources(image: np.ndarray,
-                               sources: List[DetectedSource],
-                               aperture_radius: float = 3.0,
-                               background_annulus: Tuple[float, float] = (5.0, 8.0)) -> List[Dict]:
+def extract_star_list(image: np.ndarray, max_stars: int = 300,
+                      downsample: int = 2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    Perform aperture photometry on detected sources.
+    Extract the brightest stars of an image, e.g. to feed a plate solver.
+    
+    Detection runs on a block-averaged copy of the image with a scalar
+    background and no deblending, which is all a solver needs.
     
     Parameters:
     -----------
     image : np.ndarray
         Input image
+    max_stars : int
+        Maximum number of stars to return
+    downsample : int
+        Block-averaging factor applied before detection
+    
+    Returns:
+    --------
+    tuple : (x, y, flux) arrays sorted by decreasing flux, with 0-based pixel
+        coordinates in the full-resolution image
+    """
+    factor = max(1, int(downsample))
+    small = block_average(image, factor) if factor > 1 else np.asarray(image, dtype=np.float32)
+    
+    result = detect_sources_in_image(small, threshold_sigma=3.0, npixels=4, deblend=False,
+                                     min_area=3, max_area=None, max_eccentricity=0.95, min_snr=5.0)
+    if not result.success:
+        raise SourceDetectionError(result.message)
+    
+    if not result.sources:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty, empty
+    
+    x = np.array([s.x for s in result.sources])
+    y = np.array([s.y for s in result.sources])
+    flux = np.array([s.flux for s in result.sources])
+    order = np.argsort(flux)[::-1][:max_stars]
+    
+    # Block centre in full-resolution pixel coordinates
+    return (x[order] + 0.5) * factor - 0.5, (y[order] + 0.5) * factor - 0.5, flux[order]
+
+
+def _annulus_pixel_indices(positions: np.ndarray, shape: Tuple[int, int],
+                           r_in: float, r_out: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Flat image indices of the background annulus pixels of every position.
+
+    A pixel belongs to an annulus when its centre lies at a distance d with
+    r_in <= d < r_out from the position (photutils 'center' method). Pixels
+    outside the image are flagged invalid rather than read as zeros.
+
+    Returns:
+    --------
+    tuple : (indices, valid), both of shape (n_positions, n_candidate_pixels)
+    """
+    half = int(np.ceil(r_out)) + 1
+    offsets = np.arange(-half, half + 1)
+    off_y, off_x = (o.ravel() for o in np.meshgrid(offsets, offsets, indexing='ij'))
+
+    base_x = np.round(positions[:, 0]).astype(np.intp)
+    base_y = np.round(positions[:, 1]).astype(np.intp)
+    px = base_x[:, None] + off_x[None, :]
+    py = base_y[:, None] + off_y[None, :]
+
+    d2 = (px - positions[:, 0:1]) ** 2 + (py - positions[:, 1:2]) ** 2
+    valid = (d2 >= r_in ** 2) & (d2 < r_out ** 2)
+    valid &= (px >= 0) & (px < shape[1]) & (py >= 0) & (py < shape[0])
+
+    indices = np.clip(py, 0, shape[0] - 1) * shape[1] + np.clip(px, 0, shape[1] - 1)
+    return indices, valid
+
+
+def _photometry_results(sources: List[DetectedSource], aperture_sums: np.ndarray,
+                        aperture_area: float, bkg_mean: np.ndarray, bkg_median: np.ndarray,
+                        bkg_std: np.ndarray) -> List[Dict]:
+    """Assemble the per-source photometry dictionaries from measurement arrays."""
+    final_sums = aperture_sums - bkg_median * aperture_area
+    with np.errstate(invalid='ignore'):
+        flux_errors = np.sqrt(aperture_sums + aperture_area * bkg_std ** 2)
+        snr = np.where(flux_errors > 0, final_sums / flux_errors, 0.0)
+
+    return [
+        {
+            'source_id': source.id,
+            'x': source.x,
+            'y': source.y,
+            'ra': source.ra,
+            'dec': source.dec,
+            'aperture_sum': aperture_sums[i],
+            'background_subtracted_sum': final_sums[i],
+            'background_mean': bkg_mean[i],
+            'background_median': bkg_median[i],
+            'background_std': bkg_std[i],
+            'flux_error': flux_errors[i],
+            'aperture_area': aperture_area,
+            'snr': snr[i]
+        }
+        for i, source in enumerate(sources)
+    ]
+
+
+def aperture_photometry_sequence(images,
+                                 sources: List[DetectedSource],
+                                 aperture_radius: float = 3.0,
+                                 background_annulus: Tuple[float, float] = (5.0, 8.0)) -> List[List[Dict]]:
+    """
+    Perform aperture photometry of the same sources on a sequence of frames.
+    
+    All sources are measured at once: a single multi-position aperture gives
+    every aperture sum in one call, and the annulus pixels of all sources are
+    gathered into one NaN-padded stack whose sigma-clipped statistics are
+    computed along the pixel axis. The aperture and the annulus pixel indices
+    are computed once and reused for every frame, so the frames must share the
+    same shape and registration (e.g. an aligned sequence).
+    
+    Parameters:
+    -----------
+    images : sequence of np.ndarray or 3D np.ndarray
+        Frames to measure
     sources : List[DetectedSource]
         List of detected sources
     aperture_radius : float
@@ -737,61 +1379,77 @@ def aperture_photometry_sources(image: np.ndarray,
     
     Returns:
     --------
-    List[Dict]
-        List of dictionaries containing photometry results
+    List[List[Dict]]
+        One list of photometry results per frame (see aperture_photometry_sources)
     """
+    images = list(images)
     try:
-        from photutils.aperture import CircularAperture, CircularAnnulus, aperture_photometry
+        import warnings
+        from photutils.aperture import CircularAperture, aperture_photometry
         from astropy.stats import sigma_clipped_stats
+        from astropy.utils.exceptions import AstropyUserWarning
         
-        results = []
+        if not sources:
+            return [[] for _ in images]
         
-        for source in sources:
-            # Create aperture
-            position = (source.x, source.y)
-            aperture = CircularAperture(position, r=aperture_radius)
-            
-            # Create background annulus
-            annulus = CircularAnnulus(position, r_in=background_annulus[0], 
-                                    r_out=background_annulus[1])
+        positions = np.array([(source.x, source.y) for source in sources], dtype=np.float64)
+        aperture = CircularAperture(positions, r=aperture_radius)
+        aperture_area = aperture.area
+        
+        shape = None
+        indices = valid = None
+        frame_results = []
+        
+        for image in images:
+            if shape != image.shape:
+                if shape is not None:
+                    raise ValueError(f"All frames must have the same shape ({shape} != {image.shape})")
+                shape = image.shape
+                indices, valid = _annulus_pixel_indices(positions, shape, *background_annulus)
             
-            # Perform photometry
             phot_table = aperture_photometry(image, aperture)
+            aperture_sums = np.asarray(phot_table['aperture_sum'], dtype=np.float64)
             
-            # Calculate background
-            annulus_masks = annulus.to_mask(method='center')
-            annulus_data = annulus_masks.multiply(image)
-            mask = annulus_masks.data
-            annulus_data_1d = annulus_data[mask > 0]
-            bkg_mean, bkg_median, bkg_std = sigma_clipped_stats(annulus_data_1d)
-            
-            # Calculate background-subtracted flux
-            aperture_area = aperture.area
-            bkg_sum = bkg_median * aperture_area
-            final_sum = phot_table['aperture_sum'][0] - bkg_sum
-            
-            # Calculate error
-            flux_error = np.sqrt(phot_table['aperture_sum'][0] + aperture_area * bkg_std**2)
+            # NaN-padded stack of annulus pixels, one row per source
+            stack = np.asarray(image).ravel()[indices].astype(np.float64)
+            stack[~valid] = np.nan
+            with warnings.catch_warnings():
+                # The padding NaNs are expected and are ignored by the clipping
+                warnings.simplefilter('ignore', AstropyUserWarning)
+                bkg_mean, bkg_median, bkg_std = sigma_clipped_stats(stack, axis=1)
             
-            result = {
-                'source_id': source.id,
-                'x': source.x,
-                'y': source.y,
-                'ra': source.ra,
-                'dec': source.dec,
-                'aperture_sum': phot_table['aperture_sum'][0],
-                'background_subtracted_sum': final_sum,
-                'background_mean': bkg_mean,
-                'background_median': bkg_median,
-                'background_std': bkg_std,
-                'flux_error': flux_error,
-                'aperture_area': aperture_area,
-                'snr': final_sum / flux_error if flux_error > 0 else 0.0
-            }
-            results.append(result)
+            frame_results.append(_photometry_results(
+                sources, aperture_sums, aperture_area,
+                np.asarray(bkg_mean), np.asarray(bkg_median), np.asarray(bkg_std)))
         
-        return results
+        return frame_results
         
     except Exception as e:
         logger.error(f"Aperture photometry failed: {e}")
-        return []
+        return [[] for _ in images]
+
+
+def aperture_photometry_sources(image: np.ndarray,
+                               sources: List[DetectedSource],
+                               aperture_radius: float = 3.0,
+                               background_annulus: Tuple[float, float] = (5.0, 8.0)) -> List[Dict]:
+    """
+    Perform aperture photometry on detected sources.
+    
+    Parameters:
+    -----------
+    image : np.ndarray
+        Input image
+    sources : List[DetectedSource]
+        List of detected sources
+    aperture_radius : float
+        Radius of the circular aperture in pixels
+    background_annulus : Tuple[float, float]
+        Inner and outer radius of background annulus in pixels
+    
+    Returns:
+    --------
+    List[Dict]
+        List of dictionaries containing photometry results
+    """
+    return aperture_photometry_sequence([image], sources, aperture_radius, background_annulus)[0]
@@ -12,9 +12,9 @@ from astropy.coordinates import SkyCoord
 from astropy.wcs import WCS
 from astropy.io import fits
 
-import lib.helpers as hlp
-import lib.solver as slv
+import lib.legacy.helpers as hlp
 import config as cfg
+from lib.fits.compression import read_image_header
 
 if __name__ == "__main__":
 
@@ -43,7 +43,11 @@ if __name__ == "__main__":
                         action='store_true', help='skip confirmation')
     parser.add_argument('-o', '--online', action='store_true',
                         help='use online solver (requires internet connection)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='solve again even if a solution is stored for the same image data')
     args = parser.parse_args()
+    # Hints given on the command line apply to every file; otherwise each file's header is used
+    explicit_hints = args.blind or (args.ra is not None and args.dec is not None)
 
     images = ccdp.ImageFileCollection(filenames=args.files)
     print(
@@ -52,9 +56,7 @@ if __name__ == "__main__":
     if (not args.ra and not args.dec) and not args.blind:
         try:
             # Try to read the first file and extract WCS information
-            hdu = fits.open(args.files[0])
-            header = hdu[0].header
-            hdu.close()
+            header = read_image_header(args.files[0])
             
             # Use helper function to extract coordinates
             ra_center, dec_center, has_wcs, source = hlp.extract_coordinates_from_header(header)
@@ -85,6 +87,25 @@ if __name__ == "__main__":
         hlp.prompt()
 
     if args.online:
-        slv.solve_online(args, apiKey)
+        from lib.sci.online_solver import solve_online_batch, constraints_from_options
+        solve_online_batch(args.files, api_key=apiKey, constraints=constraints_from_options(args))
     else:
-        slv.solve_offline(args)
+        from lib.sci.solver_pool import SolverPool, SolveJob
+
+        def report(job):
+            if job.status in SolveJob.FINAL_STATES:
+                print(job)
+
+        constraints = None
+        if explicit_hints:
+            constraints = {'blind': bool(args.blind), 'ra': None, 'dec': None, 'radius': None}
+            if not args.blind:
+                constraints.update(ra=float(args.ra), dec=float(args.dec), radius=float(args.radius))
+        pool = SolverPool()
+        try:
+            jobs = pool.solve_files(args.files, status_callback=report,
+                                    constraints=constraints, use_cache=not args.force)
+        finally:
+            pool.shutdown()
+        solved = sum(job.status == SolveJob.SOLVED for job in jobs)
+        print(f'{Style.BRIGHT}Solved {solved} of {len(jobs)} files.{Style.RESET_ALL}')